@@ -1,9 +1,14 @@
 from flask import Blueprint, jsonify, request
-from datetime import datetime, timedelta
-from services.wind_service import WindService
+from datetime import datetime
+from extensions import wind_service
+from services import metrics
+from services.wind_worker import WindOverloadedError
+from utils.date_utils import get_previous_trading_days
+from utils.resample import period_start
+from utils.serializers import negotiate_format, frame_response, stream_response, UnsupportedFormatError
+from utils.http_cache import conditional_response
 
 stock_api = Blueprint('stock_api', __name__)
-wind_service = WindService()
 
 @stock_api.route('/api/stock/kline', methods=['GET'])
 def get_kline_data():
@@ -12,39 +17,61 @@ def get_kline_data():
         code = request.args.get('code')
         timeframe = request.args.get('timeframe', 'D')  # 默认日线
         limit = int(request.args.get('limit', 100))     # 默认100条数据
+        fmt = negotiate_format(request.args.get('format'), request.accept_mimetypes)
         
-        # 计算日期范围
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        if timeframe == 'D':
-            start_date = (datetime.now() - timedelta(days=limit)).strftime('%Y-%m-%d')
-            options = "PriceAdj=F"  # 前复权
-        elif timeframe == 'W':
-            start_date = (datetime.now() - timedelta(weeks=limit)).strftime('%Y-%m-%d')
-            options = "PriceAdj=F;Period=W"
-        elif timeframe == 'M':
-            start_date = (datetime.now() - timedelta(days=limit*30)).strftime('%Y-%m-%d')
-            options = "PriceAdj=F;Period=M"
+        # 前复权；周线、月线和N分钟线由缓存的日线、1分钟线在本地合成，不再按周期分别请求Wind
+        options = "PriceAdj=F"
+        fields = "open,high,low,close,volume"
+        stream = request.args.get('stream', '').lower() in ('1', 'true')
+        
+        if timeframe in ('D', 'W', 'M'):
+            # 日线按交易日计算起始日期，周线、月线从第limit个周期的第一个交易日开始
+            end_date = datetime.now().strftime('%Y-%m-%d')
+            calendar = wind_service.get_calendar()
+            if timeframe == 'D':
+                start_date = get_previous_trading_days(end_date, limit, calendar)[0]
+            else:
+                start_date = period_start(calendar, end_date, timeframe, limit)
+            
+            # 流式模式按日期窗口逐段获取并输出，默认NDJSON
+            if stream:
+                frames = wind_service.iter_bars(code, fields, start_date, end_date, timeframe, options)
+                return conditional_response(stream_response(frames, 'ndjson' if fmt == 'json' else fmt, 'D'), False)
+            
+            df = wind_service.get_bars(code, fields, start_date, end_date, timeframe, options)
         else:
-            # 分钟级别数据
-            minutes = int(timeframe)
-            start_date = (datetime.now() - timedelta(minutes=minutes*limit)).strftime('%Y-%m-%d')
-            options = f"PriceAdj=F;Period={minutes}"
+            # 分钟级别数据：最近limit根K线，从按交易日分区的1分钟线(w.wsi)尾部读取
+            df = wind_service.get_intraday_bars(code, fields, limit, int(timeframe), options)
+            if stream:
+                return conditional_response(stream_response(iter([df]), 'ndjson' if fmt == 'json' else fmt, 's'), False)
         
-        # 获取数据
-        fields = "open,high,low,close,volume"
-        data = wind_service.get_historical_data(
-            code=code,
-            fields=fields,
-            start_date=start_date,
-            end_date=end_date,
-            options=options
-        )
+        # K线截至当天，ETag按响应内容计算，内容未变化时返回304
+        # 非默认格式直接从DataFrame序列化
+        if fmt != 'json':
+            return conditional_response(frame_response(df, fmt, request.accept_encodings), False)
         
-        return jsonify({
+        with metrics.span('convert'):
+            data = {
+                'dates': df.index.strftime('%Y-%m-%d' if timeframe in ('D', 'W', 'M') else '%Y-%m-%d %H:%M:%S').tolist(),
+                'fields': df.columns.tolist(),
+                'data': df.values.tolist()
+            }
+        
+        return conditional_response(jsonify({
             'success': True,
             'data': data
-        })
+        }), False)
         
+    except UnsupportedFormatError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 406
+    except WindOverloadedError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         return jsonify({
             'success': False,
@@ -59,7 +86,8 @@ def get_realtime_data():
         
         data = wind_service.get_realtime_data(
             codes=code,
-            fields=fields
+            fields=fields,
+            since=request.args.get('since', type=int)
         )
         
         return jsonify({
@@ -67,6 +95,11 @@ def get_realtime_data():
             'data': data
         })
         
+    except WindOverloadedError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         return jsonify({
             'success': False,
@@ -1,21 +1,39 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from flask import Flask, jsonify, request
-from services.wind_service import WindService
+from flask import Flask, Blueprint, Response, current_app, jsonify, request, stream_with_context
+from datetime import datetime, timedelta
+from itertools import chain
+import extensions
+from extensions import wind_service, quote_hub, indicator_store
+from services.wind_worker import WindOverloadedError
+from services.connection import WindUnavailableError
+from services.cache import parse_options
+from services.quote_hub import iter_sse
+from utils.indicators import compute_indicators
+from utils.serializers import negotiate_format, frame_response, stream_response, UnsupportedFormatError
+from utils.http_cache import is_closed_range, request_etag, not_modified, conditional_response
+from services import metrics
+from utils.screen import screen, referenced_fields, ScreenExpressionError
+from utils.wind_utils import get_index_constituents
+import numpy as np
+import time
 import logging
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.config.from_object('config')
+api = Blueprint('api', __name__)
 
-# 初始化Wind服务
-wind_service = WindService()
+def _fully_served(frames):
+    """已按请求参数设置了ETag的流式响应中，某个窗口只返回了已缓存的部分时中断输出"""
+    for df in frames:
+        if df.attrs.get('stale'):
+            raise WindUnavailableError("Wind不可用，流式输出中断")
+        yield df
 
-@app.route('/api/historical', methods=['GET'])
+@api.route('/api/historical', methods=['GET'])
 def get_historical_data():
     """获取历史行情数据API"""
     try:
@@ -24,43 +42,248 @@ def get_historical_data():
         end_date = request.args.get('end_date', '2023-12-31')
         fields = request.args.get('fields', 'open,high,low,close,volume')
         options = request.args.get('options', '')
+        fmt = negotiate_format(request.args.get('format'), request.accept_mimetypes)
+        
+        # 已收盘区间的ETag由请求参数与数据版本计算，客户端缓存未过期时不读取数据
+        closed = is_closed_range(end_date)
+        etag = request_etag(fmt, wind_service.get_data_version(code, options)) if closed else None
+        cached = not_modified(etag, closed)
+        if cached is not None:
+            return cached
+        
+        # 流式模式按日期窗口逐段获取并输出，默认NDJSON
+        if request.args.get('stream', '').lower() in ('1', 'true'):
+            frames = wind_service.iter_historical_frames(code, fields, start_date, end_date, options)
+            first = next(frames, None)
+            if first is not None and first.attrs.get('stale'):
+                closed, etag = None, None
+            elif etag is not None:
+                frames = _fully_served(frames)
+            frames = chain([first] if first is not None else [], frames)
+            # Period=N为分钟线，Arrow的日期列需保留时间
+            unit = 's' if parse_options(options).get('period', 'D').isdigit() else 'D'
+            return conditional_response(stream_response(frames, 'ndjson' if fmt == 'json' else fmt, unit),
+                                        closed, etag)
+        
+        # Wind不可用时只返回了已缓存的部分，不使用按请求参数计算的ETag与长期缓存
+        if fmt != 'json':
+            df = wind_service.get_historical_frame(code, fields, start_date, end_date, options)
+            if df.attrs.get('stale'):
+                closed, etag = None, None
+            return conditional_response(frame_response(df, fmt, request.accept_encodings), closed, etag)
         
         data = wind_service.get_historical_data(code, fields, start_date, end_date, options)
-        return jsonify({
+        if data.get('stale'):
+            closed, etag = None, None
+        return conditional_response(jsonify({
             'success': True, 
             'data': data,
             'message': f'成功获取{code}从{start_date}到{end_date}的历史数据'
-        })
+        }), closed, etag)
+    except UnsupportedFormatError as e:
+        return jsonify({'success': False, 'error': str(e)}), 406
+    except WindOverloadedError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         logger.error(f"获取历史数据失败: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/realtime', methods=['GET'])
+@api.route('/api/historical/batch', methods=['GET', 'POST'])
+def get_historical_batch():
+    """批量获取多只证券的历史行情数据API"""
+    try:
+        params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+        codes = params.get('codes', '000001.SZ')
+        start_date = params.get('start_date', '2023-01-01')
+        end_date = params.get('end_date', '2023-12-31')
+        fields = params.get('fields', 'open,high,low,close,volume')
+        options = params.get('options', '')
+        
+        data = wind_service.get_historical_batch(codes, fields, start_date, end_date, options)
+        return jsonify({
+            'success': True,
+            'data': data,
+            'message': f'成功获取{len(data["codes"])}只证券从{start_date}到{end_date}的历史数据'
+        })
+    except WindOverloadedError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error(f"批量获取历史数据失败: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/indicators', methods=['GET', 'POST'])
+def get_indicators():
+    """批量计算技术指标API"""
+    try:
+        params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+        codes = params.get('codes', '000001.SZ')
+        start_date = params.get('start_date', '2023-01-01')
+        end_date = params.get('end_date', '2023-12-31')
+        options = params.get('options', 'PriceAdj=F')
+        
+        code_list, dates, _, panel = wind_service.get_historical_panel(codes, 'close', start_date, end_date, options)
+        # 日期×证券的收盘价矩阵，一次计算全部证券的指标
+        indicators = compute_indicators(panel[:, :, 0].T)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'codes': code_list,
+                'dates': dates.strftime('%Y-%m-%d').tolist(),
+                # 数据不足的预热期为NaN，转换为null
+                'indicators': {name: np.where(np.isnan(values), None, values).T.tolist()
+                               for name, values in indicators.items()}
+            },
+            'message': f'成功计算{len(code_list)}只证券从{start_date}到{end_date}的技术指标'
+        })
+    except WindOverloadedError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error(f"计算技术指标失败: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/indicators/realtime', methods=['GET'])
+def get_realtime_indicators():
+    """获取基于最新报价增量更新的技术指标API"""
+    try:
+        codes = [c.strip() for c in request.args.get('codes', '000001.SZ').split(',') if c.strip()]
+        today = datetime.now().strftime('%Y-%m-%d')
+        # 周末、节假日的最新价属于最近一个交易日的K线，不追加新K线
+        recent_bars = wind_service.get_calendar().previous_trading_days(today, 2) or [today]
+        bar = recent_bars[-1]
+        
+        # 首次出现的证券，以及状态停留在前一交易日之前(如重启前保存的状态)的证券用近期日线重新初始化
+        new_codes = indicator_store.stale_codes(codes, recent_bars)
+        if new_codes:
+            start_date = (datetime.now() - timedelta(days=current_app.config['INDICATOR_SEED_DAYS'])).strftime('%Y-%m-%d')
+            _, dates, _, panel = wind_service.get_historical_panel(new_codes, 'close', start_date, today, 'PriceAdj=F')
+            bars = dates.strftime('%Y-%m-%d').tolist()
+            for i, code in enumerate(new_codes):
+                indicator_store.seed(code, panel[i, :, 0], bars)
+        
+        # 最新价属于当天K线，同一天内的多次报价覆盖当天的值
+        realtime = wind_service.get_realtime_data(','.join(codes), 'rt_last')
+        values = indicator_store.update_from_realtime(realtime, 'rt_last', bar=bar)
+        
+        return jsonify({
+            'success': True,
+            'data': values,
+            'message': f'成功获取{len(values)}只证券的实时技术指标'
+        })
+    except WindOverloadedError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error(f"获取实时技术指标失败: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/realtime', methods=['GET'])
 def get_realtime_data():
     """获取实时行情数据API"""
     try:
         codes = request.args.get('codes', '000001.SZ')
         fields = request.args.get('fields', 'rt_last,rt_vol,rt_amt')
+        since = request.args.get('since', type=int)
         
-        data = wind_service.get_realtime_data(codes, fields)
+        data = wind_service.get_realtime_data(codes, fields, since)
         return jsonify({
             'success': True, 
             'data': data,
             'message': f'成功获取{codes}的实时数据'
         })
+    except WindOverloadedError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         logger.error(f"获取实时数据失败: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/stream/quotes', methods=['GET'])
+def stream_quotes():
+    """实时行情推送API(Server-Sent Events)"""
+    try:
+        codes = [c.strip() for c in request.args.get('codes', '000001.SZ').split(',') if c.strip()]
+        # 连接关闭时应用上下文可能已结束，取出实际对象
+        hub = quote_hub._get_current_object()
+        client = hub.connect(codes)
+        response = Response(stream_with_context(iter_sse(hub, client, current_app.config['QUOTE_HEARTBEAT'])),
+                            mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        # 生成器尚未开始迭代时连接即关闭，也要释放订阅
+        response.call_on_close(lambda: hub.disconnect(client))
+        return response
+    except WindOverloadedError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error(f"订阅实时行情失败: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/screen', methods=['GET', 'POST'])
+def screen_stocks():
+    """按截面数据筛选、排序证券API"""
+    try:
+        params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+        universe = params.get('universe', 'A').strip().upper()  # A为全部A股，或指数代码如000300.SH
+        date = params.get('date') or datetime.now().strftime('%Y-%m-%d')
+        condition = params.get('filter', '').strip()
+        sort = params.get('sort', '').strip()
+        ascending = str(params.get('order', 'desc')).lower() == 'asc'
+        limit = min(int(params.get('limit', 50)), current_app.config['SCREEN_MAX_LIMIT'])
+        fields = params.get('fields') or current_app.config['SCREEN_DEFAULT_FIELDS']
+        
+        # 返回的字段加上筛选与排序引用的字段
+        field_list = [f.strip().lower() for f in fields.split(',') if f.strip()]
+        for expression in (condition, sort):
+            if expression:
+                field_list += [f for f in referenced_fields(expression) if f not in field_list]
+        
+        started = time.perf_counter()
+        codes = wind_service.get_market_codes(date) if universe == 'A' else get_index_constituents(universe, date)
+        if not codes:
+            raise Exception(f"无法获取{universe}的成分股")
+        columns = wind_service.get_cross_section(codes, field_list, date)
+        matched, selected = screen(codes, columns, condition, sort, ascending, limit)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'date': date,
+                'universe': universe,
+                'total': len(codes),
+                'matched': matched,
+                'codes': np.asarray(codes, dtype=object)[selected].tolist(),
+                'fields': [f.upper() for f in field_list],
+                # NaN转换为null
+                'data': [[None if isinstance(v, float) and v != v else v for v in row]
+                         for row in zip(*(columns[f.upper()][selected].tolist() for f in field_list))],
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+            },
+            'message': f'{universe}中{matched}只证券满足条件'
+        })
+    except (ScreenExpressionError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except WindOverloadedError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error(f"选股失败: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查API"""
     try:
         is_connected = wind_service.check_connection() if hasattr(wind_service, 'check_connection') else True
+        stats = dict(wind_service.get_stats(), quote_stream=quote_hub.stats())
+        # 启用盘前预热时附加最近一次预热的耗时汇总
+        if 'prewarm' in current_app.extensions['wind']:
+            stats['prewarm'] = current_app.extensions['wind']['prewarm'].stats()
+        # 通过asgi.py运行时附加ASGI服务的请求统计
+        if 'asgi' in current_app.extensions:
+            stats['asgi'] = current_app.extensions['asgi'].stats()
         return jsonify({
             'success': True,
             'status': 'running',
-            'wind_connected': is_connected
+            'wind_connected': is_connected,
+            'stats': stats
         })
     except Exception as e:
         return jsonify({
@@ -69,11 +292,56 @@ def health_check():
             'error': str(e)
         }), 500
 
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus指标：各段耗时直方图、缓存命中率、队列深度与连接状态"""
+    try:
+        stats = wind_service.get_stats()
+    except Exception as e:
+        # 抓取进程不可用时仍输出本进程的耗时直方图
+        logger.warning(f"获取服务统计失败: {str(e)}")
+        stats = None
+    return Response(metrics.render(stats), content_type=metrics.CONTENT_TYPE)
+
+def create_app(config_object='config'):
+    """
+    创建Flask应用
+    
+    WindService在首次使用时创建并由所有蓝图共享；Wind连接在后台预热，
+    启动后即可响应/api/health，不等待Wind的启动超时
+    
+    Args:
+        config_object (str or object, optional): 配置对象或模块名
+    
+    Returns:
+        flask.Flask: 应用
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    extensions.init_app(app)
+    metrics.init_app(app)
+    
+    # 蓝图在应用创建时才导入，导入过程不访问Wind
+    from api.stock_api import stock_api
+    from controllers.market_data_controller import market_data
+    app.register_blueprint(api)
+    app.register_blueprint(stock_api)
+    app.register_blueprint(market_data, url_prefix='/market')
+    
+    if app.config['WIND_WARM_UP']:
+        extensions.warm_up(app)
+    # 多进程部署时由抓取进程预热
+    if app.config['PREWARM_ENABLED'] and not app.config['FETCHER_ADDRESS']:
+        extensions.get_prewarm_scheduler(app)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     # 打印测试数据
     print("测试WindPy获取历史行情数据:")
     try:
-        test_data = wind_service.get_historical_data('000001.SZ', 'open,high,low,close', '2023-01-01', '2023-01-10')
+        test_data = extensions.get_wind_service(app).get_historical_data('000001.SZ', 'open,high,low,close', '2023-01-01', '2023-01-10')
         print("获取数据成功:")
         print(f"日期: {test_data['dates'][:3]}...")
         print(f"字段: {test_data['fields']}")
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ASGI服务入口
+复用app.py中的Flask应用与全部路由：每个请求由协程持有，同步视图在有界线程池中执行并等待其结果，
+线程只在视图实际执行(等待Wind工作线程或读取缓存)时占用；等待线程池的请求超过ASYNC_MAX_PENDING时返回503。
+实时推送(/api/stream/quotes)为原生协程实现，行情到达时由推送线程唤醒，长连接不占用线程
+
+用法:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+    python asgi.py  # 未安装uvicorn时使用内置的简易HTTP服务器，仅用于开发与基准测试
+"""
+
+import io
+import os
+import sys
+import json
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote
+
+import extensions
+from app import app as flask_app
+from services.quote_hub import format_sse
+from services.wind_worker import WindOverloadedError
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def _environ(scope, body):
+    """由ASGI的scope构造WSGI的environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'content-length':
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _send_json(send, status, payload, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                            *headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class AsgiApp:
+    """将Flask应用包装为ASGI应用"""
+
+    def __init__(self, flask_app, max_workers=64, max_pending=1024, heartbeat=15):
+        """
+        初始化ASGI应用
+
+        Args:
+            flask_app (flask.Flask): 提供路由的Flask应用
+            max_workers (int, optional): 执行同步视图的线程数
+            max_pending (int, optional): 执行中与等待线程的请求数上限，超过时返回503
+            heartbeat (float, optional): 实时推送无更新时发送心跳的间隔(秒)
+        """
+        self.flask_app = flask_app
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='asgi-worker')
+        self.max_workers = max_workers
+        # 计数只在事件循环线程中修改
+        self._pending = 0
+        self._streams = 0
+        self._stats = {'requests': 0, 'rejected': 0}
+        flask_app.extensions['asgi'] = self
+
+    def stats(self):
+        """
+        获取ASGI服务统计
+
+        Returns:
+            dict: 请求数、被拒绝的请求数、执行中与等待中的请求数及推送连接数
+        """
+        return dict(self._stats, pending=self._pending, streams=self._streams, max_workers=self.max_workers)
+
+    def _run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            self._stats['requests'] += 1
+            if scope['method'] == 'GET' and scope['path'] == '/api/stream/quotes':
+                await self._stream_quotes(scope, receive, send)
+            else:
+                await self._call_wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _call_wsgi(self, scope, receive, send):
+        """在线程池中执行Flask应用，等待线程期间不占用线程"""
+        if self._pending >= self.max_pending:
+            self._stats['rejected'] += 1
+            await _send_json(send, 503, {'success': False, 'error': '服务繁忙，请稍后重试'}, [(b'retry-after', b'1')])
+            return
+
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        self._pending += 1
+        try:
+            # 流式响应的各段在不同线程中生成，需在同一上下文中执行
+            context = contextvars.copy_context()
+            status, headers, chunks, result = await self._run(context.run, self._start_wsgi, _environ(scope, body))
+            await send({'type': 'http.response.start', 'status': status,
+                        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                    for name, value in headers]})
+            if chunks is not None:
+                await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+                return
+            try:
+                iterator = iter(result)
+                while True:
+                    chunk = await self._run(context.run, next, iterator, None)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                await send({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(result, 'close'):
+                    await self._run(context.run, result.close)
+        finally:
+            self._pending -= 1
+
+    def _start_wsgi(self, environ):
+        """
+        在线程中调用WSGI应用
+
+        Returns:
+            tuple: (状态码, 响应头, 已读完的响应体或None, 流式响应的可迭代对象)
+        """
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'], response['headers'] = int(status.split(' ', 1)[0]), headers
+
+        result = self.flask_app(environ, start_response)
+        # 长度已知的响应直接读完，只有流式响应逐段返回
+        if any(name.lower() == 'content-length' for name, _ in response['headers']):
+            try:
+                return response['status'], response['headers'], list(result), None
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        return response['status'], response['headers'], None, result
+
+    async def _stream_quotes(self, scope, receive, send):
+        """实时行情推送(Server-Sent Events)，推送线程放入更新时唤醒协程"""
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        codes = [c.strip() for c in query.get('codes', ['000001.SZ'])[0].split(',') if c.strip()]
+        try:
+            hub = await self._run(extensions.get_quote_hub, self.flask_app)
+            client = await self._run(hub.connect, codes)
+        except WindOverloadedError as e:
+            await _send_json(send, 503, {'success': False, 'error': str(e)}, [(b'retry-after', str(e.retry_after).encode())])
+            return
+        except Exception as e:
+            logger.error(f"订阅实时行情失败: {str(e)}")
+            await _send_json(send, 500, {'success': False, 'error': str(e)})
+            return
+
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        client.notify = lambda: loop.call_soon_threadsafe(wake.set)
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        self._streams += 1
+        try:
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                                    (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]})
+            while True:
+                update = client.get(timeout=0)
+                if update is None:
+                    # 先清除再检查一次，避免错过清除前放入的更新
+                    wake.clear()
+                    update = client.get(timeout=0)
+                if update is None:
+                    waiter = asyncio.ensure_future(wake.wait())
+                    done, _ = await asyncio.wait({waiter, disconnected}, timeout=self.heartbeat,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    waiter.cancel()
+                    if disconnected in done:
+                        break
+                    if waiter in done:
+                        continue
+                await send({'type': 'http.response.body', 'body': format_sse(update).encode('utf-8'),
+                            'more_body': True})
+        finally:
+            self._streams -= 1
+            disconnected.cancel()
+            client.notify = None
+            await self._run(hub.disconnect, client)
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+
+async def serve(app, host='0.0.0.0', port=5000):
+    """
+    简易HTTP/1.1服务器，未安装uvicorn时用于开发与基准测试；每个连接只处理一个请求
+
+    Args:
+        app: ASGI应用
+        host (str, optional): 监听地址
+        port (int, optional): 监听端口
+    """
+    async def handle(reader, writer):
+        disconnected = asyncio.Event()
+        watcher = None
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            headers = []
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+            length = int(dict(headers).get(b'content-length', b'0'))
+            body = await reader.readexactly(length) if length else b''
+            path, _, query = target.partition('?')
+
+            async def watch():
+                # 客户端关闭连接时读到EOF
+                await reader.read(1)
+                disconnected.set()
+            watcher = asyncio.ensure_future(watch())
+
+            request = {'type': 'http.request', 'body': body, 'more_body': False}
+
+            async def receive():
+                nonlocal request
+                if request is not None:
+                    message, request = request, None
+                    return message
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    lines = [f"HTTP/1.1 {message['status']} {_REASONS.get(message['status'], '')}"]
+                    lines += [f"{name.decode('latin-1')}: {value.decode('latin-1')}"
+                              for name, value in message.get('headers', [])]
+                    lines.append('connection: close')
+                    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+                else:
+                    writer.write(message.get('body', b''))
+                await writer.drain()
+
+            await app({'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': version.split('/', 1)[-1],
+                       'method': method, 'scheme': 'http', 'path': unquote(path), 'raw_path': path.encode('latin-1'),
+                       'query_string': query.encode('latin-1'), 'root_path': '', 'headers': headers,
+                       'client': writer.get_extra_info('peername')[:2], 'server': (host, port)}, receive, send)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port, backlog=4096)
+    logger.info(f"ASGI服务已启动(内置服务器)，地址: http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 406: 'Not Acceptable',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+app = AsgiApp(flask_app, flask_app.config['ASYNC_MAX_WORKERS'], flask_app.config['ASYNC_MAX_PENDING'],
+              flask_app.config['QUOTE_HEARTBEAT'])
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    port = int(os.environ.get("PORT", 5000))
+    host = os.environ.get("HOST", "0.0.0.0")
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+    if uvicorn is not None:
+        uvicorn.run(app, host=host, port=port, log_level='warning')
+    else:
+        logger.warning("未安装uvicorn，使用内置的简易HTTP服务器")
+        asyncio.run(serve(app, host, port))
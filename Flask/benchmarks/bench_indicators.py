@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+技术指标计算基准测试
+比较向量化引擎与逐只证券调用pandas计算的耗时
+
+用法:
+    python benchmarks/bench_indicators.py [交易日数]
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# 添加项目目录到系统路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indicators import compute_indicators
+
+try:
+    from utils.wind_utils import calculate_technical_indicators
+except ImportError:
+    calculate_technical_indicators = None
+
+SYMBOL_COUNTS = [1, 10, 100, 300, 1000, 5000]
+
+def per_symbol(close):
+    """逐只证券调用calculate_technical_indicators"""
+    for j in range(close.shape[1]):
+        calculate_technical_indicators(pd.DataFrame({'close': close[:, j]}))
+
+def timeit(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = np.random.default_rng(0)
+    print(f"交易日数: {days}")
+    print(f"{'证券数':>8}{'向量化(ms)':>14}{'逐只pandas(ms)':>18}{'加速比':>10}")
+
+    for n in SYMBOL_COUNTS:
+        close = 10 + np.cumsum(rng.normal(0, 0.2, (days, n)), axis=0)
+        vectorized = timeit(lambda: compute_indicators(close))
+        if calculate_technical_indicators is None:
+            print(f"{n:>8}{vectorized * 1000:>14.1f}{'(无WindPy，跳过)':>18}")
+            continue
+        # 逐只计算在证券数较多时耗时很长，只运行一次
+        baseline = timeit(lambda: per_symbol(close), repeat=1 if n >= 1000 else 3)
+        print(f"{n:>8}{vectorized * 1000:>14.1f}{baseline * 1000:>18.1f}{baseline / vectorized:>10.1f}x")
+
+if __name__ == "__main__":
+    main()
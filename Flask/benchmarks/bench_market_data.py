@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+MarketData基准测试
+比较原有的列表+DataFrame实现与连续数组实现每100万条K线的内存占用，以及按日期过滤和序列化的耗时
+
+用法:
+    python benchmarks/bench_market_data.py [行数]
+"""
+
+import gc
+import sys
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# 添加项目目录到系统路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.market_data import MarketData
+
+FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+class LegacyMarketData:
+    """原实现: 同时保存原始列表和DataFrame，过滤时复制后用布尔掩码"""
+
+    def __init__(self, data=None):
+        self.data = data if data else {}
+        self.df = None
+        if data:
+            df = pd.DataFrame(data['data'], index=data['dates'], columns=data['fields'])
+            df.index = pd.to_datetime(df.index)
+            self.df = df
+
+    def to_json(self):
+        df_reset = self.df.reset_index()
+        df_reset.rename(columns={'index': 'date'}, inplace=True)
+        df_reset['date'] = df_reset['date'].dt.strftime('%Y-%m-%d')
+        return df_reset.to_dict(orient='records')
+
+    def filter_by_date_range(self, start_date=None, end_date=None):
+        df_copy = self.df.copy()
+        if start_date:
+            df_copy = df_copy[df_copy.index >= pd.to_datetime(start_date)]
+        if end_date:
+            df_copy = df_copy[df_copy.index <= pd.to_datetime(end_date)]
+        filtered_data = LegacyMarketData()
+        filtered_data.df = df_copy
+        return filtered_data
+
+def make_data(rows):
+    """生成分钟线规模的原始数据字典（与Wind返回转换后的格式相同）"""
+    rng = np.random.default_rng(0)
+    close = 10 + np.cumsum(rng.normal(0, 0.05, rows))
+    values = np.column_stack([close, close + 0.1, close - 0.1, close, rng.integers(1e5, 1e7, rows)])
+    dates = pd.date_range('2015-01-05 09:31', periods=rows, freq='min').strftime('%Y-%m-%d %H:%M:%S').tolist()
+    return {'dates': dates, 'fields': FIELDS, 'data': values.tolist()}
+
+def measure_memory(factory, data):
+    """构造对象期间新分配且仍被持有的内存(字节)，原始数据计入对象自身持有的部分"""
+    gc.collect()
+    tracemalloc.start()
+    obj = factory(data)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+def timeit(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    data = make_data(rows)
+    # 原实现保留传入的列表，这部分内存按每条K线计入
+    raw_size = sum(sys.getsizeof(row) + 5 * 24 for row in data['data']) + sum(map(sys.getsizeof, data['dates']))
+    start, end = data['dates'][rows // 4], data['dates'][rows // 2]
+    print(f"行数: {rows}, 字段数: {len(FIELDS)}")
+    print(f"{'实现':<10}{'内存/100万条(MB)':>18}{'过滤(ms)':>12}{'过滤后序列化(ms)':>20}")
+
+    for name, factory, retained in (('legacy', LegacyMarketData, raw_size), ('arrays', MarketData, 0)):
+        obj, allocated = measure_memory(factory, data)
+        per_million = (allocated + retained) / rows * 1_000_000 / 1024 / 1024
+        filter_seconds = timeit(lambda: obj.filter_by_date_range(start, end))
+        filtered = obj.filter_by_date_range(start, end)
+        json_seconds = timeit(filtered.to_json, repeat=3)
+        print(f"{name:<10}{per_million:>18.1f}{filter_seconds * 1000:>12.3f}{json_seconds * 1000:>20.1f}")
+        del obj, filtered
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+实时行情增量返回基准测试
+比较每次返回全部行情与按版本号只返回变化行情的响应大小与编码耗时
+
+用法:
+    python benchmarks/bench_quote_store.py [每次变化的证券比例]
+"""
+
+import sys
+import os
+import json
+import time
+
+import numpy as np
+
+# 添加项目目录到系统路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.quote_store import QuoteStore
+
+WATCHLIST_SIZES = [100, 1000, 5000]
+FIELDS = ['RT_LAST', 'RT_VOL', 'RT_AMT', 'RT_CHG', 'RT_PCT_CHG']
+
+def timeit(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    ratio = float(sys.argv[1]) if len(sys.argv) > 1 else 0.01
+    rng = np.random.default_rng(0)
+    print(f"每次变化比例: {ratio:.1%}")
+    print(f"{'证券数':>8}{'全量(KB)':>12}{'增量(KB)':>12}{'全量(ms)':>12}{'增量(ms)':>12}")
+
+    for n in WATCHLIST_SIZES:
+        codes = [f'{i:06d}.SZ' for i in range(n)]
+        values = rng.random((n, len(FIELDS))) * 100
+        store = QuoteStore()
+        store.update(codes, FIELDS, values)
+        version = store.snapshot(codes[:1], FIELDS)['version']
+
+        # 模拟下一次轮询时只有少量证券价格变化
+        changed = rng.choice(n, max(int(n * ratio), 1), replace=False)
+        values[changed, 0] += 0.01
+        store.update(codes, FIELDS, values)
+
+        full_time, full = timeit(lambda: json.dumps(store.snapshot(codes, FIELDS)))
+        delta_time, delta = timeit(lambda: json.dumps(store.snapshot(codes, FIELDS, since=version)))
+        print(f"{n:>8}{len(full) / 1024:>12.1f}{len(delta) / 1024:>12.2f}"
+              f"{full_time * 1000:>12.2f}{delta_time * 1000:>12.2f}")
+
+if __name__ == '__main__':
+    main()
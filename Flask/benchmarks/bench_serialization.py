@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+历史行情序列化基准测试
+比较原有的tolist+jsonify方式与列式JSON、NDJSON、MessagePack、Arrow IPC的耗时和响应体大小
+
+用法:
+    python benchmarks/bench_serialization.py [行数]
+"""
+
+import gzip
+import json
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# 添加项目目录到系统路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import serializers
+from utils.serializers import serialize_frame
+
+def make_frame(rows):
+    """生成多年分钟线规模的OHLCV数据"""
+    rng = np.random.default_rng(0)
+    close = 10 + np.cumsum(rng.normal(0, 0.05, rows))
+    index = pd.date_range('2015-01-05 09:31', periods=rows, freq='min')
+    return pd.DataFrame({
+        'OPEN': close + rng.normal(0, 0.02, rows),
+        'HIGH': close + 0.1,
+        'LOW': close - 0.1,
+        'CLOSE': close,
+        'VOLUME': rng.integers(1e5, 1e7, rows).astype(np.float64),
+    }, index=index)
+
+def legacy_json(df):
+    """原实现: strftime + tolist 后由json编码(等价于jsonify)"""
+    data = {
+        'dates': df.index.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+        'fields': df.columns.tolist(),
+        'data': df.values.tolist()
+    }
+    return json.dumps({'success': True, 'data': data}).encode('utf-8')
+
+def timeit(func, repeat=5):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = make_frame(rows)
+    print(f"行数: {rows}, 字段数: {len(df.columns)}")
+    print(f"{'格式':<16}{'耗时(ms)':>12}{'大小(KB)':>14}")
+
+    cases = [('legacy json', lambda: legacy_json(df)),
+             ('legacy json+gz', lambda: gzip.compress(legacy_json(df), 6))]
+    for fmt in ('columnar', 'ndjson', 'msgpack', 'arrow'):
+        if fmt == 'arrow' and serializers.pa is None or fmt == 'msgpack' and serializers.msgpack is None:
+            print(f"{fmt:<16}{'跳过(缺少可选依赖)':>26}")
+            continue
+        cases.append((fmt, lambda fmt=fmt: serialize_frame(df, fmt)[0]))
+        if fmt in ('columnar', 'ndjson'):
+            cases.append((f'{fmt}+gz', lambda fmt=fmt: serialize_frame(df, fmt, gzip_level=6)[0]))
+
+    for name, func in cases:
+        elapsed, body = timeit(func, repeat=3)
+        print(f"{name:<16}{elapsed * 1000:>12.1f}{len(body) / 1024:>14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+启动耗时基准测试
+在新进程中分别测量导入应用模块、创建应用、首次响应/api/health以及Wind连接完成的耗时；
+用离线数据源模拟Wind的启动等待，验证健康检查不受其影响
+
+用法:
+    python benchmarks/bench_startup.py [模拟的w.start耗时(秒)]
+"""
+
+import sys
+import os
+import json
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行，保证导入耗时为冷启动
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+
+import services.data_provider as data_provider
+start_delay = float(sys.argv[1])
+original_start = data_provider.ReplayProvider.start
+def slow_start(self, waitTime=120):
+    time.sleep(start_delay)
+    return original_start(self, waitTime)
+data_provider.ReplayProvider.start = slow_start
+t1 = time.perf_counter()
+
+from app import create_app
+t2 = time.perf_counter()
+app = create_app()
+t3 = time.perf_counter()
+response = app.test_client().get('/api/health')
+t4 = time.perf_counter()
+connected = response.get_json()['wind_connected']
+
+import extensions
+while not extensions.get_wind_service(app).check_connection():
+    time.sleep(0.01)
+t5 = time.perf_counter()
+
+print(json.dumps({
+    'import_provider': t1 - t0,
+    'import_app': t2 - t1,
+    'create_app': t3 - t2,
+    'first_health': t4 - t3,
+    'ready_to_health': t4 - t0,
+    'connected_at_health': connected,
+    'wind_connected': t5 - t0,
+}))
+'''
+
+def main():
+    start_delay = sys.argv[1] if len(sys.argv) > 1 else '2'
+    env = dict(os.environ, DATA_PROVIDER='replay', CACHE_DIR='')
+    output = subprocess.run([sys.executable, '-c', CHILD, start_delay], cwd=PROJECT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    print(f"模拟w.start耗时: {start_delay}秒")
+    print(f"{'阶段':<28}{'耗时(ms)':>12}")
+    for key, label in [('import_provider', '导入数据源模块'), ('import_app', '导入app模块(含默认应用)'),
+                       ('create_app', 'create_app()'), ('first_health', '首次/api/health'),
+                       ('ready_to_health', '进程启动至可响应健康检查'), ('wind_connected', '进程启动至Wind连接完成')]:
+        print(f"{label:<28}{result[key] * 1000:>12.1f}")
+    print(f"健康检查时Wind是否已连接: {result['connected_at_health']}")
+
+if __name__ == '__main__':
+    main()
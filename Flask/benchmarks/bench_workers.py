@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多进程部署吞吐基准测试
+启动一个抓取进程(离线数据源)，再分别用1..N个工作进程并发请求/api/historical，
+比较总吞吐随工作进程数的变化，以及抓取进程的Wind连接数与上游调用数
+
+用法:
+    python benchmarks/bench_workers.py [最大工作进程数] [每轮持续时间(秒)]
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from services.fetcher import FetcherClient
+
+CODES = [f'{600000 + i:06d}.SH' for i in range(50)]
+
+# 工作进程：通过Flask测试客户端循环请求，统计持续时间内完成的请求数；持续时间为0时每只证券请求一次
+CHILD = r'''
+import json, sys, time
+from app import create_app
+codes, duration = json.loads(sys.argv[1]), float(sys.argv[2])
+client = create_app().test_client()
+count, i = 0, 0
+deadline = time.perf_counter() + duration
+while (time.perf_counter() < deadline) if duration > 0 else i < len(codes):
+    response = client.get(f'/api/historical?code={codes[i % len(codes)]}&start_date=2023-01-01&end_date=2023-12-31')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    count, i = count + 1, i + 1
+print(json.dumps({'requests': count}))
+'''
+
+def run_workers(n, duration, env):
+    processes = [subprocess.Popen([sys.executable, '-c', CHILD, json.dumps(CODES), str(duration)],
+                                  cwd=PROJECT_DIR, env=env, stdout=subprocess.PIPE, text=True)
+                 for _ in range(n)]
+    total = 0
+    for process in processes:
+        output, _ = process.communicate()
+        total += json.loads(output.strip().splitlines()[-1])['requests']
+    return total
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else min(os.cpu_count() or 1, 4)
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    tmp_dir = tempfile.mkdtemp(prefix='bench-workers-')
+    env = dict(os.environ, DATA_PROVIDER='replay', REPLAY_LATENCY='0.002', CACHE_DIR=os.path.join(tmp_dir, 'cache'),
+               FETCHER_ADDRESS=os.path.join(tmp_dir, 'fetcher.sock'), QUOTE_SHM_PATH=os.path.join(tmp_dir, 'quotes'),
+               FETCHER_AUTHKEY='bench')
+    fetcher = subprocess.Popen([sys.executable, os.path.join(PROJECT_DIR, 'run_fetcher.py')], cwd=PROJECT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        client = FetcherClient(env['FETCHER_ADDRESS'], b'bench')
+        while not os.path.exists(env['FETCHER_ADDRESS']):
+            time.sleep(0.05)
+        # 预热：由抓取进程补取全部证券的缓存
+        run_workers(1, 0, env)
+
+        print(f"CPU核数: {os.cpu_count()}，每轮{duration}秒")
+        print(f"{'工作进程数':<10}{'请求数':>10}{'吞吐(请求/秒)':>16}")
+        for n in range(1, max_workers + 1):
+            total = run_workers(n, duration, env)
+            print(f"{n:<14}{total:>10}{total / duration:>16.1f}")
+
+        stats = client.call('get_stats')
+        print(f"抓取进程: Wind连接尝试{stats['connection']['reconnect_attempts']}次，"
+              f"上游调用{stats['singleflight']['upstream_calls']}次，处理请求{stats['fetcher']['requests']}次")
+        client.close()
+    finally:
+        fetcher.terminate()
+        fetcher.wait()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+同步(WSGI)与异步(ASGI)服务的压力测试
+在离线数据源上分别启动run.py使用的Flask多线程服务器与asgi.py，
+以相同的并发连接数混合请求Wind调用较慢的实时行情与已缓存的历史行情，
+比较吞吐、各接口延迟分位数、状态码分布以及服务进程的线程数与内存峰值
+
+用法:
+    python benchmarks/load_test.py [--concurrency 200] [--duration 10] [--latency 0.05]
+"""
+
+import os
+import sys
+import time
+import json
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import threading
+from collections import Counter
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+
+SERVERS = {
+    'sync': [sys.executable, '-c', "import os; from app import app; "
+             "app.run(host='127.0.0.1', port=int(os.environ['PORT']), debug=False, threaded=True)"],
+    'async': [sys.executable, 'asgi.py'],
+}
+
+# 实时行情每次都调用w.wsq，历史行情在预热后命中缓存
+PATHS = {
+    'realtime': '/api/realtime?codes=000001.SZ,600000.SH',
+    'historical': '/api/historical?code=000001.SZ&start_date=2023-01-01&end_date=2023-06-30',
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def fetch(port, path):
+    """发送一个GET请求，返回(状态码, 耗时)；连接失败时状态码为0"""
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        writer.close()
+        status = int(status_line.split()[1])
+    except (OSError, IndexError, ValueError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+async def load(port, concurrency, duration):
+    """concurrency个连接交替请求各接口，持续duration秒"""
+    results = {name: [] for name in PATHS}
+    deadline = time.perf_counter() + duration
+    names = list(PATHS)
+
+    async def client(i):
+        n = i
+        while time.perf_counter() < deadline:
+            name = names[n % len(names)]
+            results[name].append(await fetch(port, PATHS[name]))
+            n += 1
+
+    await asyncio.gather(*[client(i) for i in range(concurrency)])
+    return results
+
+
+class ProcessSampler(threading.Thread):
+    """定时读取/proc中服务进程的线程数与常驻内存，记录峰值(仅Linux)"""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.path = f'/proc/{pid}/status'
+        self.threads = 0
+        self.rss_kb = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(0.1) and os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    status = dict(line.split(':', 1) for line in f if ':' in line)
+            except OSError:
+                return
+            self.threads = max(self.threads, int(status['Threads']))
+            self.rss_kb = max(self.rss_kb, int(status['VmRSS'].split()[0]))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else float('nan')
+
+
+def run_server(name, args):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), DATA_PROVIDER='replay', REPLAY_LATENCY=str(args.latency),
+               CACHE_DIR=tempfile.mkdtemp(prefix=f'load-test-{name}-'))
+    env.pop('FETCHER_ADDRESS', None)
+    process = subprocess.Popen(SERVERS[name], cwd=PROJECT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # 等待服务可响应并预热缓存
+        deadline = time.time() + 30
+        while asyncio.run(fetch(port, '/api/health'))[0] != 200:
+            if time.time() > deadline or process.poll() is not None:
+                raise RuntimeError(f"{name}服务启动失败")
+            time.sleep(0.1)
+        asyncio.run(fetch(port, PATHS['historical']))
+
+        sampler = ProcessSampler(process.pid)
+        sampler.start()
+        started = time.perf_counter()
+        results = asyncio.run(load(port, args.concurrency, args.duration))
+        elapsed = time.perf_counter() - started
+        sampler.stopped.set()
+        sampler.join()
+        return results, elapsed, sampler
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='同步与异步服务压力测试')
+    parser.add_argument('--concurrency', type=int, default=200, help='并发连接数')
+    parser.add_argument('--duration', type=float, default=10, help='每个服务的测试时长(秒)')
+    parser.add_argument('--latency', type=float, default=0.05, help='离线数据源每次Wind调用的模拟延迟(秒)')
+    parser.add_argument('--servers', default='sync,async', help='测试的服务，逗号分隔')
+    args = parser.parse_args()
+
+    print(f"并发连接: {args.concurrency}，时长: {args.duration}秒，模拟Wind延迟: {args.latency * 1000:.0f}ms")
+    summary = {}
+    for name in args.servers.split(','):
+        results, elapsed, sampler = run_server(name, args)
+        total = sum(len(r) for r in results.values())
+        print(f"\n[{name}] 吞吐: {total / elapsed:.1f}请求/秒，峰值线程数: {sampler.threads}，"
+              f"峰值内存: {sampler.rss_kb / 1024:.1f}MB")
+        print(f"{'接口':<12}{'请求数':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}  状态码")
+        for path_name, values in results.items():
+            latencies = [latency * 1000 for _, latency in values]
+            statuses = Counter(status for status, _ in values)
+            print(f"{path_name:<12}{len(values):>8}{percentile(latencies, 0.5):>10.1f}"
+                  f"{percentile(latencies, 0.99):>10.1f}{max(latencies, default=float('nan')):>10.1f}  "
+                  f"{dict(sorted(statuses.items()))}")
+        summary[name] = {'throughput': total / elapsed, 'threads': sampler.threads, 'rss_mb': sampler.rss_kb / 1024}
+    print('\n' + json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,85 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # Flask配置
 DEBUG = True
 SECRET_KEY = 'wind-flask-app-secret-key'
 
 # WindPy配置
 WIND_WAIT_TIME = 120  # Wind API命令超时时间(秒)
+WIND_WORKERS = 1  # Wind工作线程数(WindPy为进程内全局会话)
+WIND_QUEUE_SIZE = 64  # Wind请求队列上限，超过时返回503
+WIND_RETRY_AFTER = 1  # 队列已满时Retry-After响应头(秒)
+WIND_BATCH_SIZE = 100  # 批量接口单次w.wsd请求的证券数量上限
+WIND_SNAPSHOT_BATCH_SIZE = 1000  # 补取截面数据(选股)时单次w.wss请求的证券数量上限
+WIND_WARM_UP = True  # 启动时在后台建立Wind连接，不阻塞启动
+WIND_CONNECT_WAIT = 5  # 未连接时请求等待后台连接完成的最长时间(秒)，超过时返回503
+WIND_BREAKER_THRESHOLD = 5  # 连续上游失败达到该次数时熔断
+WIND_BREAKER_RESET = 30  # 熔断后放行试探请求前的等待时间(秒)
+
+# 数据源配置
+DATA_PROVIDER = os.environ.get('DATA_PROVIDER', 'wind')  # wind: 真实WindPy；replay: 离线回放/模拟数据
+REPLAY_DIR = os.environ.get('REPLAY_DIR') or None  # 录制结果目录，replay数据源优先回放其中的结果
+REPLAY_LATENCY = float(os.environ.get('REPLAY_LATENCY', 0))  # replay数据源每次调用的模拟延迟(秒)
+REPLAY_RECORD = os.environ.get('REPLAY_RECORD', '').lower() in ('1', 'true')  # 将wind数据源的结果录制到REPLAY_DIR
+
+# 历史行情缓存配置
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, 'cache'))  # 列式缓存目录，置空则禁用缓存
+
+# HTTP缓存配置(见utils/http_cache.py)
+HTTP_CACHE_CLOSED_MAX_AGE = 86400  # 结束日期早于今天的历史行情的max-age(秒)
+HTTP_CACHE_OPEN_MAX_AGE = 5  # 含当天行情的max-age(秒)，为0时每次需向服务端验证
+HTTP_CACHE_VERSION = '1'  # 参与计算所有ETag，修订已缓存的历史数据后修改以使客户端缓存失效
+
+# 指数成分与行业分类时点存储配置(见services/pit_store.py)
+PIT_HISTORY_START = '2005-01-01'  # 首次加载指数成分时获取调整记录的起始日期，更早日期的成分按日向Wind查询
+
+# 盘前缓存预热配置(见services/prewarm.py)，多进程部署时由抓取进程执行
+PREWARM_ENABLED = os.environ.get('PREWARM_ENABLED', 'true').lower() in ('1', 'true')  # 每个交易日开盘前预热指数成分股的缓存
+PREWARM_TIME = '08:30'  # 每天的预热时间，启动时已过该时间且当天未完成则立即执行
+PREWARM_INDEXES = '000300.SH,000905.SH'  # 预热的指数成分股(沪深300、中证500)
+PREWARM_FIELDS = 'open,high,low,close,volume'  # 预热的日线字段
+PREWARM_OPTIONS = ''  # 预热日线的Wind选项，如'PriceAdj=F'
+PREWARM_HISTORY_DAYS = 365  # 日线回溯的自然日数
+PREWARM_FUNDAMENTAL_FIELDS = 'pe_ttm,pb,ps_ttm'  # 预热的基本面字段，置空则不预热
+PREWARM_INDUSTRY_STANDARD = 'sw'  # 预热的行业分类标准，置空则不预热
+PREWARM_CONCURRENCY = 4  # 同时执行的预热任务数，Wind调用仍经工作线程排队，用户请求优先
+PREWARM_BATCH_SIZE = 100  # 每个预热任务的证券数
+PREWARM_RETRY_INTERVAL = 300  # 有任务失败时重新执行(跳过已完成任务)的间隔(秒)
+
+# 实时指标配置
+INDICATOR_SEED_DAYS = 180  # 初始化增量指标状态时回溯的自然日数(需覆盖60日均线)
+
+# 实时行情推送配置
+QUOTE_FIELDS = 'rt_last,rt_vol,rt_amt,rt_chg,rt_pct_chg'  # w.wsq订阅字段
+QUOTE_CLIENT_QUEUE_SIZE = 256  # 每个推送连接的待发送队列上限，超过时丢弃最旧的更新
+QUOTE_HEARTBEAT = 15  # 无行情更新时SSE心跳间隔(秒)
+
+# 多进程部署配置(见gunicorn.conf.py与run_fetcher.py)
+FETCHER_ADDRESS = os.environ.get('FETCHER_ADDRESS') or None  # 抓取进程地址('host:port'或Unix套接字路径)，设置后本进程不直接连接Wind
+FETCHER_AUTHKEY = os.environ.get('FETCHER_AUTHKEY') or None  # 抓取进程连接认证密钥，gunicorn.conf.py启动时随机生成；未设置时抓取进程不启动
+QUOTE_SHM_PATH = os.environ.get('QUOTE_SHM_PATH') or os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'wind_quotes')  # 共享行情表文件
+QUOTE_SHM_CAPACITY = 8192  # 共享行情表的证券数上限
+QUOTE_SHM_FIELDS = 32  # 共享行情表的字段数上限
+QUOTE_MAX_AGE = 1.0  # 工作进程直接返回共享行情表中行情的最长时长(秒)，为0时每次请求都经抓取进程调用w.wsq
+QUOTE_POLL_INTERVAL = 0.2  # 工作进程实时推送轮询共享行情表的间隔(秒)
+METRICS_DIR = os.environ.get('METRICS_DIR') or None  # 各工作进程写入耗时直方图的目录，设置后/metrics合并所有进程的直方图
+METRICS_WRITE_INTERVAL = 1.0  # 工作进程写入直方图的最短间隔(秒)
+
+# ASGI服务配置(见asgi.py)
+ASYNC_MAX_WORKERS = 64  # 执行同步视图的线程数，Wind请求在工作线程队列中等待时占用线程，与WIND_QUEUE_SIZE相当即可
+ASYNC_MAX_PENDING = 1024  # 执行中与等待线程的请求数上限，超过时返回503
+
+# 选股配置(/api/screen)
+SCREEN_DEFAULT_FIELDS = 'pe_ttm,pb,ps_ttm'  # 默认返回的截面字段，筛选与排序引用的字段自动加入
+SCREEN_MAX_LIMIT = 5000  # 单次返回的证券数上限
+SCREEN_LIVE_TTL = 60  # 收盘前的当天截面数据(估值等仍在变化)只在内存中缓存的秒数，不写入磁盘
 
 # 默认查询参数
 DEFAULT_CODE = '000001.SZ'  # 平安银行
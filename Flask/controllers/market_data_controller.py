@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from flask import Blueprint, request, jsonify, render_template
-from services.wind_service import WindService
+from flask import Blueprint, request, jsonify, render_template, make_response
+from extensions import wind_service
+from services.wind_worker import WindOverloadedError
+from utils.http_cache import is_closed_range, request_etag, not_modified, conditional_response
 import logging
 
 # 配置日志
@@ -11,9 +13,6 @@ logger = logging.getLogger(__name__)
 # 创建Blueprint
 market_data = Blueprint('market_data', __name__)
 
-# 初始化Wind服务
-wind_service = WindService()
-
 @market_data.route('/historical', methods=['GET'])
 def get_historical_data():
     """获取历史行情数据"""
@@ -25,14 +24,30 @@ def get_historical_data():
         fields = request.args.get('fields', 'open,high,low,close,volume')
         options = request.args.get('options', '')
         
+        # 已收盘区间的ETag由请求参数与数据版本计算，客户端缓存未过期时不读取数据
+        closed = is_closed_range(end_date)
+        etag = request_etag(wind_service.get_data_version(code, options)) if closed else None
+        cached = not_modified(etag, closed)
+        if cached is not None:
+            return cached
+        
         # 调用Wind服务获取数据
         data = wind_service.get_historical_data(code, fields, start_date, end_date, options)
+        # Wind不可用时只返回了已缓存的部分，不使用按请求参数计算的ETag与长期缓存
+        if data.get('stale'):
+            closed, etag = None, None
         
-        return jsonify({
+        return conditional_response(jsonify({
             'success': True,
             'data': data,
             'message': f'成功获取{code}从{start_date}到{end_date}的历史数据'
-        })
+        }), closed, etag)
+    
+    except WindOverloadedError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503, {'Retry-After': str(e.retry_after)}
     
     except Exception as e:
         logger.error(f"获取历史数据失败: {str(e)}")
@@ -48,15 +63,23 @@ def get_realtime_data():
         # 获取请求参数
         codes = request.args.get('codes', '000001.SZ')
         fields = request.args.get('fields', 'rt_last,rt_vol,rt_amt')
+        since = request.args.get('since', type=int)
         
         # 调用Wind服务获取数据
-        data = wind_service.get_realtime_data(codes, fields)
+        data = wind_service.get_realtime_data(codes, fields, since)
         
-        return jsonify({
+        # 实时行情每次向服务端验证，行情未更新时返回304
+        return conditional_response(jsonify({
             'success': True,
             'data': data,
             'message': f'成功获取{codes}的实时数据'
-        })
+        }), None)
+    
+    except WindOverloadedError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503, {'Retry-After': str(e.retry_after)}
     
     except Exception as e:
         logger.error(f"获取实时数据失败: {str(e)}")
@@ -68,4 +91,4 @@ def get_realtime_data():
 @market_data.route('/dashboard')
 def dashboard():
     """数据展示仪表盘"""
-    return render_template('dashboard.html') 
\ No newline at end of file
+    return conditional_response(make_response(render_template('dashboard.html')), None) 
\ No newline at end of file
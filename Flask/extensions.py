@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+应用共享对象
+WindService及依赖它的行情推送、指标状态在首次使用时创建，保存在app.extensions中，
+所有蓝图通过下面的代理对象访问同一实例；Wind连接在后台线程中预热，不阻塞启动。
+配置了FETCHER_ADDRESS时为多进程部署中的工作进程，Wind调用转发给抓取进程(run_fetcher.py)
+"""
+
+import os
+import atexit
+import threading
+import logging
+
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+from services.data_provider import create_provider, set_default_provider
+from services.snapshot_store import SnapshotStore, set_default_snapshot_store
+from services.pit_store import PointInTimeStore, set_default_pit_store
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 创建行情推送中心时会嵌套创建WindService，使用可重入锁
+_lock = threading.RLock()
+
+
+def init_app(app):
+    """
+    为应用注册共享对象的存储，并设置进程内默认数据源
+
+    Args:
+        app (flask.Flask): 应用
+    """
+    app.extensions['wind'] = {}
+    set_default_snapshot_store(create_snapshot_store(app.config))
+    set_default_pit_store(create_pit_store(app.config))
+    if app.config['FETCHER_ADDRESS']:
+        # 工作进程不持有Wind会话，直接使用默认数据源的模块也经抓取进程访问Wind
+        from services.fetcher import RemoteProvider
+        set_default_provider(RemoteProvider(get_fetcher_client(app)))
+    else:
+        set_default_provider(create_data_provider(app.config))
+    # wind_utils等模块级函数经共享的WindService调用Wind(工作线程队列、请求合并与熔断)
+    from services.wind_service import set_default_wind_service
+    set_default_wind_service(LocalProxy(lambda: get_wind_service(app)))
+
+
+def create_data_provider(config):
+    """
+    按配置创建数据源：wind为真实WindPy，replay为离线回放/模拟数据
+
+    Args:
+        config (dict): 应用配置
+
+    Returns:
+        DataProvider: 数据源
+    """
+    return create_provider(
+        config['DATA_PROVIDER'],
+        replay_dir=config['REPLAY_DIR'],
+        latency=config['REPLAY_LATENCY'],
+        record=config['REPLAY_RECORD']
+    )
+
+
+def create_snapshot_store(config):
+    """
+    按配置创建截面数据(基本面、行业分类)缓存，保存在CACHE_DIR/snapshot下
+
+    Args:
+        config (dict): 应用配置
+
+    Returns:
+        SnapshotStore: 截面缓存
+    """
+    return SnapshotStore(os.path.join(config['CACHE_DIR'], 'snapshot') if config['CACHE_DIR'] else None,
+                         config['SCREEN_LIVE_TTL'])
+
+
+def create_pit_store(config):
+    """
+    按配置创建指数成分与行业分类的时点存储，保存在CACHE_DIR/pit下
+
+    Args:
+        config (dict): 应用配置
+
+    Returns:
+        PointInTimeStore: 时点存储
+    """
+    return PointInTimeStore(os.path.join(config['CACHE_DIR'], 'pit') if config['CACHE_DIR'] else None,
+                            history_start=config['PIT_HISTORY_START'])
+
+
+def create_wind_service(config, quote_store=None):
+    """
+    按配置创建持有Wind会话的WindService，单进程部署时由应用创建，多进程部署时由抓取进程创建
+
+    Args:
+        config (dict): 应用配置
+        quote_store (QuoteStore, optional): 最新行情表，默认为进程内行情表
+
+    Returns:
+        WindService: Wind数据服务
+    """
+    # 导入WindService会加载pandas等依赖，推迟到首次使用时
+    from services.wind_service import WindService
+    return WindService(
+        wait_time=config['WIND_WAIT_TIME'],
+        cache_dir=config['CACHE_DIR'],
+        workers=config['WIND_WORKERS'],
+        queue_size=config['WIND_QUEUE_SIZE'],
+        retry_after=config['WIND_RETRY_AFTER'],
+        batch_size=config['WIND_BATCH_SIZE'],
+        connect_wait=config['WIND_CONNECT_WAIT'],
+        breaker_threshold=config['WIND_BREAKER_THRESHOLD'],
+        breaker_reset=config['WIND_BREAKER_RESET'],
+        quote_store=quote_store,
+        snapshot_batch_size=config['WIND_SNAPSHOT_BATCH_SIZE']
+    )
+
+
+def create_prewarm_scheduler(config, service):
+    """
+    按配置创建盘前缓存预热的调度器，由持有Wind会话的进程(单进程应用或抓取进程)启动
+
+    Args:
+        config (dict): 应用配置
+        service (WindService): Wind数据服务
+
+    Returns:
+        PrewarmScheduler: 预热调度器(尚未启动)
+    """
+    from services.prewarm import Prewarmer, PrewarmScheduler
+    prewarmer = Prewarmer(
+        service,
+        indexes=config['PREWARM_INDEXES'],
+        fields=config['PREWARM_FIELDS'],
+        options=config['PREWARM_OPTIONS'],
+        history_days=config['PREWARM_HISTORY_DAYS'],
+        fundamental_fields=config['PREWARM_FUNDAMENTAL_FIELDS'],
+        industry_standard=config['PREWARM_INDUSTRY_STANDARD'],
+        concurrency=config['PREWARM_CONCURRENCY'],
+        batch_size=config['PREWARM_BATCH_SIZE'],
+        checkpoint_path=os.path.join(config['CACHE_DIR'], 'prewarm_checkpoint.json') if config['CACHE_DIR'] else None
+    )
+    return PrewarmScheduler(prewarmer, config['PREWARM_TIME'],
+                            is_trading_day=lambda date: service.get_calendar().is_trading_day(date),
+                            retry_interval=config['PREWARM_RETRY_INTERVAL'])
+
+
+def _get(name, factory, app=None):
+    app = app or current_app._get_current_object()
+    state = app.extensions['wind']
+    obj = state.get(name)
+    if obj is None:
+        with _lock:
+            obj = state.get(name)
+            if obj is None:
+                obj = state[name] = factory(app)
+    return obj
+
+
+def _create_fetcher_client(app):
+    from services.fetcher import FetcherClient, parse_address, fetcher_authkey
+    return FetcherClient(parse_address(app.config['FETCHER_ADDRESS']), fetcher_authkey(app.config),
+                         retry_after=app.config['WIND_RETRY_AFTER'])
+
+
+def _create_wind_service(app):
+    if app.config['FETCHER_ADDRESS']:
+        # 工作进程：日线缓存与行情表由抓取进程写入，本进程只读映射
+        from services.fetcher import RemoteWindService
+        service = RemoteWindService(
+            get_fetcher_client(app),
+            cache_dir=app.config['CACHE_DIR'],
+            quote_path=app.config['QUOTE_SHM_PATH'],
+            quote_max_age=app.config['QUOTE_MAX_AGE'],
+            poll_interval=app.config['QUOTE_POLL_INTERVAL'],
+            batch_size=app.config['WIND_BATCH_SIZE'],
+            snapshot_batch_size=app.config['WIND_SNAPSHOT_BATCH_SIZE']
+        )
+    else:
+        service = create_wind_service(app.config)
+    atexit.register(service.shutdown)
+    return service
+
+
+def _create_quote_hub(app):
+    # 实时行情推送：每只证券一个上游订阅，分发给所有连接
+    return get_wind_service(app).create_quote_hub(app.config['QUOTE_FIELDS'], app.config['QUOTE_CLIENT_QUEUE_SIZE'])
+
+
+def _create_indicator_store(app):
+    # 实时指标的增量状态，进入新K线与退出时持久化，重启后无需回放历史
+    from utils.incremental_indicators import IndicatorStateStore
+    store = IndicatorStateStore(
+        os.path.join(app.config['CACHE_DIR'], 'indicator_state.json') if app.config['CACHE_DIR'] else None
+    )
+    atexit.register(store.save)
+    return store
+
+
+def _create_prewarm_scheduler(app):
+    scheduler = create_prewarm_scheduler(app.config, get_wind_service(app))
+    atexit.register(scheduler.stop)
+    return scheduler.start()
+
+
+def get_wind_service(app=None):
+    """
+    获取应用共享的WindService，首次调用时创建
+
+    Args:
+        app (flask.Flask, optional): 应用，默认为当前应用
+
+    Returns:
+        WindService: Wind数据服务
+    """
+    return _get('wind_service', _create_wind_service, app)
+
+
+def get_fetcher_client(app=None):
+    """获取多进程部署中工作进程的抓取进程客户端"""
+    return _get('fetcher_client', _create_fetcher_client, app)
+
+
+def get_quote_hub(app=None):
+    """获取应用共享的实时行情推送中心"""
+    return _get('quote_hub', _create_quote_hub, app)
+
+
+def get_indicator_store(app=None):
+    """获取应用共享的实时指标状态存储"""
+    return _get('indicator_store', _create_indicator_store, app)
+
+
+def get_prewarm_scheduler(app=None):
+    """获取应用的盘前缓存预热调度器，首次调用时创建并启动"""
+    return _get('prewarm', _create_prewarm_scheduler, app)
+
+
+def warm_up(app):
+    """
+    在后台线程中创建WindService并建立Wind连接，启动过程不等待连接完成
+
+    Args:
+        app (flask.Flask): 应用
+
+    Returns:
+        threading.Thread: 预热线程
+    """
+    def run():
+        try:
+            get_wind_service(app).connect(wait=True)
+        except Exception as e:
+            logger.error(f"Wind连接预热失败: {str(e)}")
+
+    thread = threading.Thread(target=run, name='wind-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+# 蓝图中使用的代理对象
+wind_service = LocalProxy(get_wind_service)
+quote_hub = LocalProxy(get_quote_hub)
+indicator_store = LocalProxy(get_indicator_store)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+gunicorn多进程部署配置
+
+    gunicorn -c gunicorn.conf.py
+
+主进程启动时先启动一个抓取进程(run_fetcher.py)独占Wind会话，
+各HTTP工作进程通过FETCHER_ADDRESS连接抓取进程，日线缓存与行情表以内存映射方式共享，
+工作进程数增加不会增加Wind连接数
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 工作进程在fork后导入应用，继承此处设置的环境变量
+os.environ.setdefault('FETCHER_ADDRESS', os.path.join(tempfile.gettempdir(), 'wind-fetcher.sock'))
+# 抓取进程与工作进程之间的认证密钥，每次启动随机生成
+os.environ.setdefault('FETCHER_AUTHKEY', os.urandom(32).hex())
+# 各工作进程写入耗时直方图的目录，任一工作进程的/metrics输出所有进程的合计
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'wind-metrics-{os.getpid()}'))
+
+wsgi_app = 'app:app'
+chdir = BASE_DIR
+bind = os.environ.get('BIND', f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# 实时推送为长连接，使用线程处理请求
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 8))
+# 大于Wind命令超时时间(WIND_WAIT_TIME)
+timeout = 150
+
+_fetcher = None
+
+
+def on_starting(server):
+    """启动抓取进程"""
+    global _fetcher
+    # 上次运行留下的直方图不计入本次
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    _fetcher = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, 'run_fetcher.py')], cwd=BASE_DIR)
+    server.log.info(f"已启动Wind抓取进程(pid={_fetcher.pid})，地址: {os.environ['FETCHER_ADDRESS']}")
+
+
+def on_exit(server):
+    """停止抓取进程并删除直方图目录"""
+    if _fetcher is not None and _fetcher.poll() is None:
+        _fetcher.terminate()
+        try:
+            _fetcher.wait(10)
+        except subprocess.TimeoutExpired:
+            _fetcher.kill()
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
@@ -1,135 +1,180 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import numpy as np
 import pandas as pd
-from datetime import datetime
 
 class MarketData:
-    """市场数据模型类"""
-    
+    """
+    市场数据模型类
+
+    日期以int64（纳秒时间戳）有序数组保存，各字段的值保存在一个(日期数, 字段数)的float64二维数组中，
+    不再同时保留原始列表和DataFrame；按日期过滤为二分查找后的切片，返回共享内存的视图
+    """
+
+    __slots__ = ('dates', 'fields', 'values')
+
     def __init__(self, data=None):
         """
         初始化市场数据模型
-        
+
         Args:
-            data (dict, optional): 原始数据字典
+            data (dict, optional): 原始数据字典，包含dates、fields和按日期排列的data行
         """
-        self.data = data if data else {}
-        self.df = None
-        
-        # 如果有数据，转换为DataFrame
+        self.dates = np.empty(0, dtype=np.int64)
+        self.fields = []
+        self.values = np.empty((0, 0), dtype=np.float64)
+
         if data and 'dates' in data and 'fields' in data and 'data' in data:
-            self._convert_to_dataframe()
-    
-    def _convert_to_dataframe(self):
-        """将原始数据转换为DataFrame"""
-        if not self.data:
-            return
-        
-        # 创建DataFrame
-        df = pd.DataFrame(
-            self.data['data'],
-            index=self.data['dates'],
-            columns=self.data['fields']
-        )
-        
-        # 转换索引为日期类型
-        df.index = pd.to_datetime(df.index)
-        
-        self.df = df
-    
+            dates = pd.to_datetime(data['dates']).values.astype('datetime64[ns]').view(np.int64)
+            values = np.asarray(data['data'], dtype=np.float64).reshape(len(dates), len(data['fields']))
+            self._set(dates, list(data['fields']), values)
+
+    def _set(self, dates, fields, values):
+        """设置数组，日期无序时按日期排序一次"""
+        if len(dates) > 1 and np.any(dates[1:] < dates[:-1]):
+            order = np.argsort(dates, kind='stable')
+            dates, values = dates[order], values[order]
+        self.dates = dates
+        self.fields = fields
+        self.values = values
+
+    @classmethod
+    def from_arrays(cls, dates, fields, values):
+        """
+        由数组创建市场数据对象，已是所需类型时不复制
+
+        Args:
+            dates (numpy.ndarray): datetime64或int64纳秒时间戳数组
+            fields (list): 字段名列表
+            values (numpy.ndarray): (日期数, 字段数)的数值数组
+
+        Returns:
+            MarketData: 市场数据对象
+        """
+        dates = np.asarray(dates)
+        if dates.dtype.kind == 'M':
+            dates = dates.astype('datetime64[ns]', copy=False).view(np.int64)
+        market_data = cls()
+        market_data._set(dates.astype(np.int64, copy=False), list(fields),
+                         np.asarray(values, dtype=np.float64).reshape(len(dates), len(fields)))
+        return market_data
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        由以日期为索引的DataFrame创建市场数据对象
+
+        Args:
+            df (pandas.DataFrame): 行情数据
+
+        Returns:
+            MarketData: 市场数据对象
+        """
+        return cls.from_arrays(pd.DatetimeIndex(df.index).values, df.columns, df.to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def data(self):
+        """原始数据字典格式，与to_dict相同"""
+        return self.to_dict()
+
+    @property
+    def df(self):
+        """以日期为索引的DataFrame，与values共享内存；没有数据时为None"""
+        if not self.fields:
+            return None
+        return pd.DataFrame(self.values, index=pd.DatetimeIndex(self.dates.view('datetime64[ns]')),
+                            columns=self.fields, copy=False)
+
+    def _date_strings(self):
+        return np.datetime_as_string(self.dates.view('datetime64[ns]'), unit='D').tolist()
+
     def to_dict(self):
         """将数据转换为字典格式"""
-        if self.df is None:
-            return self.data
-        
+        if not self.fields:
+            return {}
+
         return {
-            'dates': self.df.index.strftime('%Y-%m-%d').tolist(),
-            'fields': self.df.columns.tolist(),
-            'data': self.df.values.tolist()
+            'dates': self._date_strings(),
+            'fields': list(self.fields),
+            'data': self.values.tolist()
         }
-    
+
     def to_json(self):
         """将数据转换为JSON格式"""
-        if self.df is None:
+        if not self.fields:
             return {}
-        
-        # 将日期索引转换为列
-        df_reset = self.df.reset_index()
-        df_reset.rename(columns={'index': 'date'}, inplace=True)
-        df_reset['date'] = df_reset['date'].dt.strftime('%Y-%m-%d')
-        
-        # 将DataFrame转为记录列表
-        return df_reset.to_dict(orient='records')
-    
+
+        # 每行一个记录，直接由二维数组的行生成，不经过DataFrame
+        keys = ['date'] + list(self.fields)
+        return [dict(zip(keys, (date, *row))) for date, row in zip(self._date_strings(), self.values.tolist())]
+
     def filter_by_date_range(self, start_date=None, end_date=None):
         """
         按日期范围过滤数据
-        
+
         Args:
             start_date (str, optional): 开始日期
             end_date (str, optional): 结束日期
-            
+
         Returns:
-            MarketData: 过滤后的市场数据对象
+            MarketData: 过滤后的市场数据对象，数组为原对象的视图
         """
-        if self.df is None:
-            return self
-        
-        df_copy = self.df.copy()
-        
+        start, end = 0, len(self.dates)
         if start_date:
-            start_date = pd.to_datetime(start_date)
-            df_copy = df_copy[df_copy.index >= start_date]
-        
+            start = np.searchsorted(self.dates, pd.Timestamp(start_date).value, side='left')
         if end_date:
-            end_date = pd.to_datetime(end_date)
-            df_copy = df_copy[df_copy.index <= end_date]
-        
-        # 创建新的市场数据对象
+            end = np.searchsorted(self.dates, pd.Timestamp(end_date).value, side='right')
+        end = max(start, end)
+
         filtered_data = MarketData()
-        filtered_data.df = df_copy
-        
+        filtered_data.dates = self.dates[start:end]
+        filtered_data.fields = self.fields
+        filtered_data.values = self.values[start:end]
+
         return filtered_data
-    
+
     def calculate_returns(self, price_column='close'):
         """
         计算收益率
-        
+
         Args:
             price_column (str): 价格列名，默认为'close'
-            
+
         Returns:
             pandas.Series: 收益率序列
         """
-        if self.df is None or price_column not in self.df.columns:
+        if price_column not in self.fields:
             return None
-        
+
         # 计算日收益率
         returns = self.df[price_column].pct_change()
-        
+
         return returns
-    
+
     @staticmethod
     def combine_data(data_list):
         """
         合并多个市场数据对象
-        
+
         Args:
             data_list (list): MarketData对象列表
-            
+
         Returns:
             pandas.DataFrame: 合并后的DataFrame
         """
         if not data_list:
             return None
-        
+
         dfs = [data.df for data in data_list if data.df is not None]
-        
+
         if not dfs:
             return None
-        
+
         # 合并多个DataFrame
         combined_df = pd.concat(dfs, axis=1)
-        
-        return combined_df 
\ No newline at end of file
+
+        return combined_df
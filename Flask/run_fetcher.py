@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Wind抓取进程启动脚本
+多进程部署时由gunicorn.conf.py启动，也可单独运行；独占Wind会话，
+日线写入CACHE_DIR缓存，最新行情写入QUOTE_SHM_PATH共享行情表，
+HTTP工作进程通过FETCHER_ADDRESS连接本进程
+"""
+
+import os
+import sys
+import signal
+import logging
+
+from flask import Config
+
+import extensions
+from services.data_provider import set_default_provider
+from services.wind_service import set_default_wind_service
+from services.fetcher import FetcherServer, parse_address, fetcher_authkey
+from services.shared_quotes import SharedQuoteStore
+from services.snapshot_store import set_default_snapshot_store
+from services.pit_store import set_default_pit_store
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+logger = logging.getLogger(__name__)
+
+# 未配置FETCHER_ADDRESS时的默认监听地址
+DEFAULT_ADDRESS = '127.0.0.1:6100'
+
+
+def create_fetcher(config):
+    """
+    按配置创建抓取进程的Wind数据服务与请求服务
+
+    Args:
+        config (dict): 应用配置
+
+    Returns:
+        FetcherServer: 已开始监听的请求服务
+    """
+    authkey = fetcher_authkey(config)
+    set_default_provider(extensions.create_data_provider(config))
+    set_default_snapshot_store(extensions.create_snapshot_store(config))
+    set_default_pit_store(extensions.create_pit_store(config))
+    quotes = SharedQuoteStore(config['QUOTE_SHM_PATH'], config['QUOTE_SHM_CAPACITY'], config['QUOTE_SHM_FIELDS'],
+                              create=True)
+    service = extensions.create_wind_service(config, quote_store=quotes)
+    set_default_wind_service(service)
+    # 盘前预热在抓取进程中执行，日线写入共享缓存
+    prewarm = extensions.create_prewarm_scheduler(config, service).start() if config['PREWARM_ENABLED'] else None
+    return FetcherServer(service, parse_address(config['FETCHER_ADDRESS'] or DEFAULT_ADDRESS),
+                         authkey, quote_fields=config['QUOTE_FIELDS'],
+                         prewarm=prewarm)
+
+
+if __name__ == "__main__":
+    config = Config(os.path.dirname(os.path.abspath(__file__)))
+    config.from_object('config')
+    try:
+        server = create_fetcher(config)
+    except Exception as e:
+        logger.error(f"启动抓取进程失败: {str(e)}")
+        sys.exit(1)
+
+    # gunicorn退出时发送SIGTERM，转为正常退出以关闭Wind连接
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logger.info(f"Wind抓取进程已启动，监听地址: {server.address}，共享行情表: {config['QUOTE_SHM_PATH']}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        server.service.shutdown()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+历史行情磁盘缓存模块
+按(证券代码, 字段, 选项)分别以列式NumPy数组存储日线数据，
+请求与已缓存区间部分重叠时只向Wind补取缺失的日期区间
+"""
+
+import os
+import json
+import hashlib
+import shutil
+import threading
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class CacheBypass(Exception):
+    """数据无法写入列式缓存(如非数值字段)时抛出，调用方应直接请求Wind"""
+
+
+def to_day(date_value):
+    """
+    将日期转换为自1970-01-01起的天数
+
+    Args:
+        date_value (str or datetime): 日期，如'2023-01-01'
+
+    Returns:
+        int: 天数
+    """
+    return int(np.datetime64(pd.Timestamp(date_value).date(), 'D').astype(np.int64))
+
+
+def day_to_str(day):
+    """
+    将天数转换为'YYYY-MM-DD'格式的日期字符串
+
+    Args:
+        day (int): 自1970-01-01起的天数
+
+    Returns:
+        str: 日期字符串
+    """
+    return str(np.datetime64(int(day), 'D'))
+
+
+def normalize_options(options):
+    """
+    标准化Wind选项字符串，保证等价选项得到相同的缓存键
+
+    Args:
+        options (str): 选项字符串，如'PriceAdj=F;Period=D'
+
+    Returns:
+        str: 按键名排序后的选项字符串
+    """
+    if not options:
+        return ''
+    parts = [p.strip() for p in options.split(';') if p.strip()]
+    return ';'.join(sorted(parts, key=lambda p: p.split('=', 1)[0].lower()))
+
+
+def parse_options(options):
+    """
+    解析Wind选项字符串为字典(键名统一为小写)
+
+    Args:
+        options (str): 选项字符串，如'PriceAdj=F;Period=W'
+
+    Returns:
+        dict: 选项字典，如{'priceadj': 'F', 'period': 'W'}
+    """
+    result = {}
+    for part in (options or '').split(';'):
+        if '=' in part:
+            key, value = part.split('=', 1)
+            result[key.strip().lower()] = value.strip()
+    return result
+
+
+def remove_option(options, key):
+    """
+    从Wind选项字符串中删除一个选项
+
+    Args:
+        options (str): 选项字符串，如'PriceAdj=F;Fill=Previous'
+        key (str): 选项名(不区分大小写)，如'PriceAdj'
+
+    Returns:
+        str: 删除后的选项字符串，如'Fill=Previous'
+    """
+    parts = [p.strip() for p in (options or '').split(';') if p.strip()]
+    return ';'.join(p for p in parts if p.split('=', 1)[0].strip().lower() != key.lower())
+
+
+def subtract_intervals(start, end, covered):
+    """
+    计算[start, end]中未被已缓存区间覆盖的部分
+
+    Args:
+        start (int): 开始天数
+        end (int): 结束天数
+        covered (list): 已覆盖的闭区间列表，按开始天数升序
+
+    Returns:
+        list: 缺失的闭区间列表
+    """
+    gaps = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, c_start - 1))
+        cursor = max(cursor, c_end + 1)
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def merge_intervals(intervals):
+    """
+    合并相交或相邻的闭区间
+
+    Args:
+        intervals (list): 闭区间列表
+
+    Returns:
+        list: 合并后按开始天数升序的区间列表
+    """
+    merged = []
+    for i_start, i_end in sorted(intervals):
+        if merged and i_start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], i_end)
+        else:
+            merged.append([i_start, i_end])
+    return merged
+
+
+def _is_weekend_only(start, end):
+    """判断区间内是否只有周六、周日(1970-01-01为周四)"""
+    if end - start >= 2:
+        return False
+    return all((day + 3) % 7 >= 5 for day in range(start, end + 1))
+
+
+class _Column:
+    """单个(代码, 字段, 选项)的列数据"""
+
+    __slots__ = ('dates', 'values', 'covered')
+
+    def __init__(self, dates, values, covered):
+        self.dates = dates
+        self.values = values
+        self.covered = covered
+
+
+class HistoricalCache:
+    """历史行情列式磁盘缓存"""
+
+    def __init__(self, root_dir):
+        """
+        初始化缓存
+
+        Args:
+            root_dir (str): 缓存根目录
+        """
+        self.root_dir = root_dir
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'partial_hits': 0, 'misses': 0, 'upstream_calls': 0}
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def stats(self):
+        """
+        获取缓存命中统计
+
+        Returns:
+            dict: 命中、部分命中、未命中次数及上游调用次数
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _column_dir(self, code, options_key, field):
+        # 选项可能包含'='、';'等字符，目录名使用其摘要
+        digest = hashlib.md5(options_key.encode('utf-8')).hexdigest()[:12] if options_key else '_'
+        return os.path.join(self.root_dir, code.upper(), digest, field)
+
+    def _load(self, code, options_key, field):
+        path = self._column_dir(code, options_key, field)
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return _Column(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), [])
+        while True:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            # 以只读内存映射方式加载，避免读取整列数据
+            dates = np.load(os.path.join(path, 'dates.npy'), mmap_mode='r')
+            values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+            # 另一进程正在替换两个文件时长度可能不一致，重新读取
+            if len(dates) == len(values):
+                return _Column(dates, values, [list(c) for c in meta['covered']])
+
+    def _save(self, code, options_key, field, column):
+        path = self._column_dir(code, options_key, field)
+        os.makedirs(path, exist_ok=True)
+        # 先写临时文件再原子替换，保证并发读取者不会读到半写入的数据
+        for name, array in (('dates', column.dates), ('values', column.values)):
+            tmp_path = os.path.join(path, f'{name}.tmp.npy')
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, os.path.join(path, f'{name}.npy'))
+        tmp_meta = os.path.join(path, 'meta.json.tmp')
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({'code': code, 'field': field, 'options': options_key,
+                       'covered': column.covered}, f)
+        os.replace(tmp_meta, os.path.join(path, 'meta.json'))
+
+    @staticmethod
+    def _merge(column, dates, values):
+        # 新数据排在前面，np.unique保留首次出现的位置，从而以新数据为准
+        all_dates = np.concatenate([dates, np.asarray(column.dates)])
+        all_values = np.concatenate([values, np.asarray(column.values)])
+        unique_dates, index = np.unique(all_dates, return_index=True)
+        column.dates = unique_dates
+        column.values = all_values[index]
+
+    @staticmethod
+    def _frame_columns(df, fields):
+        """将Wind返回的DataFrame按字段拆分为(日期数组, 数值数组)"""
+        if df is None or df.empty:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+            return {field: empty for field in fields}
+        index = df.index if isinstance(df.index, pd.DatetimeIndex) else pd.to_datetime(df.index)
+        dates = index.values.astype('datetime64[D]').astype(np.int64)
+        columns = {}
+        for i, field in enumerate(fields):
+            raw = df.iloc[:, i]
+            numeric = pd.to_numeric(raw, errors='coerce')
+            if numeric.isna().sum() > raw.isna().sum():
+                raise CacheBypass(f"字段{field}包含非数值数据")
+            columns[field] = (dates, numeric.to_numpy(dtype=np.float64))
+        return columns
+
+    def get_frame(self, code, fields, start_date, end_date, options, fetcher):
+        """
+        获取历史行情，缺失的日期区间通过fetcher补取并写入缓存
+
+        Args:
+            code (str): 证券代码，如'000001.SZ'
+            fields (list): 小写字段名列表，如['open', 'close']
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            options (str): Wind选项字符串
+            fetcher (callable): fetcher(fields, start_date, end_date)返回Wind的DataFrame，
+                列顺序与fields一致
+
+        Returns:
+            pandas.DataFrame: 以日期为索引、大写字段名为列的数据
+        """
+        options_key = normalize_options(options)
+        start, end = to_day(start_date), to_day(end_date)
+        # 只有已收盘的交易日才标记为已覆盖，当天数据每次都重新获取
+        closed_until = to_day(datetime.now()) - 1
+
+        with self._lock_for((code.upper(), options_key)):
+            columns = {field: self._load(code, options_key, field) for field in fields}
+
+            # 缺失区间相同的字段合并为一次Wind请求
+            groups = {}
+            for field in fields:
+                gaps = subtract_intervals(start, end, columns[field].covered)
+                if gaps:
+                    groups.setdefault(tuple(gaps), []).append(field)
+
+            if not groups:
+                self._count('hits')
+            elif any(columns[field].covered for field in fields):
+                self._count('partial_hits')
+            else:
+                self._count('misses')
+
+            for gaps, group_fields in groups.items():
+                for gap_start, gap_end in gaps:
+                    if not _is_weekend_only(gap_start, gap_end):
+                        logger.info(f"缓存缺失，补取{code}从{day_to_str(gap_start)}到{day_to_str(gap_end)}的"
+                                    f"{','.join(group_fields)}数据")
+                        self._count('upstream_calls')
+                        df = fetcher(group_fields, day_to_str(gap_start), day_to_str(gap_end))
+                        for field, (dates, values) in self._frame_columns(df, group_fields).items():
+                            self._merge(columns[field], dates, values)
+                    for field in group_fields:
+                        self._mark_covered(columns[field], gap_start, gap_end, closed_until)
+                for field in group_fields:
+                    self._save(code, options_key, field, columns[field])
+
+            return self._assemble(columns, fields, start, end)
+
+    @staticmethod
+    def _mark_covered(column, start, end, closed_until):
+        """将[start, end]中已收盘的部分标记为已覆盖"""
+        if start <= closed_until:
+            column.covered = merge_intervals(column.covered + [[start, min(end, closed_until)]])
+
+    def gaps(self, code, field, start_date, end_date, options=''):
+        """
+        获取单个字段在请求区间内尚未缓存的日期区间
+
+        Args:
+            code (str): 证券代码
+            field (str): 小写字段名
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            options (str, optional): Wind选项字符串
+
+        Returns:
+            list: 缺失区间列表，如[('2023-01-01', '2023-01-31')]
+        """
+        column = self._load(code, normalize_options(options), field)
+        gaps = subtract_intervals(to_day(start_date), to_day(end_date), column.covered)
+        return [(day_to_str(s), day_to_str(e)) for s, e in gaps if not _is_weekend_only(s, e)]
+
+    def store(self, code, field, options, series, start_date, end_date):
+        """
+        写入单个字段的数据，并将[start_date, end_date]标记为已覆盖
+
+        Args:
+            code (str): 证券代码
+            field (str): 小写字段名
+            options (str): Wind选项字符串
+            series (pandas.Series): 以日期为索引的数据
+            start_date (str): 本次获取的开始日期
+            end_date (str): 本次获取的结束日期
+        """
+        options_key = normalize_options(options)
+        dates, values = self._frame_columns(series.to_frame(), [field])[field]
+        closed_until = to_day(datetime.now()) - 1
+        with self._lock_for((code.upper(), options_key)):
+            column = self._load(code, options_key, field)
+            self._merge(column, dates, values)
+            self._mark_covered(column, to_day(start_date), to_day(end_date), closed_until)
+            self._save(code, options_key, field, column)
+
+    def invalidate(self, code, field, options=''):
+        """
+        删除单个字段的缓存，下次请求时重新获取，同一证券的其他字段不受影响
+
+        Args:
+            code (str): 证券代码
+            field (str): 小写字段名
+            options (str, optional): Wind选项字符串
+        """
+        options_key = normalize_options(options)
+        with self._lock_for((code.upper(), options_key)):
+            shutil.rmtree(self._column_dir(code, options_key, field), ignore_errors=True)
+        logger.info(f"已删除{code}的{field}缓存")
+
+    def read_frame(self, code, fields, start_date, end_date, options=''):
+        """
+        只读取已缓存的数据，不访问上游
+
+        Args:
+            code (str): 证券代码
+            fields (list): 小写字段名列表
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            options (str, optional): Wind选项字符串
+
+        Returns:
+            pandas.DataFrame: 以日期为索引、大写字段名为列的数据
+        """
+        options_key = normalize_options(options)
+        columns = {field: self._load(code, options_key, field) for field in fields}
+        return self._assemble(columns, fields, to_day(start_date), to_day(end_date))
+
+    def read_covered_frame(self, code, fields, start_date, end_date, options=''):
+        """
+        请求区间已全部缓存时读取数据，不访问上游也不写入缓存
+
+        Args:
+            code (str): 证券代码
+            fields (list): 小写字段名列表
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            options (str, optional): Wind选项字符串
+
+        Returns:
+            pandas.DataFrame: 以日期为索引、大写字段名为列的数据，有缺失区间时返回None
+        """
+        options_key = normalize_options(options)
+        start, end = to_day(start_date), to_day(end_date)
+        columns = {field: self._load(code, options_key, field) for field in fields}
+        for column in columns.values():
+            if any(not _is_weekend_only(s, e) for s, e in subtract_intervals(start, end, column.covered)):
+                return None
+        self._count('hits')
+        return self._assemble(columns, fields, start, end)
+
+    @staticmethod
+    def _assemble(columns, fields, start, end):
+        """将各字段在[start, end]内的数据按日期对齐为DataFrame"""
+        slices = {}
+        for field in fields:
+            dates = columns[field].dates
+            lo, hi = np.searchsorted(dates, [start, end + 1])
+            slices[field] = (dates[lo:hi], columns[field].values[lo:hi])
+
+        all_dates = np.unique(np.concatenate([s[0] for s in slices.values()])) if slices else np.empty(0, np.int64)
+        matrix = np.full((len(all_dates), len(fields)), np.nan)
+        for i, field in enumerate(fields):
+            dates, values = slices[field]
+            matrix[np.searchsorted(all_dates, dates), i] = values
+
+        index = pd.DatetimeIndex(all_dates.astype('datetime64[D]'))
+        return pd.DataFrame(matrix, index=index, columns=[f.upper() for f in fields])
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Wind连接监控模块
+后台线程跟踪连接状态，断开后按指数退避重连，请求路径上不再同步执行w.start；
+上游连续出错时熔断器打开，期间请求直接失败(或由调用方改用缓存)，超时后放行一次试探请求
+"""
+
+import time
+import threading
+import logging
+from datetime import datetime
+
+from services.wind_worker import WindOverloadedError, PRIORITY_REALTIME
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 连接状态
+STATE_CONNECTED = 'connected'
+STATE_CONNECTING = 'connecting'
+STATE_DISCONNECTED = 'disconnected'
+
+# 熔断器状态
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+
+class WindUnavailableError(WindOverloadedError):
+    """Wind未连接或熔断器打开时抛出，接口与队列已满时一样返回503并携带Retry-After"""
+
+
+class CircuitBreaker:
+    """
+    连续失败达到阈值后打开，reset_timeout秒后进入半开状态并放行一次试探请求；
+    试探请求超过reset_timeout仍未记录结果时视为丢失，放行下一个试探请求
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold (int): 打开熔断器的连续失败次数
+            reset_timeout (float): 打开后进入半开状态前的等待时间(秒)
+            clock (callable, optional): 时钟函数，便于测试
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._trial_started = None
+        self._stats = {'opened': 0, 'rejected': 0}
+
+    def allow(self):
+        """
+        判断是否放行请求
+
+        Returns:
+            bool: 是否放行；半开状态下只放行一个试探请求
+        """
+        with self._lock:
+            if self.state == BREAKER_OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = BREAKER_HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == BREAKER_CLOSED:
+                return True
+            if self.state == BREAKER_HALF_OPEN and (
+                    not self._trial_in_flight or self._clock() - self._trial_started >= self.reset_timeout):
+                self._trial_in_flight = True
+                self._trial_started = self._clock()
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def retry_after(self):
+        """
+        距离下次放行试探请求的秒数
+
+        Returns:
+            int: 秒数，至少为1
+        """
+        with self._lock:
+            if self.state != BREAKER_OPEN:
+                return 1
+            return max(int(self._opened_at + self.reset_timeout - self._clock()) + 1, 1)
+
+    def release(self):
+        """放行的请求没有发出(如队列已满)时调用，半开状态下归还试探名额，不影响熔断状态"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        """记录成功，关闭熔断器"""
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self.state != BREAKER_CLOSED:
+                logger.info("Wind熔断器已关闭")
+            self.state = BREAKER_CLOSED
+
+    def record_failure(self):
+        """记录失败，连续失败达到阈值或半开状态下试探失败时打开熔断器"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != BREAKER_OPEN:
+                    self._stats['opened'] += 1
+                    logger.warning(f"Wind上游连续失败{self._failures}次，熔断器打开{self.reset_timeout}秒")
+                self.state = BREAKER_OPEN
+                self._opened_at = self._clock()
+
+    def stats(self):
+        """
+        获取熔断器状态
+
+        Returns:
+            dict: 状态、当前连续失败次数、打开次数与被拒绝的请求数
+        """
+        with self._lock:
+            return dict(self._stats, state=self.state, failures=self._failures)
+
+
+class ConnectionSupervisor:
+    """后台维护Wind连接"""
+
+    def __init__(self, provider, worker, wait_time=120, check_interval=5, backoff_base=1, backoff_max=60,
+                 breaker=None):
+        """
+        初始化连接监控并启动后台线程
+
+        Args:
+            provider (DataProvider): 数据源
+            worker (WindWorker): Wind工作线程，w.start在其中执行
+            wait_time (int): w.start的超时时间(秒)
+            check_interval (float): 已连接时检查连接状态的间隔(秒)
+            backoff_base (float): 重连退避的初始间隔(秒)，每次失败翻倍
+            backoff_max (float): 重连退避的最大间隔(秒)
+            breaker (CircuitBreaker, optional): 熔断器
+        """
+        self.provider = provider
+        self.worker = worker
+        self.wait_time = wait_time
+        self.check_interval = check_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.state = STATE_DISCONNECTED
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._connected = threading.Event()
+        self._stopped = threading.Event()
+        self._attempts = 0
+        self._next_attempt_at = None
+        self._stats = {
+            'reconnects': 0,
+            'reconnect_attempts': 0,
+            'last_error_code': None,
+            'last_error': None,
+            'last_connected_at': None,
+        }
+        self._thread = threading.Thread(target=self._run, name='wind-supervisor', daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        """在Wind工作线程中执行w.start"""
+        if self.provider.isconnected():
+            return
+        logger.info("WindPy未连接，正在尝试连接...")
+        result = self.provider.start(waitTime=self.wait_time)
+        if result.ErrorCode != 0:
+            self.record_error(result.ErrorCode, f"WindPy连接失败: {result.ErrorCode}")
+            raise Exception(f"WindPy连接失败: {result.ErrorCode}")
+        logger.info("WindPy连接成功")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                connected = self.provider.isconnected()
+            except Exception:
+                connected = False
+
+            if connected:
+                if self.state != STATE_CONNECTED:
+                    self._on_connected()
+                self._wake.wait(self.check_interval)
+                self._wake.clear()
+                continue
+
+            self._connected.clear()
+            self.state = STATE_CONNECTING
+            with self._lock:
+                self._stats['reconnect_attempts'] += 1
+            try:
+                self.worker.call(PRIORITY_REALTIME, self.wait_time + 5, self._connect)
+                self._on_connected()
+                continue
+            except Exception as e:
+                self._attempts += 1
+                self.state = STATE_DISCONNECTED
+                with self._lock:
+                    self._stats['last_error'] = str(e)
+                delay = min(self.backoff_base * 2 ** (self._attempts - 1), self.backoff_max)
+                self._next_attempt_at = time.monotonic() + delay
+                logger.error(f"WindPy连接失败，{delay}秒后重试: {str(e)}")
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def _on_connected(self):
+        self.state = STATE_CONNECTED
+        self._attempts = 0
+        self._next_attempt_at = None
+        with self._lock:
+            # 首次连接不计入重连次数
+            if self._stats['last_connected_at'] is not None:
+                self._stats['reconnects'] += 1
+            self._stats['last_connected_at'] = datetime.now().isoformat(timespec='seconds')
+        self._connected.set()
+
+    def wait_connected(self, timeout):
+        """
+        等待连接建立；处于重连退避期间时不等待，直接返回
+
+        Args:
+            timeout (float): 最长等待时间(秒)
+
+        Returns:
+            bool: 是否已连接
+        """
+        if self.state == STATE_CONNECTED:
+            return True
+        if self.state == STATE_DISCONNECTED and self._next_attempt_at is not None:
+            return False
+        return self._connected.wait(timeout)
+
+    def notify_disconnected(self):
+        """请求路径发现连接断开时调用，唤醒后台线程立即重连"""
+        if self.state == STATE_CONNECTED:
+            logger.warning("检测到WindPy连接断开")
+            self.state = STATE_DISCONNECTED
+            self._connected.clear()
+        self._wake.set()
+
+    def record_error(self, error_code, message=None):
+        """
+        记录上游错误码
+
+        Args:
+            error_code (int): Wind错误码
+            message (str, optional): 错误信息
+        """
+        with self._lock:
+            self._stats['last_error_code'] = error_code
+            self._stats['last_error'] = message
+
+    def retry_after(self):
+        """
+        建议客户端重试的间隔
+
+        Returns:
+            int: 秒数
+        """
+        if self.breaker.state == BREAKER_OPEN:
+            return self.breaker.retry_after()
+        if self._next_attempt_at is not None:
+            return max(int(self._next_attempt_at - time.monotonic()) + 1, 1)
+        return 1
+
+    def stop(self):
+        """停止后台线程"""
+        self._stopped.set()
+        self._wake.set()
+
+    def stats(self):
+        """
+        获取连接状态
+
+        Returns:
+            dict: 连接状态、(重)连接次数、最后的错误码与熔断器状态
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['state'] = self.state
+        stats['breaker'] = self.breaker.stats()
+        return stats
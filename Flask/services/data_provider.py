@@ -0,0 +1,780 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据源模块
+WindService通过数据源对象调用wsd/wsq/wss/tdays/wset，接口与WindPy的w对象一致：
+- WindPyProvider: 真实的WindPy，首次使用时才导入，未安装WindPy也能启动服务
+- ReplayProvider: 离线数据源，优先返回录制的结果，否则按证券代码生成确定性的模拟数据，
+  可配置每次调用的延迟，用于没有Wind终端的压测与基准测试
+- RecordingProvider: 包装真实数据源，将每次调用的结果录制到目录供ReplayProvider回放
+"""
+
+import os
+import re
+import math
+import time
+import pickle
+import hashlib
+import zlib
+import itertools
+import threading
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from services.cache import parse_options
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 模拟数据的错误码：证券代码无效/无数据
+REPLAY_INVALID_CODE = -40520007
+
+# 模拟日线的日期范围，一次生成固定长度的序列，任意区间内同一日期的数据都相同
+REPLAY_START_DATE = '2005-01-04'
+REPLAY_END_DATE = '2035-12-31'
+
+# 午间休市前后的分钟数，A股每天240分钟
+_MORNING_MINUTES = 120
+_AFTERNOON_MINUTES = 120
+
+_CODE_PATTERN = re.compile(r'^[0-9A-Z]{2,8}\.[A-Z]{2,3}$')
+
+# 模拟行业名称
+REPLAY_INDUSTRIES = ['银行', '非银金融', '食品饮料', '医药生物', '电子', '计算机', '电力设备',
+                     '汽车', '机械设备', '化工', '有色金属', '房地产', '公用事业', '交通运输']
+
+# 模拟指数的成分股数量
+REPLAY_INDEX_SIZES = {
+    '000016.SH': 50,
+    '000300.SH': 300,
+    '000905.SH': 500,
+    '000852.SH': 1000,
+}
+
+
+class ProviderResult:
+    """与WindPy的WindData结构相同的返回结果"""
+
+    def __init__(self, error_code=0, codes=None, fields=None, times=None, data=None, request_id=0):
+        self.ErrorCode = error_code
+        self.Codes = codes or []
+        self.Fields = fields or []
+        self.Times = times or []
+        self.Data = data or []
+        self.RequestID = request_id
+
+    def __repr__(self):
+        return f"ProviderResult(ErrorCode={self.ErrorCode}, Codes={self.Codes[:5]}, Fields={self.Fields})"
+
+
+class DataProvider:
+    """数据源接口，方法名与参数与WindPy的w对象一致"""
+
+    name = None
+
+    def start(self, waitTime=120):
+        """建立连接，返回带ErrorCode的结果"""
+        raise NotImplementedError
+
+    def stop(self):
+        """关闭连接"""
+        raise NotImplementedError
+
+    def isconnected(self):
+        """是否已连接"""
+        raise NotImplementedError
+
+    def wsd(self, codes, fields, beginTime, endTime, options='', usedf=False):
+        """日期序列；多只证券时只能有一个字段"""
+        raise NotImplementedError
+
+    def wsi(self, codes, fields, beginTime, endTime, options='', usedf=False):
+        """分钟序列，beginTime、endTime为'YYYY-MM-DD HH:MM:SS'，选项如'BarSize=1'"""
+        raise NotImplementedError
+
+    def wsq(self, codes, fields, func=None, usedf=False):
+        """实时行情快照，传入func时为订阅模式"""
+        raise NotImplementedError
+
+    def wss(self, codes, fields, options='', usedf=False):
+        """截面数据"""
+        raise NotImplementedError
+
+    def tdays(self, beginTime, endTime, options=''):
+        """交易日"""
+        raise NotImplementedError
+
+    def wset(self, tablename, options=''):
+        """数据集，如指数成分"""
+        raise NotImplementedError
+
+    def cancelRequest(self, request_id):
+        """取消订阅"""
+        raise NotImplementedError
+
+
+class WindPyProvider(DataProvider):
+    """真实的WindPy数据源"""
+
+    name = 'wind'
+
+    def __init__(self):
+        self._w = None
+
+    @property
+    def w(self):
+        """首次使用时导入WindPy"""
+        if self._w is None:
+            try:
+                from WindPy import w
+            except ImportError:
+                raise ImportError("无法导入WindPy模块，请确保Wind Python API已正确安装")
+            self._w = w
+        return self._w
+
+    def start(self, waitTime=120):
+        return self.w.start(waitTime=waitTime)
+
+    def stop(self):
+        if self._w is not None:
+            self._w.stop()
+
+    def isconnected(self):
+        try:
+            return self.w.isconnected()
+        except ImportError:
+            return False
+
+    def wsd(self, *args, **kwargs):
+        return self.w.wsd(*args, **kwargs)
+
+    def wsi(self, *args, **kwargs):
+        return self.w.wsi(*args, **kwargs)
+
+    def wsq(self, *args, **kwargs):
+        return self.w.wsq(*args, **kwargs)
+
+    def wss(self, *args, **kwargs):
+        return self.w.wss(*args, **kwargs)
+
+    def tdays(self, *args, **kwargs):
+        return self.w.tdays(*args, **kwargs)
+
+    def wset(self, *args, **kwargs):
+        return self.w.wset(*args, **kwargs)
+
+    def cancelRequest(self, request_id):
+        return self.w.cancelRequest(request_id)
+
+
+def _record_path(replay_dir, func_name, args, kwargs):
+    """录制文件路径，由函数名和参数决定"""
+    kwargs = {k: v for k, v in kwargs.items() if k != 'func'}
+    key = hashlib.md5(repr((func_name, args, sorted(kwargs.items()))).encode('utf-8')).hexdigest()
+    return os.path.join(replay_dir, func_name, f'{key}.pkl')
+
+
+def _seed(*parts):
+    """由字符串生成稳定的随机种子(不受PYTHONHASHSEED影响)"""
+    return zlib.crc32('|'.join(parts).encode('utf-8'))
+
+
+def _split(values):
+    if isinstance(values, (list, tuple)):
+        return [str(v).strip() for v in values if str(v).strip()]
+    return [v.strip() for v in str(values).split(',') if v.strip()]
+
+
+def _industry_change_date(code):
+    """模拟证券调整行业的日期(2010至2030年之间)"""
+    return pd.Timestamp('2010-01-01') + pd.Timedelta(days=_seed(code, 'industry_change') % (365 * 20))
+
+
+def _replay_universe():
+    """模拟的全部A股：沪市600000起、深市000001起各1500只"""
+    return [f'{600000 + i:06d}.SH' for i in range(1500)] + [f'{i + 1:06d}.SZ' for i in range(1500)]
+
+
+@lru_cache(maxsize=None)
+def _index_history(index_code):
+    """
+    模拟指数的成分调整：初始成分从固定的证券池中按指数代码确定性抽取，
+    之后每年6月、12月的15日(遇周末顺延)调入、调出各约5%的成分股
+
+    Returns:
+        tuple: (初始成分集合, [(调整日期, 调入列表, 调出列表)])
+    """
+    size = REPLAY_INDEX_SIZES.get(index_code, 100)
+    universe = _replay_universe()
+    rng = np.random.default_rng(_seed(index_code))
+    members = set(rng.choice(universe, size, replace=False).tolist())
+    initial = frozenset(members)
+    changes = []
+    for year in range(pd.Timestamp(REPLAY_START_DATE).year, pd.Timestamp(REPLAY_END_DATE).year + 1):
+        for month in (6, 12):
+            date = pd.Timestamp(year, month, 15)
+            date += pd.offsets.BDay(0) if date.weekday() < 5 else pd.offsets.BDay(1)
+            k = max(size // 20, 1)
+            removed = sorted(rng.choice(sorted(members), k, replace=False).tolist())
+            added = sorted(rng.choice(sorted(set(universe) - members), k, replace=False).tolist())
+            members = (members - set(removed)) | set(added)
+            changes.append((date, added, removed))
+    return initial, changes
+
+
+@lru_cache(maxsize=1)
+def _replay_dates():
+    """模拟日线的日期序列(工作日)，pd.bdate_range逐日生成较慢，所有证券共用"""
+    return pd.bdate_range(REPLAY_START_DATE, REPLAY_END_DATE)
+
+
+def _to_timestamp(value):
+    return pd.Timestamp(value).normalize() if value else pd.Timestamp.now().normalize()
+
+
+class ReplayProvider(DataProvider):
+    """离线回放/模拟数据源"""
+
+    name = 'replay'
+
+    def __init__(self, replay_dir=None, latency=0.0, tick_interval=1.0):
+        """
+        初始化离线数据源
+
+        Args:
+            replay_dir (str, optional): 录制结果目录，存在对应录制时优先回放
+            latency (float, optional): 每次调用的模拟延迟(秒)
+            tick_interval (float, optional): 订阅模式下推送行情的间隔(秒)
+        """
+        self.replay_dir = replay_dir
+        self.latency = latency
+        self.tick_interval = tick_interval
+        self._connected = False
+        self._lock = threading.Lock()
+        self._series = {}
+        self._ticks = {}
+        self._request_ids = itertools.count(1)
+        self._subscriptions = {}
+        self.calls = {}
+
+    # ---- 连接 ----
+
+    def start(self, waitTime=120):
+        self._connected = True
+        return ProviderResult()
+
+    def stop(self):
+        self._connected = False
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, {}
+        for stop_event in subscriptions.values():
+            stop_event.set()
+
+    def isconnected(self):
+        return self._connected
+
+    # ---- 公共逻辑 ----
+
+    def _begin(self, func_name, args, kwargs):
+        """记录调用次数并模拟延迟，返回录制的结果(如有)"""
+        with self._lock:
+            self.calls[func_name] = self.calls.get(func_name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.replay_dir:
+            path = _record_path(self.replay_dir, func_name, args, kwargs)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return pickle.load(f)
+        return None
+
+    def _error(self, usedf):
+        return (REPLAY_INVALID_CODE, pd.DataFrame()) if usedf else ProviderResult(REPLAY_INVALID_CODE)
+
+    @staticmethod
+    def _valid(codes):
+        return bool(codes) and all(_CODE_PATTERN.match(code.upper()) for code in codes)
+
+    def _daily(self, code):
+        """
+        生成证券的模拟日线(未复权)，结果按证券缓存；序列超过今天的部分不会返回
+
+        Returns:
+            dict: 字段名到数组的映射，'dates'为DatetimeIndex
+        """
+        code = code.upper()
+        with self._lock:
+            series = self._series.get(code)
+        if series is not None:
+            return series
+
+        dates = _replay_dates()
+        n = len(dates)
+        rng = np.random.default_rng(_seed(code))
+        base = 5 + _seed(code, 'base') % 95
+        returns = rng.normal(0.0002, 0.02, n)
+        close = base * np.exp(np.cumsum(returns))
+        pre_close = np.concatenate([[close[0]], close[:-1]])
+        open_ = pre_close * (1 + rng.normal(0, 0.005, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, n)))
+        volume = np.round(rng.lognormal(15, 0.5, n))
+        # 约每年一次除权，复权因子阶梯上升
+        adjfactor = np.cumprod(np.where(rng.random(n) < 1 / 250, 1 + rng.uniform(0.01, 0.05, n), 1.0))
+
+        series = {
+            'dates': dates,
+            'open': open_,
+            'high': high,
+            'low': low,
+            'close': close,
+            'pre_close': pre_close,
+            'volume': volume,
+            'amt': volume * (open_ + close) / 2,
+            'chg': close - pre_close,
+            'pct_chg': (close / pre_close - 1) * 100,
+            'adjfactor': adjfactor,
+            'pe_ttm': 5 + (_seed(code, 'pe') % 60) * close / close[-1],
+            'pb': 0.5 + (_seed(code, 'pb') % 80) / 10 * close / close[-1],
+            'mkt_cap_ard': close * (1e8 + _seed(code, 'shares') % 10 ** 10),
+            'turn': volume / (1e6 + _seed(code, 'float') % 10 ** 9) * 100,
+        }
+        with self._lock:
+            self._series[code] = series
+        return series
+
+    @staticmethod
+    def _last_index(series, date):
+        """不晚于date(且不晚于今天)的最后一个交易日的位置"""
+        date = min(date, pd.Timestamp.now().normalize())
+        return max(series['dates'].searchsorted(date, 'right') - 1, 0)
+
+    def _field_values(self, code, field, series):
+        """获取日线字段，未知的数值字段生成确定性的模拟值"""
+        values = series.get(field)
+        if values is None:
+            rng = np.random.default_rng(_seed(code.upper(), field))
+            values = 1 + np.abs(np.cumsum(rng.normal(0, 0.01, len(series['dates']))) + (_seed(field) % 100))
+            series[field] = values
+        return values
+
+    def _text_value(self, code, field, date=None):
+        """字符串字段的模拟值，约十分之一的证券在某一日期调整行业"""
+        code = code.upper()
+        if field == 'sec_name':
+            return f'模拟{code[:6]}'
+        if field.startswith('industry'):
+            seed = _seed(code, 'industry')
+            if seed % 10 == 0 and _to_timestamp(date) >= _industry_change_date(code):
+                seed += 1
+            return REPLAY_INDUSTRIES[seed % len(REPLAY_INDUSTRIES)]
+        return None
+
+    def _adjusted(self, series, field, values, price_adj):
+        """按PriceAdj选项复权价格字段"""
+        if price_adj not in ('F', 'B') or field not in ('open', 'high', 'low', 'close', 'pre_close', 'chg'):
+            return values
+        factor = series['adjfactor']
+        latest = factor[self._last_index(series, pd.Timestamp.now().normalize())]
+        return values * (factor / latest if price_adj == 'F' else factor)
+
+    def _daily_frame(self, code, fields, start, end, price_adj):
+        series = self._daily(code)
+        dates = series['dates']
+        lo, hi = dates.searchsorted(start, 'left'), dates.searchsorted(end, 'right')
+        data = {}
+        for field in fields:
+            if self._text_value(code, field) is not None:
+                data[field.upper()] = [self._text_value(code, field, day) for day in dates[lo:hi]]
+            else:
+                values = self._adjusted(series, field, self._field_values(code, field, series), price_adj)
+                data[field.upper()] = values[lo:hi]
+        return pd.DataFrame(data, index=dates[lo:hi], columns=[f.upper() for f in fields])
+
+    def _minute_frame(self, code, fields, start, end, price_adj, bar_size):
+        """由日线生成分钟线：每天的价格路径在开盘价与收盘价之间随机游走"""
+        daily = self._daily_frame(code, ['open', 'high', 'low', 'close', 'volume', 'amt'], start, end, price_adj)
+        frames = []
+        for day, row in daily.iterrows():
+            rng = np.random.default_rng(_seed(code.upper(), day.strftime('%Y%m%d')))
+            minutes = _MORNING_MINUTES + _AFTERNOON_MINUTES
+            steps = rng.normal(0, 1, minutes)
+            bridge = np.cumsum(steps) - np.arange(1, minutes + 1) / minutes * steps.sum()
+            scale = (row['HIGH'] - row['LOW']) / 4 / max(np.abs(bridge).max(), 1e-9)
+            path = row['OPEN'] + (row['CLOSE'] - row['OPEN']) * np.arange(1, minutes + 1) / minutes + bridge * scale
+            path = np.clip(path, row['LOW'], row['HIGH'])
+            times = (list(pd.date_range(day + timedelta(hours=9, minutes=31), periods=_MORNING_MINUTES, freq='min'))
+                     + list(pd.date_range(day + timedelta(hours=13, minutes=1), periods=_AFTERNOON_MINUTES, freq='min')))
+            volume = np.full(minutes, row['VOLUME'] / minutes)
+            minute = pd.DataFrame({
+                'OPEN': np.concatenate([[row['OPEN']], path[:-1]]),
+                'HIGH': path, 'LOW': path, 'CLOSE': path,
+                'VOLUME': volume, 'AMT': volume * path,
+            }, index=pd.DatetimeIndex(times))
+            minute['HIGH'] = minute[['OPEN', 'CLOSE']].max(axis=1)
+            minute['LOW'] = minute[['OPEN', 'CLOSE']].min(axis=1)
+            # 按K线大小合并，K线时间为区间结束时间
+            groups = np.arange(minutes) // bar_size
+            frames.append(minute.groupby(groups).agg({
+                'OPEN': 'first', 'HIGH': 'max', 'LOW': 'min', 'CLOSE': 'last', 'VOLUME': 'sum', 'AMT': 'sum'
+            }).set_axis(minute.index[np.minimum((np.arange(groups[-1] + 1) + 1) * bar_size, minutes) - 1]))
+        if not frames:
+            return pd.DataFrame(columns=[f.upper() for f in fields])
+        df = pd.concat(frames)
+        return df.reindex(columns=[f.upper() for f in fields])
+
+    def _period_frame(self, code, fields, start, end, price_adj, period):
+        """由日线合成周线或月线，K线日期为该周期内的最后一个交易日"""
+        daily = self._daily_frame(code, list(dict.fromkeys(['open', 'high', 'low', 'close', 'volume', 'amt'] + fields)),
+                                  start, end, price_adj)
+        if daily.empty:
+            return daily[[f.upper() for f in fields]]
+        key = daily.index.to_period('W' if period == 'W' else 'M')
+        how = {column: 'last' for column in daily.columns}
+        how.update({'OPEN': 'first', 'HIGH': 'max', 'LOW': 'min', 'VOLUME': 'sum', 'AMT': 'sum'})
+        last_dates = pd.Series(daily.index, index=daily.index).groupby(key).last()
+        df = daily.groupby(key).agg(how).set_axis(pd.DatetimeIndex(last_dates.values))
+        return df[[f.upper() for f in fields]]
+
+    def _frame(self, code, fields, start, end, options):
+        parsed = parse_options(options)
+        period = parsed.get('period', 'D').upper()
+        price_adj = parsed.get('priceadj', '').upper()
+        if period.isdigit():
+            return self._minute_frame(code, fields, start, end, price_adj, int(period))
+        if period in ('W', 'M'):
+            return self._period_frame(code, fields, start, end, price_adj, period)
+        return self._daily_frame(code, fields, start, end, price_adj)
+
+    # ---- Wind接口 ----
+
+    def wsd(self, codes, fields, beginTime, endTime, options='', usedf=False):
+        recorded = self._begin('wsd', (codes, fields, beginTime, endTime, options), {'usedf': usedf})
+        if recorded is not None:
+            return recorded
+        code_list = _split(codes)
+        field_list = [f.lower() for f in _split(fields)]
+        if not self._valid(code_list) or not field_list or (len(code_list) > 1 and len(field_list) > 1):
+            return self._error(usedf)
+        start = _to_timestamp(beginTime)
+        end = min(_to_timestamp(endTime), pd.Timestamp.now().normalize())
+
+        if len(code_list) == 1:
+            df = self._frame(code_list[0], field_list, start, end, options)
+        else:
+            columns = {code.upper(): self._frame(code, field_list, start, end, options).iloc[:, 0]
+                       for code in code_list}
+            df = pd.DataFrame(columns)
+
+        if usedf:
+            return 0, df
+        return ProviderResult(
+            codes=[c.upper() for c in code_list],
+            fields=df.columns.tolist() if len(code_list) == 1 else [field_list[0].upper()],
+            times=[t.to_pydatetime() for t in df.index],
+            data=[df[column].tolist() for column in df.columns],
+        )
+
+    def wsi(self, codes, fields, beginTime, endTime, options='', usedf=False):
+        recorded = self._begin('wsi', (codes, fields, beginTime, endTime, options), {'usedf': usedf})
+        if recorded is not None:
+            return recorded
+        code_list = _split(codes)
+        field_list = [f.lower() for f in _split(fields)]
+        if not self._valid(code_list) or len(code_list) != 1 or not field_list:
+            return self._error(usedf)
+        # 当天只返回已经走完的分钟
+        begin = pd.Timestamp(beginTime)
+        end = min(pd.Timestamp(endTime), pd.Timestamp.now())
+        parsed = parse_options(options)
+        df = self._minute_frame(code_list[0], field_list, begin.normalize(), end.normalize(),
+                                parsed.get('priceadj', '').upper(), int(parsed.get('barsize', 1)))
+        df = df[(df.index >= begin) & (df.index <= end)]
+
+        if usedf:
+            return 0, df
+        return ProviderResult(
+            codes=[code_list[0].upper()],
+            fields=df.columns.tolist(),
+            times=[t.to_pydatetime() for t in df.index],
+            data=[df[column].tolist() for column in df.columns],
+        )
+
+    def _quote(self, code, fields):
+        """
+        生成证券的模拟实时行情：以最近收盘价为昨收，每次调用推进一个tick
+        """
+        series = self._daily(code)
+        with self._lock:
+            tick = self._ticks[code] = self._ticks.get(code, 0) + 1
+        i = self._last_index(series, pd.Timestamp.now().normalize())
+        pre_close = series['close'][i]
+        rng = np.random.default_rng(_seed(code.upper(), 'tick', str(tick)))
+        last = pre_close * (1 + 0.01 * math.sin(tick / 10) + rng.normal(0, 0.001))
+        volume = float(series['volume'][i] * min(tick, 240) / 240)
+        quote = {
+            'rt_last': last,
+            'rt_pre_close': pre_close,
+            'rt_open': pre_close,
+            'rt_high': max(last, pre_close),
+            'rt_low': min(last, pre_close),
+            'rt_vol': volume,
+            'rt_amt': volume * last,
+            'rt_chg': last - pre_close,
+            'rt_pct_chg': (last / pre_close - 1) * 100,
+            'rt_bid1': last - 0.01,
+            'rt_ask1': last + 0.01,
+        }
+        return [quote.get(f.lower(), float('nan')) for f in fields]
+
+    def _subscribe(self, code_list, field_list, func):
+        request_id = next(self._request_ids)
+        stop_event = threading.Event()
+        with self._lock:
+            self._subscriptions[request_id] = stop_event
+
+        def run():
+            while not stop_event.wait(self.tick_interval):
+                rows = [self._quote(code, field_list) for code in code_list]
+                try:
+                    func(ProviderResult(codes=code_list, fields=[f.upper() for f in field_list],
+                                        times=[datetime.now()], data=[list(col) for col in zip(*rows)],
+                                        request_id=request_id))
+                except Exception as e:
+                    logger.error(f"模拟行情回调失败: {str(e)}")
+
+        threading.Thread(target=run, name=f'replay-wsq-{request_id}', daemon=True).start()
+        return ProviderResult(request_id=request_id)
+
+    def wsq(self, codes, fields, func=None, usedf=False):
+        recorded = None if func else self._begin('wsq', (codes, fields), {'usedf': usedf})
+        if recorded is not None:
+            return recorded
+        code_list = [c.upper() for c in _split(codes)]
+        field_list = _split(fields)
+        if not self._valid(code_list):
+            return self._error(usedf)
+        if func is not None:
+            return self._subscribe(code_list, field_list, func)
+
+        rows = [self._quote(code, field_list) for code in code_list]
+        columns = [f.upper() for f in field_list]
+        if usedf:
+            return 0, pd.DataFrame(rows, index=code_list, columns=columns, dtype=np.float64)
+        return ProviderResult(codes=code_list, fields=columns, times=[datetime.now()],
+                              data=[list(col) for col in zip(*rows)])
+
+    def wss(self, codes, fields, options='', usedf=False):
+        recorded = self._begin('wss', (codes, fields, options), {'usedf': usedf})
+        if recorded is not None:
+            return recorded
+        code_list = [c.upper() for c in _split(codes)]
+        field_list = [f.lower() for f in _split(fields)]
+        if not self._valid(code_list):
+            return self._error(usedf)
+        parsed = parse_options(options)
+        date = _to_timestamp(parsed.get('tradedate') or parsed.get('rptdate'))
+
+        columns = {}
+        for field in field_list:
+            values = []
+            for code in code_list:
+                text = self._text_value(code, field, date)
+                if text is not None:
+                    values.append(text)
+                    continue
+                series = self._daily(code)
+                i = self._last_index(series, date)
+                values.append(float(self._field_values(code, field, series)[i]))
+            columns[field.upper()] = values
+        df = pd.DataFrame(columns, index=code_list)
+        if usedf:
+            return 0, df
+        return ProviderResult(codes=code_list, fields=df.columns.tolist(), times=[date.to_pydatetime()],
+                              data=[df[column].tolist() for column in df.columns])
+
+    def tdays(self, beginTime, endTime, options=''):
+        recorded = self._begin('tdays', (beginTime, endTime, options), {})
+        if recorded is not None:
+            return recorded
+        days = [d.to_pydatetime() for d in pd.bdate_range(_to_timestamp(beginTime), _to_timestamp(endTime))]
+        return ProviderResult(codes=['Result'], fields=['Times'], times=days, data=[days])
+
+    def _constituents(self, index_code, date):
+        """模拟指数在date的成分股与权重(见_index_history)"""
+        initial, changes = _index_history(index_code.upper())
+        members = set(initial)
+        for change_date, added, removed in changes:
+            if change_date > date:
+                break
+            members = (members - set(removed)) | set(added)
+        codes = sorted(members)
+        weights = np.random.default_rng(_seed(index_code.upper(), str(date.date()))).random(len(codes))
+        return codes, (weights / weights.sum() * 100).tolist()
+
+    def _index_changes(self, index_code, start, end):
+        """模拟指数在[start, end]内的成分调整记录"""
+        rows = []
+        for change_date, added, removed in _index_history(index_code.upper())[1]:
+            if start <= change_date <= end:
+                rows += [(change_date, code, '纳入') for code in added]
+                rows += [(change_date, code, '剔除') for code in removed]
+        return rows
+
+    def wset(self, tablename, options=''):
+        recorded = self._begin('wset', (tablename, options), {})
+        if recorded is not None:
+            return recorded
+        parsed = parse_options(options)
+        if tablename.lower() == 'indexhistory' and 'windcode' in parsed:
+            rows = self._index_changes(parsed['windcode'], _to_timestamp(parsed.get('startdate')),
+                                       _to_timestamp(parsed.get('enddate')))
+            return ProviderResult(
+                codes=list(range(1, len(rows) + 1)),
+                fields=['tradedate', 'tradecode', 'tradename', 'tradestatus'],
+                times=[pd.Timestamp.now().to_pydatetime()],
+                data=[[row[0].to_pydatetime() for row in rows], [row[1] for row in rows],
+                      [self._text_value(row[1], 'sec_name') for row in rows], [row[2] for row in rows]],
+            )
+        date = _to_timestamp(parsed.get('date'))
+        if tablename.lower() == 'sectorconstituent' and 'sectorid' in parsed:
+            # 板块成分均视为全部A股
+            codes = _replay_universe()
+            weights = [100 / len(codes)] * len(codes)
+        elif tablename.lower() in ('indexconstituent', 'sectorconstituent') and 'windcode' in parsed:
+            codes, weights = self._constituents(parsed['windcode'], date)
+        else:
+            return ProviderResult(REPLAY_INVALID_CODE)
+        return ProviderResult(
+            codes=list(range(1, len(codes) + 1)),
+            fields=['date', 'wind_code', 'sec_name', 'i_weight'],
+            times=[date.to_pydatetime()],
+            data=[[date.to_pydatetime()] * len(codes), codes,
+                  [self._text_value(code, 'sec_name') for code in codes], weights],
+        )
+
+    def cancelRequest(self, request_id):
+        with self._lock:
+            stop_event = self._subscriptions.pop(request_id, None)
+        if stop_event is not None:
+            stop_event.set()
+        return ProviderResult()
+
+
+class RecordingProvider(DataProvider):
+    """包装真实数据源，将成功的调用结果录制到目录供ReplayProvider回放"""
+
+    def __init__(self, provider, replay_dir):
+        self.provider = provider
+        self.replay_dir = replay_dir
+        self.name = f'{provider.name}+record'
+
+    def _record(self, func_name, args, kwargs):
+        result = getattr(self.provider, func_name)(*args, **kwargs)
+        error_code = result[0] if isinstance(result, tuple) else result.ErrorCode
+        if error_code == 0:
+            if not isinstance(result, tuple):
+                # WindData对象依赖WindPy，转换为通用结构后再保存
+                result = ProviderResult(result.ErrorCode, list(result.Codes), list(result.Fields),
+                                        list(result.Times), [list(col) for col in result.Data])
+            path = _record_path(self.replay_dir, func_name, args, kwargs)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump(result, f)
+            os.replace(path + '.tmp', path)
+        return result
+
+    def start(self, waitTime=120):
+        return self.provider.start(waitTime=waitTime)
+
+    def stop(self):
+        return self.provider.stop()
+
+    def isconnected(self):
+        return self.provider.isconnected()
+
+    def wsd(self, codes, fields, beginTime, endTime, options='', usedf=False):
+        return self._record('wsd', (codes, fields, beginTime, endTime, options), {'usedf': usedf})
+
+    def wsi(self, codes, fields, beginTime, endTime, options='', usedf=False):
+        return self._record('wsi', (codes, fields, beginTime, endTime, options), {'usedf': usedf})
+
+    def wsq(self, codes, fields, func=None, usedf=False):
+        if func is not None:
+            return self.provider.wsq(codes, fields, func=func)
+        return self._record('wsq', (codes, fields), {'usedf': usedf})
+
+    def wss(self, codes, fields, options='', usedf=False):
+        return self._record('wss', (codes, fields, options), {'usedf': usedf})
+
+    def tdays(self, beginTime, endTime, options=''):
+        return self._record('tdays', (beginTime, endTime, options), {})
+
+    def wset(self, tablename, options=''):
+        return self._record('wset', (tablename, options), {})
+
+    def cancelRequest(self, request_id):
+        return self.provider.cancelRequest(request_id)
+
+
+def create_provider(name='wind', replay_dir=None, latency=0.0, record=False):
+    """
+    创建数据源
+
+    Args:
+        name (str, optional): 'wind'或'replay'
+        replay_dir (str, optional): 录制结果目录
+        latency (float, optional): replay数据源每次调用的模拟延迟(秒)
+        record (bool, optional): 为True时将wind数据源的结果录制到replay_dir
+
+    Returns:
+        DataProvider: 数据源
+    """
+    name = (name or 'wind').lower()
+    if name == 'wind':
+        provider = WindPyProvider()
+        return RecordingProvider(provider, replay_dir) if record and replay_dir else provider
+    if name == 'replay':
+        return ReplayProvider(replay_dir, latency)
+    raise ValueError(f"未知的数据源: {name}，可选: wind, replay")
+
+
+# 进程内默认数据源
+_default_provider = None
+_default_lock = threading.Lock()
+
+
+def set_default_provider(provider):
+    """
+    设置进程内默认数据源
+
+    Args:
+        provider (DataProvider): 数据源
+    """
+    global _default_provider
+    with _default_lock:
+        _default_provider = provider
+
+
+def get_default_provider():
+    """
+    获取进程内默认数据源，未设置时按环境变量DATA_PROVIDER、REPLAY_DIR、REPLAY_LATENCY创建
+
+    Returns:
+        DataProvider: 数据源
+    """
+    global _default_provider
+    with _default_lock:
+        if _default_provider is None:
+            _default_provider = create_provider(
+                os.environ.get('DATA_PROVIDER', 'wind'),
+                replay_dir=os.environ.get('REPLAY_DIR') or None,
+                latency=float(os.environ.get('REPLAY_LATENCY', 0)),
+                record=os.environ.get('REPLAY_RECORD', '').lower() in ('1', 'true'),
+            )
+        return _default_provider
@@ -0,0 +1,582 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多进程部署模块
+抓取进程(run_fetcher.py)独占Wind会话，日线写入磁盘列式缓存，最新行情写入共享内存行情表；
+各HTTP工作进程通过multiprocessing.connection向抓取进程发送请求，
+已缓存的日线与未过期的行情直接从内存映射中读取，不经过抓取进程，也不在各进程中各保存一份
+"""
+
+import os
+import itertools
+import threading
+import logging
+from datetime import datetime
+from multiprocessing.connection import Listener, Client
+
+import pandas as pd
+
+from services.cache import HistoricalCache, parse_options, remove_option
+from services.connection import WindUnavailableError
+from services.data_provider import DataProvider, ProviderResult
+from services.intraday_store import IntradayStore
+from services import metrics
+from services.quote_hub import QuoteHub
+from services.shared_quotes import SharedQuoteStore
+from services.snapshot_store import get_default_snapshot_store
+from services.wind_service import WindService, wind_decorator
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def parse_address(address):
+    """
+    解析抓取进程地址
+
+    Args:
+        address (str): 'host:port'为TCP地址，其他视为Unix套接字路径(Windows下为命名管道)
+
+    Returns:
+        tuple or str: multiprocessing.connection使用的地址
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def fetcher_authkey(config):
+    """
+    获取抓取进程的连接认证密钥
+
+    Args:
+        config (dict): 应用配置
+
+    Returns:
+        bytes: 认证密钥
+
+    Raises:
+        RuntimeError: 未设置FETCHER_AUTHKEY
+    """
+    authkey = config.get('FETCHER_AUTHKEY')
+    if not authkey:
+        raise RuntimeError("未设置FETCHER_AUTHKEY，抓取进程不接受无密钥的连接")
+    return authkey.encode('utf-8')
+
+
+class FetcherServer:
+    """抓取进程中的请求服务，每个工作进程连接由一个线程处理"""
+
+    # 工作进程可以调用的方法
+    METHODS = ('call', 'connect', 'check_connection', 'get_stats', 'get_historical_frame',
+               'get_historical_panel', 'get_realtime_data', 'subscribe_quotes', 'unsubscribe_quotes',
+               'invalidate_adjfactor')
+
+    # call可以调用的Wind函数
+    WIND_FUNCTIONS = ('wsd', 'wsi', 'wsq', 'wss', 'wset', 'tdays')
+
+    def __init__(self, service, address, authkey, quote_fields='rt_last,rt_vol,rt_amt', prewarm=None):
+        """
+        初始化并开始监听
+
+        Args:
+            service (WindService): 抓取进程的Wind数据服务，行情表应为可写的SharedQuoteStore
+            address (tuple or str): 监听地址，见parse_address
+            authkey (bytes): 连接认证密钥
+            quote_fields (str, optional): 行情订阅字段
+            prewarm (PrewarmScheduler, optional): 抓取进程中的盘前预热调度器，统计随get_stats返回
+        """
+        self.service = service
+        self.quote_fields = quote_fields
+        self.prewarm = prewarm
+        if isinstance(address, str) and os.path.exists(address):
+            # 上次退出时未清理的Unix套接字文件
+            os.unlink(address)
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        self._hub = None
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._subscription_ids = itertools.count(1)
+        self._closed = threading.Event()
+        self._stats = {'connections': 0, 'requests': 0, 'errors': 0}
+
+    def serve_forever(self):
+        """接受工作进程连接，直到close被调用"""
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if self._closed.is_set():
+                    break
+                logger.error(f"接受工作进程连接失败: {str(e)}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), name='fetcher-conn', daemon=True).start()
+
+    def start(self):
+        """
+        在后台线程中运行serve_forever
+
+        Returns:
+            threading.Thread: 服务线程
+        """
+        thread = threading.Thread(target=self.serve_forever, name='fetcher-server', daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """停止监听并取消所有行情订阅"""
+        self._closed.set()
+        self._listener.close()
+        if self.prewarm is not None:
+            self.prewarm.stop()
+        with self._lock:
+            subscription_ids = list(self._subscriptions)
+        for subscription_id in subscription_ids:
+            self.unsubscribe_quotes(subscription_id)
+
+    def _handle(self, conn):
+        with self._lock:
+            self._stats['connections'] += 1
+        owned = set()
+        try:
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    break
+                with self._lock:
+                    self._stats['requests'] += 1
+                try:
+                    if method not in self.METHODS:
+                        raise ValueError(f"不支持的方法: {method}")
+                    target = getattr(self, method, None) or getattr(self.service, method)
+                    reply = ('ok', target(*args, **kwargs))
+                    if method == 'subscribe_quotes':
+                        owned.add(reply[1])
+                    elif method == 'unsubscribe_quotes':
+                        owned.discard(args[0])
+                except Exception as e:
+                    with self._lock:
+                        self._stats['errors'] += 1
+                    reply = ('error', e)
+                try:
+                    conn.send(reply)
+                except Exception as e:
+                    # 结果或异常无法序列化时只返回错误信息
+                    conn.send(('error', Exception(str(e) if reply[0] == 'ok' else str(reply[1]))))
+        finally:
+            conn.close()
+            # 工作进程退出后释放它持有的订阅
+            for subscription_id in owned:
+                self.unsubscribe_quotes(subscription_id)
+
+    def call(self, func_name, args, kwargs):
+        """经抓取进程的Wind工作线程调用数据源函数(订阅模式的wsq除外)"""
+        if func_name not in self.WIND_FUNCTIONS:
+            raise ValueError(f"不支持的Wind函数: {func_name}")
+        if kwargs.get('func') is not None:
+            raise ValueError("订阅请使用subscribe_quotes")
+        return self.service._call(func_name, *args, **kwargs)
+
+    def get_stats(self):
+        """Wind数据服务与抓取进程的统计"""
+        with self._lock:
+            fetcher = dict(self._stats, subscriptions=len(self._subscriptions), pid=os.getpid())
+        stats = dict(self.service.get_stats(), fetcher=fetcher)
+        if self.prewarm is not None:
+            stats['prewarm'] = self.prewarm.stats()
+        return stats
+
+    def subscribe_quotes(self, codes):
+        """
+        订阅证券的实时推送，推送的行情写入共享行情表
+
+        Args:
+            codes (list): 证券代码列表
+
+        Returns:
+            int: 订阅编号
+        """
+        with self._lock:
+            if self._hub is None:
+                # 推送只需写入行情表，客户端队列不会被读取
+                self._hub = self.service.create_quote_hub(self.quote_fields, client_queue_size=1)
+            hub = self._hub
+        client = hub.connect(codes)
+        with self._lock:
+            subscription_id = next(self._subscription_ids)
+            self._subscriptions[subscription_id] = client
+        return subscription_id
+
+    def unsubscribe_quotes(self, subscription_id):
+        """
+        取消订阅
+
+        Args:
+            subscription_id (int): subscribe_quotes返回的订阅编号
+        """
+        with self._lock:
+            client = self._subscriptions.pop(subscription_id, None)
+        if client is not None:
+            self._hub.disconnect(client)
+
+
+class FetcherClient:
+    """抓取进程的客户端，每个线程使用独立的连接"""
+
+    def __init__(self, address, authkey, retry_after=1):
+        """
+        初始化客户端，首次调用时才建立连接
+
+        Args:
+            address (tuple or str): 抓取进程地址，见parse_address
+            authkey (bytes): 连接认证密钥
+            retry_after (int, optional): 抓取进程不可用时建议的重试间隔(秒)
+        """
+        self.address = address
+        self.authkey = authkey
+        self.retry_after = retry_after
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+            except OSError as e:
+                raise WindUnavailableError(f"抓取进程不可用: {str(e)}", self.retry_after)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.add(conn)
+        return conn
+
+    def _discard(self, conn):
+        self._local.conn = None
+        with self._lock:
+            self._connections.discard(conn)
+        conn.close()
+
+    def call(self, method, *args, **kwargs):
+        """
+        调用抓取进程的方法
+
+        Args:
+            method (str): 方法名，见FetcherServer.METHODS
+
+        Returns:
+            方法的返回值
+
+        Raises:
+            WindUnavailableError: 抓取进程不可用或连接中断
+            Exception: 抓取进程中抛出的异常
+        """
+        conn = self._connection()
+        try:
+            conn.send((method, args, kwargs))
+            status, value = conn.recv()
+        except (EOFError, OSError) as e:
+            self._discard(conn)
+            raise WindUnavailableError(f"与抓取进程的连接中断: {str(e)}", self.retry_after)
+        if status == 'error':
+            raise value
+        return value
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+
+
+class RemoteProvider(DataProvider):
+    """经抓取进程访问Wind的数据源，供工作进程中直接使用默认数据源的模块(如wind_utils)调用"""
+
+    name = 'remote'
+
+    def __init__(self, client):
+        """
+        Args:
+            client (FetcherClient): 抓取进程客户端
+        """
+        self.client = client
+
+    def start(self, waitTime=120):
+        # 连接由抓取进程维护
+        return ProviderResult()
+
+    def stop(self):
+        pass
+
+    def isconnected(self):
+        try:
+            return self.client.call('check_connection')
+        except WindUnavailableError:
+            return False
+
+    def _call(self, func_name, *args, **kwargs):
+        return self.client.call('call', func_name, args, kwargs)
+
+    def wsd(self, codes, fields, beginTime, endTime, options='', usedf=False):
+        return self._call('wsd', codes, fields, beginTime, endTime, options, usedf=usedf)
+
+    def wsi(self, codes, fields, beginTime, endTime, options='', usedf=False):
+        return self._call('wsi', codes, fields, beginTime, endTime, options, usedf=usedf)
+
+    def wsq(self, codes, fields, func=None, usedf=False):
+        if func is not None:
+            raise NotImplementedError("工作进程中的订阅请使用SharedQuoteFeed")
+        return self._call('wsq', codes, fields, usedf=usedf)
+
+    def wss(self, codes, fields, options='', usedf=False):
+        return self._call('wss', codes, fields, options, usedf=usedf)
+
+    def tdays(self, beginTime, endTime, options=''):
+        return self._call('tdays', beginTime, endTime, options)
+
+    def wset(self, tablename, options=''):
+        return self._call('wset', tablename, options)
+
+
+class SharedQuoteFeed:
+    """
+    工作进程中行情推送中心的上游：订阅由抓取进程发起，
+    后台线程按版本号轮询共享行情表，将变化的行情以WindPy回调的格式交给推送中心
+    """
+
+    def __init__(self, service, poll_interval=0.2):
+        """
+        Args:
+            service (RemoteWindService): 工作进程的数据服务
+            poll_interval (float, optional): 轮询共享行情表的间隔(秒)
+        """
+        self.service = service
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def wsq(self, codes, fields, func=None, usedf=False):
+        """订阅证券，与WindPy订阅模式的w.wsq参数一致"""
+        code_list = [c.strip().upper() for c in codes.split(',') if c.strip()]
+        field_list = [f.strip() for f in fields.split(',') if f.strip()]
+        subscription_id = self.service._remote('subscribe_quotes', code_list)
+        with self._lock:
+            self._subscriptions[subscription_id] = [code_list, field_list, func, None]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='shared-quote-feed', daemon=True)
+                self._thread.start()
+        return ProviderResult(request_id=subscription_id)
+
+    def cancelRequest(self, request_id):
+        """取消订阅"""
+        with self._lock:
+            self._subscriptions.pop(request_id, None)
+        self.service._remote('unsubscribe_quotes', request_id)
+
+    def stop(self):
+        """停止轮询线程"""
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_interval):
+            with self._lock:
+                subscriptions = list(self._subscriptions.items())
+            for subscription_id, subscription in subscriptions:
+                code_list, field_list, func, since = subscription
+                try:
+                    data = self.service.quotes.snapshot(code_list, field_list, since)
+                    subscription[3] = data['version']
+                    if data['codes']:
+                        func(ProviderResult(codes=data['codes'], fields=data['fields'], times=[datetime.now()],
+                                            data=[list(column) for column in zip(*data['data'])],
+                                            request_id=subscription_id))
+                except Exception as e:
+                    logger.error(f"读取共享行情失败: {str(e)}")
+
+
+class RemoteWindService(WindService):
+    """
+    工作进程中的Wind数据服务，接口与WindService相同；
+    Wind调用转发给抓取进程，已缓存的日线与未过期的行情在本进程中直接读取
+    """
+
+    def __init__(self, client, cache_dir=None, quote_path=None, quote_max_age=1.0, poll_interval=0.2,
+                 batch_size=100, snapshot_batch_size=1000):
+        """
+        初始化工作进程的数据服务
+
+        Args:
+            client (FetcherClient): 抓取进程客户端
+            cache_dir (str, optional): 与抓取进程相同的历史行情缓存目录，为None时日线全部由抓取进程返回
+            quote_path (str, optional): 共享行情表文件路径，为None时实时行情全部由抓取进程返回
+            quote_max_age (float, optional): 共享行情表中的行情在该时长(秒)内更新过时直接返回
+            poll_interval (float, optional): 实时推送轮询共享行情表的间隔(秒)
+            batch_size (int, optional): 批量请求时单次w.wsd的证券数量上限
+            snapshot_batch_size (int, optional): 补取截面数据时单次w.wss的证券数量上限
+        """
+        self.client = client
+        self.provider = RemoteProvider(client)
+        self.cache_dir = cache_dir
+        self.cache = HistoricalCache(cache_dir) if cache_dir else None
+        self.quote_path = quote_path
+        self.quote_max_age = quote_max_age
+        self.poll_interval = poll_interval
+        self.workers = 1
+        self.batch_size = batch_size
+        # 截面数据缺失时经抓取进程调用w.wss，写入本进程的截面缓存(与抓取进程共用CACHE_DIR)
+        self.snapshots = get_default_snapshot_store()
+        self.snapshot_batch_size = snapshot_batch_size
+        self._market_codes = {}
+        # 已收盘的分钟线分区写入后不再修改，各工作进程直接读写同一目录；当天的分区在各进程内存中
+        self.intraday = IntradayStore(os.path.join(cache_dir, 'intraday') if cache_dir else None)
+        self._latest_factors = {}
+        self._quotes = None
+        self._feeds = []
+        self._stats_lock = threading.Lock()
+        self._stats = {'local_reads': 0, 'remote_calls': 0}
+
+    @property
+    def quotes(self):
+        """
+        只读映射的共享行情表，抓取进程创建后才能打开
+
+        Raises:
+            WindUnavailableError: 共享行情表尚未创建
+        """
+        if self._quotes is None:
+            try:
+                self._quotes = SharedQuoteStore(self.quote_path)
+            except FileNotFoundError:
+                raise WindUnavailableError("共享行情表尚未由抓取进程创建", self.client.retry_after)
+        return self._quotes
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _remote(self, method, *args, **kwargs):
+        """调用抓取进程的方法"""
+        self._count('remote_calls')
+        return self.client.call(method, *args, **kwargs)
+
+    def _call(self, func_name, *args, **kwargs):
+        """Wind调用由抓取进程排队执行，熔断与请求合并也在抓取进程中进行；耗时含进程间通信"""
+        with metrics.span('wind', function=func_name, size='error') as span_labels:
+            result = self._remote('call', func_name, args, kwargs)
+            span_labels['size'] = metrics.size_label(metrics.result_size(result))
+        return result
+
+    def connect(self, wait=False):
+        return self._remote('connect', wait)
+
+    def shutdown(self):
+        """关闭与抓取进程的连接，不影响抓取进程中的Wind会话"""
+        for feed in self._feeds:
+            feed.stop()
+        self.client.close()
+
+    def check_connection(self):
+        try:
+            return self._remote('check_connection')
+        except WindUnavailableError:
+            return False
+
+    def get_stats(self):
+        """
+        获取抓取进程的统计，并附加本进程的本地读取次数
+
+        Returns:
+            dict: 同WindService.get_stats，另有fetcher与worker两项
+        """
+        stats = self._remote('get_stats')
+        with self._stats_lock:
+            stats['worker'] = dict(self._stats, pid=os.getpid(),
+                                   cache=self.cache.stats() if self.cache is not None else None,
+                                   snapshots=self.snapshots.stats(),
+                                   intraday=self.intraday.stats())
+        return stats
+
+    def _read_cached(self, code, field_list, start_date, end_date, options):
+        """请求区间已全部缓存时从内存映射读取，否则返回None"""
+        if self.cache is None or parse_options(options).get('period', 'D').upper() != 'D':
+            return None
+        df = self.cache.read_covered_frame(code, field_list, start_date, end_date, options)
+        if df is not None:
+            self._count('local_reads')
+        return df
+
+    @wind_decorator
+    def get_historical_frame(self, code, fields, start_date, end_date, options=""):
+        field_list = [f.strip().lower() for f in fields.split(',') if f.strip()]
+        period = parse_options(options).get('period', 'D').upper()
+        if period.isdigit():
+            # 已收盘的1分钟线分区在本进程读取，缺失的交易日经抓取进程调用w.wsi
+            return self.get_bars(code, fields, start_date, end_date, period, remove_option(options, 'Period'))
+        if self._adjusts_locally(options):
+            # 未复权行情与复权因子分别在本地读取或由抓取进程补取
+            return self._adjusted_frame(code, field_list, start_date, end_date, options)
+        df = self._read_cached(code, field_list, start_date, end_date, options)
+        if df is not None:
+            return df
+        # 有缺失区间时由抓取进程补取并写入缓存，之后的相同请求在各工作进程中直接读取
+        return self._remote('get_historical_frame', code, fields, start_date, end_date, options)
+
+    @wind_decorator
+    def get_historical_panel(self, codes, fields, start_date, end_date, options=""):
+        code_list = codes.split(',') if isinstance(codes, str) else list(codes)
+        code_list = [c.strip() for c in code_list if c.strip()]
+        field_list = [f.strip().lower() for f in fields.split(',') if f.strip()]
+        if self._adjusts_locally(options):
+            return self._adjusted_panel(code_list, field_list, start_date, end_date, options)
+
+        frames = {}
+        for field in field_list:
+            columns = {}
+            for code in code_list:
+                df = self._read_cached(code, [field], start_date, end_date, options)
+                if df is None:
+                    return self._remote('get_historical_panel', code_list, fields, start_date, end_date, options)
+                columns[code] = df.iloc[:, 0]
+            frames[field] = pd.concat(columns, axis=1)
+        return self._assemble_panel(code_list, field_list, frames)
+
+    def invalidate_adjfactor(self, code):
+        """复权因子缓存由抓取进程删除"""
+        self._latest_factors.pop(code.upper(), None)
+        self._remote('invalidate_adjfactor', code)
+
+    @wind_decorator
+    def get_realtime_data(self, codes, fields, since=None):
+        code_list = [c.strip() for c in codes.split(',') if c.strip()]
+        field_list = [f.strip() for f in fields.split(',') if f.strip()]
+        if self.quote_path and self.quote_max_age > 0:
+            try:
+                if self.quotes.is_fresh(code_list, field_list, self.quote_max_age):
+                    self._count('local_reads')
+                    return self.quotes.snapshot(code_list, field_list, since)
+            except WindUnavailableError:
+                pass
+        # 抓取进程调用w.wsq并写入共享行情表，版本号在所有工作进程间一致
+        return self._remote('get_realtime_data', codes, fields, since)
+
+    def create_quote_hub(self, fields='rt_last,rt_vol,rt_amt', client_queue_size=256):
+        """
+        创建本进程的行情推送中心，上游订阅由抓取进程维护，推送内容从共享行情表读取
+
+        Args:
+            fields (str): 订阅字段
+            client_queue_size (int, optional): 每个客户端的待发送队列上限
+
+        Returns:
+            QuoteHub: 行情推送中心
+        """
+        feed = SharedQuoteFeed(self, self.poll_interval)
+        self._feeds.append(feed)
+        return QuoteHub(feed, fields, client_queue_size=client_queue_size)
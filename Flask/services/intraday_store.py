@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分钟线存储模块
+1分钟线按(证券代码, 选项, 交易日)分区保存为NumPy文件：已收盘的交易日写入后不再修改，
+以只读内存映射方式读取；当天的分区保存在内存中，每次只向Wind(w.wsi)补取最后一根之后的分钟。
+N分钟线由utils.resample在本地合成
+"""
+
+import os
+import hashlib
+import threading
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from services.cache import to_day, day_to_str, normalize_options
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 分区保存的字段
+INTRADAY_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amt')
+
+# A股每个交易日的交易分钟数
+MINUTES_PER_DAY = 240
+
+# 收盘时间(最后一根1分钟线的时间)，当天收盘后不再向Wind补取
+SESSION_CLOSE = timedelta(hours=15)
+
+# 向前查找最近N根K线时最多回溯的交易日数
+MAX_TAIL_DAYS = 250
+
+_EMPTY_TIMES = np.empty(0, dtype=np.int64)
+_EMPTY_VALUES = np.empty((0, len(INTRADAY_FIELDS)), dtype=np.float64)
+
+
+class IntradayStore:
+    """按交易日分区的1分钟线存储"""
+
+    def __init__(self, root_dir=None, clock=None):
+        """
+        初始化分钟线存储
+
+        Args:
+            root_dir (str, optional): 存储目录，为None时已收盘的分区只保存在内存中
+            clock (callable, optional): 返回当前时间的函数，用于区分当天与已收盘的交易日，默认为datetime.now
+        """
+        self.root_dir = root_dir
+        self.clock = clock or datetime.now
+        self._partitions = {}
+        self._today = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'upstream_calls': 0}
+        if root_dir:
+            os.makedirs(root_dir, exist_ok=True)
+
+    def stats(self):
+        """
+        获取存储统计
+
+        Returns:
+            dict: 已收盘分区的命中、缺失次数，当天分区的刷新次数与上游请求次数
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _lock_for(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _path(self, key, day):
+        code, options_key = key
+        digest = hashlib.md5(options_key.encode('utf-8')).hexdigest()[:12] if options_key else '_'
+        return os.path.join(self.root_dir, code, digest, day_to_str(day).replace('-', ''))
+
+    def _load(self, key, day):
+        """读取已收盘的分区，不存在时返回None"""
+        if not self.root_dir:
+            return self._partitions.get((key, day))
+        path = self._path(key, day)
+        # 时间文件最后写入，存在即表示分区完整
+        if not os.path.exists(path + '.times.npy'):
+            return None
+        return (np.load(path + '.times.npy', mmap_mode='r'),
+                np.load(path + '.values.npy', mmap_mode='r'))
+
+    def _save(self, key, day, times, values):
+        """写入已收盘的分区，之后不再修改"""
+        if not self.root_dir:
+            self._partitions[(key, day)] = (times, values)
+            return
+        path = self._path(key, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for suffix, array in (('.values', values), ('.times', times)):
+            tmp_path = f'{path}{suffix}.{os.getpid()}.tmp.npy'
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, path + suffix + '.npy')
+
+    @staticmethod
+    def _split_frame(df):
+        """将Wind返回的DataFrame转换为(纳秒时间数组, 分钟×字段数组)"""
+        if df is None or df.empty:
+            return _EMPTY_TIMES, _EMPTY_VALUES
+        df = df.set_axis([str(c).upper() for c in df.columns], axis=1)
+        times = pd.DatetimeIndex(df.index).values.astype('datetime64[ns]').view(np.int64)
+        values = df.reindex(columns=[f.upper() for f in INTRADAY_FIELDS]).to_numpy(dtype=np.float64)
+        return times, values
+
+    def _fetch_closed(self, key, days, fetcher):
+        """连续缺失的已收盘交易日合并为一次请求，按交易日拆分后写入"""
+        df = fetcher(f'{day_to_str(days[0])} 09:00:00', f'{day_to_str(days[-1])} 15:30:00')
+        self._count('upstream_calls')
+        times, values = self._split_frame(df)
+        bounds = np.searchsorted(times // 86_400_000_000_000, [[day, day + 1] for day in days])
+        partitions = {}
+        # 没有数据的交易日(如停牌)也写入空分区，之后不再请求
+        for day, (lo, hi) in zip(days, bounds):
+            partitions[day] = (times[lo:hi], values[lo:hi])
+            self._save(key, day, times[lo:hi], values[lo:hi])
+        return partitions
+
+    def _refresh_today(self, key, day, fetcher):
+        """
+        从当天最后一根开始补取并替换：最后一根可能尚未走完，重新获取后覆盖；
+        补取的截止时间不超过收盘，收盘后已补取过的当天不再请求
+        """
+        cached = self._today.get(key)
+        if cached is not None and cached[0] == day:
+            times, values, fetched_until = cached[1:]
+        else:
+            times, values, fetched_until = _EMPTY_TIMES, _EMPTY_VALUES, None
+        session_close = pd.Timestamp(day_to_str(day)) + SESSION_CLOSE
+        if len(times):
+            begin = pd.Timestamp(int(times[-1]))
+        else:
+            begin = pd.Timestamp(day_to_str(day)) + timedelta(hours=9)
+        end = min(pd.Timestamp(self.clock()), session_close)
+        if begin <= end and (fetched_until is None or fetched_until < session_close):
+            new_times, new_values = self._split_frame(fetcher(begin.strftime('%Y-%m-%d %H:%M:%S'),
+                                                              end.strftime('%Y-%m-%d %H:%M:%S')))
+            self._count('upstream_calls')
+            if len(new_times):
+                keep = times < new_times[0]
+                times = np.concatenate([times[keep], new_times])
+                values = np.concatenate([values[keep], new_values])
+            self._today[key] = (day, times, values, end)
+        self._count('refreshes')
+        return times, values
+
+    def get_days(self, code, trading_days, options, fetcher):
+        """
+        获取若干交易日的1分钟线
+
+        Args:
+            code (str): 证券代码
+            trading_days (list): 升序的交易日列表，如['2024-01-02', '2024-01-03']
+            options (str): Wind选项(不含BarSize)，不同选项分别保存
+            fetcher (callable): fetcher(begin_time, end_time)返回该时间段以时间为索引的1分钟线
+
+        Returns:
+            tuple: (纳秒时间数组, 分钟×INTRADAY_FIELDS的数组)
+        """
+        key = (code.upper(), normalize_options(options))
+        today = to_day(self.clock())
+        days = [to_day(d) for d in trading_days]
+        with self._lock_for(key):
+            partitions = {}
+            missing = []
+            for day in days:
+                if day >= today:
+                    continue
+                partition = self._load(key, day)
+                if partition is None:
+                    missing.append(day)
+                else:
+                    partitions[day] = partition
+            self._count('hits', len(partitions))
+            self._count('misses', len(missing))
+
+            # 按交易日列表中的位置拆分为连续的缺失区间
+            position = {day: i for i, day in enumerate(days)}
+            runs = []
+            for day in missing:
+                if runs and position[day] == position[runs[-1][-1]] + 1:
+                    runs[-1].append(day)
+                else:
+                    runs.append([day])
+            for run in runs:
+                partitions.update(self._fetch_closed(key, run, fetcher))
+
+            if today in days:
+                partitions[today] = self._refresh_today(key, today, fetcher)
+
+        selected = [partitions[day] for day in days if day in partitions]
+        if not selected:
+            return _EMPTY_TIMES, _EMPTY_VALUES
+        return np.concatenate([p[0] for p in selected]), np.concatenate([p[1] for p in selected])
+
+    def tail(self, code, count, options, recent_days, fetcher):
+        """
+        获取最近count根1分钟线，只读取所需的最近几个交易日分区
+
+        Args:
+            code (str): 证券代码
+            count (int): 分钟数
+            options (str): Wind选项(不含BarSize)
+            recent_days (callable): recent_days(n)返回截至今天最近n个交易日的升序列表
+            fetcher (callable): 同get_days
+
+        Returns:
+            tuple: (纳秒时间数组, 分钟×INTRADAY_FIELDS的数组)，按交易日整日返回，调用方再截取
+        """
+        n = max(-(-count // MINUTES_PER_DAY), 1)
+        while True:
+            days = recent_days(n)
+            times, values = self.get_days(code, days, options, fetcher)
+            # 停牌或当天未收盘时分钟数不足，扩大回溯的交易日数
+            if len(times) >= count or len(days) < n or n >= MAX_TAIL_DAYS:
+                return times, values
+            n = min(n * 2, MAX_TAIL_DAYS)
@@ -0,0 +1,473 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能指标模块
+进程内的Prometheus直方图(不依赖prometheus_client)，记录每个请求中Wind上游调用、DataFrame转换、
+序列化与总耗时，按接口、Wind函数与结果规模分别统计；/metrics以Prometheus文本格式输出，
+并附带缓存命中率、队列深度与连接状态。各段耗时同时以Server-Timing响应头返回。
+多进程部署时各进程定期将直方图写入METRICS_DIR下的文件，/metrics合并所有进程的直方图输出
+"""
+
+import os
+import json
+import math
+import time
+import atexit
+import threading
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+from services.connection import (STATE_CONNECTED, STATE_CONNECTING, STATE_DISCONNECTED,
+                                 BREAKER_CLOSED, BREAKER_OPEN, BREAKER_HALF_OPEN)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 耗时直方图的分桶上限(秒)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def size_label(n):
+    """
+    将结果规模归入10的幂分档，作为标签时取值数有限
+
+    Args:
+        n (int): 数值个数或字节数，未知时为None
+
+    Returns:
+        str: 不小于n的10的幂，如1234为'1e4'；n为0时为'0'，未知时为'none'
+    """
+    if n is None:
+        return 'none'
+    if n <= 0:
+        return '0'
+    return f'1e{max(math.ceil(math.log10(n)), 0)}'
+
+
+def result_size(result):
+    """
+    统计Wind返回结果中的数值个数
+
+    Args:
+        result: Wind函数的返回值，(错误码, DataFrame)或WindData
+
+    Returns:
+        int: 数值个数，无法识别时为None
+    """
+    data = result[1] if isinstance(result, tuple) and len(result) > 1 else getattr(result, 'Data', result)
+    if hasattr(data, 'size') and not callable(data.size):
+        return int(data.size)
+    if isinstance(data, (list, tuple)):
+        return sum(len(item) if isinstance(item, (list, tuple)) else 1 for item in data)
+    return None
+
+
+class Histogram:
+    """按标签分组的累积直方图"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        """
+        初始化直方图
+
+        Args:
+            name (str): 指标名
+            documentation (str): 指标说明
+            labelnames (tuple): 标签名
+            buckets (tuple): 分桶上限，+Inf自动追加
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        记录一次观测值
+
+        Args:
+            value (float): 观测值
+            **labels: 各标签的值，缺少的标签为空字符串
+        """
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self):
+        """
+        获取各组标签的分桶计数与总和，用于写入文件与合并
+
+        Returns:
+            list: [[标签值列表, 分桶计数列表, 总和], ...]
+        """
+        with self._lock:
+            return [[list(key), list(counts), total] for key, (counts, total) in self._series.items()]
+
+    def samples(self, **labels):
+        """
+        获取一组标签的观测次数与总和
+
+        Returns:
+            tuple: (次数, 总和)，没有观测时为(0, 0.0)
+        """
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return (sum(series[0]), series[1]) if series is not None else (0, 0.0)
+
+    def render(self, series=None):
+        """
+        输出Prometheus文本格式
+
+        Args:
+            series (list, optional): snapshot格式的数据，默认为本进程的观测值
+
+        Returns:
+            list: 文本行
+        """
+        if series is None:
+            series = self.snapshot()
+        series = sorted((tuple(key), counts, total) for key, counts, total in series)
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, counts, total in series:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(pairs + [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(pairs)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(pairs)} {cumulative}')
+        return lines
+
+
+def _merge_series(series_lists):
+    """按标签合并多个进程的snapshot，分桶计数与总和相加"""
+    merged = {}
+    for series in series_lists:
+        for key, counts, total in series:
+            current = merged.get(tuple(key))
+            if current is None:
+                merged[tuple(key)] = [list(counts), total]
+            else:
+                current[0] = [a + b for a, b in zip(current[0], counts)]
+                current[1] += total
+    return [[list(key), counts, total] for key, (counts, total) in merged.items()]
+
+
+class MetricsRegistry:
+    """进程内的指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        """
+        获取或创建直方图
+
+        Returns:
+            Histogram: 同名的直方图只创建一次
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return metric
+
+    def render(self):
+        """
+        输出全部指标的Prometheus文本格式
+
+        Returns:
+            list: 文本行
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return lines
+
+    def write(self, path):
+        """
+        将全部直方图的观测值写入文件(先写临时文件再替换，读取方不会读到写了一半的文件)
+
+        Args:
+            path (str): 文件路径
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        data = {metric.name: metric.snapshot() for metric in metrics}
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def render_merged(self, directory, own_path=None):
+        """
+        合并目录中各进程写入的观测值与本进程当前的观测值，输出Prometheus文本格式
+
+        已退出进程的文件保留，其观测值继续计入累计的直方图
+
+        Args:
+            directory (str): 各进程写入指标文件的目录
+            own_path (str, optional): 本进程的指标文件，以内存中的当前值代替
+
+        Returns:
+            list: 文本行
+        """
+        others = []
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not name.endswith('.json') or path == own_path:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    others.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取指标文件{path}失败: {str(e)}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            series = [metric.snapshot()] + [data.get(metric.name, []) for data in others]
+            lines += metric.render(_merge_series(series))
+        return lines
+
+
+# 进程内默认注册表
+REGISTRY = MetricsRegistry()
+
+# 多进程部署时各进程写入指标文件的目录与间隔，由init_app按配置设置
+_multiprocess = {'directory': None, 'interval': 1.0, 'written': 0.0}
+_write_lock = threading.Lock()
+
+# 各计时段的直方图
+SPAN_HISTOGRAMS = {
+    'wind': REGISTRY.histogram('wind_upstream_duration_seconds', 'Wind函数调用耗时(含排队与合并等待)',
+                               ('endpoint', 'function', 'size')),
+    'convert': REGISTRY.histogram('wind_convert_duration_seconds', 'DataFrame与响应数据结构之间的转换耗时',
+                                  ('endpoint',)),
+    'serialize': REGISTRY.histogram('wind_serialize_duration_seconds', '响应体序列化耗时', ('endpoint', 'format')),
+}
+REQUEST_HISTOGRAM = REGISTRY.histogram('http_request_duration_seconds',
+                                       '请求处理耗时(流式响应只计到返回响应头，不含之后逐块生成与发送响应体)',
+                                       ('endpoint', 'method', 'status', 'size'))
+
+
+def current_endpoint():
+    """当前请求的路由规则，如'/api/historical'；请求之外(预热、抓取进程等)为'background'"""
+    if not has_request_context():
+        return 'background'
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def observe(name, seconds, **labels):
+    """
+    记录一段耗时，并累加到当前请求的Server-Timing
+
+    Args:
+        name (str): 计时段，'wind'、'convert'或'serialize'
+        seconds (float): 耗时(秒)
+        **labels: 除endpoint外的其他标签
+    """
+    SPAN_HISTOGRAMS[name].observe(seconds, endpoint=current_endpoint(), **labels)
+    if has_request_context():
+        timings = g.setdefault('server_timing', {})
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    记录with块的耗时
+
+    产出标签字典，块内可以补充执行后才知道的标签(如结果规模)：
+
+        with span('wind', function='wsd', size='error') as span_labels:
+            result = ...
+            span_labels['size'] = size_label(result_size(result))
+
+    Args:
+        name (str): 计时段，'wind'、'convert'或'serialize'
+        **labels: 除endpoint外的其他标签
+    """
+    started = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify生成响应时记录序列化耗时"""
+
+    def response(self, *args, **kwargs):
+        with span('serialize', format='json'):
+            return super().response(*args, **kwargs)
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    # 流式响应没有Content-Length，规模为none
+    REQUEST_HISTOGRAM.observe(elapsed, endpoint=current_endpoint(), method=request.method,
+                              status=response.status_code, size=size_label(response.content_length))
+    timings = g.get('server_timing', {})
+    response.headers['Server-Timing'] = ', '.join(
+        [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.items()]
+        + [f'total;dur={elapsed * 1000:.2f}'])
+    write_process_metrics()
+    return response
+
+
+def _process_path():
+    return os.path.join(_multiprocess['directory'], f'metrics-{os.getpid()}.json')
+
+
+def write_process_metrics(force=False):
+    """
+    多进程部署时将本进程的观测值写入METRICS_DIR，距上次写入不足间隔时跳过
+
+    Args:
+        force (bool, optional): 是否忽略写入间隔
+    """
+    if _multiprocess['directory'] is None:
+        return
+    now = time.monotonic()
+    if not force and now - _multiprocess['written'] < _multiprocess['interval']:
+        return
+    if not _write_lock.acquire(blocking=force):
+        return
+    try:
+        _multiprocess['written'] = now
+        REGISTRY.write(_process_path())
+    except OSError as e:
+        logger.warning(f"写入指标文件失败: {str(e)}")
+    finally:
+        _write_lock.release()
+
+
+def init_app(app):
+    """
+    注册请求计时钩子，并使jsonify记录序列化耗时
+
+    Args:
+        app (flask.Flask): 应用
+    """
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    directory = app.config.get('METRICS_DIR')
+    if directory and _multiprocess['directory'] is None:
+        os.makedirs(directory, exist_ok=True)
+        _multiprocess.update(directory=directory, interval=app.config.get('METRICS_WRITE_INTERVAL', 1.0))
+        atexit.register(write_process_metrics, True)
+
+
+def _state_lines(name, documentation, current, states):
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} gauge']
+    lines += [f'{name}{_format_labels([("state", state)])} {int(state == current)}' for state in states]
+    return lines
+
+
+def render_stats(stats):
+    """
+    将WindService.get_stats()的结果转换为Prometheus指标
+
+    Args:
+        stats (dict): 服务统计，为None时(如抓取进程不可用)只输出wind_stats_up 0
+
+    Returns:
+        list: 文本行
+    """
+    lines = ['# HELP wind_stats_up 服务统计是否可用', '# TYPE wind_stats_up gauge',
+             f'wind_stats_up {int(stats is not None)}']
+    if stats is None:
+        return lines
+
+    lines += ['# HELP wind_queue_depth Wind工作线程队列中等待的请求数', '# TYPE wind_queue_depth gauge',
+              f'wind_queue_depth {stats.get("queue_depth", 0)}']
+    connection = stats.get('connection') or {}
+    lines += _state_lines('wind_connection_state', 'Wind连接状态', connection.get('state'),
+                          (STATE_CONNECTED, STATE_CONNECTING, STATE_DISCONNECTED))
+    lines += _state_lines('wind_breaker_state', '熔断器状态', (connection.get('breaker') or {}).get('state'),
+                          (BREAKER_CLOSED, BREAKER_OPEN, BREAKER_HALF_OPEN))
+
+    # 各缓存的命中统计，命中率为完全命中的次数占比
+    requests = ['# HELP wind_cache_requests_total 缓存查询次数', '# TYPE wind_cache_requests_total counter']
+    ratios = ['# HELP wind_cache_hit_ratio 缓存命中率', '# TYPE wind_cache_hit_ratio gauge']
+    for cache in ('cache', 'intraday', 'snapshots'):
+        cache_stats = stats.get(cache)
+        if not cache_stats:
+            continue
+        name = 'historical' if cache == 'cache' else cache
+        results = {result: cache_stats.get(result, 0) for result in ('hits', 'partial_hits', 'misses')
+                   if result in cache_stats}
+        for result, count in results.items():
+            requests.append(f'wind_cache_requests_total{_format_labels([("cache", name), ("result", result)])} {count}')
+        total = sum(results.values())
+        ratios.append(f'wind_cache_hit_ratio{_format_labels([("cache", name)])} '
+                      f'{_format_value(results["hits"] / total if total else 0.0)}')
+    lines += requests + ratios
+
+    singleflight = stats.get('singleflight') or {}
+    lines += ['# HELP wind_singleflight_calls_total 经请求合并的Wind调用次数',
+              '# TYPE wind_singleflight_calls_total counter']
+    lines += [f'wind_singleflight_calls_total{_format_labels([("result", result)])} {singleflight.get(key, 0)}'
+              for result, key in (('upstream', 'upstream_calls'), ('deduplicated', 'deduplicated_calls'))]
+    return lines
+
+
+def render(stats=None):
+    """
+    输出/metrics的响应体
+
+    Args:
+        stats (dict, optional): WindService.get_stats()的结果
+
+    Returns:
+        str: Prometheus文本格式
+    """
+    if _multiprocess['directory'] is not None:
+        lines = REGISTRY.render_merged(_multiprocess['directory'], _process_path())
+    else:
+        lines = REGISTRY.render()
+    return '\n'.join(lines + render_stats(stats)) + '\n'
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+指数成分与行业分类的时点(point-in-time)存储模块
+成分股以(证券, 纳入日, 剔除日)区间保存，由一次成分快照和调整记录(w.wset indexhistory)重建，
+任意日期的成分都是本地查询；行业分类按证券保存带日期的观测值，两次观测相同则其间的日期都取该值，
+不同时二分查找调整日期，回测中逐日查询不会逐日访问Wind
+"""
+
+import os
+import json
+import bisect
+import threading
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from services.cache import to_day, day_to_str
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 尚未剔除的成分股的剔除日
+OPEN_END = np.iinfo(np.int64).max
+
+# 默认的成分调整记录起始日期
+DEFAULT_HISTORY_START = '2005-01-01'
+
+# 行业分类查询结果中表示本地无法确定
+_MISSING = object()
+
+
+class _IndexTimeline:
+    """单个指数的成分区间：members(day)为start <= day < end的证券"""
+
+    __slots__ = ('codes', 'start', 'end', 'covered_from', 'covered_until')
+
+    def __init__(self, codes, start, end, covered_from, covered_until):
+        self.codes = np.asarray(codes, dtype=str)
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.covered_from = covered_from
+        self.covered_until = covered_until
+
+    def members(self, day):
+        return sorted(self.codes[(self.start <= day) & (day < self.end)].tolist())
+
+    def apply(self, changes):
+        """按时间顺序应用调整记录：剔除时结束当前区间，纳入时开始新的区间"""
+        codes, start, end = self.codes.tolist(), self.start.tolist(), self.end.tolist()
+        for day, code, is_in in sorted(changes, key=lambda change: (change[0], change[2])):
+            if is_in:
+                codes.append(code)
+                start.append(day)
+                end.append(OPEN_END)
+                continue
+            for i in range(len(codes) - 1, -1, -1):
+                if codes[i] == code and end[i] == OPEN_END:
+                    end[i] = day
+                    break
+        self.codes = np.asarray(codes, dtype=str)
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+
+    def to_dict(self):
+        return {'covered_from': self.covered_from, 'covered_until': self.covered_until,
+                'codes': self.codes.tolist(), 'start': self.start.tolist(), 'end': self.end.tolist()}
+
+
+class PointInTimeStore:
+    """指数成分与行业分类的时点存储"""
+
+    def __init__(self, root_dir=None, history_start=DEFAULT_HISTORY_START, clock=datetime.now):
+        """
+        初始化存储
+
+        Args:
+            root_dir (str, optional): 持久化目录，为None时只保存在内存中
+            history_start (str, optional): 首次加载指数成分时调整记录的起始日期，更早日期的成分逐日向Wind查询
+            clock (callable, optional): 返回当前时间的函数
+        """
+        self.root_dir = root_dir
+        self.history_start = to_day(history_start)
+        self.clock = clock
+        self._timelines = {}
+        self._labels = {}
+        # 不支持调整记录或早于history_start的成分快照，只保存在内存中
+        self._snapshots = {}
+        self._refreshed = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'lookups': 0, 'upstream_calls': 0}
+
+    def stats(self):
+        """
+        获取统计
+
+        Returns:
+            dict: 查询次数、上游调用次数及已加载的指数与行业分类标准
+        """
+        with self._stats_lock:
+            return dict(self._stats, indexes=len(self._timelines), industry_standards=len(self._labels))
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _path(self, kind, name):
+        return os.path.join(self.root_dir, kind, f'{name}.json') if self.root_dir else None
+
+    def _read_json(self, path):
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"加载时点数据{path}失败: {str(e)}")
+            return None
+
+    @staticmethod
+    def _write_json(path, data):
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 临时文件名带进程号，多个工作进程同时写入时互不覆盖
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    # ---- 指数成分 ----
+
+    def _load_timeline(self, index_code):
+        timeline = self._timelines.get(index_code)
+        if timeline is None:
+            data = self._read_json(self._path('constituents', index_code))
+            if data is not None:
+                timeline = self._timelines[index_code] = _IndexTimeline(
+                    data['codes'], data['start'], data['end'], data['covered_from'], data['covered_until'])
+        return timeline
+
+    def _build_timeline(self, index_code, today, fetch_members, fetch_changes):
+        """由今天的成分快照和调整记录倒推各成分股的区间"""
+        self._count('upstream_calls', 2)
+        members = fetch_members(index_code, day_to_str(today))
+        changes = [c for c in fetch_changes(index_code, day_to_str(self.history_start), day_to_str(today))
+                   if c[0] <= today]
+
+        open_end = {code: OPEN_END for code in members}
+        codes, start, end = [], [], []
+        for day, code, is_in in sorted(changes, key=lambda change: (change[0], change[2]), reverse=True):
+            if is_in and code in open_end:
+                codes.append(code)
+                start.append(day)
+                end.append(open_end.pop(code))
+            elif not is_in:
+                open_end[code] = day
+        # 调整记录起始日之前纳入的成分股，区间从起始日开始
+        for code, code_end in open_end.items():
+            codes.append(code)
+            start.append(self.history_start)
+            end.append(code_end)
+        logger.info(f"已加载指数{index_code}的成分区间: {len(members)}只当前成分股，{len(changes)}条调整记录")
+        return _IndexTimeline(codes, start, end, self.history_start, today)
+
+    def _refresh_timeline(self, index_code, timeline, today, fetch_changes):
+        """增量获取上次加载之后的调整记录，每天最多一次"""
+        if timeline.covered_until >= today or self._refreshed.get(index_code) == today:
+            return
+        self._refreshed[index_code] = today
+        self._count('upstream_calls')
+        try:
+            changes = fetch_changes(index_code, day_to_str(timeline.covered_until + 1), day_to_str(today))
+        except Exception as e:
+            logger.error(f"刷新指数{index_code}的成分调整记录失败: {str(e)}")
+            return
+        timeline.apply([c for c in changes if timeline.covered_until < c[0] <= today])
+        timeline.covered_until = today
+        self._write_json(self._path('constituents', index_code), timeline.to_dict())
+
+    def constituents(self, index_code, date, fetch_members, fetch_changes):
+        """
+        获取指数在date的成分股
+
+        Args:
+            index_code (str): 指数代码，如'000300.SH'
+            date (str): 日期，晚于今天时按今天查询
+            fetch_members (callable): fetch_members(index_code, date)返回当天的成分股列表(w.wset indexconstituent)
+            fetch_changes (callable): fetch_changes(index_code, start_date, end_date)返回
+                [(天数, 证券代码, 是否纳入)]调整记录(w.wset indexhistory)，不支持时抛出异常
+
+        Returns:
+            list: 按代码排序的成分股列表
+        """
+        index_code = index_code.upper()
+        today = to_day(self.clock())
+        day = min(to_day(date), today)
+        self._count('lookups')
+
+        with self._lock_for(('constituents', index_code)):
+            timeline = self._load_timeline(index_code)
+            if timeline is None and index_code not in self._snapshots:
+                try:
+                    timeline = self._build_timeline(index_code, today, fetch_members, fetch_changes)
+                    self._timelines[index_code] = timeline
+                    self._write_json(self._path('constituents', index_code), timeline.to_dict())
+                except Exception as e:
+                    logger.warning(f"无法获取指数{index_code}的成分调整记录，按日期缓存成分快照: {str(e)}")
+                    self._snapshots[index_code] = {}
+            if timeline is not None:
+                self._refresh_timeline(index_code, timeline, today, fetch_changes)
+                if timeline.covered_from <= day <= timeline.covered_until:
+                    return timeline.members(day)
+
+            snapshots = self._snapshots.setdefault(index_code, {})
+            if day not in snapshots:
+                self._count('upstream_calls')
+                snapshots[day] = sorted(fetch_members(index_code, day_to_str(day)))
+            return list(snapshots[day])
+
+    # ---- 行业分类 ----
+
+    def _load_labels(self, standard):
+        labels = self._labels.get(standard)
+        if labels is None:
+            data = self._read_json(self._path('industry', standard)) or {}
+            labels = self._labels[standard] = {
+                code: ([d for d, _ in observations], [label for _, label in observations])
+                for code, observations in data.items()
+            }
+        return labels
+
+    @staticmethod
+    def _label_at(observations, day):
+        """两侧最近的观测值相同时取该值，否则返回_MISSING"""
+        if observations is None:
+            return _MISSING
+        days, labels = observations
+        i = bisect.bisect_right(days, day) - 1
+        if i >= 0 and days[i] == day:
+            return labels[i]
+        if 0 <= i < len(days) - 1 and labels[i] == labels[i + 1]:
+            return labels[i]
+        return _MISSING
+
+    def _observe(self, labels, codes, day, fetch_labels):
+        """向Wind获取一批证券在day的行业并记录为观测值"""
+        self._count('upstream_calls')
+        values = fetch_labels(codes, day_to_str(day))
+        for code, label in zip(codes, values):
+            days, code_labels = labels.setdefault(code, ([], []))
+            i = bisect.bisect_left(days, day)
+            if i < len(days) and days[i] == day:
+                code_labels[i] = label
+            else:
+                days.insert(i, day)
+                code_labels.insert(i, label)
+
+    def _differing_neighbors(self, labels, code, day):
+        """day与两侧最近观测值之间行业不同、且尚未确定调整日期的区间"""
+        days, code_labels = labels[code]
+        i = days.index(day)
+        intervals = []
+        if i > 0 and code_labels[i - 1] != code_labels[i] and day - days[i - 1] > 1:
+            intervals.append((days[i - 1], day))
+        if i < len(days) - 1 and code_labels[i + 1] != code_labels[i] and days[i + 1] - day > 1:
+            intervals.append((day, days[i + 1]))
+        return intervals
+
+    def _locate_changes(self, labels, pending, fetch_labels):
+        """二分查找各区间内的行业调整日期，区间中点相同的证券合并为一次请求"""
+        while pending:
+            groups = {}
+            for code, (lo, hi) in pending:
+                groups.setdefault((lo + hi) // 2, []).append((code, lo, hi))
+            pending = []
+            for mid, items in groups.items():
+                self._observe(labels, [code for code, _, _ in items], mid, fetch_labels)
+                for code, lo, hi in items:
+                    days, code_labels = labels[code]
+                    for a, b in ((lo, mid), (mid, hi)):
+                        if b - a > 1 and code_labels[days.index(a)] != code_labels[days.index(b)]:
+                            pending.append((code, (a, b)))
+
+    def industry(self, codes, date, standard, fetch_labels):
+        """
+        获取一批证券在date的行业分类
+
+        首次查询某只证券时同时获取今天的行业，两者相同则其间所有日期都可本地查询；
+        不同则二分查找调整日期
+
+        Args:
+            codes (list): 证券代码列表
+            date (str): 日期，晚于今天时按今天查询
+            standard (str): 行业分类标准，如'sw'
+            fetch_labels (callable): fetch_labels(codes, date)返回与codes对齐的行业列表(w.wss)
+
+        Returns:
+            list: 与codes对齐的行业列表
+        """
+        code_list = [c.strip().upper() for c in codes if c.strip()]
+        today = to_day(self.clock())
+        day = min(to_day(date), today)
+        self._count('lookups')
+
+        with self._lock_for(('industry', standard)):
+            labels = self._load_labels(standard)
+            unresolved = list(dict.fromkeys(code for code in code_list
+                                            if self._label_at(labels.get(code), day) is _MISSING))
+            if unresolved:
+                self._observe(labels, unresolved, day, fetch_labels)
+                # 没有更晚观测值的证券再获取今天的行业，作为区间的右端
+                latest = [code for code in unresolved if day < today and labels[code][0][-1] == day]
+                if latest:
+                    self._observe(labels, latest, today, fetch_labels)
+                pending = [(code, interval) for code in unresolved
+                           for interval in self._differing_neighbors(labels, code, day)]
+                self._locate_changes(labels, pending, fetch_labels)
+                self._write_json(self._path('industry', standard),
+                                 {code: [list(pair) for pair in zip(*obs)] for code, obs in labels.items()})
+            return [self._label_at(labels[code], day) for code in code_list]
+
+
+# 进程内默认时点存储
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def set_default_pit_store(store):
+    """
+    设置进程内默认时点存储，应用和抓取进程启动时按CACHE_DIR配置
+
+    Args:
+        store (PointInTimeStore): 时点存储
+    """
+    global _default_store
+    _default_store = store
+
+
+def get_default_pit_store():
+    """
+    获取进程内默认时点存储，未设置时按环境变量CACHE_DIR创建
+
+    Returns:
+        PointInTimeStore: 时点存储
+    """
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                cache_dir = os.environ.get('CACHE_DIR')
+                _default_store = PointInTimeStore(os.path.join(cache_dir, 'pit') if cache_dir else None)
+    return _default_store
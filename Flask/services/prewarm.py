@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+盘前缓存预热模块
+每个交易日开盘前解析指数成分股(如沪深300、中证500)，将其日线、基本面和行业分类预先取入缓存，
+开盘后的首批请求不再承担冷启动的Wind延迟；任务以有限并发执行，完成的任务记录在检查点文件中，
+中断后重新运行时跳过，并记录每个任务的耗时供调整预热时间
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from utils import wind_utils
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_SKIPPED = 'skipped'
+
+
+class Prewarmer:
+    """按指数成分股预热日线、基本面和行业分类缓存"""
+
+    def __init__(self, service, indexes='000300.SH,000905.SH', fields='open,high,low,close,volume', options='',
+                 history_days=365, fundamental_fields='pe_ttm,pb,ps_ttm', industry_standard='sw',
+                 concurrency=4, batch_size=100, checkpoint_path=None):
+        """
+        初始化预热任务
+
+        Args:
+            service (WindService): Wind数据服务，日线写入其历史行情缓存
+            indexes (str): 指数代码，逗号分隔
+            fields (str): 预热的日线字段
+            options (str, optional): 日线的Wind选项，如'PriceAdj=F'
+            history_days (int, optional): 日线回溯的自然日数
+            fundamental_fields (str, optional): 预热的基本面字段，为空时不预热基本面
+            industry_standard (str, optional): 行业分类标准，为空时不预热行业分类
+            concurrency (int, optional): 同时执行的任务数
+            batch_size (int, optional): 每个任务包含的证券数
+            checkpoint_path (str, optional): 检查点文件，为None时不支持中断后继续
+        """
+        self.service = service
+        self.indexes = [c.strip() for c in indexes.split(',') if c.strip()]
+        self.fields = fields
+        self.options = options
+        self.history_days = history_days
+        self.fundamental_fields = fundamental_fields
+        self.industry_standard = industry_standard
+        self.concurrency = max(concurrency, 1)
+        self.batch_size = max(batch_size, 1)
+        self.checkpoint_path = checkpoint_path
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self.last_report = None
+
+    def _load_checkpoint(self, run_date):
+        """读取run_date的检查点，不存在或属于其他日期时返回空检查点"""
+        empty = {'run_date': run_date, 'universes': {}, 'done': {}, 'finished': False}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return empty
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except Exception as e:
+            logger.error(f"读取预热检查点失败: {str(e)}")
+            return empty
+        return checkpoint if checkpoint.get('run_date') == run_date else empty
+
+    def _save_checkpoint(self, checkpoint):
+        if not self.checkpoint_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        tmp_path = f'{self.checkpoint_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def is_finished(self, run_date):
+        """
+        判断run_date的预热是否已全部完成
+
+        Args:
+            run_date (str): 日期，如'2024-01-02'
+
+        Returns:
+            bool: 是否已完成
+        """
+        return self._load_checkpoint(run_date)['finished']
+
+    def plan(self, universes, run_date):
+        """
+        按指数和证券分组生成预热任务
+
+        Args:
+            universes (dict): {指数代码: 成分股代码列表}
+            run_date (str): 预热日期
+
+        Returns:
+            list: (任务ID, 证券数, 无参数的执行函数)列表，任务ID在成分股不变时保持稳定
+        """
+        day = datetime.strptime(run_date, '%Y-%m-%d')
+        # 只预热已收盘的日线，当天的数据开盘后才产生
+        start_date = (day - timedelta(days=self.history_days)).strftime('%Y-%m-%d')
+        end_date = (day - timedelta(days=1)).strftime('%Y-%m-%d')
+
+        jobs = []
+        for index_code, codes in universes.items():
+            codes = sorted(codes)
+            for i in range(0, len(codes), self.batch_size):
+                chunk = codes[i:i + self.batch_size]
+                suffix = f'{index_code}:{i // self.batch_size}'
+                jobs.append((f'bars:{suffix}', len(chunk),
+                             lambda chunk=chunk: self._warm_bars(chunk, start_date, end_date)))
+                if self.fundamental_fields:
+                    jobs.append((f'fundamentals:{suffix}', len(chunk),
+                                 lambda chunk=chunk: self._warm_fundamentals(chunk, run_date)))
+                if self.industry_standard:
+                    jobs.append((f'industry:{suffix}', len(chunk), lambda chunk=chunk: self._warm_industry(chunk)))
+        return jobs
+
+    def _warm_bars(self, codes, start_date, end_date):
+        self.service.get_historical_panel(codes, self.fields, start_date, end_date, self.options)
+
+    def _warm_fundamentals(self, codes, run_date):
+        # wind_utils的函数出错时返回空表，视为任务失败以便下次继续
+        if wind_utils.get_fundamental_data(codes, self.fundamental_fields, run_date, service=self.service).empty:
+            raise Exception("获取基本面数据失败")
+
+    def _warm_industry(self, codes):
+        if wind_utils.get_industry_classification(codes, self.industry_standard, service=self.service).empty:
+            raise Exception("获取行业分类失败")
+
+    def _resolve_universes(self, checkpoint, run_date, report):
+        """解析各指数的成分股，已记录在检查点中的指数不再请求"""
+        for index_code in self.indexes:
+            job_id = f'constituents:{index_code}'
+            if index_code in checkpoint['universes']:
+                report['jobs'].append({'job': job_id, 'status': JOB_SKIPPED})
+                continue
+            started = time.perf_counter()
+            codes = wind_utils.get_index_constituents(index_code, run_date, service=self.service)
+            entry = {'job': job_id, 'codes': len(codes), 'seconds': round(time.perf_counter() - started, 3)}
+            if codes:
+                entry['status'] = JOB_DONE
+                checkpoint['universes'][index_code] = list(codes)
+                self._save_checkpoint(checkpoint)
+            else:
+                entry.update(status=JOB_FAILED, error="获取指数成分股失败")
+            report['jobs'].append(entry)
+
+    def run(self, run_date=None):
+        """
+        执行一次预热，同一日期已完成的任务跳过
+
+        Args:
+            run_date (str, optional): 预热日期，默认为今天
+
+        Returns:
+            dict: 预热报告，包含每个任务的状态与耗时，以及按任务类型汇总的耗时
+        """
+        run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+        # 同一进程内不重复执行
+        with self._run_lock:
+            started = time.perf_counter()
+            checkpoint = self._load_checkpoint(run_date)
+            report = {'run_date': run_date, 'started_at': datetime.now().isoformat(timespec='seconds'), 'jobs': []}
+            logger.info(f"开始预热{run_date}的缓存: {','.join(self.indexes)}")
+
+            self._resolve_universes(checkpoint, run_date, report)
+            # 各指数的任务独立分组，某个指数稍后才解析成功时已完成任务的ID不变
+            universes = {index_code: checkpoint['universes'][index_code] for index_code in self.indexes
+                         if index_code in checkpoint['universes']}
+            codes = {code for members in universes.values() for code in members}
+            jobs = self.plan(universes, run_date)
+            pending = []
+            for job_id, size, func in jobs:
+                if job_id in checkpoint['done']:
+                    report['jobs'].append({'job': job_id, 'codes': size, 'status': JOB_SKIPPED})
+                else:
+                    pending.append((job_id, size, func))
+
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='prewarm') as executor:
+                futures = {executor.submit(self._timed, func): (job_id, size) for job_id, size, func in pending}
+                for future in as_completed(futures):
+                    job_id, size = futures[future]
+                    seconds, error = future.result()
+                    entry = {'job': job_id, 'codes': size, 'seconds': seconds}
+                    if error is None:
+                        entry['status'] = JOB_DONE
+                        with self._lock:
+                            checkpoint['done'][job_id] = seconds
+                            self._save_checkpoint(checkpoint)
+                    else:
+                        entry.update(status=JOB_FAILED, error=error)
+                        logger.error(f"预热任务{job_id}失败: {error}")
+                    report['jobs'].append(entry)
+
+            failed = [entry['job'] for entry in report['jobs'] if entry['status'] == JOB_FAILED]
+            checkpoint['finished'] = not failed and len(checkpoint['universes']) == len(self.indexes)
+            self._save_checkpoint(checkpoint)
+
+            report.update(codes=len(codes), failed=failed, finished=checkpoint['finished'],
+                          seconds=round(time.perf_counter() - started, 3), summary=self._summarize(report['jobs']))
+            logger.info(f"预热{run_date}完成: {len(codes)}只证券，耗时{report['seconds']}秒，"
+                        f"失败{len(failed)}个任务，各类任务耗时: {report['summary']}")
+            self.last_report = report
+            return report
+
+    @staticmethod
+    def _timed(func):
+        """执行任务，返回(耗时, 错误信息)"""
+        started = time.perf_counter()
+        try:
+            func()
+            error = None
+        except Exception as e:
+            error = str(e)
+        return round(time.perf_counter() - started, 3), error
+
+    @staticmethod
+    def _summarize(jobs):
+        """按任务类型汇总本次执行的任务数与耗时"""
+        summary = {}
+        for entry in jobs:
+            if entry['status'] == JOB_SKIPPED:
+                continue
+            kind = entry['job'].split(':', 1)[0]
+            item = summary.setdefault(kind, {'jobs': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            item['jobs'] += 1
+            item['seconds'] = round(item['seconds'] + entry['seconds'], 3)
+            item['max_seconds'] = max(item['max_seconds'], entry['seconds'])
+        return summary
+
+
+class PrewarmScheduler:
+    """每个交易日在指定时间执行预热的后台线程"""
+
+    def __init__(self, prewarmer, run_at='08:30', is_trading_day=None, retry_interval=300, clock=datetime.now):
+        """
+        初始化调度器
+
+        Args:
+            prewarmer (Prewarmer): 预热任务
+            run_at (str, optional): 每天的执行时间，如'08:30'，应早于开盘
+            is_trading_day (callable, optional): is_trading_day(date)判断是否为交易日，默认按周一至周五判断
+            retry_interval (float, optional): 有任务失败时重新执行(跳过已完成任务)的间隔(秒)
+            clock (callable, optional): 返回当前时间的函数
+        """
+        self.prewarmer = prewarmer
+        hour, minute = (int(part) for part in run_at.split(':'))
+        self.run_at = (hour, minute)
+        self.is_trading_day = is_trading_day or (lambda date: datetime.strptime(date, '%Y-%m-%d').weekday() < 5)
+        self.retry_interval = retry_interval
+        self.clock = clock
+        self._stopped = threading.Event()
+        self._thread = None
+        self._last_attempt = None
+        self.runs = 0
+
+    def due(self, now=None):
+        """
+        判断当前是否应执行预热：交易日已过执行时间且当天预热尚未完成；
+        启动时已过执行时间(如进程在预热中途重启)会立即继续当天的预热
+
+        Args:
+            now (datetime, optional): 当前时间
+
+        Returns:
+            bool: 是否应执行
+        """
+        now = now or self.clock()
+        if (now.hour, now.minute) < self.run_at:
+            return False
+        if self._last_attempt is not None and (now - self._last_attempt).total_seconds() < self.retry_interval:
+            return False
+        run_date = now.strftime('%Y-%m-%d')
+        try:
+            return self.is_trading_day(run_date) and not self.prewarmer.is_finished(run_date)
+        except Exception as e:
+            logger.error(f"判断是否需要预热失败: {str(e)}")
+            return False
+
+    def next_run(self, now=None):
+        """
+        下一次执行时间(不检查交易日)
+
+        Args:
+            now (datetime, optional): 当前时间
+
+        Returns:
+            datetime: 下一次执行时间
+        """
+        now = now or self.clock()
+        today = now.replace(hour=self.run_at[0], minute=self.run_at[1], second=0, microsecond=0)
+        return today if now < today else today + timedelta(days=1)
+
+    def run_pending(self):
+        """
+        到期时执行一次预热
+
+        Returns:
+            dict: 预热报告，未到期时返回None
+        """
+        if not self.due():
+            return None
+        now = self.clock()
+        self._last_attempt = now
+        self.runs += 1
+        try:
+            return self.prewarmer.run(now.strftime('%Y-%m-%d'))
+        except Exception as e:
+            logger.error(f"缓存预热失败: {str(e)}")
+            return None
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self.run_pending()
+            # 每分钟检查一次，兼顾执行时间的精度与系统时间调整
+            self._stopped.wait(60)
+
+    def start(self):
+        """启动调度线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='prewarm-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止调度线程，进程退出时中断的预热由检查点记录已完成的任务，下次执行时继续"""
+        self._stopped.set()
+
+    def stats(self):
+        """
+        获取调度统计
+
+        Returns:
+            dict: 下一次执行时间、执行次数及最近一次预热的汇总
+        """
+        report = self.prewarmer.last_report
+        return {
+            'next_run': self.next_run().isoformat(timespec='minutes'),
+            'runs': self.runs,
+            'last_run': None if report is None else {
+                key: report[key] for key in ('run_date', 'started_at', 'codes', 'seconds', 'finished', 'failed',
+                                             'summary')
+            }
+        }
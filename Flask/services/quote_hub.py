@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+实时行情推送模块
+每只证券只保持一个上游w.wsq订阅(回调模式)，行情更新分发给所有订阅该证券的客户端；
+订阅按引用计数管理，最后一个客户端断开后取消上游订阅
+"""
+
+import json
+import functools
+import math
+import queue
+import threading
+import logging
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def _clean(value):
+    """NaN转换为None，保证输出为合法JSON"""
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+class QuoteClient:
+    """一个推送连接，持有有界的待发送队列"""
+
+    def __init__(self, codes, max_queue_size=256):
+        self.codes = codes
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self.closed = False
+        # 放入更新后调用的无参函数，异步服务用它唤醒等待中的协程
+        self.notify = None
+
+    def put(self, update):
+        """放入一条更新，队列已满时丢弃最旧的一条，慢客户端不会阻塞回调线程"""
+        while True:
+            try:
+                self._queue.put_nowait(update)
+                if self.notify is not None:
+                    self.notify()
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """
+        获取下一条更新
+
+        Args:
+            timeout (float, optional): 等待秒数，为0时不等待
+
+        Returns:
+            dict: {'code': 证券代码, 'time': 时间, 'data': {字段: 值}}，超时返回None
+        """
+        try:
+            if timeout == 0:
+                return self._queue.get_nowait()
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class QuoteHub:
+    """按证券引用计数的wsq订阅与行情分发"""
+
+    def __init__(self, wind, fields='rt_last,rt_vol,rt_amt', run=None, client_queue_size=256, store=None):
+        """
+        初始化行情推送中心
+
+        Args:
+            wind: WindPy的w对象或提供wsq(codes, fields, func=...)与cancelRequest(request_id)的同类对象
+            fields (str): 订阅字段
+            run (callable, optional): run(func, *args)在Wind工作线程中执行订阅与取消，默认直接调用
+            client_queue_size (int, optional): 每个客户端的待发送队列上限
+            store (QuoteStore, optional): 推送的行情同时写入的最新行情表
+        """
+        self.wind = wind
+        self.store = store
+        self.fields = fields
+        self.client_queue_size = client_queue_size
+        self._run = run or (lambda func, *args: func(*args))
+        # 保护订阅引用计数，订阅与取消过程中持有，保证同一证券不会重复订阅
+        self._subscription_lock = threading.Lock()
+        # 保护客户端列表与最新行情，回调线程中只短暂持有
+        self._lock = threading.Lock()
+        self._refs = {}
+        self._request_ids = {}
+        self._clients = {}
+        self._latest = {}
+        self._stats = {'upstream_subscriptions': 0, 'upstream_cancels': 0, 'updates': 0}
+
+    def _subscribe(self, code):
+        # 回调参数名为func，与工作线程的调用参数同名，先绑定
+        result = self._run(functools.partial(self.wind.wsq, func=self._on_quote), code, self.fields)
+        if result.ErrorCode != 0:
+            raise Exception(f"订阅{code}实时行情失败，错误码: {result.ErrorCode}")
+        self._request_ids[code] = result.RequestID
+        self._stats['upstream_subscriptions'] += 1
+        logger.info(f"已订阅{code}实时行情")
+
+    def _cancel(self, code):
+        request_id = self._request_ids.pop(code, None)
+        with self._lock:
+            self._latest.pop(code, None)
+        if request_id is None:
+            return
+        try:
+            self._run(self.wind.cancelRequest, request_id)
+            self._stats['upstream_cancels'] += 1
+            logger.info(f"已取消{code}实时行情订阅")
+        except Exception as e:
+            logger.error(f"取消{code}实时行情订阅失败: {str(e)}")
+
+    def connect(self, codes):
+        """
+        建立推送连接，尚未订阅的证券向Wind发起订阅
+
+        Args:
+            codes (list): 证券代码列表
+
+        Returns:
+            QuoteClient: 客户端，已有行情的证券会先收到最新快照
+
+        Raises:
+            Exception: 上游订阅失败，已增加的引用会被回滚
+        """
+        codes = list(dict.fromkeys(codes))
+        client = QuoteClient(codes, self.client_queue_size)
+        added = []
+        with self._subscription_lock:
+            try:
+                for code in codes:
+                    if self._refs.get(code, 0) == 0:
+                        self._subscribe(code)
+                    self._refs[code] = self._refs.get(code, 0) + 1
+                    added.append(code)
+            except Exception:
+                self._release(added)
+                raise
+
+        with self._lock:
+            for code in codes:
+                self._clients.setdefault(code, set()).add(client)
+                if code in self._latest:
+                    client.put(self._latest[code])
+        return client
+
+    def disconnect(self, client):
+        """
+        断开推送连接，引用计数归零的证券取消上游订阅
+
+        Args:
+            client (QuoteClient): connect返回的客户端，重复断开不会重复释放
+        """
+        with self._lock:
+            if client.closed:
+                return
+            client.closed = True
+            for code in client.codes:
+                clients = self._clients.get(code)
+                if clients is not None:
+                    clients.discard(client)
+                    if not clients:
+                        del self._clients[code]
+        with self._subscription_lock:
+            self._release(client.codes)
+
+    def _release(self, codes):
+        for code in codes:
+            refs = self._refs.get(code, 0) - 1
+            if refs > 0:
+                self._refs[code] = refs
+            else:
+                self._refs.pop(code, None)
+                self._cancel(code)
+
+    def _on_quote(self, indata):
+        """WindPy回调，在WindPy的推送线程中执行"""
+        if indata.ErrorCode != 0:
+            logger.error(f"实时行情推送错误，错误码: {indata.ErrorCode}")
+            return
+        time = str(indata.Times[0]) if indata.Times else None
+        fields = [f.upper() for f in indata.Fields]
+        if self.store is not None:
+            try:
+                self.store.update(indata.Codes, fields, [list(row) for row in zip(*indata.Data)])
+            except Exception as e:
+                logger.error(f"写入最新行情表失败: {str(e)}")
+        for j, code in enumerate(indata.Codes):
+            changed = {field: _clean(indata.Data[i][j]) for i, field in enumerate(fields)}
+            with self._lock:
+                # 推送只包含变化的字段，与上一次行情合并成完整快照
+                previous = self._latest.get(code)
+                data = dict(previous['data']) if previous else {}
+                data.update(changed)
+                update = {'code': code, 'time': time, 'data': data}
+                self._latest[code] = update
+                clients = list(self._clients.get(code, ()))
+                self._stats['updates'] += 1
+            for client in clients:
+                client.put(update)
+
+    def latest(self, code):
+        """
+        获取证券的最新推送行情
+
+        Returns:
+            dict: 最新行情，未订阅或尚无推送时返回None
+        """
+        with self._lock:
+            return self._latest.get(code)
+
+    def stats(self):
+        """
+        获取订阅统计
+
+        Returns:
+            dict: 当前订阅数、连接数、上游订阅/取消次数、推送次数及丢弃的更新数
+        """
+        with self._lock:
+            clients = {client for group in self._clients.values() for client in group}
+            stats = dict(self._stats)
+        stats.update({
+            'subscriptions': len(self._refs),
+            'clients': len(clients),
+            'dropped': sum(client.dropped for client in clients),
+        })
+        return stats
+
+
+def format_sse(update):
+    """
+    将一条更新格式化为SSE事件，update为None时输出心跳注释
+
+    Args:
+        update (dict): QuoteClient.get返回的更新
+
+    Returns:
+        str: SSE事件
+    """
+    if update is None:
+        return ': keep-alive\n\n'
+    return f"event: quote\ndata: {json.dumps(update, ensure_ascii=False, default=str)}\n\n"
+
+
+def iter_sse(hub, client, heartbeat=15):
+    """
+    将客户端的更新输出为Server-Sent Events，客户端断开时释放订阅
+
+    Args:
+        hub (QuoteHub): 行情推送中心
+        client (QuoteClient): 推送连接
+        heartbeat (float, optional): 无更新时发送心跳注释的间隔(秒)
+
+    Yields:
+        str: SSE事件
+    """
+    try:
+        while True:
+            yield format_sse(client.get(timeout=heartbeat))
+    finally:
+        hub.disconnect(client)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+最新行情存储模块
+行情保存在预分配的NumPy二维数组中，证券代码映射到行、字段映射到列；
+每行记录最后一次变化时的版本号，轮询方只需取回指定版本之后变化的行；
+文本字段(如rt_trade_status)不进入数值数组，按字段另存为{证券代码: 文本}；
+返回给客户端的版本号的高位为行情表实例的纪元，服务重启后客户端持有的版本号不会被误认为仍然有效
+"""
+
+import secrets
+import threading
+import logging
+
+import numpy as np
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 版本号中序号所占的低位数，其余高位为纪元
+EPOCH_SHIFT = 32
+_SEQUENCE_MASK = (1 << EPOCH_SHIFT) - 1
+
+
+def new_epoch():
+    """随机生成行情表纪元，版本号不超过2**52，在JavaScript中可精确表示"""
+    return secrets.randbelow((1 << 20) - 1) + 1
+
+
+def to_float_values(values, shape):
+    """
+    将行情转换为float64二维数组，非数值(如文本字段、None)记为NaN
+
+    Args:
+        values (array-like): 证券×字段的行情
+        shape (tuple): (证券数, 字段数)
+
+    Returns:
+        numpy.ndarray: float64数组
+    """
+    try:
+        return np.asarray(values, dtype=np.float64).reshape(shape)
+    except (TypeError, ValueError):
+        return np.vectorize(_to_float, otypes=[np.float64])(np.asarray(values, dtype=object).reshape(shape))
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _to_text(value):
+    """文本字段的值，缺失(None、NaN)记为None"""
+    return None if value is None or (isinstance(value, float) and value != value) else value
+
+
+class QuoteStore:
+    """证券×字段的最新行情表"""
+
+    def __init__(self, capacity=1024, field_capacity=16):
+        """
+        初始化行情表
+
+        Args:
+            capacity (int, optional): 预分配的证券行数，不足时按倍数扩容
+            field_capacity (int, optional): 预分配的字段列数
+        """
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._codes = []
+        self._columns = {}
+        self._fields = []
+        self._values = np.full((capacity, field_capacity), np.nan)
+        self._versions = np.zeros(capacity, dtype=np.int64)
+        # 文本字段: {字段名: {证券代码: 文本}}
+        self._texts = {}
+        self.version = 0
+        self.epoch = new_epoch()
+
+    def _grow(self, rows, columns):
+        """扩容到至少rows行、columns列"""
+        capacity, field_capacity = self._values.shape
+        if rows <= capacity and columns <= field_capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        while field_capacity < columns:
+            field_capacity *= 2
+        values = np.full((capacity, field_capacity), np.nan)
+        values[:self._values.shape[0], :self._values.shape[1]] = self._values
+        versions = np.zeros(capacity, dtype=np.int64)
+        versions[:len(self._versions)] = self._versions
+        self._values, self._versions = values, versions
+
+    def _index(self, mapping, names, key):
+        """获取名称对应的行或列号，不存在时追加"""
+        indexes = np.empty(len(names), dtype=np.intp)
+        for i, name in enumerate(names):
+            index = mapping.get(name)
+            if index is None:
+                index = mapping[name] = len(key)
+                key.append(name)
+            indexes[i] = index
+        return indexes
+
+    def _split_text(self, fields, values, shape):
+        """
+        将文本字段与数值字段分开；首次写入时含字符串的字段为文本字段，之后保持不变
+
+        Returns:
+            tuple: (数值字段, float64数值数组, 文本字段, 文本值的object数组)
+        """
+        if not self._texts:
+            try:
+                return fields, np.asarray(values, dtype=np.float64).reshape(shape), [], None
+            except (TypeError, ValueError):
+                pass
+        values = np.asarray(values, dtype=object).reshape(shape)
+        text = [field in self._texts or (field not in self._columns and any(isinstance(v, str) for v in values[:, j]))
+                for j, field in enumerate(fields)]
+        numeric = [j for j, is_text in enumerate(text) if not is_text]
+        texts = [j for j, is_text in enumerate(text) if is_text]
+        return ([fields[j] for j in numeric], to_float_values(values[:, numeric], (shape[0], len(numeric))),
+                [fields[j] for j in texts], values[:, texts])
+
+    def _update_texts(self, codes, fields, values):
+        """写入文本字段，返回各证券的文本是否有变化"""
+        changed = np.zeros(len(codes), dtype=bool)
+        for j, field in enumerate(fields):
+            column = self._texts.setdefault(field, {})
+            for i, code in enumerate(codes):
+                value = _to_text(values[i, j])
+                if column.get(code) != value:
+                    column[code] = value
+                    changed[i] = True
+        return changed
+
+    def update(self, codes, fields, values):
+        """
+        写入一批行情，值有变化的行获得新的版本号
+
+        Args:
+            codes (list): 证券代码
+            fields (list): 字段名(不区分大小写)
+            values (array-like): 证券×字段的二维数值；文本字段原样保存，数值字段中的非数值记为NaN
+
+        Returns:
+            int: 值有变化的证券数量
+        """
+        fields = [f.upper() for f in fields]
+        with self._lock:
+            fields, values, text_fields, texts = self._split_text(fields, values, (len(codes), len(fields)))
+            rows = self._index(self._rows, codes, self._codes)
+            columns = self._index(self._columns, fields, self._fields)
+            self._grow(len(self._codes), len(self._fields))
+
+            cells = np.ix_(rows, columns)
+            old = self._values[cells]
+            unchanged = (old == values) | (np.isnan(old) & np.isnan(values))
+            changed = ~unchanged.all(axis=1) | self._update_texts(codes, text_fields, texts)
+            if not changed.any():
+                return 0
+            self.version += 1
+            self._values[cells] = values
+            self._versions[rows[changed]] = self.version
+            return int(changed.sum())
+
+    def snapshot(self, codes, fields, since=None):
+        """
+        读取行情
+
+        Args:
+            codes (list): 证券代码
+            fields (list): 字段名(不区分大小写)
+            since (int, optional): 客户端已有的版本号，只返回之后有变化的证券；
+                为None、纪元不同(服务重启或行情表重建)或大于当前版本时返回全部
+
+        Returns:
+            dict: {'version': 当前版本, 'codes': [...], 'fields': [...], 'data': 证券×字段的值}，
+                缺失值为None；未写入过的证券或字段不出现在结果中
+        """
+        fields = [f.upper() for f in fields]
+        with self._lock:
+            codes = [code for code in codes if code in self._rows]
+            fields = [field for field in fields if field in self._columns or field in self._texts]
+            numeric = [j for j, field in enumerate(fields) if field in self._columns]
+            rows = np.array([self._rows[code] for code in codes], dtype=np.intp)
+            columns = np.array([self._columns[fields[j]] for j in numeric], dtype=np.intp)
+            epoch, version = self.epoch, self.version
+            if since is not None and (since >> EPOCH_SHIFT) == epoch and (since & _SEQUENCE_MASK) <= version:
+                selected = self._versions[rows] > (since & _SEQUENCE_MASK)
+                rows = rows[selected]
+                codes = [code for code, keep in zip(codes, selected) if keep]
+            values = self._values[np.ix_(rows, columns)]
+            missing = np.isnan(values)
+            if len(numeric) == len(fields) and not missing.any():
+                data = values
+            else:
+                # NaN转换为None，文本字段按证券取出
+                data = np.full((len(codes), len(fields)), None, dtype=object)
+                data[:, numeric] = np.where(missing, None, values)
+                for j, field in enumerate(fields):
+                    if field in self._texts:
+                        data[:, j] = [self._texts[field].get(code) for code in codes]
+        return {
+            'version': (epoch << EPOCH_SHIFT) | version,
+            'codes': codes,
+            'fields': fields,
+            'data': data.tolist(),
+        }
+
+    def stats(self):
+        """
+        获取行情表统计
+
+        Returns:
+            dict: 证券数、字段数与当前版本号
+        """
+        with self._lock:
+            return {'codes': len(self._codes), 'fields': len(self._fields), 'version': self.version}
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共享内存行情表模块
+行情表保存在内存映射文件中(Linux下默认位于/dev/shm)，由抓取进程写入，
+各HTTP工作进程只读映射同一文件，直接在映射上按行列取值，不复制整张表；
+写入期间序号为奇数，读取方发现序号变化时重读(seqlock)，读写之间无需跨进程锁
+"""
+
+import os
+import mmap
+import time
+import threading
+import logging
+
+import numpy as np
+
+from services.quote_store import QuoteStore, new_epoch
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 文件头各项在int64数组中的位置
+_MAGIC, _SEQ, _VERSION, _N_CODES, _N_FIELDS, _CAPACITY, _FIELD_CAPACITY, _EPOCH = range(8)
+_HEADER_SIZE = 8
+_MAGIC_VALUE = 0x51544142  # 'QTAB'
+# 证券代码与字段名的最大字节数
+_NAME_DTYPE = np.dtype('S32')
+
+
+def _layout(capacity, field_capacity):
+    """计算各数组在文件中的偏移量与文件总大小"""
+    offsets = {}
+    offset = _HEADER_SIZE * 8
+    for name, size in (('codes', capacity * _NAME_DTYPE.itemsize),
+                       ('fields', field_capacity * _NAME_DTYPE.itemsize),
+                       ('versions', capacity * 8),
+                       ('updated', capacity * 8),
+                       ('values', capacity * field_capacity * 8)):
+        offsets[name] = offset
+        offset += size
+    return offsets, offset
+
+
+class SharedQuoteStore(QuoteStore):
+    """基于内存映射文件的证券×字段最新行情表，一个进程写入，多个进程读取"""
+
+    def __init__(self, path, capacity=8192, field_capacity=32, create=False):
+        """
+        打开或创建共享行情表
+
+        Args:
+            path (str): 映射文件路径
+            capacity (int, optional): 证券行数上限，只在创建时使用
+            field_capacity (int, optional): 字段列数上限，只在创建时使用
+            create (bool, optional): 是否以写入方身份创建新文件；读取方打开已有文件，容量以文件头为准
+
+        Raises:
+            FileNotFoundError: 读取方打开时文件尚未由写入方创建
+        """
+        self.path = path
+        self.writable = create
+        self._lock = threading.Lock()
+        # 文本字段不写入共享文件，只保存在写入进程内；读取方请求文本字段时由抓取进程返回
+        self._texts = {}
+        if create:
+            self._create(capacity, field_capacity)
+        self._open()
+
+    def _create(self, capacity, field_capacity):
+        _, size = _layout(capacity, field_capacity)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # 新建后原子替换，仍映射着旧文件的读取方不会因文件被截断而出错
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.truncate(size)
+            header = np.zeros(_HEADER_SIZE, dtype=np.int64)
+            # 每次创建使用新的纪元，写入方重启前的版本号不再有效
+            header[[_MAGIC, _CAPACITY, _FIELD_CAPACITY, _EPOCH]] = [_MAGIC_VALUE, capacity, field_capacity, new_epoch()]
+            f.write(header.tobytes())
+        os.replace(tmp_path, self.path)
+
+    def _open(self):
+        with open(self.path, 'r+b' if self.writable else 'rb') as f:
+            self._inode = os.fstat(f.fileno()).st_ino
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ)
+        self._header = np.frombuffer(self._mmap, dtype=np.int64, count=_HEADER_SIZE)
+        if self._header[_MAGIC] != _MAGIC_VALUE:
+            raise ValueError(f"{self.path}不是共享行情表文件")
+        capacity, field_capacity = int(self._header[_CAPACITY]), int(self._header[_FIELD_CAPACITY])
+        offsets, _ = _layout(capacity, field_capacity)
+        self._code_names = np.frombuffer(self._mmap, _NAME_DTYPE, capacity, offsets['codes'])
+        self._field_names = np.frombuffer(self._mmap, _NAME_DTYPE, field_capacity, offsets['fields'])
+        self._versions = np.frombuffer(self._mmap, np.int64, capacity, offsets['versions'])
+        self._updated = np.frombuffer(self._mmap, np.float64, capacity, offsets['updated'])
+        self._values = np.frombuffer(self._mmap, np.float64, capacity * field_capacity,
+                                     offsets['values']).reshape(capacity, field_capacity)
+        self._rows, self._codes = {}, []
+        self._columns, self._fields = {}, []
+
+    @property
+    def version(self):
+        return int(self._header[_VERSION])
+
+    @property
+    def epoch(self):
+        return int(self._header[_EPOCH])
+
+    def _refresh(self):
+        """读取方同步写入方新增的证券与字段；文件被新的写入方替换时重新映射"""
+        if self.writable:
+            return
+        try:
+            replaced = os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            replaced = False
+        with self._lock:
+            if replaced:
+                logger.info(f"共享行情表{self.path}已重建，重新映射")
+                self._open()
+            for count, names, mapping, key in ((_N_CODES, self._code_names, self._rows, self._codes),
+                                               (_N_FIELDS, self._field_names, self._columns, self._fields)):
+                # 名称先于数量写入，读到的数量范围内的名称均已写好
+                for i in range(len(key), int(self._header[count])):
+                    name = names[i].decode('utf-8')
+                    mapping[name] = i
+                    key.append(name)
+
+    def _grow(self, rows, columns):
+        """共享表容量固定，超出时报错"""
+        capacity, field_capacity = self._values.shape
+        if rows > capacity or columns > field_capacity:
+            raise ValueError(f"共享行情表容量不足: 需要{rows}×{columns}，容量{capacity}×{field_capacity}")
+
+    def update(self, codes, fields, values):
+        """
+        写入一批行情，值有变化的行获得新的版本号，所有写入的行刷新更新时间
+
+        Args:
+            codes (list): 证券代码
+            fields (list): 字段名(不区分大小写)
+            values (array-like): 证券×字段的二维数值；文本字段只保存在写入进程内，数值字段中的非数值记为NaN
+
+        Returns:
+            int: 值有变化的证券数量
+
+        Raises:
+            ValueError: 以只读方式打开，或证券、字段数超出容量
+        """
+        if not self.writable:
+            raise ValueError("共享行情表以只读方式打开")
+        fields = [f.upper() for f in fields]
+        with self._lock:
+            fields, values, text_fields, texts = self._split_text(fields, values, (len(codes), len(fields)))
+            self._grow(len(self._rows.keys() | set(codes)), len(self._columns.keys() | set(fields)))
+            n_codes, n_fields = len(self._codes), len(self._fields)
+            rows = self._index(self._rows, codes, self._codes)
+            columns = self._index(self._columns, fields, self._fields)
+
+            cells = np.ix_(rows, columns)
+            old = self._values[cells]
+            unchanged = (old == values) | (np.isnan(old) & np.isnan(values))
+            changed = ~unchanged.all(axis=1) | self._update_texts(codes, text_fields, texts)
+
+            self._header[_SEQ] += 1
+            try:
+                for i in range(n_codes, len(self._codes)):
+                    self._code_names[i] = self._codes[i].encode('utf-8')
+                for i in range(n_fields, len(self._fields)):
+                    self._field_names[i] = self._fields[i].encode('utf-8')
+                self._header[_N_CODES] = len(self._codes)
+                self._header[_N_FIELDS] = len(self._fields)
+                self._updated[rows] = time.time()
+                if changed.any():
+                    self._header[_VERSION] += 1
+                    self._values[cells] = values
+                    self._versions[rows[changed]] = self._header[_VERSION]
+            finally:
+                self._header[_SEQ] += 1
+            return int(changed.sum())
+
+    def _read(self, func, *args):
+        """在两次读取的序号相同且为偶数时返回结果，否则重读"""
+        while True:
+            seq = self._header[_SEQ]
+            if seq % 2 == 0:
+                result = func(*args)
+                if self._header[_SEQ] == seq:
+                    return result
+            time.sleep(0)
+
+    def snapshot(self, codes, fields, since=None):
+        """
+        读取行情，参数与返回值同QuoteStore.snapshot；版本号与纪元由所有进程共享
+        """
+        self._refresh()
+        return self._read(super().snapshot, codes, fields, since)
+
+    def is_fresh(self, codes, fields, max_age):
+        """
+        判断证券的行情是否都在max_age秒内更新过
+
+        Args:
+            codes (list): 证券代码
+            fields (list): 字段名(不区分大小写)
+            max_age (float): 最大允许的行情时长(秒)
+
+        Returns:
+            bool: 全部证券与字段都已写入且未过期时为True
+        """
+        self._refresh()
+        if any(code not in self._rows for code in codes) or any(f.upper() not in self._columns for f in fields):
+            return False
+        rows = np.array([self._rows[code] for code in codes], dtype=np.intp)
+        oldest = self._read(lambda: self._updated[rows].min()) if len(rows) else time.time()
+        return time.time() - oldest <= max_age
+
+    def stats(self):
+        """
+        获取行情表统计
+
+        Returns:
+            dict: 证券数、字段数、当前版本号、容量与映射文件路径
+        """
+        self._refresh()
+        stats = self._read(super().stats)
+        stats.update({'capacity': self._values.shape[0], 'path': self.path})
+        return stats
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+请求合并(single-flight)模块
+并发的相同上游请求只执行一次，其余调用方等待并共享同一结果
+"""
+
+import threading
+import logging
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """一次进行中的上游调用"""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'upstream_calls': 0, 'deduplicated_calls': 0}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        执行调用，若相同键的调用正在进行则等待其结果
+
+        注意：所有调用方共享同一个返回对象，调用方不应修改返回值
+
+        Args:
+            key (hashable): 调用键，相同键的并发调用会被合并
+            func (callable): 实际执行的函数
+
+        Returns:
+            func的返回值；若func抛出异常，所有等待者都会收到该异常
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats['deduplicated_calls'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats['upstream_calls'] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.debug(f"合并了{call.waiters}个相同请求: {key[0] if isinstance(key, tuple) else key}")
+            call.event.set()
+
+    def stats(self):
+        """
+        获取合并统计
+
+        Returns:
+            dict: 上游调用次数、被合并的调用次数及当前进行中的调用数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+截面数据磁盘缓存模块
+每个(交易日, 选项)的w.wss结果保存为一张列式表：证券代码数组，以及每个字段一个与之对齐的值数组
+和已获取标记；请求时只向Wind补取表中缺失的(证券, 字段)，全市场选股直接在这些数组上计算。
+当天收盘前的截面数据仍在变化，只在内存中保存live_ttl秒，不写入磁盘
+"""
+
+import os
+import hashlib
+import threading
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from services.cache import normalize_options
+from services.intraday_store import SESSION_CLOSE
+from utils.date_utils import standardize_date_format
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+class _Table:
+    """单个(交易日, 选项)的截面表"""
+
+    __slots__ = ('codes', 'index', 'values', 'fetched')
+
+    def __init__(self, codes=(), values=None, fetched=None):
+        self.codes = list(codes)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.values = values or {}
+        self.fetched = fetched or {}
+
+    def add_codes(self, codes):
+        """追加新证券，各字段数组相应延长"""
+        new_codes = [code for code in dict.fromkeys(codes) if code not in self.index]
+        if not new_codes:
+            return
+        for code in new_codes:
+            self.index[code] = len(self.codes)
+            self.codes.append(code)
+        for field, values in self.values.items():
+            pad = np.full(len(new_codes), np.nan) if values.dtype != object else np.full(len(new_codes), None)
+            self.values[field] = np.concatenate([values, pad])
+            self.fetched[field] = np.concatenate([self.fetched[field], np.zeros(len(new_codes), dtype=bool)])
+
+    def missing(self, codes, field, rows=None):
+        """codes中尚未获取field的证券，rows为lookup(codes)的结果"""
+        fetched = self.fetched.get(field)
+        if fetched is None:
+            return list(codes)
+        rows = self.lookup(codes) if rows is None else rows
+        known = rows >= 0
+        known[known] = fetched[rows[known]]
+        return [codes[i] for i in np.flatnonzero(~known)]
+
+    def put(self, codes, field, values):
+        """写入一个字段的值，非数值字段以object数组保存"""
+        self.add_codes(codes)
+        rows = np.array([self.index[code] for code in codes], dtype=np.int64)
+        try:
+            values = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            values = np.array(list(values), dtype=object)
+        current = self.values.get(field)
+        if current is None:
+            current = np.full(len(self.codes), np.nan) if values.dtype != object else np.full(len(self.codes), None)
+            self.fetched[field] = np.zeros(len(self.codes), dtype=bool)
+        elif values.dtype == object and current.dtype != object:
+            current = current.astype(object)
+        self.values[field] = current
+        current[rows] = values
+        self.fetched[field][rows] = True
+
+    def lookup(self, codes):
+        """codes在表中的行号，不在表中的为-1"""
+        index = self.index
+        return np.fromiter((index.get(code, -1) for code in codes), dtype=np.int64, count=len(codes))
+
+
+class SnapshotStore:
+    """截面数据列式缓存"""
+
+    def __init__(self, root_dir=None, live_ttl=60, clock=datetime.now):
+        """
+        初始化缓存
+
+        Args:
+            root_dir (str, optional): 缓存根目录，为None时只保存在内存中
+            live_ttl (float, optional): 收盘前的当天(及之后)截面表在内存中的有效期(秒)
+            clock (callable, optional): 返回当前时间的函数，便于测试
+        """
+        self.root_dir = root_dir
+        self.live_ttl = live_ttl
+        self._clock = clock
+        self._tables = {}
+        # 收盘前获取的截面表: {键: 过期时间}
+        self._expires = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'upstream_calls': 0}
+
+    def stats(self):
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 命中、未命中次数、上游调用次数及内存中的表数
+        """
+        with self._stats_lock:
+            return dict(self._stats, tables=len(self._tables))
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _path(self, key):
+        if not self.root_dir:
+            return None
+        date, options_key = key
+        digest = hashlib.md5(options_key.encode('utf-8')).hexdigest()[:12] if options_key else '_'
+        return os.path.join(self.root_dir, date, f'{digest}.npz')
+
+    def _is_final(self, date):
+        """交易日已收盘时截面数据不再变化"""
+        now = self._clock()
+        return pd.Timestamp(standardize_date_format(date)) + SESSION_CLOSE <= now
+
+    def _load(self, key, final=True):
+        table = self._tables.get(key)
+        expires = self._expires.get(key)
+        if table is not None and expires is not None and (final or self._clock() >= expires):
+            # 收盘前的数据已过期，或已收盘而需要获取收盘后的数据
+            table = None
+            del self._expires[key]
+        if table is not None:
+            return table
+        path = self._path(key) if final else None
+        table = _Table()
+        if path and os.path.exists(path):
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    values, fetched = {}, {}
+                    for name in data.files:
+                        if name.startswith('values_'):
+                            field = name[len('values_'):]
+                            array = data[name]
+                            # 字符串字段以定长字符串保存，空串表示缺失
+                            values[field] = (array if array.dtype.kind == 'f'
+                                             else np.array([v or None for v in array.tolist()], dtype=object))
+                            fetched[field] = data[f'fetched_{field}'].copy()
+                    table = _Table(data['codes'].tolist(), values, fetched)
+            except Exception as e:
+                logger.error(f"加载截面缓存{path}失败: {str(e)}")
+        self._tables[key] = table
+        if not final:
+            self._expires[key] = self._clock() + timedelta(seconds=self.live_ttl)
+        return table
+
+    def _save(self, key, table):
+        path = self._path(key)
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {'codes': np.array(table.codes, dtype=str)}
+        for field, values in table.values.items():
+            if values.dtype == object:
+                values = np.array(['' if v is None or v != v else str(v) for v in values], dtype=str)
+            arrays[f'values_{field}'] = values
+            arrays[f'fetched_{field}'] = table.fetched[field]
+        # 先写临时文件再原子替换，临时文件名带进程号，多个进程同时写入时互不覆盖
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def get_columns(self, codes, fields, date, options, loader):
+        """
+        获取与codes对齐的各字段数组，缺失的(证券, 字段)通过loader补取并写入缓存
+
+        Args:
+            codes (list): 证券代码列表
+            fields (list): 字段名列表
+            date (str): 交易日，如'2023-12-29'
+            options (str): Wind选项字符串(不含交易日)
+            loader (callable): loader(codes, fields)返回以证券代码为索引、字段名为列的DataFrame
+
+        Returns:
+            dict: {大写字段名: 数组}，数值字段为float64数组，其他字段为object数组
+        """
+        code_list = [c.strip().upper() for c in codes if c.strip()]
+        field_list = [f.strip().upper() for f in fields if f.strip()]
+        key = (date, normalize_options(options))
+        final = self._is_final(date)
+
+        with self._lock_for(key):
+            table = self._load(key, final)
+            rows = table.lookup(code_list)
+            # 缺失证券相同的字段合并为一次Wind请求
+            groups = {}
+            for field in field_list:
+                missing = table.missing(code_list, field, rows)
+                if missing:
+                    groups.setdefault(tuple(missing), []).append(field)
+            self._count('misses' if groups else 'hits')
+
+            for missing, group_fields in groups.items():
+                logger.info(f"截面缓存缺失，补取{date}的{len(missing)}只证券的{','.join(group_fields)}数据")
+                self._count('upstream_calls')
+                df = loader(list(missing), group_fields)
+                df = df.rename(columns=str.upper).reindex(index=list(missing), columns=group_fields)
+                for field in group_fields:
+                    table.put(list(missing), field, df[field].tolist())
+            if groups:
+                if final:
+                    self._save(key, table)
+                rows = table.lookup(code_list)
+            return {field: table.values[field][rows] for field in field_list}
+
+    def get_frame(self, codes, fields, date, options, loader):
+        """
+        获取截面数据，参数见get_columns
+
+        Returns:
+            pandas.DataFrame: 以证券代码为索引、大写字段名为列的数据
+        """
+        columns = self.get_columns(codes, fields, date, options, loader)
+        return pd.DataFrame(columns, index=[c.strip().upper() for c in codes if c.strip()])
+
+
+# 进程内默认截面缓存
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def set_default_snapshot_store(store):
+    """
+    设置进程内默认截面缓存，应用和抓取进程启动时按CACHE_DIR配置
+
+    Args:
+        store (SnapshotStore): 截面缓存
+    """
+    global _default_store
+    _default_store = store
+
+
+def get_default_snapshot_store():
+    """
+    获取进程内默认截面缓存，未设置时按环境变量CACHE_DIR创建
+
+    Returns:
+        SnapshotStore: 截面缓存
+    """
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                cache_dir = os.environ.get('CACHE_DIR')
+                _default_store = SnapshotStore(os.path.join(cache_dir, 'snapshot') if cache_dir else None)
+    return _default_store
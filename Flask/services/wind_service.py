@@ -1,46 +1,63 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import threading
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import traceback
 import logging
 from functools import wraps
 
-# 导入WindPy
-try:
-    from WindPy import w
-except ImportError:
-    raise ImportError("无法导入WindPy模块，请确保Wind Python API已正确安装")
+from services.cache import HistoricalCache, CacheBypass, parse_options, remove_option
+from services.singleflight import SingleFlight
+from services.quote_hub import QuoteHub
+from services.quote_store import QuoteStore
+from services.snapshot_store import get_default_snapshot_store
+from services.intraday_store import IntradayStore, INTRADAY_FIELDS
+from services import metrics
+from services.data_provider import get_default_provider
+from services.connection import ConnectionSupervisor, CircuitBreaker, WindUnavailableError, BREAKER_HALF_OPEN
+from utils.trading_calendar import get_trading_calendar
+from utils.resample import resample
+from services.wind_worker import (WindWorker, WindOverloadedError, FUNCTION_PRIORITIES,
+                                  PRIORITY_NORMAL, PRIORITY_REALTIME)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 全部A股的板块代码
+MARKET_SECTOR_ID = 'a001010100000000'
+
+# 复权时需要乘以复权因子的价格字段，其他字段(成交量等)不复权
+ADJUSTED_FIELDS = ('open', 'high', 'low', 'close', 'pre_close', 'chg')
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+
+# 进程内默认的Wind数据服务，供utils.wind_utils等模块级函数使用
+_default_service = None
+_default_lock = threading.Lock()
+
 def wind_decorator(func):
-    """Wind API装饰器，用于处理连接和错误"""
+    """Wind API装饰器，用于记录错误
+
+    连接管理由Wind工作线程负责，单个请求失败不会关闭共享连接
+    """
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            # 检查WindPy是否已连接
-            if not w.isconnected():
-                logger.info("WindPy未连接，正在尝试连接...")
-                result = w.start()
-                if result.ErrorCode != 0:
-                    raise Exception(f"WindPy连接失败: {result.ErrorCode}")
-                logger.info("WindPy连接成功")
-            
             # 执行被装饰的函数
             return func(*args, **kwargs)
         
+        except WindOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"WindPy操作失败: {str(e)}")
             logger.error(traceback.format_exc())
-            # 尝试关闭连接
-            try:
-                w.stop()
-            except:
-                pass
             # 重新抛出异常
             raise
     
@@ -49,33 +66,82 @@ def wind_decorator(func):
 class WindService:
     """Wind数据服务类"""
     
-    def __init__(self, wait_time=120):
+    def __init__(self, wait_time=120, cache_dir=DEFAULT_CACHE_DIR, workers=1, queue_size=64, retry_after=1,
+                 batch_size=100, provider=None, connect_wait=5, breaker_threshold=5, breaker_reset=30,
+                 request_error_codes=(-40520007,), quote_store=None, snapshot_store=None, snapshot_batch_size=1000):
         """
         初始化Wind服务
         
         Args:
             wait_time (int): API超时时间(秒)
+            cache_dir (str, optional): 历史行情缓存目录，为None时不使用缓存
+            workers (int, optional): Wind工作线程数
+            queue_size (int, optional): Wind请求队列上限，超过时返回503
+            retry_after (int, optional): 队列已满时建议的重试间隔(秒)
+            batch_size (int, optional): 批量请求时单次w.wsd的证券数量上限
+            provider (DataProvider, optional): 数据源，默认为进程内默认数据源(见DATA_PROVIDER)
+            connect_wait (float, optional): 未连接时请求等待后台连接完成的最长时间(秒)
+            breaker_threshold (int, optional): 打开熔断器的连续上游失败次数
+            breaker_reset (float, optional): 熔断器打开后放行试探请求前的等待时间(秒)
+            request_error_codes (iterable, optional): 属于请求本身(如代码无效、无数据)而不计入熔断的错误码
+            quote_store (QuoteStore, optional): 最新行情表，多进程部署时为共享内存行情表
+            snapshot_store (SnapshotStore, optional): 截面数据缓存，默认为进程内默认截面缓存
+            snapshot_batch_size (int, optional): 补取截面数据时单次w.wss的证券数量上限
         """
+        self.provider = provider or get_default_provider()
         self.wait_time = wait_time
-        # 尝试启动WindPy
-        try:
-            if not w.isconnected():
-                result = w.start(waitTime=self.wait_time)
-                if result.ErrorCode != 0:
-                    logger.error(f"WindPy启动失败: {result.ErrorCode}")
-                else:
-                    logger.info("WindPy启动成功")
-        except Exception as e:
-            logger.error(f"WindPy初始化失败: {str(e)}")
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.batch_size = batch_size
+        self.cache = HistoricalCache(cache_dir) if cache_dir else None
+        # 截面数据(估值等)按交易日以列式数组缓存，与wind_utils共用同一实例
+        self.snapshots = snapshot_store if snapshot_store is not None else get_default_snapshot_store()
+        self.snapshot_batch_size = snapshot_batch_size
+        self._market_codes = {}
+        # 1分钟线按交易日分区保存在CACHE_DIR/intraday，其他分钟周期在本地合成
+        self.intraday = IntradayStore(os.path.join(cache_dir, 'intraday') if cache_dir else None)
+        # 各证券当天的最新复权因子{代码: (日期, 因子)}，前复权的基准
+        self._latest_factors = {}
+        # 最新行情表，支持按版本号增量返回
+        self.quotes = quote_store if quote_store is not None else QuoteStore()
+        # 合并并发的相同Wind请求
+        self._flight = SingleFlight()
+        # 所有Wind调用都在独占的工作线程中执行
+        self._worker = WindWorker(workers, queue_size, retry_after)
+        # 连接由后台线程维护，请求路径上不执行w.start
+        self.connect_wait = connect_wait
+        self.request_error_codes = frozenset(request_error_codes)
+        self.supervisor = ConnectionSupervisor(self.provider, self._worker, wait_time,
+                                               breaker=CircuitBreaker(breaker_threshold, breaker_reset))
+    
+    def connect(self, wait=False):
+        """
+        等待后台连接完成，服务创建后即开始连接，无需显式调用
+        
+        Args:
+            wait (bool, optional): 是否等待连接完成
+        
+        Returns:
+            bool: 是否已连接
+        
+        Raises:
+            WindUnavailableError: wait为True且超时仍未连接
+        """
+        if not wait:
+            return self.check_connection()
+        if not self.supervisor.wait_connected(self.wait_time):
+            raise WindUnavailableError("Wind连接未建立", self.supervisor.retry_after())
+        return True
     
-    def __del__(self):
-        """析构函数，确保关闭Wind连接"""
+    def shutdown(self):
+        """关闭Wind连接，只应在进程退出时由共享实例的持有者调用"""
+        self.supervisor.stop()
         try:
-            if w.isconnected():
-                w.stop()
+            if self.provider.isconnected():
+                self.provider.stop()
                 logger.info("WindPy连接已关闭")
-        except:
-            pass
+        except Exception as e:
+            logger.error(f"关闭WindPy连接失败: {str(e)}")
     
     def check_connection(self):
         """
@@ -85,12 +151,120 @@ class WindService:
             bool: 是否连接成功
         """
         try:
-            return w.isconnected()
+            return self.provider.isconnected()
         except Exception as e:
             logger.error(f"检查WindPy连接失败: {str(e)}")
             return False
     
-    @wind_decorator
+    def get_stats(self):
+        """
+        获取服务统计信息
+        
+        Returns:
+            dict: 请求合并与缓存命中统计
+        """
+        return {
+            'provider': self.provider.name,
+            'singleflight': self._flight.stats(),
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'queue_depth': self._worker.queue_depth(),
+            'connection': self.supervisor.stats(),
+            'quotes': self.quotes.stats(),
+            'snapshots': self.snapshots.stats(),
+            'intraday': self.intraday.stats()
+        }
+    
+    def call(self, func_name, *args, **kwargs):
+        """
+        调用Wind函数，供服务外的工具函数使用；与服务内部的调用一样经工作线程排队、请求合并、熔断并计时
+
+        Args:
+            func_name (str): Wind函数名，如'wset'、'wss'、'tdays'
+            *args: Wind函数的参数，须可哈希(代码、字段列表以逗号连接为字符串)
+
+        Returns:
+            Wind API的原始返回值
+        """
+        return self._call(func_name, *args, **kwargs)
+    
+    def _guard(self):
+        """
+        请求进入队列前检查熔断器与连接状态，不可用时快速失败
+        
+        Raises:
+            WindUnavailableError: 熔断器打开或连接未建立
+        """
+        if not self.supervisor.breaker.allow():
+            raise WindUnavailableError("Wind上游连续出错，熔断中", self.supervisor.retry_after())
+        if not self.supervisor.wait_connected(self.connect_wait):
+            # 半开状态下放行的试探请求无法发出，视为试探失败
+            if self.supervisor.breaker.state == BREAKER_HALF_OPEN:
+                self.supervisor.breaker.record_failure()
+            raise WindUnavailableError("Wind连接未建立", self.supervisor.retry_after())
+    
+    def _record_result(self, result):
+        """按返回的错误码更新熔断器"""
+        error_code = result[0] if isinstance(result, tuple) else getattr(result, 'ErrorCode', 0)
+        if error_code == 0 or error_code in self.request_error_codes:
+            self.supervisor.breaker.record_success()
+        else:
+            self.supervisor.breaker.record_failure()
+        if error_code != 0:
+            self.supervisor.record_error(error_code, f"Wind返回错误码: {error_code}")
+    
+    def _invoke(self, func_name, args, kwargs):
+        """在工作线程中执行Wind函数"""
+        return getattr(self.provider, func_name)(*args, **kwargs)
+    
+    def _call(self, func_name, *args, **kwargs):
+        """
+        调用Wind API
+        
+        请求经Wind工作线程按优先级排队执行(wsq优先于wsd回补)，
+        并发的相同调用共享同一次上游请求；连续的上游失败会打开熔断器
+        
+        Args:
+            func_name (str): Wind函数名，如'wsd'、'wsq'、'wss'
+        
+        Returns:
+            Wind API的原始返回值
+        
+        Raises:
+            WindOverloadedError: 请求队列已满
+            WindUnavailableError: 熔断器打开或连接未建立
+        """
+        self._guard()
+        key = (func_name, args, tuple(sorted(kwargs.items())))
+        try:
+            with metrics.span('wind', function=func_name, size='error') as span_labels:
+                result = self._flight.do(key, self._upstream, func_name, args, kwargs)
+                span_labels['size'] = metrics.size_label(metrics.result_size(result))
+        except WindOverloadedError:
+            # 请求没有发出，半开状态下归还试探名额
+            self.supervisor.breaker.release()
+            raise
+        return result
+    
+    def _upstream(self, func_name, args, kwargs):
+        """
+        经工作线程发出一次上游请求并更新熔断器
+        
+        只由合并调用中的首个调用方执行，共享同一结果的其他调用方不重复计入成功或失败
+        """
+        priority = FUNCTION_PRIORITIES.get(func_name, PRIORITY_NORMAL)
+        try:
+            result = self._worker.call(priority, self.wait_time, self._invoke, func_name, args, kwargs)
+        except WindOverloadedError:
+            raise
+        except Exception as e:
+            self.supervisor.breaker.record_failure()
+            self.supervisor.record_error(None, str(e))
+            if not self.check_connection():
+                self.supervisor.notify_disconnected()
+            raise
+        self._record_result(result)
+        return result
+    
     def get_historical_data(self, code, fields, start_date, end_date, options=""):
         """
         获取历史行情数据
@@ -103,12 +277,331 @@ class WindService:
             options (str, optional): 额外选项，如'PriceAdj=F'前复权
         
         Returns:
-            dict: 包含历史数据的字典
+            dict: 包含历史数据的字典；Wind不可用而只返回了已缓存的部分时另有stale为True
+        """
+        df = self.get_historical_frame(code, fields, start_date, end_date, options)
+        
+        # 转换为字典格式
+        with metrics.span('convert'):
+            data = {
+                'dates': df.index.strftime('%Y-%m-%d').tolist(),
+                'fields': df.columns.tolist(),
+                'data': df.values.tolist()
+            }
+        if df.attrs.get('stale'):
+            data['stale'] = True
+        
+        return data
+    
+    @wind_decorator
+    def get_historical_frame(self, code, fields, start_date, end_date, options=""):
+        """
+        获取历史行情数据的DataFrame，日线数据优先从磁盘缓存读取
+        
+        Args:
+            code (str): 证券代码，如'000001.SZ'
+            fields (str): 字段列表，如'open,high,low,close,volume'
+            start_date (str): 开始日期，如'2023-01-01'
+            end_date (str): 结束日期，如'2023-12-31'
+            options (str, optional): 额外选项，如'PriceAdj=F'前复权
+        
+        Returns:
+            pandas.DataFrame: 以日期为索引的历史数据；Wind不可用而只返回了已缓存的部分时，attrs['stale']为True
+        """
+        logger.debug(f"获取{code}从{start_date}到{end_date}的{fields}数据")
+        
+        field_list = [f.strip().lower() for f in fields.split(',') if f.strip()]
+        
+        # 周线、月线及分钟线的K线日期依赖请求区间，不按日期拆分缓存
+        period = parse_options(options).get('period', 'D').upper()
+        if period.isdigit():
+            # N分钟线由按交易日保存的w.wsi 1分钟线合成，不使用w.wsd的Period=N
+            return self.get_bars(code, fields, start_date, end_date, period, remove_option(options, 'Period'))
+        if self._adjusts_locally(options):
+            # 只缓存未复权行情和复权因子，前、后复权在读取时计算
+            return self._adjusted_frame(code, field_list, start_date, end_date, options)
+        if self.cache is not None and period == 'D':
+            fetcher = lambda gap_fields, gap_start, gap_end: self._wsd(
+                code, ','.join(gap_fields), gap_start, gap_end, options)
+            try:
+                return self.cache.get_frame(code, field_list, start_date, end_date, options, fetcher)
+            except CacheBypass as e:
+                logger.info(f"跳过缓存: {str(e)}")
+            except WindUnavailableError:
+                # Wind不可用时返回已缓存的部分，缓存中没有数据才报错
+                df = self.cache.read_frame(code, field_list, start_date, end_date, options)
+                if df.empty:
+                    raise
+                logger.warning(f"Wind不可用，返回{code}已缓存的{len(df)}条数据")
+                df.attrs['stale'] = True
+                return df
+        
+        return self._wsd(code, fields, start_date, end_date, options)
+    
+    def _adjusts_locally(self, options):
+        """日线的前、后复权是否由缓存的未复权行情与复权因子计算"""
+        parsed = parse_options(options)
+        return (self.cache is not None and parsed.get('period', 'D').upper() == 'D'
+                and parsed.get('priceadj', '').upper() in ('F', 'B'))
+    
+    def _adjusted_frame(self, code, field_list, start_date, end_date, options):
+        """
+        由未复权行情与复权因子计算前复权(PriceAdj=F)或后复权(PriceAdj=B)行情
+        
+        Returns:
+            pandas.DataFrame: 以日期为索引的复权行情
+        """
+        price_adj = parse_options(options)['priceadj'].upper()
+        df = self.get_historical_frame(code, ','.join(field_list), start_date, end_date,
+                                       remove_option(options, 'PriceAdj'))
+        columns = [c for c in df.columns if c.lower() in ADJUSTED_FIELDS]
+        if df.empty or not columns:
+            return df
+        
+        factor = self.get_historical_frame(code, 'adjfactor', start_date, end_date)
+        scale = factor.iloc[:, 0].reindex(df.index).ffill().to_numpy(dtype=np.float64)
+        if price_adj == 'F':
+            scale = scale / self._latest_adjfactors([code])[0]
+        df = df.copy()
+        df[columns] = df[columns].to_numpy(dtype=np.float64) * scale[:, None]
+        if factor.attrs.get('stale'):
+            df.attrs['stale'] = True
+        return df
+    
+    def _latest_adjfactors(self, code_list):
+        """
+        获取各证券最新的复权因子(前复权的基准)，每只证券每天只查询一次
+        
+        Returns:
+            numpy.ndarray: 与code_list对齐的复权因子
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        missing = [code for code in code_list if self._latest_factors.get(code.upper(), (None,))[0] != today]
+        if missing:
+            start = (datetime.now() - timedelta(days=31)).strftime('%Y-%m-%d')
+            _, _, _, panel = self.get_historical_panel(missing, 'adjfactor', start, today)
+            for code, values in zip(missing, panel[:, :, 0]):
+                valid = values[~np.isnan(values)]
+                self._latest_factors[code.upper()] = (today, valid[-1] if len(valid) else np.nan)
+        return np.array([self._latest_factors[code.upper()][1] for code in code_list], dtype=np.float64)
+    
+    def invalidate_adjfactor(self, code):
+        """
+        复权因子被修订(如除权信息更正)时删除该证券的复权因子缓存，未复权行情的缓存保持不变
+        
+        Args:
+            code (str): 证券代码
+        """
+        self._latest_factors.pop(code.upper(), None)
+        if self.cache is not None:
+            self.cache.invalidate(code, 'adjfactor')
+
+    def get_data_version(self, code, options=""):
+        """
+        获取已收盘区间行情的数据版本，用于生成HTTP ETag
+
+        已收盘的未复权、后复权行情不再变化；前复权价格以最新复权因子为基准，除权后随之变化，
+        因此前复权的版本为最新复权因子(每只证券每天只查询一次)
+
+        Args:
+            code (str): 证券代码
+            options (str, optional): 额外选项，如'PriceAdj=F'
+
+        Returns:
+            str: 数据版本，不随时间变化时为空字符串
+        """
+        if parse_options(options).get('priceadj', '').upper() != 'F':
+            return ''
+        return repr(float(self._latest_adjfactors([code])[0]))
+
+    def iter_historical_frames(self, code, fields, start_date, end_date, options="", window_days=None):
+        """
+        按日期窗口逐段获取历史行情，每个窗口获取后立即产出，单次请求的内存占用与总区间长度无关
+        
+        Args:
+            code (str): 证券代码，如'000001.SZ'
+            fields (str): 字段列表，如'open,high,low,close,volume'
+            start_date (str): 开始日期，如'2013-01-01'
+            end_date (str): 结束日期，如'2023-12-31'
+            options (str, optional): 额外选项
+            window_days (int, optional): 窗口长度(自然日)，默认日线365天、分钟线7天
+        
+        Yields:
+            pandas.DataFrame: 各窗口以日期为索引的历史数据
+        """
+        if window_days is None:
+            period = parse_options(options).get('period', 'D').upper()
+            window_days = 7 if period.isdigit() else 365
+        
+        window_start = pd.Timestamp(start_date).normalize()
+        last = pd.Timestamp(end_date).normalize()
+        while window_start <= last:
+            window_end = min(window_start + timedelta(days=window_days - 1), last)
+            yield self.get_historical_frame(code, fields, window_start.strftime('%Y-%m-%d'),
+                                            window_end.strftime('%Y-%m-%d'), options)
+            window_start = window_end + timedelta(days=1)
+    
+    def get_bars(self, code, fields, start_date, end_date, timeframe='D', options=""):
+        """
+        获取指定周期的K线，周线、月线由缓存的日线合成，N分钟线由缓存的1分钟线合成，
+        同一证券切换周期时不再请求Wind
+        
+        Args:
+            code (str): 证券代码，如'000001.SZ'
+            fields (str): 字段列表，如'open,high,low,close,volume'
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            timeframe (str, optional): 'D'、'W'、'M'或分钟数，如'5'
+            options (str, optional): 额外选项(不含Period)，如'PriceAdj=F'
+        
+        Returns:
+            pandas.DataFrame: 以时间为索引的K线
+        """
+        timeframe = str(timeframe).upper()
+        if timeframe in ('D', 'W', 'M'):
+            df = self.get_historical_frame(code, fields, start_date, end_date, options)
+        else:
+            df = self.get_minute_frame(code, fields, start_date, end_date, options)
+        return resample(df, timeframe)
+    
+    def iter_bars(self, code, fields, start_date, end_date, timeframe='D', options=""):
+        """
+        按日期窗口逐段获取指定周期的K线；周线、月线跨越窗口边界，一次合成后产出
+        
+        Yields:
+            pandas.DataFrame: 各窗口的K线
+        """
+        timeframe = str(timeframe).upper()
+        if timeframe in ('W', 'M'):
+            yield self.get_bars(code, fields, start_date, end_date, timeframe, options)
+            return
+        window_days = 365 if timeframe == 'D' else 7
+        window_start = pd.Timestamp(start_date).normalize()
+        last = pd.Timestamp(end_date).normalize()
+        while window_start <= last:
+            window_end = min(window_start + timedelta(days=window_days - 1), last)
+            yield self.get_bars(code, fields, window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d'),
+                                timeframe, options)
+            window_start = window_end + timedelta(days=1)
+    
+    @wind_decorator
+    def get_minute_frame(self, code, fields, start_date, end_date, options=""):
+        """
+        获取若干交易日的1分钟线，已收盘的交易日从本地分区读取，当天只补取新增的分钟
+        
+        分区中保存未复权的分钟线，前、后复权在读取时按当天的复权因子计算，除权后已保存的分区仍然有效
+        
+        Args:
+            code (str): 证券代码
+            fields (str): 字段列表，不在INTRADAY_FIELDS中的字段直接请求Wind
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            options (str, optional): 额外选项(不含BarSize)，如'PriceAdj=F'
+        
+        Returns:
+            pandas.DataFrame: 以时间为索引的1分钟线
+        """
+        field_list = [f.strip().lower() for f in fields.split(',') if f.strip()]
+        if not set(field_list) <= set(INTRADAY_FIELDS):
+            return self._wsi(code, fields, f'{start_date} 09:00:00', f'{end_date} 15:30:00', options)
+        
+        raw_options = remove_option(options, 'PriceAdj')
+        trading_days = self.get_calendar().trading_days_between(start_date, end_date)
+        times, values = self.intraday.get_days(code, trading_days, raw_options,
+                                               self._intraday_fetcher(code, raw_options))
+        return self._adjusted_intraday(code, self._intraday_frame(times, values, field_list), options)
+    
+    @wind_decorator
+    def get_intraday_bars(self, code, fields, count, bar_size=1, options=""):
+        """
+        获取最近count根N分钟线，只读取所需的最近几个交易日的1分钟线分区
+        
+        Args:
+            code (str): 证券代码
+            fields (str): 字段列表，须为INTRADAY_FIELDS中的字段
+            count (int): K线数量
+            bar_size (int, optional): 分钟数，如1、5、15、60
+            options (str, optional): 额外选项(不含BarSize)
+        
+        Returns:
+            pandas.DataFrame: 以时间为索引的最近count根K线
+        """
+        field_list = [f.strip().lower() for f in fields.split(',') if f.strip()]
+        if not set(field_list) <= set(INTRADAY_FIELDS):
+            raise ValueError(f"分钟线只支持字段: {','.join(INTRADAY_FIELDS)}")
+        
+        calendar = self.get_calendar()
+        recent_days = lambda n: calendar.previous_trading_days(datetime.now().strftime('%Y-%m-%d'), n)
+        raw_options = remove_option(options, 'PriceAdj')
+        times, values = self.intraday.tail(code, count * bar_size, raw_options, recent_days,
+                                           self._intraday_fetcher(code, raw_options))
+        df = self._adjusted_intraday(code, self._intraday_frame(times, values, field_list), options)
+        return resample(df, str(bar_size)).iloc[-count:]
+    
+    def _adjusted_intraday(self, code, df, options):
+        """
+        按各交易日的复权因子对未复权的分钟线复权，与日线的_adjusted_frame相同
+        
+        Returns:
+            pandas.DataFrame: PriceAdj=F/B时为复权后的分钟线，否则为df本身
+        """
+        price_adj = parse_options(options).get('priceadj', '').upper()
+        columns = [c for c in df.columns if c.lower() in ADJUSTED_FIELDS]
+        if price_adj not in ('F', 'B') or df.empty or not columns:
+            return df
+        
+        days = df.index.values.astype('datetime64[D]')
+        factor = self.get_historical_frame(code, 'adjfactor', str(days[0]), str(days[-1])).iloc[:, 0].ffill()
+        # 分钟线所在交易日的复权因子，当天的因子尚未返回时沿用前一交易日
+        positions = np.searchsorted(factor.index.values.astype('datetime64[D]'), days, side='right') - 1
+        scale = np.where(positions >= 0, factor.to_numpy(dtype=np.float64)[np.maximum(positions, 0)], np.nan)
+        if price_adj == 'F':
+            scale = scale / self._latest_adjfactors([code])[0]
+        df = df.copy()
+        df[columns] = df[columns].to_numpy(dtype=np.float64) * scale[:, None]
+        return df
+    
+    def _intraday_fetcher(self, code, options):
+        return lambda begin_time, end_time: self._wsi(code, ','.join(INTRADAY_FIELDS), begin_time, end_time,
+                                                      options)
+    
+    @staticmethod
+    def _intraday_frame(times, values, field_list):
+        """由分区数组生成DataFrame，只复制所需的字段"""
+        index = pd.DatetimeIndex(np.asarray(times).view('datetime64[ns]'))
+        columns = [INTRADAY_FIELDS.index(field) for field in field_list]
+        return pd.DataFrame(np.asarray(values)[:, columns], index=index, columns=[f.upper() for f in field_list])
+    
+    def _wsi(self, code, fields, begin_time, end_time, options=""):
+        """
+        调用w.wsi获取1分钟线
+        
+        Returns:
+            pandas.DataFrame: 以时间为索引、字段名大写的分钟线
         """
-        logger.info(f"获取{code}从{start_date}到{end_date}的{fields}数据")
+        result = self._call('wsi', code, fields, begin_time, end_time,
+                            ';'.join(filter(None, ['BarSize=1', options])), usedf=True)
         
+        # 检查返回结果
+        if result[0] != 0:
+            error_msg = f"获取分钟数据失败，错误码: {result[0]}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        df = result[1]
+        if not isinstance(df.index, pd.DatetimeIndex):
+            df = df.set_axis(pd.to_datetime(df.index), axis=0)
+        return df.set_axis([str(c).upper() for c in df.columns], axis=1)
+    
+    def _wsd(self, code, fields, start_date, end_date, options=""):
+        """
+        调用w.wsd获取历史数据
+        
+        Returns:
+            pandas.DataFrame: 以日期为索引的历史数据
+        """
         # 调用Wind API获取数据
-        result = w.wsd(code, fields, start_date, end_date, options, usedf=True)
+        result = self._call('wsd', code, fields, start_date, end_date, options, usedf=True)
         
         # 检查返回结果
         if result[0] != 0:
@@ -119,40 +612,216 @@ class WindService:
         # 获取DataFrame结果
         df = result[1]
         
-        # 转换日期格式并设置为索引
-        if not df.empty:
-            # 确保索引是日期格式
-            if not isinstance(df.index, pd.DatetimeIndex):
-                df.index = pd.to_datetime(df.index)
-            
-            # 格式化日期为字符串
-            df.index = df.index.strftime('%Y-%m-%d')
+        # 确保索引是日期格式(结果可能被合并请求共享，不修改原对象)
+        if not isinstance(df.index, pd.DatetimeIndex):
+            df = df.set_axis(pd.to_datetime(df.index), axis=0)
         
-        # 转换为字典格式
+        return df
+    
+    def get_historical_batch(self, codes, fields, start_date, end_date, options=""):
+        """
+        批量获取多只证券的历史行情数据
+        
+        Args:
+            codes (str or list): 证券代码，如'000001.SZ,600000.SH'或['000001.SZ', '600000.SH']
+            fields (str): 字段列表，如'open,high,low,close,volume'
+            start_date (str): 开始日期，如'2023-01-01'
+            end_date (str): 结束日期，如'2023-12-31'
+            options (str, optional): 额外选项，如'PriceAdj=F'前复权
+        
+        Returns:
+            dict: 按字段组织的列式数据，data[字段]为证券×日期的二维列表
+        """
+        code_list, dates, field_list, panel = self.get_historical_panel(
+            codes, fields, start_date, end_date, options)
+        
+        # 转换为列式字典格式
         data = {
-            'dates': df.index.tolist(),
-            'fields': df.columns.tolist(),
-            'data': df.values.tolist()
+            'codes': code_list,
+            'dates': dates.strftime('%Y-%m-%d').tolist(),
+            'fields': field_list,
+            'shape': list(panel.shape),
+            'data': {field: panel[:, :, i].tolist() for i, field in enumerate(field_list)}
         }
         
         return data
     
     @wind_decorator
-    def get_realtime_data(self, codes, fields):
+    def get_historical_panel(self, codes, fields, start_date, end_date, options=""):
+        """
+        批量获取历史行情数据的三维数组
+        
+        Wind的多证券w.wsd只支持单个字段，因此按字段、按batch_size分组请求，
+        日线数据优先从磁盘缓存读取，只补取缺失区间
+        
+        Args:
+            codes (str or list): 证券代码
+            fields (str): 字段列表
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            options (str, optional): 额外选项
+        
+        Returns:
+            tuple: (证券代码列表, 日期DatetimeIndex, 大写字段名列表, 证券×日期×字段的numpy数组)
+        """
+        code_list = codes.split(',') if isinstance(codes, str) else list(codes)
+        code_list = [c.strip() for c in code_list if c.strip()]
+        field_list = [f.strip().lower() for f in fields.split(',') if f.strip()]
+        logger.info(f"批量获取{len(code_list)}只证券从{start_date}到{end_date}的{fields}数据")
+        
+        frames = None
+        period = parse_options(options).get('period', 'D').upper()
+        if self._adjusts_locally(options):
+            return self._adjusted_panel(code_list, field_list, start_date, end_date, options)
+        if self.cache is not None and period == 'D':
+            try:
+                frames = self._cached_batch_frames(code_list, field_list, start_date, end_date, options)
+            except CacheBypass as e:
+                logger.info(f"跳过缓存: {str(e)}")
+        if frames is None:
+            frames = {field: self._wsd_batch(code_list, field, start_date, end_date, options)
+                      for field in field_list}
+        
+        return self._assemble_panel(code_list, field_list, frames)
+    
+    def _adjusted_panel(self, code_list, field_list, start_date, end_date, options):
+        """由未复权行情与复权因子计算复权后的三维数组，价格字段一次乘以证券×日期的复权因子"""
+        price_adj = parse_options(options)['priceadj'].upper()
+        code_list, dates, fields, panel = self.get_historical_panel(
+            code_list, ','.join(field_list), start_date, end_date, remove_option(options, 'PriceAdj'))
+        index = [i for i, field in enumerate(fields) if field.lower() in ADJUSTED_FIELDS]
+        if not index or not len(dates):
+            return code_list, dates, fields, panel
+        
+        _, factor_dates, _, factors = self.get_historical_panel(code_list, 'adjfactor', start_date, end_date)
+        scale = pd.DataFrame(factors[:, :, 0].T, index=factor_dates).reindex(dates).ffill().to_numpy().T
+        if price_adj == 'F':
+            scale = scale / self._latest_adjfactors(code_list)[:, None]
+        panel[:, :, index] *= scale[:, :, None]
+        return code_list, dates, fields, panel
+    
+    @staticmethod
+    def _assemble_panel(code_list, field_list, frames):
+        """将{字段: 日期×证券的DataFrame}按日期并集对齐为三维数组"""
+        dates = pd.DatetimeIndex([])
+        for df in frames.values():
+            dates = dates.union(df.index)
+        panel = np.full((len(code_list), len(dates), len(field_list)), np.nan)
+        for i, field in enumerate(field_list):
+            aligned = frames[field].reindex(index=dates, columns=code_list)
+            panel[:, :, i] = aligned.to_numpy(dtype=np.float64).T
+        
+        return code_list, dates, [f.upper() for f in field_list], panel
+    
+    def _cached_batch_frames(self, code_list, field_list, start_date, end_date, options):
+        """按字段补取各证券的缓存缺失区间，返回{字段: 日期×证券的DataFrame}"""
+        frames = {}
+        for field in field_list:
+            # 缺失区间完全相同的证券合并为一组，每个缺失区间分别请求，不重复获取中间已缓存的日期
+            pending = {}
+            for code in code_list:
+                gaps = self.cache.gaps(code, field, start_date, end_date, options)
+                if gaps:
+                    pending.setdefault(tuple(gaps), []).append(code)
+            
+            for gaps, group in pending.items():
+                for gap_start, gap_end in gaps:
+                    df = self._wsd_batch(group, field, gap_start, gap_end, options)
+                    for code in group:
+                        self.cache.store(code, field, options, df[code], gap_start, gap_end)
+            
+            frames[field] = pd.concat(
+                {code: self.cache.read_frame(code, [field], start_date, end_date, options).iloc[:, 0]
+                 for code in code_list}, axis=1)
+        return frames
+    
+    def _wsd_batch(self, code_list, field, start_date, end_date, options=""):
+        """分组并行调用w.wsd获取多只证券的单个字段，返回日期×证券的DataFrame"""
+        chunks = [code_list[i:i + self.batch_size] for i in range(0, len(code_list), self.batch_size)]
+        
+        def fetch(chunk):
+            df = self._wsd(','.join(chunk), field, start_date, end_date, options)
+            if df.empty:
+                return pd.DataFrame(columns=chunk, index=pd.DatetimeIndex([]), dtype=np.float64)
+            # 单只证券时Wind以字段名作为列名
+            if len(chunk) == 1:
+                return df.set_axis(chunk, axis=1)
+            # 多只证券按返回的列名(证券代码)对齐，Wind未返回的证券为NaN
+            return (df.rename(columns=lambda column: str(column).upper())
+                    .reindex(columns=[code.upper() for code in chunk]).set_axis(chunk, axis=1))
+        
+        if len(chunks) == 1:
+            return fetch(chunks[0])
+        # 并发数略大于工作线程数，保证工作线程在分组之间不空闲
+        with ThreadPoolExecutor(max_workers=min(len(chunks), max(self.workers, 1) * 2)) as executor:
+            results = list(executor.map(fetch, chunks))
+        return pd.concat(results, axis=1)
+    
+    @wind_decorator
+    def get_trading_days(self, start_date, end_date, exchange='SSE'):
+        """
+        从Wind获取交易日列表(w.tdays)，一般通过get_calendar使用本地日历而不直接调用
+        
+        Args:
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            exchange (str, optional): 交易所代码，默认为'SSE'
+        
+        Returns:
+            list: 交易日(datetime)列表
+        """
+        result = self._call('tdays', start_date, end_date, f"TradingCalendar={exchange}")
+        
+        # 检查返回结果
+        if result.ErrorCode != 0:
+            error_msg = f"获取交易日失败，错误码: {result.ErrorCode}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        return result.Data[0] if result.Data else []
+    
+    def get_calendar(self, exchange='SSE'):
+        """
+        获取本地交易日历，首次使用时从Wind加载并持久化到缓存目录
+        
+        Args:
+            exchange (str, optional): 交易所代码，默认为'SSE'
+        
+        Returns:
+            TradingCalendar: 交易日历
+        """
+        cache_dir = os.path.join(self.cache_dir, 'calendar') if self.cache_dir else None
+        return get_trading_calendar(exchange, loader=self.get_trading_days, cache_dir=cache_dir)
+    
+    @wind_decorator
+    def get_realtime_data(self, codes, fields, since=None):
         """
         获取实时行情数据
         
         Args:
             codes (str): 证券代码，如'000001.SZ,600000.SH'
             fields (str): 字段列表，如'rt_last,rt_vol'
+            since (int, optional): 客户端上次收到的版本号，只返回之后有变化的证券
             
         Returns:
-            dict: 包含实时数据的字典
+            dict: 包含实时数据及当前版本号(version)的字典
         """
         logger.info(f"获取{codes}的实时{fields}数据")
         
-        # 调用Wind API获取数据
-        result = w.wsq(codes, fields, usedf=True)
+        # 调用Wind API获取数据；Wind不可用时返回最新行情表中的数据(需包含全部证券)
+        try:
+            result = self._call('wsq', codes, fields, usedf=True)
+        except WindUnavailableError:
+            code_list = [c.strip() for c in codes.split(',') if c.strip()]
+            field_list = [f.strip() for f in fields.split(',') if f.strip()]
+            data = self.quotes.snapshot(code_list, field_list)
+            if len(data['codes']) < len(code_list) or len(data['fields']) < len(field_list):
+                raise
+            if since is not None:
+                data = self.quotes.snapshot(code_list, field_list, since)
+            logger.warning(f"Wind不可用，返回{codes}的最新缓存行情")
+            data['stale'] = True
+            return data
         
         # 检查返回结果
         if result[0] != 0:
@@ -163,6 +832,63 @@ class WindService:
         # 获取DataFrame结果
         df = result[1]
         
+        # 写入最新行情表(文本字段原样保存)，再按版本号取出变化的行
+        with metrics.span('convert'):
+            self.quotes.update(df.index.tolist(), df.columns.tolist(), df.to_numpy())
+            return self.quotes.snapshot(df.index.tolist(), df.columns.tolist(), since)
+    
+    def create_quote_hub(self, fields='rt_last,rt_vol,rt_amt', client_queue_size=256):
+        """
+        创建实时行情推送中心，订阅与取消请求经Wind工作线程按实时优先级执行
+        
+        Args:
+            fields (str): 订阅字段
+            client_queue_size (int, optional): 每个客户端的待发送队列上限
+        
+        Returns:
+            QuoteHub: 行情推送中心
+        """
+        def run(func, *args):
+            self._guard()
+            try:
+                result = self._worker.call(PRIORITY_REALTIME, self.wait_time, func, *args)
+            except WindOverloadedError:
+                self.supervisor.breaker.release()
+                raise
+            except Exception:
+                self.supervisor.breaker.record_failure()
+                raise
+            self._record_result(result)
+            return result
+        return QuoteHub(self.provider, fields, run=run, client_queue_size=client_queue_size, store=self.quotes)
+    
+    @wind_decorator
+    def get_snapshot_data(self, codes, fields, options=""):
+        """
+        获取截面数据(w.wss)，如估值、行业分类等
+        
+        Args:
+            codes (str): 证券代码，如'000001.SZ,600000.SH'
+            fields (str): 字段列表，如'pe_ttm,pb'
+            options (str, optional): 额外选项，如'tradeDate=2023-12-29'
+            
+        Returns:
+            dict: 包含截面数据的字典
+        """
+        logger.info(f"获取{codes}的截面{fields}数据")
+        
+        # 调用Wind API获取数据
+        result = self._call('wss', codes, fields, options, usedf=True)
+        
+        # 检查返回结果
+        if result[0] != 0:
+            error_msg = f"获取截面数据失败，错误码: {result[0]}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        # 获取DataFrame结果
+        df = result[1]
+        
         # 转换为字典格式
         data = {
             'codes': df.index.tolist(),
@@ -170,4 +896,83 @@ class WindService:
             'data': df.values.tolist()
         }
         
-        return data 
\ No newline at end of file
+        return data
+    
+    def get_market_codes(self, date):
+        """
+        获取某日全部A股的代码(w.wset sectorconstituent)，结果按日期保留在内存中
+        
+        Args:
+            date (str): 日期，如'2023-12-29'
+        
+        Returns:
+            list: 证券代码列表
+        """
+        codes = self._market_codes.get(date)
+        if codes is not None:
+            return codes
+        result = self._call('wset', 'sectorconstituent', f'date={date};sectorid={MARKET_SECTOR_ID}')
+        if result.ErrorCode != 0:
+            error_msg = f"获取全部A股失败，错误码: {result.ErrorCode}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        # 只保留最近几个交易日
+        if len(self._market_codes) >= 8:
+            self._market_codes.pop(next(iter(self._market_codes)), None)
+        codes = self._market_codes[date] = list(result.Data[1])
+        return codes
+    
+    def get_cross_section(self, codes, fields, date, options=""):
+        """
+        获取一批证券在某个交易日的截面数据数组，已缓存的(证券, 字段)直接返回，
+        缺失部分按snapshot_batch_size分组调用w.wss补取
+        
+        Args:
+            codes (list): 证券代码列表
+            fields (list): 字段名列表，如['pe_ttm', 'pb']
+            date (str): 交易日，如'2023-12-29'
+            options (str, optional): 额外选项(不含tradeDate)
+        
+        Returns:
+            dict: {大写字段名: 与codes对齐的数组}
+        """
+        def load(missing, missing_fields):
+            frames = []
+            for i in range(0, len(missing), self.snapshot_batch_size):
+                chunk = missing[i:i + self.snapshot_batch_size]
+                result = self._call('wss', ','.join(chunk), ','.join(missing_fields),
+                                    ';'.join(filter(None, [options, f'tradeDate={date}'])), usedf=True)
+                if result[0] != 0:
+                    error_msg = f"获取截面数据失败，错误码: {result[0]}"
+                    logger.error(error_msg)
+                    raise Exception(error_msg)
+                frames.append(result[1])
+            return pd.concat(frames)
+        
+        return self.snapshots.get_columns(codes, fields, date, options, load)
+
+
+def set_default_wind_service(service):
+    """
+    设置进程内默认的Wind数据服务
+
+    Args:
+        service (WindService): 数据服务，应用中为共享实例的代理
+    """
+    global _default_service
+    with _default_lock:
+        _default_service = service
+
+
+def get_default_wind_service():
+    """
+    获取进程内默认的Wind数据服务，未设置时(如脚本中单独使用)以默认数据源创建不带缓存的服务
+
+    Returns:
+        WindService: 数据服务
+    """
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = WindService(cache_dir=None)
+        return _default_service
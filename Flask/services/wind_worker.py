@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Wind工作线程模块
+所有Wind调用都在独占的工作线程中执行，由有界优先级队列调度
+"""
+
+import itertools
+import queue
+import threading
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 调度优先级，数值越小越先执行
+PRIORITY_REALTIME = 0  # 实时行情(wsq)
+PRIORITY_NORMAL = 1    # 截面、日历等轻量请求
+PRIORITY_BULK = 2      # 历史数据回补(wsd)
+
+# Wind函数对应的默认优先级
+FUNCTION_PRIORITIES = {
+    'wsq': PRIORITY_REALTIME,
+    'wss': PRIORITY_NORMAL,
+    'wset': PRIORITY_NORMAL,
+    'tdays': PRIORITY_NORMAL,
+    'wsi': PRIORITY_NORMAL,  # 分钟线按(证券, 交易日)缓存，每次只补取少量交易日或当天新增的分钟
+    'wsd': PRIORITY_BULK,
+}
+
+
+class WindOverloadedError(Exception):
+    """请求队列已满时抛出，接口应返回503并携带Retry-After"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        # 经进程间连接传递时保留retry_after
+        return self.__class__, (str(self), self.retry_after)
+
+
+class WindWorker:
+    """Wind调用工作线程池"""
+
+    def __init__(self, num_workers=1, max_queue_size=64, retry_after=1):
+        """
+        初始化并启动工作线程
+
+        Args:
+            num_workers (int): 工作线程数，WindPy会话为进程内全局对象，默认只用1个
+            max_queue_size (int): 等待队列上限，超过时直接拒绝请求
+            retry_after (int): 队列已满时建议客户端重试的间隔(秒)
+        """
+        self.retry_after = retry_after
+        self._queue = queue.PriorityQueue(maxsize=max_queue_size)
+        # 同优先级按提交顺序执行
+        self._sequence = itertools.count()
+        self._threads = []
+        for i in range(num_workers):
+            thread = threading.Thread(target=self._run, name=f'wind-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def queue_depth(self):
+        """
+        获取当前排队的请求数
+
+        Returns:
+            int: 排队数量
+        """
+        return self._queue.qsize()
+
+    def submit(self, priority, func, *args, **kwargs):
+        """
+        提交调用到队列
+
+        Args:
+            priority (int): 优先级，见PRIORITY_*常量
+            func (callable): 在工作线程中执行的函数
+
+        Returns:
+            concurrent.futures.Future: 调用结果
+
+        Raises:
+            WindOverloadedError: 队列已满
+        """
+        future = Future()
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), future, func, args, kwargs))
+        except queue.Full:
+            logger.warning(f"Wind请求队列已满({self._queue.maxsize})，拒绝请求")
+            raise WindOverloadedError("Wind请求队列已满，请稍后重试", self.retry_after)
+        return future
+
+    def call(self, priority, timeout, func, *args, **kwargs):
+        """
+        提交调用并等待结果
+
+        Args:
+            priority (int): 优先级
+            timeout (float): 等待结果的超时时间(秒)
+            func (callable): 在工作线程中执行的函数
+
+        Returns:
+            func的返回值
+        """
+        future = self.submit(priority, func, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # 仍在排队的请求直接取消，避免超时后继续占用Wind
+            future.cancel()
+            raise TimeoutError(f"Wind请求超时({timeout}秒)")
+
+    def _run(self):
+        while True:
+            priority, _, future, func, args, kwargs = self._queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
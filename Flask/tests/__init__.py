@@ -1,3 +1,12 @@
 """
 测试包初始化文件
-""" 
\ No newline at end of file
+"""
+
+import os
+import tempfile
+
+# 测试使用离线数据源和临时缓存目录，无需Wind终端
+os.environ.setdefault('DATA_PROVIDER', 'replay')
+os.environ.setdefault('CACHE_DIR', tempfile.mkdtemp(prefix='wind-test-cache-'))
+# 预热任务由test_prewarm单独测试，应用不启动预热线程
+os.environ.setdefault('PREWARM_ENABLED', '0')
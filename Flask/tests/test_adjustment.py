@@ -0,0 +1,77 @@
+import unittest
+import shutil
+import tempfile
+
+import numpy as np
+
+from services.data_provider import ReplayProvider
+from services.wind_service import WindService
+
+FIELDS = 'open,high,low,close,volume'
+
+class TestPriceAdjustment(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.provider = ReplayProvider()
+        self.service = WindService(cache_dir=self.tmp_dir, provider=self.provider)
+
+    def tearDown(self):
+        self.service.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def expected(self, code, options):
+        return self.provider.wsd(code, FIELDS, '2020-01-02', '2023-12-29', options, usedf=True)[1]
+
+    def test_adjust_from_raw_bars(self):
+        """测试前复权、后复权由同一份未复权行情与复权因子计算，结果与Wind一致"""
+        code = '600000.SH'
+        raw = self.service.get_historical_frame(code, FIELDS, '2020-01-02', '2023-12-29')
+        calls = self.provider.calls['wsd']
+        forward = self.service.get_historical_frame(code, FIELDS, '2020-01-02', '2023-12-29', 'PriceAdj=F')
+        backward = self.service.get_historical_frame(code, FIELDS, '2020-01-02', '2023-12-29', 'PriceAdj=B')
+        # 复权因子的请求区间与最新复权因子各一次，未复权行情不再请求
+        self.assertEqual(self.provider.calls['wsd'], calls + 2)
+
+        for df, options in ((raw, ''), (forward, 'PriceAdj=F'), (backward, 'PriceAdj=B')):
+            expected = self.expected(code, options)
+            self.assertEqual(df.index.strftime('%Y-%m-%d').tolist(), expected.index.strftime('%Y-%m-%d').tolist())
+            self.assertTrue(np.allclose(df.values, expected.values))
+        self.assertTrue(np.array_equal(forward['VOLUME'].values, raw['VOLUME'].values))
+
+    def test_panel_and_invalidate(self):
+        """测试批量复权与单只证券一致，删除复权因子缓存不影响未复权行情缓存"""
+        codes = ['600000.SH', '000001.SZ']
+        _, dates, fields, panel = self.service.get_historical_panel(codes, 'close,volume', '2023-01-03',
+                                                                    '2023-12-29', 'PriceAdj=F')
+        for i, code in enumerate(codes):
+            expected = self.provider.wsd(code, 'close', '2023-01-03', '2023-12-29', 'PriceAdj=F', usedf=True)[1]
+            self.assertTrue(np.allclose(panel[i, :, 0], expected['CLOSE'].values))
+
+        calls = self.provider.calls['wsd']
+        self.service.invalidate_adjfactor(codes[0])
+        self.assertEqual(self.service.cache.gaps(codes[0], 'close', '2023-01-03', '2023-12-29'), [])
+        self.assertNotEqual(self.service.cache.gaps(codes[0], 'adjfactor', '2023-01-03', '2023-12-29'), [])
+        df = self.service.get_historical_frame(codes[0], 'close', '2023-01-03', '2023-12-29', 'PriceAdj=F')
+        self.assertTrue(np.allclose(df['CLOSE'].values, panel[0, :, 0]))
+        self.assertEqual(self.provider.calls['wsd'], calls + 2)
+
+    def test_adjust_minute_bars(self):
+        """测试分钟线分区保存未复权行情，跨除权日的前复权、后复权在读取时计算，与Wind一致"""
+        code = '600000.SH'
+        raw = self.service.get_minute_frame(code, FIELDS, '2022-11-22', '2022-11-23')
+        calls = self.provider.calls['wsi']
+        frames = {options: self.service.get_minute_frame(code, FIELDS, '2022-11-22', '2022-11-23', options)
+                  for options in ('PriceAdj=F', 'PriceAdj=B')}
+        # 复权后的分钟线由同一份未复权分区计算，不再请求w.wsi
+        self.assertEqual(self.provider.calls['wsi'], calls)
+
+        for options, df in frames.items():
+            expected = self.provider.wsi(code, FIELDS, '2022-11-22 09:00:00', '2022-11-23 15:30:00',
+                                         f'BarSize=1;{options}', usedf=True)[1]
+            self.assertEqual(len(df), 480)
+            self.assertTrue(np.allclose(df.values, expected.values))
+            self.assertTrue(np.array_equal(df['VOLUME'].values, raw['VOLUME'].values))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,12 @@
 import unittest
 import json
+import pandas as pd
 from app import app
 from services.wind_service import WindService
 from unittest.mock import patch
 
+from utils import serializers
+
 class TestWindAPI(unittest.TestCase):
     def setUp(self):
         """测试前的设置"""
@@ -81,5 +84,29 @@ class TestWindAPI(unittest.TestCase):
         response = self.app.get('/api/realtime?codes=invalid_code')
         self.assertEqual(response.status_code, 500)
 
+    @unittest.skipIf(serializers.pa is None, "未安装pyarrow")
+    def test_stream_minute_bars_arrow(self):
+        """测试分钟线的Arrow流式响应保留K线时间"""
+        response = self.app.get('/api/historical?code=600000.SH&start_date=2023-12-01&end_date=2023-12-05'
+                                '&fields=close&stream=1&format=arrow&options=Period=5')
+        self.assertEqual(response.status_code, 200)
+        table = serializers.pa.ipc.open_stream(response.get_data()).read_all()
+        self.assertEqual(str(table.schema.field('date').type), 'timestamp[s]')
+        times = pd.to_datetime(table.column('date').to_pylist())
+        self.assertGreater(len(times), 3)
+        self.assertTrue((times != times.normalize()).all())
+        self.assertTrue(times.is_unique)
+
+    @patch('services.wind_service.WindService._call')
+    def test_realtime_non_numeric_fields(self, mock_call):
+        """测试w.wsq返回的文本字段原样返回，响应为严格合法的JSON"""
+        mock_call.return_value = (0, pd.DataFrame({'RT_LAST': [10.5], 'RT_TRADE_STATUS': ['交易']},
+                                                  index=['000001.SZ']))
+        response = self.app.get('/api/realtime?codes=000001.SZ&fields=rt_last,rt_trade_status')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.get_data(as_text=True), parse_constant=self.fail)['data']
+        self.assertEqual(data['fields'], ['RT_LAST', 'RT_TRADE_STATUS'])
+        self.assertEqual(data['data'], [[10.5, '交易']])
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,93 @@
+import unittest
+import json
+import asyncio
+
+from asgi import AsgiApp
+from app import app as flask_app
+import extensions
+
+async def call(app, path, query='', until=None, timeout=10):
+    """
+    以ASGI协议请求一次，返回(状态码, 响应头, 各段响应体)；
+    until(body)为True时模拟客户端断开
+    """
+    start, chunks = {}, []
+    disconnected = asyncio.Event()
+    request = {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def receive():
+        nonlocal request
+        if request is not None:
+            message, request = request, None
+            return message
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            start.update(message)
+        else:
+            chunks.append(message.get('body', b''))
+            if until is not None and until(b''.join(chunks)):
+                disconnected.set()
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+             'path': path, 'query_string': query.encode(), 'root_path': '', 'headers': [(b'host', b'localhost')],
+             'client': ('127.0.0.1', 50000), 'server': ('localhost', 80)}
+    await asyncio.wait_for(app(scope, receive, send), timeout)
+    return start['status'], dict(start['headers']), chunks
+
+class TestAsgiApp(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.app = AsgiApp(flask_app, max_workers=4, max_pending=64, heartbeat=0.5)
+
+    def test_routes_match_flask(self):
+        """测试经ASGI执行的路由与Flask测试客户端结果一致"""
+        query = 'code=000001.SZ&start_date=2023-01-01&end_date=2023-01-31&fields=open,close'
+        status, headers, chunks = asyncio.run(call(self.app, '/api/historical', query))
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        expected = flask_app.test_client().get(f'/api/historical?{query}').get_json()
+        self.assertEqual(json.loads(b''.join(chunks)), expected)
+
+        status, _, chunks = asyncio.run(call(self.app, '/api/health'))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(b''.join(chunks))['stats']['asgi']['max_workers'], 4)
+
+    def test_streaming_response(self):
+        """测试流式响应逐段发送"""
+        query = 'code=000001.SZ&start_date=2021-01-01&end_date=2023-12-31&fields=close&stream=1'
+        status, _, chunks = asyncio.run(call(self.app, '/api/historical', query))
+        self.assertEqual(status, 200)
+        lines = [line for line in b''.join(chunks).decode().splitlines() if line]
+        self.assertGreater(len([c for c in chunks if c]), 1)
+        self.assertEqual(len(lines), len(set(lines)))
+
+    def test_concurrent_requests_and_overload(self):
+        """测试并发请求数超过线程数时排队等待，超过等待上限时返回503"""
+        async def many():
+            return await asyncio.gather(*[call(self.app, '/api/health') for _ in range(20)])
+        self.assertEqual({status for status, _, _ in asyncio.run(many())}, {200})
+
+        self.app.max_pending = 0
+        status, headers, _ = asyncio.run(call(self.app, '/api/health'))
+        self.assertEqual(status, 503)
+        self.assertEqual(headers[b'retry-after'], b'1')
+        self.assertEqual(self.app.stats()['rejected'], 1)
+
+    def test_stream_quotes(self):
+        """测试实时推送在行情到达时发送，客户端断开后释放订阅"""
+        status, headers, chunks = asyncio.run(call(self.app, '/api/stream/quotes', 'codes=600519.SH',
+                                                   until=lambda body: b'event: quote' in body))
+        self.assertEqual(status, 200)
+        self.assertTrue(headers[b'content-type'].startswith(b'text/event-stream'))
+        event = next(c for c in chunks if c.startswith(b'event: quote')).decode()
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['code'], '600519.SH')
+
+        stats = extensions.get_quote_hub(flask_app).stats()
+        self.assertEqual(stats['clients'], 0)
+        self.assertEqual(self.app.stats()['streams'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
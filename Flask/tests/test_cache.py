@@ -0,0 +1,144 @@
+import unittest
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from app import app
+from services.cache import HistoricalCache, CacheBypass, subtract_intervals, to_day
+from services.data_provider import ReplayProvider
+from services.wind_service import WindService
+
+class FakeFetcher:
+    """模拟w.wsd，按日期生成确定性的数据并记录调用区间"""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, fields, start_date, end_date):
+        self.calls.append((tuple(fields), start_date, end_date))
+        index = pd.bdate_range(start_date, end_date)
+        data = {f.upper(): [d.day + i for d in index] for i, f in enumerate(fields)}
+        return pd.DataFrame(data, index=index)
+
+class TestHistoricalCache(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = HistoricalCache(self.cache_dir)
+        self.fetcher = FakeFetcher()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_subtract_intervals(self):
+        """测试缺失区间计算"""
+        self.assertEqual(subtract_intervals(0, 10, []), [(0, 10)])
+        self.assertEqual(subtract_intervals(0, 10, [[2, 3], [6, 7]]), [(0, 1), (4, 5), (8, 10)])
+        self.assertEqual(subtract_intervals(2, 3, [[0, 10]]), [])
+
+    def test_repeat_request_served_from_cache(self):
+        """测试重复请求不再调用上游"""
+        first = self.cache.get_frame('000001.SZ', ['open', 'close'], '2023-01-02', '2023-01-31', '', self.fetcher)
+        second = self.cache.get_frame('000001.SZ', ['open', 'close'], '2023-01-02', '2023-01-31', '', self.fetcher)
+
+        self.assertEqual(len(self.fetcher.calls), 1)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(list(second.columns), ['OPEN', 'CLOSE'])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_partial_overlap_fetches_only_gaps(self):
+        """测试部分重叠时只补取缺失区间"""
+        self.cache.get_frame('000001.SZ', ['close'], '2023-01-09', '2023-01-20', '', self.fetcher)
+        df = self.cache.get_frame('000001.SZ', ['close'], '2023-01-02', '2023-01-31', '', self.fetcher)
+
+        self.assertEqual(self.fetcher.calls[1:], [
+            (('close',), '2023-01-02', '2023-01-08'),
+            (('close',), '2023-01-21', '2023-01-31'),
+        ])
+        self.assertEqual(len(df), len(pd.bdate_range('2023-01-02', '2023-01-31')))
+        self.assertTrue(df.index.is_monotonic_increasing)
+
+    def test_fields_and_options_cached_separately(self):
+        """测试字段与选项分别缓存"""
+        self.cache.get_frame('000001.SZ', ['close'], '2023-01-02', '2023-01-31', '', self.fetcher)
+        self.cache.get_frame('000001.SZ', ['open', 'close'], '2023-01-02', '2023-01-31', '', self.fetcher)
+        self.cache.get_frame('000001.SZ', ['close'], '2023-01-02', '2023-01-31', 'PriceAdj=F', self.fetcher)
+
+        self.assertEqual([c[0] for c in self.fetcher.calls], [('close',), ('open',), ('close',)])
+
+    def test_cache_persists_on_disk(self):
+        """测试缓存重建后仍可命中"""
+        self.cache.get_frame('000001.SZ', ['close'], '2023-01-02', '2023-01-31', '', self.fetcher)
+        reopened = HistoricalCache(self.cache_dir)
+        df = reopened.get_frame('000001.SZ', ['close'], '2023-01-10', '2023-01-12', '', self.fetcher)
+
+        self.assertEqual(len(self.fetcher.calls), 1)
+        np.testing.assert_array_equal(df['CLOSE'].values, [10.0, 11.0, 12.0])
+
+    def test_non_numeric_field_bypasses_cache(self):
+        """测试非数值字段抛出CacheBypass"""
+        fetcher = lambda fields, start, end: pd.DataFrame(
+            {'TRADE_STATUS': ['交易']}, index=pd.to_datetime([start]))
+        with self.assertRaises(CacheBypass):
+            self.cache.get_frame('000001.SZ', ['trade_status'], '2023-01-03', '2023-01-03', '', fetcher)
+
+    def test_to_day(self):
+        """测试日期转换"""
+        self.assertEqual(to_day('1970-01-02'), 1)
+
+class TestBatchCache(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.provider = ReplayProvider()
+        self.service = WindService(cache_dir=self.cache_dir, provider=self.provider)
+        self.codes = ['000001.SZ', '600000.SH']
+
+    def tearDown(self):
+        self.service.shutdown()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def expected(self, code, start_date, end_date):
+        return ReplayProvider().wsd(code, 'close', start_date, end_date, usedf=True)[1]['CLOSE'].values
+
+    def test_batch_fetches_each_gap(self):
+        """测试批量请求分别补取各缺失区间，不重复获取中间已缓存的日期"""
+        for code in self.codes:
+            self.service.get_historical_frame(code, 'close', '2023-02-01', '2023-02-28')
+        with patch.object(self.provider, 'wsd', wraps=self.provider.wsd) as mock_wsd:
+            batch = self.service.get_historical_batch(self.codes, 'close', '2023-01-01', '2023-03-31')
+        ranges = [call.args[2:4] for call in mock_wsd.call_args_list]
+        self.assertEqual(len(ranges), 2)
+        for begin, end in ranges:
+            self.assertTrue(end < '2023-02-01' or begin > '2023-02-28', (begin, end))
+        for i, code in enumerate(self.codes):
+            self.assertTrue(np.allclose(batch['data']['CLOSE'][i], self.expected(code, '2023-01-01', '2023-03-31')))
+
+    def test_batch_aligns_returned_columns(self):
+        """测试多只证券的返回列按证券代码对齐，而不是按请求顺序"""
+        wsd = self.service._wsd
+        reversed_wsd = lambda *args, **kwargs: wsd(*args, **kwargs).iloc[:, ::-1]
+        with patch.object(self.service, '_wsd', side_effect=reversed_wsd):
+            batch = self.service.get_historical_batch(self.codes, 'close', '2023-01-01', '2023-01-31')
+        for i, code in enumerate(self.codes):
+            self.assertTrue(np.allclose(batch['data']['CLOSE'][i], self.expected(code, '2023-01-01', '2023-01-31')))
+
+    def test_batch_endpoint(self):
+        """测试批量接口返回证券×日期的列式数据"""
+        client = app.test_client()
+        response = client.get('/api/historical/batch?codes=000001.SZ,600000.SH&fields=close,volume'
+                              '&start_date=2023-01-01&end_date=2023-01-31')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertEqual(data['shape'], [2, 22, 2])
+        response = client.post('/api/historical/batch', json={'codes': '600000.SH,000001.SZ', 'fields': 'close',
+                                                               'start_date': '2023-01-01', 'end_date': '2023-01-31'})
+        swapped = response.get_json()['data']
+        self.assertEqual(swapped['codes'], ['600000.SH', '000001.SZ'])
+        self.assertEqual(swapped['data']['CLOSE'], data['data']['CLOSE'][::-1])
+        self.assertTrue(np.allclose(swapped['data']['CLOSE'][0], self.expected('600000.SH', '2023-01-01', '2023-01-31')))
+
+if __name__ == '__main__':
+    unittest.main()
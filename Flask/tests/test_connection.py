@@ -0,0 +1,214 @@
+import unittest
+import threading
+import time
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from services.connection import (CircuitBreaker, ConnectionSupervisor, WindUnavailableError,
+                                  BREAKER_OPEN, BREAKER_HALF_OPEN, BREAKER_CLOSED, STATE_CONNECTED)
+from services.data_provider import ProviderResult, ReplayProvider
+from services.wind_service import WindService
+from services.wind_worker import WindWorker, WindOverloadedError
+
+class FlakyProvider(ReplayProvider):
+    """前若干次w.start失败、可模拟wsd出错的数据源"""
+
+    def __init__(self, failed_starts=0):
+        super().__init__()
+        self.failed_starts = failed_starts
+        self.wsd_error = None
+
+    def start(self, waitTime=120):
+        if self.failed_starts > 0:
+            self.failed_starts -= 1
+            return ProviderResult(-40520004)
+        return super().start(waitTime)
+
+    def wsd(self, *args, **kwargs):
+        if self.wsd_error is not None:
+            return self.wsd_error, None
+        return super().wsd(*args, **kwargs)
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.01)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_open_half_open_and_close(self):
+        """测试连续失败后打开，超时后放行一次试探请求"""
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=lambda: now[0])
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.retry_after(), 11)
+
+        now[0] = 10.0
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, BREAKER_HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+        # 试探失败重新打开，再次试探成功后关闭
+        breaker.record_failure()
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        now[0] = 20.0
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+        self.assertEqual(breaker.stats()['opened'], 2)
+
+    def test_lost_trial_expires(self):
+        """测试试探请求未记录结果时，归还名额或超过reset_timeout后放行下一个试探请求"""
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 10.0
+        self.assertTrue(breaker.allow())
+        breaker.release()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        now[0] = 20.0
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, BREAKER_HALF_OPEN)
+
+class TestConnectionSupervisor(unittest.TestCase):
+    def test_reconnect_with_backoff(self):
+        """测试连接失败后在后台退避重连，断开后自动重连"""
+        provider = FlakyProvider(failed_starts=2)
+        supervisor = ConnectionSupervisor(provider, WindWorker(), check_interval=0.01,
+                                          backoff_base=0.01, backoff_max=0.05)
+        try:
+            wait_until(lambda: supervisor.state == STATE_CONNECTED)
+            stats = supervisor.stats()
+            self.assertEqual(stats['reconnect_attempts'], 3)
+            self.assertEqual(stats['last_error_code'], -40520004)
+
+            provider.stop()
+            supervisor.notify_disconnected()
+            wait_until(lambda: supervisor.stats()['reconnects'] == 1)
+            self.assertTrue(provider.isconnected())
+        finally:
+            supervisor.stop()
+
+class TestWindServiceBreaker(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.provider = FlakyProvider()
+        self.service = WindService(cache_dir=self.cache_dir, provider=self.provider,
+                                   breaker_threshold=2, breaker_reset=60)
+        self.service.connect(wait=True)
+
+    def tearDown(self):
+        self.service.shutdown()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_open_breaker_fails_fast_or_serves_cache(self):
+        """测试熔断后直接失败，已缓存的数据仍可返回"""
+        self.service.get_historical_frame('000001.SZ', 'close', '2023-01-01', '2023-01-31')
+
+        self.provider.wsd_error = -40521009
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                self.service.get_historical_frame('600000.SH', 'close', '2023-01-01', '2023-01-31')
+        stats = self.service.get_stats()['connection']
+        self.assertEqual(stats['breaker']['state'], BREAKER_OPEN)
+        self.assertEqual(stats['last_error_code'], -40521009)
+
+        calls = self.provider.calls['wsd']
+        with self.assertRaises(WindUnavailableError) as ctx:
+            self.service.get_historical_frame('600000.SH', 'close', '2023-01-01', '2023-01-31')
+        self.assertGreater(ctx.exception.retry_after, 1)
+        df = self.service.get_historical_frame('000001.SZ', 'close', '2023-01-01', '2023-02-28')
+        self.assertEqual(len(df), 22)
+        self.assertEqual(self.provider.calls['wsd'], calls)
+
+    def test_request_errors_do_not_open_breaker(self):
+        """测试代码无效等请求错误不计入熔断"""
+        for _ in range(3):
+            with self.assertRaises(Exception):
+                self.service.get_historical_frame('invalid_code', 'close', '2023-01-01', '2023-01-31')
+        self.assertEqual(self.service.get_stats()['connection']['breaker']['state'], BREAKER_CLOSED)
+
+    def test_coalesced_failure_counted_once(self):
+        """测试合并的并发调用共享一次上游失败时只计一次失败，熔断器保持关闭"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing_invoke(func_name, args, kwargs):
+            started.set()
+            release.wait(5)
+            raise RuntimeError('上游出错')
+
+        errors = []
+
+        def request():
+            try:
+                self.service.call('wss', '600000.SH', 'pe_ttm', 'tradeDate=20231229')
+            except RuntimeError as e:
+                errors.append(e)
+
+        flight = self.service._flight.stats()
+        with patch.object(self.service, '_invoke', side_effect=failing_invoke):
+            threads = [threading.Thread(target=request) for _ in range(5)]
+            threads[0].start()
+            started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            wait_until(lambda: self.service._flight.stats()['deduplicated_calls']
+                       - flight['deduplicated_calls'] == 4)
+            release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(errors), 5)
+        breaker = self.service.get_stats()['connection']['breaker']
+        self.assertEqual((breaker['state'], breaker['failures']), (BREAKER_CLOSED, 1))
+
+class TestBreakerTrialPaths(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.provider = FlakyProvider()
+        self.service = WindService(cache_dir=self.cache_dir, provider=self.provider,
+                                   breaker_threshold=1, breaker_reset=0.05)
+        self.service.connect(wait=True)
+
+    def tearDown(self):
+        self.service.shutdown()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def open_breaker(self):
+        self.provider.wsd_error = -40521009
+        with self.assertRaises(Exception):
+            self.service.get_historical_frame('600000.SH', 'close', '2023-01-01', '2023-01-31')
+        self.provider.wsd_error = None
+        self.assertEqual(self.service.supervisor.breaker.state, BREAKER_OPEN)
+        time.sleep(0.06)
+
+    def test_quote_hub_trial_records_result(self):
+        """测试实时订阅作为试探请求时记录结果，熔断器关闭"""
+        self.open_breaker()
+        hub = self.service.create_quote_hub()
+        hub.disconnect(hub.connect(['000001.SZ']))
+        self.assertEqual(self.service.supervisor.breaker.state, BREAKER_CLOSED)
+        self.service.get_snapshot_data('000001.SZ', 'pe_ttm')
+
+    def test_overloaded_trial_released(self):
+        """测试试探请求因队列已满未发出时归还名额"""
+        self.open_breaker()
+        with patch.object(self.service._worker, 'call', side_effect=WindOverloadedError("队列已满", 1)):
+            with self.assertRaises(WindOverloadedError):
+                self.service.get_historical_frame('600000.SH', 'close', '2023-01-01', '2023-01-31')
+        self.assertEqual(self.service.supervisor.breaker.state, BREAKER_HALF_OPEN)
+        df = self.service.get_historical_frame('600000.SH', 'close', '2023-01-01', '2023-01-31')
+        self.assertEqual(len(df), 22)
+        self.assertEqual(self.service.supervisor.breaker.state, BREAKER_CLOSED)
+
+if __name__ == '__main__':
+    unittest.main()
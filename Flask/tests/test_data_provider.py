@@ -0,0 +1,94 @@
+import unittest
+import time
+import shutil
+import tempfile
+import threading
+
+from services.data_provider import (ReplayProvider, RecordingProvider, create_provider,
+                                    REPLAY_INVALID_CODE)
+from services.wind_service import WindService
+
+class TestReplayProvider(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.provider = ReplayProvider()
+
+    def test_wsd_is_deterministic_across_ranges(self):
+        """测试同一日期在不同请求区间、不同实例中的数据相同"""
+        code, df = self.provider.wsd('000001.SZ', 'open,close,volume', '2023-01-01', '2023-12-31', '', usedf=True)
+        _, part = ReplayProvider().wsd('000001.SZ', 'close', '2023-06-01', '2023-06-30', '', usedf=True)
+
+        self.assertEqual(code, 0)
+        self.assertEqual(df.columns.tolist(), ['OPEN', 'CLOSE', 'VOLUME'])
+        self.assertTrue((df.index.dayofweek < 5).all())
+        self.assertTrue((df.loc[part.index, 'CLOSE'] == part['CLOSE']).all())
+
+    def test_multi_code_and_periods(self):
+        """测试多证券单字段、周线与分钟线"""
+        _, panel = self.provider.wsd('000001.SZ,600000.SH', 'close', '2023-01-01', '2023-01-31', '', usedf=True)
+        self.assertEqual(panel.columns.tolist(), ['000001.SZ', '600000.SH'])
+        self.assertEqual(self.provider.wsd('000001.SZ,600000.SH', 'open,close', '2023-01-01', '2023-01-31',
+                                           '', usedf=True)[0], REPLAY_INVALID_CODE)
+
+        _, weekly = self.provider.wsd('000001.SZ', 'open,close', '2023-01-01', '2023-01-31', 'Period=W', usedf=True)
+        # 最后一周截止于区间结束日(周二)
+        self.assertEqual(weekly.index.strftime('%m-%d').tolist(), ['01-06', '01-13', '01-20', '01-27', '01-31'])
+
+        _, minute = self.provider.wsd('000001.SZ', 'close', '2023-01-03', '2023-01-03', 'Period=5', usedf=True)
+        self.assertEqual(len(minute), 48)
+        self.assertEqual(str(minute.index[-1]), '2023-01-03 15:00:00')
+
+    def test_invalid_code_returns_error(self):
+        """测试无效证券代码返回错误码"""
+        self.assertEqual(self.provider.wsd('invalid_code', 'close', '2023-01-01', '2023-01-31').ErrorCode,
+                         REPLAY_INVALID_CODE)
+        self.assertEqual(self.provider.wsq('invalid_code', 'rt_last', usedf=True)[0], REPLAY_INVALID_CODE)
+
+    def test_snapshot_calendar_and_constituents(self):
+        """测试wss、tdays与wset"""
+        _, df = self.provider.wss('000001.SZ,600000.SH', 'sec_name,pe_ttm', 'tradeDate=2023-12-29', usedf=True)
+        self.assertEqual(df.loc['000001.SZ', 'SEC_NAME'], '模拟000001')
+
+        days = self.provider.tdays('2023-01-01', '2023-01-10').Data[0]
+        self.assertEqual(len(days), 7)
+
+        result = self.provider.wset('indexconstituent', 'date=2023-12-29;windcode=000300.SH')
+        self.assertEqual(len(result.Data[1]), 300)
+
+    def test_subscription_and_latency(self):
+        """测试订阅模式推送与取消，以及模拟延迟"""
+        provider = ReplayProvider(latency=0.05, tick_interval=0.01)
+        received = threading.Event()
+        result = provider.wsq('000001.SZ', 'rt_last,rt_vol', func=lambda data: received.set())
+        self.assertTrue(received.wait(2))
+        provider.cancelRequest(result.RequestID)
+        self.assertEqual(provider._subscriptions, {})
+
+        start = time.perf_counter()
+        provider.wsq('000001.SZ', 'rt_last', usedf=True)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+    def test_recorded_results_are_replayed(self):
+        """测试录制的结果被回放"""
+        replay_dir = tempfile.mkdtemp()
+        try:
+            source = ReplayProvider()
+            source._daily('000001.SZ')['close'][:] = 42.0
+            RecordingProvider(source, replay_dir).wsd('000001.SZ', 'close', '2023-01-03', '2023-01-05', '', usedf=True)
+
+            _, df = create_provider('replay', replay_dir=replay_dir).wsd(
+                '000001.SZ', 'close', '2023-01-03', '2023-01-05', '', usedf=True)
+            self.assertTrue((df['CLOSE'] == 42.0).all())
+        finally:
+            shutil.rmtree(replay_dir, ignore_errors=True)
+
+    def test_wind_service_runs_on_replay(self):
+        """测试WindService在离线数据源上运行"""
+        service = WindService(cache_dir=None, provider=self.provider)
+        data = service.get_historical_data('000001.SZ', 'open,close', '2023-01-01', '2023-01-31')
+
+        self.assertTrue(service.check_connection())
+        self.assertEqual(len(data['dates']), 22)
+
+if __name__ == '__main__':
+    unittest.main()
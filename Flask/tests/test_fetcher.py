@@ -0,0 +1,190 @@
+import unittest
+import os
+import sys
+import json
+import pickle
+import shutil
+import tempfile
+import subprocess
+from unittest.mock import patch
+
+import pandas as pd
+
+from services.connection import WindUnavailableError
+from services.data_provider import ReplayProvider
+from services.fetcher import (FetcherServer, FetcherClient, RemoteProvider, RemoteWindService, parse_address,
+                              fetcher_authkey)
+from services.quote_store import EPOCH_SHIFT
+from services.shared_quotes import SharedQuoteStore
+from services.wind_service import WindService
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestSharedQuoteStore(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'quotes')
+        self.writer = SharedQuoteStore(self.path, capacity=4, field_capacity=4, create=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_reader_sees_writer_updates(self):
+        """测试读取方看到写入方之后新增的证券，版本号与增量返回与QuoteStore一致"""
+        reader = SharedQuoteStore(self.path)
+        self.writer.update(['000001.SZ'], ['rt_last'], [[10.0]])
+        self.writer.update(['600000.SH'], ['rt_last'], [[8.0]])
+        self.writer.update(['000001.SZ'], ['rt_last'], [[10.5]])
+
+        data = reader.snapshot(['000001.SZ', '600000.SH', '000002.SZ'], ['rt_last'])
+        self.assertEqual(reader.epoch, self.writer.epoch)
+        self.assertEqual(data['version'], (self.writer.epoch << EPOCH_SHIFT) | 3)
+        self.assertEqual(data['codes'], ['000001.SZ', '600000.SH'])
+        self.assertEqual(data['data'], [[10.5], [8.0]])
+        self.assertEqual(reader.snapshot(['000001.SZ', '600000.SH'], ['rt_last'], since=data['version'] - 1)['codes'],
+                         ['000001.SZ'])
+        self.assertTrue(reader.is_fresh(['000001.SZ'], ['RT_LAST'], 5))
+        self.assertFalse(reader.is_fresh(['000001.SZ'], ['rt_vol'], 5))
+        with self.assertRaises(ValueError):
+            reader.update(['000001.SZ'], ['rt_last'], [[1.0]])
+
+    def test_capacity_and_rebuild(self):
+        """测试超出容量时报错，写入方重建文件后读取方重新映射"""
+        reader = SharedQuoteStore(self.path)
+        with self.assertRaises(ValueError):
+            self.writer.update([f'{i:06d}.SZ' for i in range(5)], ['rt_last'], [[1.0]] * 5)
+        self.assertEqual(self.writer.stats()['codes'], 0)
+
+        self.writer.update(['000001.SZ', '600000.SH'], ['rt_last'], [[10.0], [8.0]])
+        since = reader.snapshot(['000001.SZ'], ['rt_last'])['version']
+        writer = SharedQuoteStore(self.path, capacity=4, field_capacity=4, create=True)
+        writer.update(['000001.SZ'], ['rt_last'], [[9.0]])
+        writer.update(['600000.SH'], ['rt_last'], [[8.0]])
+        self.assertEqual(reader.snapshot(['000001.SZ'], ['rt_last'])['data'], [[9.0]])
+        # 重建后的序号追上旧版本号，纪元不同仍返回全部行情
+        self.assertEqual(reader.snapshot(['000001.SZ', '600000.SH'], ['rt_last'], since=since)['codes'],
+                         ['000001.SZ', '600000.SH'])
+
+    def test_read_from_other_process(self):
+        """测试另一进程映射同一文件读取行情"""
+        self.writer.update(['000001.SZ', '600000.SH'], ['rt_last', 'rt_vol'], [[10.0, 100.0], [8.0, 200.0]])
+        code = ("import json, sys; from services.shared_quotes import SharedQuoteStore; "
+                "print(json.dumps(SharedQuoteStore(sys.argv[1]).snapshot(['600000.SH'], ['rt_vol'])))")
+        output = subprocess.run([sys.executable, '-c', code, self.path], cwd=PROJECT_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(json.loads(output)['data'], [[200.0]])
+
+class TestFetcher(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置：在本进程中启动抓取服务，工作进程一侧的服务通过套接字连接"""
+        self.tmp_dir = tempfile.mkdtemp()
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        quote_path = os.path.join(self.tmp_dir, 'quotes')
+        self.provider = ReplayProvider(tick_interval=0.05)
+        self.service = WindService(cache_dir=cache_dir, provider=self.provider,
+                                   quote_store=SharedQuoteStore(quote_path, create=True))
+        self.server = FetcherServer(self.service, os.path.join(self.tmp_dir, 'fetcher.sock'), b'test',
+                                    quote_fields='rt_last,rt_vol')
+        self.server.start()
+        self.client = FetcherClient(self.server.address, b'test')
+        self.remote = RemoteWindService(self.client, cache_dir=cache_dir, quote_path=quote_path,
+                                        quote_max_age=60, poll_interval=0.02)
+
+    def tearDown(self):
+        self.remote.shutdown()
+        self.server.close()
+        self.service.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_parse_address(self):
+        """测试TCP地址与Unix套接字路径的解析"""
+        self.assertEqual(parse_address('127.0.0.1:6100'), ('127.0.0.1', 6100))
+        self.assertEqual(parse_address('/tmp/wind-fetcher.sock'), '/tmp/wind-fetcher.sock')
+
+    def test_historical_read_from_shared_cache(self):
+        """测试缺失区间由抓取进程补取，之后的请求直接读取共享缓存"""
+        df = self.remote.get_historical_frame('000001.SZ', 'open,close', '2023-01-01', '2023-03-31')
+        self.assertEqual(len(df), 65)
+        wsd_calls = self.provider.calls['wsd']
+        remote_calls = self.remote.get_stats()['worker']['remote_calls']
+
+        cached = self.remote.get_historical_frame('000001.SZ', 'open,close', '2023-02-01', '2023-02-28')
+        self.assertTrue(cached.equals(df.loc['2023-02-01':'2023-02-28']))
+        stats = self.remote.get_stats()['worker']
+        self.assertEqual(stats['local_reads'], 1)
+        self.assertEqual(stats['remote_calls'], remote_calls + 1)
+        self.assertEqual(self.provider.calls['wsd'], wsd_calls)
+
+        batch = self.remote.get_historical_batch('000001.SZ,600000.SH', 'close', '2023-01-01', '2023-01-31')
+        self.assertEqual(batch['shape'], [2, 22, 1])
+        again = self.remote.get_historical_batch('000001.SZ,600000.SH', 'close', '2023-01-01', '2023-01-31')
+        self.assertEqual(again, batch)
+        self.assertEqual(self.remote.get_stats()['worker']['local_reads'], 4)
+
+    def test_realtime_and_errors(self):
+        """测试实时行情写入共享行情表后由工作进程直接返回，异常原样传递"""
+        data = self.remote.get_realtime_data('000001.SZ,600000.SH', 'rt_last,rt_vol')
+        self.assertEqual(data['codes'], ['000001.SZ', '600000.SH'])
+        local = self.remote.get_realtime_data('000001.SZ,600000.SH', 'rt_last,rt_vol', since=data['version'])
+        self.assertEqual((local['version'], local['codes']), (data['version'], []))
+        self.assertEqual(self.provider.calls['wsq'], 1)
+
+        with self.assertRaises(Exception):
+            self.remote.get_historical_frame('invalid_code', 'close', '2023-01-01', '2023-01-31')
+        error = pickle.loads(pickle.dumps(WindUnavailableError("熔断中", 7)))
+        self.assertEqual((str(error), error.retry_after), ("熔断中", 7))
+        with self.assertRaises(WindUnavailableError):
+            FetcherClient(os.path.join(self.tmp_dir, 'missing.sock'), b'test').call('check_connection')
+
+    def test_realtime_text_fields(self):
+        """测试共享行情表不保存的文本字段由抓取进程返回"""
+        result = (0, pd.DataFrame({'RT_LAST': [10.5], 'RT_TRADE_STATUS': ['交易']}, index=['000001.SZ']))
+        with patch.object(self.service, '_call', return_value=result) as mock_call:
+            data = self.remote.get_realtime_data('000001.SZ', 'rt_last,rt_trade_status')
+            self.assertEqual(data['data'], [[10.5, '交易']])
+            self.remote.get_realtime_data('000001.SZ', 'rt_last,rt_trade_status')
+            self.assertEqual(mock_call.call_count, 2)
+
+    def test_restricted_calls(self):
+        """测试call只转发已知的Wind函数，未设置认证密钥时拒绝启动"""
+        for func_name in ('stop', '__class__', 'isconnected'):
+            with self.assertRaises(ValueError):
+                self.client.call('call', func_name, (), {})
+        self.assertEqual(self.client.call('call', 'tdays', ('2023-01-01', '2023-01-10'), {}).ErrorCode, 0)
+
+        self.assertEqual(fetcher_authkey({'FETCHER_AUTHKEY': 'key'}), b'key')
+        for config in ({}, {'FETCHER_AUTHKEY': None}, {'FETCHER_AUTHKEY': ''}):
+            with self.assertRaises(RuntimeError):
+                fetcher_authkey(config)
+
+    def test_remote_invalidate_adjfactor(self):
+        """测试工作进程删除复权因子缓存时由抓取进程执行，未复权行情缓存保持不变"""
+        self.remote.get_historical_frame('600000.SH', 'close', '2023-01-03', '2023-03-31', 'PriceAdj=F')
+        self.assertEqual(self.service.cache.gaps('600000.SH', 'adjfactor', '2023-01-03', '2023-03-31'), [])
+
+        self.remote.invalidate_adjfactor('600000.SH')
+        self.assertNotEqual(self.service.cache.gaps('600000.SH', 'adjfactor', '2023-01-03', '2023-03-31'), [])
+        self.assertEqual(self.service.cache.gaps('600000.SH', 'close', '2023-01-03', '2023-03-31'), [])
+
+    def test_remote_provider(self):
+        """测试默认数据源经抓取进程调用"""
+        result = RemoteProvider(self.client).tdays('2023-01-01', '2023-01-10', 'TradingCalendar=SSE')
+        self.assertEqual(result.ErrorCode, 0)
+        self.assertTrue(RemoteProvider(self.client).isconnected())
+
+    def test_quote_stream_from_shared_table(self):
+        """测试工作进程的推送中心读取抓取进程订阅写入的行情，断开后释放订阅"""
+        hub = self.remote.create_quote_hub('rt_last,rt_vol')
+        client = hub.connect(['000001.SZ'])
+        update = client.get(timeout=5)
+        self.assertEqual(update['code'], '000001.SZ')
+        self.assertIsNotNone(update['data']['RT_LAST'])
+        self.assertEqual(self.server.get_stats()['fetcher']['subscriptions'], 1)
+
+        hub.disconnect(client)
+        self.assertEqual(self.server.get_stats()['fetcher']['subscriptions'], 0)
+        self.assertEqual(self.server._hub.stats()['subscriptions'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from app import app
+from services.connection import WindUnavailableError
+
+MOCK_DATA = {
+    'dates': ['2023-01-03', '2023-01-04'],
+    'fields': ['OPEN', 'CLOSE'],
+    'data': [[10.0, 11.0], [11.0, 12.0]]
+}
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.app = app.test_client()
+        self.app.testing = True
+
+    @patch('services.wind_service.WindService.get_historical_data')
+    def test_closed_range_not_modified(self, mock_get_historical):
+        """测试已收盘区间的重复请求返回304，且不读取数据"""
+        mock_get_historical.return_value = MOCK_DATA
+        for path in ('/api/historical', '/market/historical'):
+            url = f'{path}?code=600000.SH&start_date=2023-01-01&end_date=2023-01-31'
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Cache-Control'], 'public, max-age=86400')
+            etag = response.headers['ETag']
+
+            calls = mock_get_historical.call_count
+            response = self.app.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.headers['ETag'], etag)
+            self.assertEqual(response.data, b'')
+            self.assertEqual(mock_get_historical.call_count, calls)
+
+            # 参数不同时ETag不同
+            response = self.app.get(url + '&fields=close', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+
+    @patch('services.wind_service.WindService.get_data_version')
+    @patch('services.wind_service.WindService.get_historical_data')
+    def test_forward_adjusted_version(self, mock_get_historical, mock_version):
+        """测试前复权的最新复权因子变化后ETag失效"""
+        mock_get_historical.return_value = MOCK_DATA
+        mock_version.return_value = '1.0'
+        url = '/api/historical?code=600000.SH&start_date=2023-01-01&end_date=2023-01-31&options=PriceAdj=F'
+        etag = self.app.get(url).headers['ETag']
+        self.assertEqual(self.app.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        mock_version.return_value = '1.1'
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    @patch('services.wind_service.WindService.get_historical_data')
+    def test_open_range_content_etag(self, mock_get_historical):
+        """测试含当天的区间按响应内容计算ETag，内容变化后返回新数据"""
+        mock_get_historical.return_value = MOCK_DATA
+        today = datetime.now().strftime('%Y-%m-%d')
+        url = f'/api/historical?code=600000.SH&start_date=2023-01-01&end_date={today}'
+        response = self.app.get(url)
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=5')
+        etag = response.headers['ETag']
+        self.assertEqual(self.app.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        mock_get_historical.return_value = dict(MOCK_DATA, data=[[10.0, 11.0], [11.0, 12.5]])
+        self.assertEqual(self.app.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_kline_not_modified(self):
+        """测试K线内容未变化时返回304"""
+        url = '/api/stock/kline?code=600000.SH&timeframe=D&limit=20'
+        response = self.app.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        response = self.app.get(url, headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_degraded_not_long_cached(self):
+        """测试Wind不可用时返回的部分缓存数据不使用按请求参数计算的ETag与长期缓存"""
+        base = '/api/historical?code=601318.SH&start_date=2023-01-01'
+        self.assertEqual(self.app.get(base + '&end_date=2023-01-31').status_code, 200)
+
+        url = base + '&end_date=2023-02-28'
+        with patch('services.wind_service.WindService._wsd', side_effect=WindUnavailableError('Wind连接未建立')):
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+            self.assertEqual(len(response.get_json()['data']['dates']), 22)
+            degraded_etag = response.headers['ETag']
+
+            response = self.app.get(url + '&stream=1')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+            self.assertNotIn('ETag', response.headers)
+
+        # Wind恢复后完整的响应使用请求ETag，客户端持有的部分数据不会被确认为有效
+        response = self.app.get(url, headers={'If-None-Match': degraded_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=86400')
+        self.assertEqual(len(response.get_json()['data']['dates']), 42)
+        self.assertNotEqual(response.headers['ETag'], degraded_etag)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+from datetime import datetime
+
+from app import app
+from extensions import get_indicator_store, wind_service
+from utils.indicators import compute_indicators
+from utils.incremental_indicators import IndicatorState, IndicatorStateStore
+
+class TestIncrementalIndicators(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        rng = np.random.default_rng(7)
+        self.prices = 10 + np.cumsum(rng.normal(0, 0.2, 200))
+        self.reference = compute_indicators(self.prices)
+
+    def assert_matches(self, values, t):
+        for name, expected in self.reference.items():
+            np.testing.assert_allclose(values[name], expected[t, 0], rtol=1e-8, atol=1e-8, err_msg=name)
+
+    def test_matches_batch_engine(self):
+        """测试逐个输入价格的结果与批量计算一致"""
+        state = IndicatorState()
+        for t, price in enumerate(self.prices):
+            values = state.update(price)
+        self.assert_matches(values, len(self.prices) - 1)
+
+    def test_intraday_ticks_replace_last_bar(self):
+        """测试同一K线内的多次报价只保留最后一次"""
+        state = IndicatorState()
+        for t, price in enumerate(self.prices[:-1]):
+            state.update(price, bar=t)
+        last = len(self.prices) - 1
+        for tick in (self.prices[last] + 1.0, self.prices[last] - 0.5, self.prices[last]):
+            values = state.update(tick, bar=last)
+        self.assert_matches(values, last)
+
+    def test_state_roundtrip(self):
+        """测试状态序列化后继续更新结果不变"""
+        state = IndicatorState()
+        for price in self.prices[:150]:
+            state.update(price)
+        restored = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+        for price in self.prices[150:]:
+            values = restored.update(price)
+        self.assert_matches(values, len(self.prices) - 1)
+
+    def test_store_persist_and_realtime_update(self):
+        """测试状态存储的持久化与实时数据更新"""
+        cache_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(cache_dir, 'indicator_state.json')
+            store = IndicatorStateStore(path)
+            store.seed('000001.SZ', self.prices[:-1], bars=range(len(self.prices) - 1))
+            store.save()
+
+            restored = IndicatorStateStore(path)
+            realtime = {'codes': ['000001.SZ'], 'fields': ['RT_LAST'], 'data': [[self.prices[-1]]]}
+            values = restored.update_from_realtime(realtime, bar=len(self.prices) - 1)
+            self.assert_matches(values['000001.SZ'], len(self.prices) - 1)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_store_saved_on_bar_roll(self):
+        """测试有证券进入新K线时写入文件，同一K线内的报价不写入"""
+        cache_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(cache_dir, 'indicator_state.json')
+            store = IndicatorStateStore(path)
+            store.seed('000001.SZ', self.prices[:-2], bars=range(len(self.prices) - 2))
+            realtime = {'codes': ['000001.SZ'], 'fields': ['RT_LAST'], 'data': [[self.prices[-2]]]}
+            store.update_from_realtime(realtime, bar=len(self.prices) - 2)
+            self.assertEqual(IndicatorStateStore(path).get('000001.SZ').bar, len(self.prices) - 2)
+
+            os.remove(path)
+            store.update_from_realtime(realtime, bar=len(self.prices) - 2)
+            self.assertFalse(os.path.exists(path))
+            store.update('000001.SZ', self.prices[-1], bar=len(self.prices) - 1)
+            self.assertEqual(IndicatorStateStore(path).get('000001.SZ').bar, len(self.prices) - 1)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_stale_state_reseeded(self):
+        """测试状态停留在前一交易日之前的证券用历史日线重新初始化"""
+        store = IndicatorStateStore()
+        store.update('000001.SZ', 10.0, bar='2024-01-02')
+        store.update('600000.SH', 10.0, bar='2024-01-04')
+        self.assertEqual(store.stale_codes(['000001.SZ', '600000.SH', '600519.SH'], ['2024-01-04', '2024-01-05']),
+                         ['000001.SZ', '600519.SH'])
+
+        with app.app_context():
+            indicator_store = get_indicator_store(app)
+        stale = IndicatorState()
+        stale.update(10.0, bar='2020-01-02')
+        indicator_store._states['600036.SH'] = stale
+        response = app.test_client().get('/api/indicators/realtime?codes=600036.SH')
+        self.assertEqual(response.status_code, 200)
+        state = indicator_store.get('600036.SH')
+        self.assertIsNot(state, stale)
+        with app.app_context():
+            last_day = wind_service.get_calendar().previous_trading_days(datetime.now().strftime('%Y-%m-%d'), 1)
+        self.assertEqual(state.bar, last_day[0])
+        self.assertFalse(np.isnan(state.values()['ma60']))
+
+    def test_non_trading_day_uses_last_bar(self):
+        """测试非交易日请求时最新价计入最近一个交易日的K线，不追加新K线"""
+        class Saturday(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls(2024, 1, 6, 10, 0)
+
+        with app.app_context():
+            indicator_store = get_indicator_store(app)
+        with patch('app.datetime', Saturday):
+            for _ in range(2):
+                response = app.test_client().get('/api/indicators/realtime?codes=600016.SH')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(indicator_store.get('600016.SH').bar, '2024-01-05')
+                self.assertEqual(indicator_store.stale_codes(['600016.SH'], ['2024-01-04', '2024-01-05']), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import json
+
+import numpy as np
+import pandas as pd
+
+from app import app
+from utils.indicators import compute_indicators, rolling_mean, rolling_std, ema
+
+class TestIndicators(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        rng = np.random.default_rng(42)
+        self.close = 10 + np.cumsum(rng.normal(0, 0.2, (300, 4)), axis=0)
+        # 第3只证券上市较晚，第4只中间停牌
+        self.close[:50, 2] = np.nan
+        self.close[120:125, 3] = np.nan
+
+    def _pandas_reference(self, series):
+        """与wind_utils.calculate_technical_indicators相同的pandas计算"""
+        df = pd.DataFrame({'close': series})
+        for period in [5, 10, 20, 60]:
+            df[f'ma{period}'] = df['close'].rolling(window=period).mean()
+        fast_ema = df['close'].ewm(span=12, adjust=False).mean()
+        slow_ema = df['close'].ewm(span=26, adjust=False).mean()
+        df['macd'] = fast_ema - slow_ema
+        df['signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+        df['macd_hist'] = df['macd'] - df['signal']
+        delta = df['close'].diff()
+        gain = delta.where(delta > 0, 0)
+        loss = -delta.where(delta < 0, 0)
+        rs = gain.rolling(window=14).mean() / loss.rolling(window=14).mean()
+        df['rsi'] = 100 - (100 / (1 + rs))
+        df['boll_mid'] = df['close'].rolling(window=20).mean()
+        df['boll_std'] = df['close'].rolling(window=20).std()
+        df['boll_upper'] = df['boll_mid'] + (df['boll_std'] * 2)
+        df['boll_lower'] = df['boll_mid'] - (df['boll_std'] * 2)
+        return df
+
+    def test_matches_pandas_without_gaps(self):
+        """测试无缺失值时与pandas逐只计算结果一致"""
+        result = compute_indicators(self.close[:, :2])
+        for j in range(2):
+            reference = self._pandas_reference(self.close[:, j])
+            for name, values in result.items():
+                np.testing.assert_allclose(values[:, j], reference[name].values, rtol=1e-9, atol=1e-9,
+                                           err_msg=name)
+
+    def test_rolling_with_missing_values(self):
+        """测试滚动指标的缺失值处理与pandas一致"""
+        frame = pd.DataFrame(self.close)
+        np.testing.assert_allclose(rolling_mean(self.close, 20), frame.rolling(20).mean().values, atol=1e-9)
+        np.testing.assert_allclose(rolling_std(self.close, 20), frame.rolling(20).std().values, atol=1e-9)
+
+    def test_ema_late_listing(self):
+        """测试上市前为NaN的证券从首个有效值开始递推"""
+        values = ema(self.close, 12)
+        reference = pd.Series(self.close[:, 2]).ewm(span=12, adjust=False).mean().values
+        np.testing.assert_allclose(values[:, 2], reference, atol=1e-9)
+
+    def test_ema_missing_values(self):
+        """测试中间停牌的缺失值处理与pandas ewm(adjust=False)一致"""
+        close = self.close.copy()
+        close[200, 0] = np.nan
+        close[250:260, 1] = np.nan
+        for span in (9, 12, 26):
+            reference = pd.DataFrame(close).ewm(span=span, adjust=False).mean().values
+            np.testing.assert_allclose(ema(close, span), reference, rtol=1e-12, atol=1e-12)
+
+    def test_matches_pandas_with_gaps(self):
+        """测试上市较晚与中间停牌的证券，均线、MACD与布林带与pandas逐只计算结果一致"""
+        result = compute_indicators(self.close)
+        for j in (2, 3):
+            reference = self._pandas_reference(self.close[:, j])
+            for name in ('ma5', 'ma60', 'macd', 'signal', 'macd_hist', 'boll_std', 'boll_upper'):
+                np.testing.assert_allclose(result[name][:, j], reference[name].values, rtol=1e-9, atol=1e-9,
+                                           err_msg=name)
+
+    def test_short_history(self):
+        """测试数据长度小于窗口时返回NaN"""
+        result = compute_indicators(self.close[:10])
+        self.assertTrue(np.isnan(result['ma20']).all())
+        self.assertEqual(result['macd'].shape, (10, 4))
+
+class TestIndicatorsAPI(unittest.TestCase):
+    def test_warmup_values_are_null(self):
+        """测试预热期的指标值输出为null，响应为严格合法的JSON"""
+        response = app.test_client().get('/api/indicators?codes=600000.SH,000001.SZ'
+                                         '&start_date=2023-01-01&end_date=2023-03-31')
+        self.assertEqual(response.status_code, 200)
+
+        def reject(constant):
+            raise ValueError(f'非法的JSON常量: {constant}')
+
+        data = json.loads(response.get_data(as_text=True), parse_constant=reject)['data']
+        ma20 = data['indicators']['ma20'][0]
+        self.assertEqual(ma20[:19], [None] * 19)
+        self.assertTrue(all(isinstance(v, float) for v in ma20[19:]))
+
+if __name__ == '__main__':
+    unittest.main()
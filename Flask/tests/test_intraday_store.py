@@ -0,0 +1,112 @@
+import unittest
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app import app
+from services.data_provider import ReplayProvider
+from services.intraday_store import IntradayStore, INTRADAY_FIELDS
+
+class TestIntradayStore(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.provider = ReplayProvider()
+        self.now = [datetime(2023, 12, 29, 10, 30)]
+        self.requests = []
+        self.partial = False
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def create_store(self):
+        return IntradayStore(self.tmp_dir, clock=lambda: self.now[0])
+
+    def fetch(self, begin_time, end_time):
+        self.requests.append((begin_time, end_time))
+        df = self.provider.wsi('600000.SH', ','.join(INTRADAY_FIELDS), begin_time, end_time, 'BarSize=1',
+                               usedf=True)[1]
+        if self.partial:
+            # 模拟最后一根尚未走完
+            df = df.copy()
+            df.iloc[-1] = df.iloc[-1] * 0.5
+        return df
+
+    def expected(self, start_date, end_date):
+        return self.provider.wsd('600000.SH', ','.join(INTRADAY_FIELDS), start_date, end_date, 'Period=1',
+                                 usedf=True)[1]
+
+    def test_closed_days_immutable(self):
+        """测试已收盘的交易日只请求一次，重新加载后以内存映射读取"""
+        days = pd.bdate_range('2023-12-18', '2023-12-22').strftime('%Y-%m-%d').tolist()
+        store = self.create_store()
+        times, values = store.get_days('600000.SH', days, '', self.fetch)
+        self.assertEqual(len(self.requests), 1)
+        expected = self.expected(days[0], days[-1])
+        self.assertTrue(np.array_equal(times, expected.index.values.astype('datetime64[ns]').view(np.int64)))
+        self.assertTrue(np.allclose(values, expected.values))
+
+        store.get_days('600000.SH', days[1:3], '', self.fetch)
+        reloaded = self.create_store()
+        times, values = reloaded.get_days('600000.SH', days[2:], '', self.fetch)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(len(times), 240 * 3)
+        self.assertEqual(reloaded.stats()['hits'], 3)
+
+        # 中间有已保存的交易日时，两侧的缺失区间分别请求
+        store.get_days('600000.SH', ['2023-12-15'] + days + ['2023-12-25'], '', self.fetch)
+        self.assertEqual(self.requests[1:], [('2023-12-15 09:00:00', '2023-12-15 15:30:00'),
+                                             ('2023-12-25 09:00:00', '2023-12-25 15:30:00')])
+
+    def test_today_refreshed_incrementally(self):
+        """测试当天的分区从最后一根开始补取并替换未走完的最后一根，收盘后的次日整天保存"""
+        store = self.create_store()
+        self.partial = True
+        times, _ = store.get_days('600000.SH', ['2023-12-28', '2023-12-29'], '', self.fetch)
+        self.assertEqual(len(times), 240 + 60)
+
+        self.partial = False
+        self.now[0] = datetime(2023, 12, 29, 11, 0)
+        times, values = store.get_days('600000.SH', ['2023-12-29'], '', self.fetch)
+        self.assertEqual(self.requests[-1], ('2023-12-29 10:30:00', '2023-12-29 11:00:00'))
+        self.assertEqual(len(times), 90)
+        self.assertTrue(np.allclose(values, self.expected('2023-12-29', '2023-12-29').values[:90]))
+
+        self.now[0] = datetime(2024, 1, 2, 9, 0)
+        times, _ = store.get_days('600000.SH', ['2023-12-29'], '', self.fetch)
+        self.assertEqual((len(times), self.requests[-1][0]), (240, '2023-12-29 09:00:00'))
+
+    def test_today_after_close(self):
+        """测试收盘后当天只补取一次，截止时间为收盘"""
+        self.now[0] = datetime(2023, 12, 29, 16, 0)
+        store = self.create_store()
+        for _ in range(3):
+            times, _ = store.get_days('600000.SH', ['2023-12-29'], '', self.fetch)
+        self.assertEqual(self.requests, [('2023-12-29 09:00:00', '2023-12-29 15:00:00')])
+        self.assertEqual(len(times), 240)
+
+    def test_tail_reads_recent_days(self):
+        """测试最近N根K线只读取所需的最近几个交易日"""
+        self.now[0] = datetime(2023, 12, 29, 16, 0)
+        calendar = pd.bdate_range('2023-01-02', '2023-12-29').strftime('%Y-%m-%d').tolist()
+        store = self.create_store()
+        times, _ = store.tail('600000.SH', 500, '', lambda n: calendar[-n:], self.fetch)
+        self.assertEqual(len(times), 240 * 3)
+        self.assertEqual(store.stats()['misses'], 2)
+        self.assertEqual(pd.Timestamp(int(times[-1])), pd.Timestamp('2023-12-29 15:00'))
+
+class TestIntradayAPI(unittest.TestCase):
+    def test_minute_kline(self):
+        """测试分钟K线返回最近limit根，通过w.wsi获取"""
+        client = app.test_client()
+        response = client.get('/api/stock/kline?code=600000.SH&timeframe=5&limit=30')
+        data = response.get_json()['data']
+        self.assertEqual(len(data['dates']), 30)
+        self.assertEqual(data['fields'], ['OPEN', 'HIGH', 'LOW', 'CLOSE', 'VOLUME'])
+        self.assertRegex(data['dates'][-1], r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:00$')
+
+if __name__ == '__main__':
+    unittest.main()
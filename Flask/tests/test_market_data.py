@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from models.market_data import MarketData
+
+class TestMarketData(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.raw = {
+            'dates': ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05'],
+            'fields': ['open', 'close'],
+            'data': [[10.0, 10.5], [10.5, 10.2], [10.2, None], [10.1, 10.8]],
+        }
+        self.market_data = MarketData(self.raw)
+
+    def test_compact_layout(self):
+        """测试日期为int64数组、数值为一个float64二维数组"""
+        self.assertEqual(self.market_data.dates.dtype, np.int64)
+        self.assertEqual((self.market_data.values.dtype, self.market_data.values.shape), (np.float64, (4, 2)))
+        self.assertFalse(hasattr(self.market_data, '__dict__'))
+        self.assertEqual(self.market_data.to_dict()['dates'], self.raw['dates'])
+        self.assertTrue(np.isnan(self.market_data.df.loc['2024-01-04', 'close']))
+        self.assertIsNone(MarketData().df)
+        self.assertEqual(MarketData().to_json(), {})
+
+    def test_filter_returns_view(self):
+        """测试按日期过滤为切片视图，结果与原实现一致"""
+        filtered = self.market_data.filter_by_date_range('2024-01-03', '2024-01-04')
+        self.assertTrue(np.shares_memory(filtered.values, self.market_data.values))
+        self.assertEqual(filtered.to_dict()['dates'], ['2024-01-03', '2024-01-04'])
+        self.assertEqual(filtered.to_json()[0], {'date': '2024-01-03', 'open': 10.5, 'close': 10.2})
+        self.assertEqual(len(self.market_data.filter_by_date_range(start_date='2024-01-04')), 2)
+        self.assertEqual(len(self.market_data.filter_by_date_range('2024-02-01', '2024-01-01')), 0)
+
+        returns = self.market_data.calculate_returns('close')
+        self.assertAlmostEqual(returns.iloc[1], 10.2 / 10.5 - 1)
+
+    def test_unsorted_input(self):
+        """测试日期无序的输入在创建时排序"""
+        market_data = MarketData.from_arrays(np.array(['2024-01-03', '2024-01-02'], dtype='datetime64[ns]'),
+                                             ['close'], [[2.0], [1.0]])
+        self.assertEqual(market_data.values[:, 0].tolist(), [1.0, 2.0])
+        combined = MarketData.combine_data([market_data, MarketData.from_frame(self.market_data.df[['open']])])
+        self.assertEqual(combined.columns.tolist(), ['close', 'open'])
+
+if __name__ == '__main__':
+    unittest.main()
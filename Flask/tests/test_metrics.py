@@ -0,0 +1,93 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from app import app
+from services import metrics
+from services.metrics import Histogram, MetricsRegistry, size_label
+
+class TestHistogram(unittest.TestCase):
+    def test_render(self):
+        """测试直方图按标签输出累积分桶、总和与次数"""
+        histogram = Histogram('test_seconds', '测试', ('function',), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value, function='wsd')
+        histogram.observe(0.2, function='wss')
+        lines = histogram.render()
+        self.assertIn('# TYPE test_seconds histogram', lines)
+        self.assertIn('test_seconds_bucket{function="wsd",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{function="wsd",le="1"} 3', lines)
+        self.assertIn('test_seconds_bucket{function="wsd",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_sum{function="wsd"} 2.65', lines)
+        self.assertIn('test_seconds_count{function="wss"} 1', lines)
+        self.assertEqual(histogram.samples(function='wsd'), (4, 2.65))
+
+    def test_size_label(self):
+        """测试结果规模按10的幂分档"""
+        self.assertEqual([size_label(n) for n in (None, 0, 1, 10, 11, 1234)],
+                         ['none', '0', '1e0', '1e1', '1e2', '1e4'])
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.app = app.test_client()
+
+    def test_request_spans(self):
+        """测试请求记录Wind调用、转换、序列化与总耗时，并在/metrics输出"""
+        wind = metrics.SPAN_HISTOGRAMS['wind']
+        calls = sum(wind.samples(endpoint='/api/historical', function='wsd', size=size)[0]
+                    for size in ('1e2', '1e3', '1e4'))
+        response = self.app.get('/api/historical?code=600519.SH&start_date=2019-01-01&end_date=2019-03-31')
+        self.assertEqual(response.status_code, 200)
+        timing = response.headers['Server-Timing']
+        for name in ('wind', 'convert', 'serialize', 'total'):
+            self.assertIn(f'{name};dur=', timing)
+        self.assertGreater(sum(wind.samples(endpoint='/api/historical', function='wsd', size=size)[0]
+                               for size in ('1e2', '1e3', '1e4')), calls)
+
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        body = response.get_data(as_text=True)
+        self.assertIn('wind_upstream_duration_seconds_bucket{endpoint="/api/historical",function="wsd"', body)
+        self.assertIn('wind_serialize_duration_seconds_count{endpoint="/api/historical",format="json"}', body)
+        self.assertIn('http_request_duration_seconds_count{endpoint="/api/historical",method="GET",status="200"', body)
+        self.assertIn('wind_stats_up 1', body)
+        self.assertIn('wind_queue_depth ', body)
+        self.assertIn('wind_connection_state{state="connected"}', body)
+        self.assertIn('wind_cache_hit_ratio{cache="historical"}', body)
+
+class TestMultiprocessMetrics(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_merge_process_files(self):
+        """测试/metrics合并其他工作进程写入的直方图与本进程的当前值"""
+        other = MetricsRegistry()
+        histogram = other.histogram(metrics.REQUEST_HISTOGRAM.name, metrics.REQUEST_HISTOGRAM.documentation,
+                                    metrics.REQUEST_HISTOGRAM.labelnames)
+        for value in (0.01, 0.2):
+            histogram.observe(value, endpoint='/merged', method='GET', status=200, size='1e2')
+        histogram.observe(0.5, endpoint='/other', method='GET', status=200, size='1e2')
+        other.write(os.path.join(self.tmp_dir, 'metrics-1.json'))
+        metrics.REQUEST_HISTOGRAM.observe(0.3, endpoint='/merged', method='GET', status=200, size='1e2')
+
+        with patch.dict(metrics._multiprocess, directory=self.tmp_dir):
+            metrics.write_process_metrics(force=True)
+            self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, f'metrics-{os.getpid()}.json')))
+            body = metrics.render()
+        labels = 'method="GET",status="200",size="1e2"'
+        self.assertIn(f'http_request_duration_seconds_count{{endpoint="/merged",{labels}}} 3', body)
+        self.assertIn(f'http_request_duration_seconds_count{{endpoint="/other",{labels}}} 1', body)
+        self.assertIn(f'http_request_duration_seconds_bucket{{endpoint="/merged",{labels},le="0.25"}} 2', body)
+        # 本进程的文件以内存中的当前值代替，不重复计入
+        self.assertEqual(body.count('endpoint="/merged",method="GET",status="200",size="1e2"} 3'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import shutil
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from services.cache import to_day
+from services.data_provider import ReplayProvider, REPLAY_INDUSTRIES, _industry_change_date, _seed
+from services.pit_store import PointInTimeStore
+
+class TestPointInTimeStore(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.provider = ReplayProvider()
+        self.now = [datetime(2024, 1, 10)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def create_store(self):
+        return PointInTimeStore(self.tmp_dir, history_start='2010-01-01', clock=lambda: self.now[0])
+
+    def fetch_members(self, index_code, date):
+        return self.provider.wset('indexconstituent', f'date={date};windcode={index_code}').Data[1]
+
+    def fetch_changes(self, index_code, start_date, end_date):
+        result = self.provider.wset('indexhistory', f'startdate={start_date};enddate={end_date};windcode={index_code}')
+        return [(to_day(d), code, status == '纳入') for d, code, status in zip(result.Data[0], result.Data[1],
+                                                                             result.Data[3])]
+
+    def fetch_labels(self, codes, date):
+        return self.provider.wss(codes, 'industry_sw', f'industryType=1;tradeDate={date}').Data[0]
+
+    def test_constituents_on_many_dates(self):
+        """测试任意日期的成分与Wind一致，逐日查询只在首次加载时访问Wind"""
+        store = self.create_store()
+        dates = pd.bdate_range('2010-01-04', '2024-01-10')[::10].strftime('%Y-%m-%d')
+        members = {date: store.constituents('000300.SH', date, self.fetch_members, self.fetch_changes)
+                   for date in dates}
+        self.assertEqual(store.stats()['upstream_calls'], 2)
+        for date in ('2010-01-04', '2015-06-15', '2015-06-12', '2023-12-15', '2024-01-10'):
+            expected = sorted(self.fetch_members('000300.SH', date))
+            self.assertEqual(store.constituents('000300.SH', date, self.fetch_members, self.fetch_changes), expected)
+        self.assertEqual(len(members[dates[0]]), 300)
+
+        # 日期推移后只增量获取之后的调整记录，重新加载后从磁盘读取
+        self.now[0] = datetime(2024, 7, 1)
+        store.constituents('000300.SH', '2024-06-28', self.fetch_members, self.fetch_changes)
+        self.assertEqual(store.stats()['upstream_calls'], 3)
+        reloaded = self.create_store()
+        self.assertEqual(reloaded.constituents('000300.SH', '2024-06-28', self.fetch_members, self.fetch_changes),
+                         sorted(self.fetch_members('000300.SH', '2024-06-28')))
+        self.assertEqual(reloaded.stats()['upstream_calls'], 0)
+
+    def test_constituents_without_history(self):
+        """测试不支持调整记录时按日期缓存成分快照"""
+        def unsupported(*args):
+            raise Exception("不支持")
+        store = self.create_store()
+        for _ in range(3):
+            store.constituents('000016.SH', '2023-06-30', self.fetch_members, unsupported)
+        store.constituents('000016.SH', '2023-07-03', self.fetch_members, unsupported)
+        self.assertEqual(store.stats()['upstream_calls'], 4)
+
+    def test_industry_change_located(self):
+        """测试行业调整的证券逐日查询的上游调用次数为对数级别，结果与Wind一致"""
+        codes = [f'{600000 + i:06d}.SH' for i in range(200)]
+        changed = next(code for code in codes if _seed(code, 'industry') % 10 == 0
+                       and pd.Timestamp('2012-01-01') < _industry_change_date(code) < pd.Timestamp('2023-01-01'))
+        store = self.create_store()
+        dates = pd.bdate_range('2012-01-01', '2023-12-29').strftime('%Y-%m-%d')
+        labels = [store.industry([changed, '000001.SZ'], date, 'sw', self.fetch_labels) for date in dates]
+        self.assertLess(store.stats()['upstream_calls'], 20)
+
+        for date in (dates[0], dates[-1], _industry_change_date(changed).strftime('%Y-%m-%d')):
+            expected = self.fetch_labels([changed, '000001.SZ'], date)
+            self.assertEqual(store.industry([changed, '000001.SZ'], date, 'sw', self.fetch_labels), expected)
+        self.assertEqual(len({label[0] for label in labels}), 2)
+        self.assertTrue(set(label[0] for label in labels) <= set(REPLAY_INDUSTRIES))
+
+        calls = store.stats()['upstream_calls']
+        reloaded = self.create_store()
+        self.assertEqual(reloaded.industry([changed], dates[100], 'sw', self.fetch_labels), [labels[100][0]])
+        self.assertEqual(store.stats()['upstream_calls'], calls)
+        self.assertEqual(reloaded.stats()['upstream_calls'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from services.data_provider import ProviderResult, ReplayProvider, get_default_provider, set_default_provider
+from services.prewarm import Prewarmer, PrewarmScheduler, JOB_DONE, JOB_FAILED, JOB_SKIPPED
+from services.snapshot_store import SnapshotStore, get_default_snapshot_store, set_default_snapshot_store
+from services.wind_service import WindService
+from utils import wind_utils
+
+class FlakyWssProvider(ReplayProvider):
+    """可模拟wss出错的数据源"""
+
+    def __init__(self):
+        super().__init__()
+        self.wss_error = None
+
+    def wss(self, *args, **kwargs):
+        if self.wss_error is not None:
+            return ProviderResult(self.wss_error)
+        return super().wss(*args, **kwargs)
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def loader(self, codes, fields):
+        self.calls.append((codes, fields))
+        return ReplayProvider().wss(codes, fields, 'tradeDate=2023-12-29', usedf=True)[1]
+
+    def test_fetch_only_missing(self):
+        """测试只补取缺失的(证券, 字段)，重新加载后从磁盘读取"""
+        store = SnapshotStore(self.tmp_dir)
+        df = store.get_frame(['000001.SZ', '600000.SH'], ['pe_ttm', 'industry_sw'], '2023-12-29', '', self.loader)
+        self.assertEqual(df.columns.tolist(), ['PE_TTM', 'INDUSTRY_SW'])
+        self.assertIsInstance(df.loc['000001.SZ', 'INDUSTRY_SW'], str)
+
+        again = store.get_frame(['600000.SH', '000002.SZ'], ['pe_ttm'], '2023-12-29', '', self.loader)
+        self.assertEqual(self.calls[-1], (['000002.SZ'], ['PE_TTM']))
+        self.assertEqual(again.loc['600000.SH', 'PE_TTM'], df.loc['600000.SH', 'PE_TTM'])
+
+        reloaded = SnapshotStore(self.tmp_dir).get_frame(['000001.SZ', '600000.SH'], ['pe_ttm', 'industry_sw'],
+                                                         '2023-12-29', '', self.loader)
+        self.assertTrue(reloaded.equals(df))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_live_day_not_persisted(self):
+        """测试当天收盘前的截面数据只在内存中短期缓存，收盘后重新获取并写入磁盘"""
+        now = [datetime(2023, 12, 29, 10, 0)]
+        store = SnapshotStore(self.tmp_dir, live_ttl=60, clock=lambda: now[0])
+        codes, fields = ['000001.SZ', '600000.SH'], ['pe_ttm']
+        store.get_frame(codes, fields, '2023-12-29', '', self.loader)
+        store.get_frame(codes, fields, '2023-12-29', '', self.loader)
+        self.assertEqual(len(self.calls), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, '2023-12-29')))
+
+        now[0] = datetime(2023, 12, 29, 10, 2)
+        store.get_frame(codes, fields, '2023-12-29', '', self.loader)
+        self.assertEqual(len(self.calls), 2)
+
+        # 收盘后重新获取一次，之后从磁盘读取
+        now[0] = datetime(2023, 12, 29, 15, 30)
+        store.get_frame(codes, fields, '2023-12-29', '', self.loader)
+        store.get_frame(codes, fields, '2023-12-29', '', self.loader)
+        self.assertEqual(len(self.calls), 3)
+        SnapshotStore(self.tmp_dir, clock=lambda: now[0]).get_frame(codes, fields, '2023-12-29', '', self.loader)
+        self.assertEqual(len(self.calls), 3)
+
+class TestPrewarm(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置：wind_utils使用本测试的数据源与截面缓存"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.provider = FlakyWssProvider()
+        self.previous = get_default_provider(), get_default_snapshot_store()
+        set_default_provider(self.provider)
+        set_default_snapshot_store(SnapshotStore(os.path.join(self.tmp_dir, 'snapshot')))
+        self.service = WindService(cache_dir=os.path.join(self.tmp_dir, 'cache'), provider=self.provider)
+        self.checkpoint = os.path.join(self.tmp_dir, 'prewarm_checkpoint.json')
+
+    def tearDown(self):
+        set_default_provider(self.previous[0])
+        set_default_snapshot_store(self.previous[1])
+        self.service.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def create_prewarmer(self):
+        return Prewarmer(self.service, indexes='000016.SH,000300.SH', fields='close', history_days=30,
+                         concurrency=2, batch_size=100, checkpoint_path=self.checkpoint)
+
+    def test_run_warms_cache(self):
+        """测试预热后相同请求命中缓存，报告包含各任务耗时"""
+        report = self.create_prewarmer().run('2024-01-02')
+        self.assertTrue(report['finished'])
+        self.assertEqual({entry['status'] for entry in report['jobs']}, {JOB_DONE})
+        # 上证50 1组、沪深300 3组，每组日线、基本面、行业分类各一个任务
+        self.assertEqual(report['summary']['bars']['jobs'], 4)
+        self.assertEqual(report['summary']['fundamentals']['jobs'], 4)
+        self.assertEqual(report['summary']['constituents']['jobs'], 2)
+        self.assertTrue(all(entry['seconds'] >= 0 for entry in report['jobs']))
+
+        code = wind_utils.get_index_constituents('000300.SH', '2024-01-02')[0]
+        wsd_calls, wss_calls = self.provider.calls['wsd'], self.provider.calls['wss']
+        self.service.get_historical_frame(code, 'close', '2023-12-03', '2024-01-01')
+        wind_utils.get_fundamental_data([code], 'pe_ttm,pb', '2024-01-02')
+        self.assertFalse(wind_utils.get_industry_classification(code).empty)
+        self.assertEqual((self.provider.calls['wsd'], self.provider.calls['wss']), (wsd_calls, wss_calls))
+
+    def test_resume_after_failure(self):
+        """测试部分任务失败后再次执行只重做未完成的任务"""
+        self.provider.wss_error = -40522017
+        report = self.create_prewarmer().run('2024-01-02')
+        self.assertFalse(report['finished'])
+        self.assertEqual(len(report['failed']), 8)
+        wsd_calls = self.provider.calls['wsd']
+
+        self.provider.wss_error = None
+        prewarmer = self.create_prewarmer()
+        self.assertFalse(prewarmer.is_finished('2024-01-02'))
+        report = prewarmer.run('2024-01-02')
+        self.assertTrue(report['finished'])
+        statuses = {entry['job']: entry['status'] for entry in report['jobs']}
+        self.assertEqual(statuses['bars:000300.SH:0'], JOB_SKIPPED)
+        self.assertEqual(statuses['constituents:000016.SH'], JOB_SKIPPED)
+        self.assertEqual(statuses['industry:000300.SH:2'], JOB_DONE)
+        self.assertEqual(self.provider.calls['wsd'], wsd_calls)
+        self.assertNotIn('bars', report['summary'])
+
+        # 新的一天重新预热
+        self.assertFalse(prewarmer.is_finished('2024-01-03'))
+
+    def test_wind_utils_use_service(self):
+        """测试wind_utils经WindService调用Wind：计入请求合并统计，熔断时不访问数据源"""
+        upstream = self.service.get_stats()['singleflight']['upstream_calls']
+        df = wind_utils.get_fundamental_data(['000001.SZ'], 'pe_ttm', '2024-01-03', service=self.service)
+        self.assertFalse(df.empty)
+        self.assertEqual(self.service.get_stats()['singleflight']['upstream_calls'], upstream + 1)
+
+        for _ in range(self.service.supervisor.breaker.failure_threshold):
+            self.service.supervisor.breaker.record_failure()
+        wss_calls = self.provider.calls['wss']
+        self.assertTrue(wind_utils.get_fundamental_data(['000002.SZ'], 'pe_ttm', '2024-01-03',
+                                                        service=self.service).empty)
+        self.assertEqual(self.provider.calls['wss'], wss_calls)
+
+    def test_scheduler(self):
+        """测试交易日到达预热时间且当天未完成时执行，失败后间隔一段时间重试"""
+        now = [datetime(2024, 1, 2, 8, 0)]
+        prewarmer = self.create_prewarmer()
+        scheduler = PrewarmScheduler(prewarmer, '08:30', retry_interval=300, clock=lambda: now[0])
+        self.assertEqual(scheduler.next_run(), datetime(2024, 1, 2, 8, 30))
+        self.assertIsNone(scheduler.run_pending())
+
+        self.provider.wss_error = -40522017
+        now[0] = datetime(2024, 1, 2, 8, 31)
+        self.assertFalse(scheduler.run_pending()['finished'])
+        self.provider.wss_error = None
+        now[0] = datetime(2024, 1, 2, 8, 33)
+        self.assertIsNone(scheduler.run_pending())
+        now[0] = datetime(2024, 1, 2, 8, 37)
+        self.assertTrue(scheduler.run_pending()['finished'])
+        now[0] = datetime(2024, 1, 2, 9, 0)
+        self.assertIsNone(scheduler.run_pending())
+        self.assertEqual(scheduler.next_run(), datetime(2024, 1, 3, 8, 30))
+
+        # 周六不预热
+        now[0] = datetime(2024, 1, 6, 9, 0)
+        self.assertFalse(scheduler.due())
+        stats = scheduler.stats()
+        self.assertEqual(stats['runs'], 2)
+        self.assertTrue(stats['last_run']['finished'])
+
+if __name__ == '__main__':
+    unittest.main()
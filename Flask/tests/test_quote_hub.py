@@ -0,0 +1,107 @@
+import unittest
+import json
+import threading
+import itertools
+from datetime import datetime
+from types import SimpleNamespace
+
+from services.quote_hub import QuoteHub, iter_sse
+
+class FakeWind:
+    """模拟WindPy回调模式的wsq：每个订阅由tick()推送行情"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count(1)
+        self.subscriptions = {}
+        self.wsq_calls = 0
+        self.cancelled = []
+        self.prices = {}
+
+    def wsq(self, codes, fields, func=None):
+        with self.lock:
+            self.wsq_calls += 1
+            request_id = next(self.request_ids)
+            self.subscriptions[request_id] = (codes.split(','), fields.upper().split(','), func)
+        return SimpleNamespace(ErrorCode=0, RequestID=request_id)
+
+    def cancelRequest(self, request_id):
+        with self.lock:
+            del self.subscriptions[request_id]
+            self.cancelled.append(request_id)
+
+    def tick(self):
+        """为每个订阅推送一条只包含最新价的行情"""
+        with self.lock:
+            subscriptions = list(self.subscriptions.values())
+        for codes, fields, func in subscriptions:
+            for code in codes:
+                self.prices[code] = self.prices.get(code, 10.0) + 0.01
+            func(SimpleNamespace(ErrorCode=0, Codes=codes, Fields=['RT_LAST'], Times=[datetime.now()],
+                                 Data=[[self.prices[code] for code in codes]]))
+
+class TestQuoteHub(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.wind = FakeWind()
+        self.hub = QuoteHub(self.wind, 'rt_last,rt_vol', client_queue_size=4)
+
+    def test_one_upstream_subscription_per_symbol(self):
+        """测试上游订阅数只与不同证券数量有关"""
+        clients = [self.hub.connect(['000001.SZ', '600000.SH']) for _ in range(20)]
+        self.wind.tick()
+
+        self.assertEqual(self.wind.wsq_calls, 2)
+        for client in clients:
+            codes = {client.get(timeout=1)['code'], client.get(timeout=1)['code']}
+            self.assertEqual(codes, {'000001.SZ', '600000.SH'})
+
+    def test_unused_symbols_are_cancelled(self):
+        """测试最后一个客户端断开后取消订阅"""
+        first = self.hub.connect(['000001.SZ'])
+        second = self.hub.connect(['000001.SZ', '600000.SH'])
+        self.hub.disconnect(second)
+        self.assertEqual(len(self.wind.cancelled), 1)
+        self.assertEqual(self.hub.stats()['subscriptions'], 1)
+
+        self.hub.disconnect(first)
+        self.hub.disconnect(first)
+        self.assertEqual(self.wind.subscriptions, {})
+        self.assertEqual(self.hub.stats()['upstream_cancels'], 2)
+
+    def test_partial_updates_merge_and_late_clients_get_snapshot(self):
+        """测试增量推送合并为完整快照，后加入的客户端先收到最新行情"""
+        self.hub.connect(['000001.SZ'])
+        self.wind.tick()
+        self.wind.tick()
+
+        late = self.hub.connect(['000001.SZ'])
+        update = late.get(timeout=1)
+        self.assertEqual(self.wind.wsq_calls, 1)
+        self.assertAlmostEqual(update['data']['RT_LAST'], 10.02)
+
+    def test_slow_client_drops_oldest(self):
+        """测试慢客户端队列已满时丢弃最旧的更新"""
+        client = self.hub.connect(['000001.SZ'])
+        for _ in range(6):
+            self.wind.tick()
+
+        self.assertEqual(client.dropped, 2)
+        self.assertAlmostEqual(client.get(timeout=1)['data']['RT_LAST'], 10.03)
+
+    def test_sse_stream_releases_subscription(self):
+        """测试SSE输出格式，生成器关闭时释放订阅"""
+        client = self.hub.connect(['000001.SZ'])
+        events = iter_sse(self.hub, client, heartbeat=0.01)
+        self.assertEqual(next(events), ': keep-alive\n\n')
+
+        self.wind.tick()
+        event = next(events)
+        self.assertTrue(event.startswith('event: quote\ndata: '))
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['code'], '000001.SZ')
+
+        events.close()
+        self.assertEqual(self.wind.subscriptions, {})
+
+if __name__ == '__main__':
+    unittest.main()
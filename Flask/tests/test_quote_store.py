@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+from services.quote_store import QuoteStore, EPOCH_SHIFT
+
+class TestQuoteStore(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.store = QuoteStore(capacity=2, field_capacity=1)
+        self.codes = ['000001.SZ', '600000.SH', '600519.SH']
+        self.store.update(self.codes, ['rt_last', 'rt_vol'], [[10.0, 100], [8.0, 200], [1700.0, np.nan]])
+
+    def test_full_snapshot_and_growth(self):
+        """测试首次读取返回全部行情，超出预分配容量时自动扩容"""
+        data = self.store.snapshot(self.codes, ['rt_last', 'rt_vol'])
+
+        self.assertEqual(data['version'], (self.store.epoch << EPOCH_SHIFT) | 1)
+        self.assertEqual(data['codes'], self.codes)
+        self.assertEqual(data['fields'], ['RT_LAST', 'RT_VOL'])
+        self.assertEqual(data['data'][1], [8.0, 200.0])
+        self.assertIsNone(data['data'][2][1])
+
+    def test_since_returns_changed_rows_only(self):
+        """测试按版本号只返回变化的证券，NaN不视为变化"""
+        since = self.store.snapshot(self.codes, ['rt_last'])['version']
+        self.store.update(self.codes, ['RT_LAST', 'RT_VOL'], [[10.0, 100], [8.1, 250], [1700.0, np.nan]])
+        data = self.store.snapshot(self.codes, ['rt_last', 'rt_vol'], since=since)
+
+        self.assertEqual(data['version'], since + 1)
+        self.assertEqual(data['codes'], ['600000.SH'])
+        self.assertEqual(data['data'], [[8.1, 250.0]])
+
+        # 没有变化时版本号不变，返回空结果
+        self.assertEqual(self.store.update(['000001.SZ'], ['RT_LAST'], [[10.0]]), 0)
+        self.assertEqual(self.store.snapshot(self.codes, ['rt_last'], since=data['version'])['codes'], [])
+
+    def test_unknown_version_returns_full_snapshot(self):
+        """测试客户端版本号大于当前版本(服务重启)时返回全部行情"""
+        version = self.store.snapshot(self.codes, ['rt_last'])['version']
+        data = self.store.snapshot(self.codes + ['000002.SZ'], ['rt_last', 'rt_amt'], since=version + 98)
+
+        self.assertEqual(data['codes'], self.codes)
+        self.assertEqual(data['fields'], ['RT_LAST'])
+
+    def test_other_epoch_returns_full_snapshot(self):
+        """测试重启后的行情表序号追上客户端版本号时，纪元不同仍返回全部行情"""
+        since = self.store.snapshot(self.codes, ['rt_last'])['version']
+        restarted = QuoteStore()
+        for price in (10.0, 10.1):
+            restarted.update(self.codes, ['rt_last'], [[price], [8.0], [1700.0]])
+        data = restarted.snapshot(self.codes, ['rt_last'], since=since)
+        self.assertEqual(data['codes'], self.codes)
+        self.assertNotEqual(data['version'] >> EPOCH_SHIFT, since >> EPOCH_SHIFT)
+
+    def test_text_fields(self):
+        """测试文本字段原样保存，文本变化时证券获得新版本号，缺失值为None"""
+        self.store.update(self.codes[:2], ['rt_last', 'rt_trade_status'], [[10.2, '交易'], [8.0, None]])
+        data = self.store.snapshot(self.codes[:2], ['rt_trade_status', 'rt_last'])
+        self.assertEqual(data['fields'], ['RT_TRADE_STATUS', 'RT_LAST'])
+        self.assertEqual(data['data'], [['交易', 10.2], [None, 8.0]])
+
+        self.store.update(self.codes[:2], ['rt_last', 'rt_trade_status'], [[10.2, '停牌'], [8.0, None]])
+        data = self.store.snapshot(self.codes[:2], ['rt_last', 'rt_trade_status'], since=data['version'])
+        self.assertEqual((data['codes'], data['data']), (['000001.SZ'], [[10.2, '停牌']]))
+        self.assertEqual(self.store.snapshot(self.codes[2:], ['rt_vol'])['data'], [[None]])
+
+if __name__ == '__main__':
+    unittest.main()
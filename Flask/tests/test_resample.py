@@ -0,0 +1,104 @@
+import unittest
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from services.data_provider import ReplayProvider
+from services.wind_service import WindService
+from utils.resample import resample, period_start
+
+FIELDS = 'open,high,low,close,volume,amt'
+
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.provider = ReplayProvider()
+
+    def wsd(self, start_date, end_date, options):
+        return self.provider.wsd('600000.SH', FIELDS, start_date, end_date, options, usedf=True)[1]
+
+    def test_matches_wind_periods(self):
+        """测试由1分钟线、日线合成的K线与Wind按Period请求的结果一致"""
+        minutes = self.wsd('2023-12-01', '2023-12-29', 'PriceAdj=F;Period=1')
+        for bar_size in ('5', '15', '60'):
+            expected = self.wsd('2023-12-01', '2023-12-29', f'PriceAdj=F;Period={bar_size}')
+            result = resample(minutes, bar_size)
+            self.assertTrue(result.index.equals(expected.index))
+            self.assertTrue(np.allclose(result.values, expected.values))
+
+        daily = self.wsd('2023-01-02', '2023-12-29', 'PriceAdj=F')
+        for period in ('W', 'M'):
+            expected = self.wsd('2023-01-02', '2023-12-29', f'PriceAdj=F;Period={period}')
+            result = resample(daily, period)
+            self.assertTrue(result.index.equals(expected.index))
+            self.assertTrue(np.allclose(result.values, expected.values))
+
+    def test_missing_values(self):
+        """测试停牌(NaN)不影响开盘价、收盘价与成交量，整周停牌时为NaN"""
+        index = pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-05', '2024-01-08', '2024-01-09'])
+        df = pd.DataFrame({'OPEN': [np.nan, 2.0, 3.0, np.nan, np.nan],
+                           'CLOSE': [np.nan, 2.5, np.nan, np.nan, np.nan],
+                           'VOLUME': [np.nan, 10.0, 5.0, np.nan, np.nan]}, index=index)
+        result = resample(df, 'W')
+        self.assertEqual(result.index.strftime('%Y-%m-%d').tolist(), ['2024-01-05', '2024-01-09'])
+        self.assertEqual(result.iloc[0].tolist(), [2.0, 2.5, 15.0])
+        self.assertTrue(result.iloc[1].isna().all())
+
+    def test_period_start(self):
+        """测试周线、月线的开始日期为第N个周期的第一个交易日"""
+        class Calendar:
+            def trading_days_between(self, start_date, end_date):
+                return pd.bdate_range(start_date, end_date).strftime('%Y-%m-%d').tolist()
+        self.assertEqual(period_start(Calendar(), '2024-01-10', 'W', 3), '2023-12-25')
+        self.assertEqual(period_start(Calendar(), '2024-01-10', 'M', 2), '2023-12-01')
+
+class TestWindServiceBars(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.provider = ReplayProvider()
+        self.service = WindService(cache_dir=self.tmp_dir, provider=self.provider)
+
+    def tearDown(self):
+        self.service.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_switch_timeframes_without_wind(self):
+        """测试同一证券切换周期时只在首次获取基础K线时请求Wind"""
+        self.service.get_bars('600000.SH', 'open,close', '2023-01-02', '2023-12-29', 'D', 'PriceAdj=F')
+        calls = self.provider.calls['wsd']
+        weekly = self.service.get_bars('600000.SH', 'open,close', '2023-01-02', '2023-12-29', 'W', 'PriceAdj=F')
+        monthly = self.service.get_bars('600000.SH', 'open,close', '2023-07-03', '2023-12-29', 'M', 'PriceAdj=F')
+        self.assertEqual((len(weekly), len(monthly)), (52, 6))
+
+        self.service.get_bars('600000.SH', 'open,close', '2023-12-25', '2023-12-29', '1', 'PriceAdj=F')
+        self.assertEqual(self.provider.calls['wsd'], calls)
+        for bar_size, bars in (('5', 48), ('15', 16), ('60', 4)):
+            df = self.service.get_bars('600000.SH', 'open,high,low,close,volume', '2023-12-27', '2023-12-29',
+                                       bar_size, 'PriceAdj=F')
+            self.assertEqual(len(df), bars * 3)
+        self.assertEqual(self.provider.calls['wsd'], calls)
+        self.assertEqual(self.provider.calls['wsi'], 1)
+
+    def test_historical_minutes_from_wsi(self):
+        """测试/api/historical的Period=N分钟线(含流式窗口)由w.wsi的1分钟线合成，不调用w.wsd"""
+        fields = 'open,high,low,close,volume'
+        with patch.object(self.provider, 'wsd', wraps=self.provider.wsd) as mock_wsd:
+            frames = list(self.service.iter_historical_frames('600000.SH', fields, '2023-12-01', '2023-12-12',
+                                                              'PriceAdj=F;Period=5'))
+        # 只有前复权的复权因子经w.wsd获取，分钟线本身不使用Period=N
+        self.assertTrue(all('Period' not in call.args[4] for call in mock_wsd.call_args_list))
+        self.assertGreater(self.provider.calls['wsi'], 0)
+
+        self.assertEqual(len(frames), 2)
+        df = pd.concat(frames)
+        expected = self.provider.wsd('600000.SH', fields, '2023-12-01', '2023-12-12', 'PriceAdj=F;Period=5',
+                                     usedf=True)[1]
+        self.assertTrue(df.index.equals(expected.index))
+        self.assertTrue(np.allclose(df.values, expected.values))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import json
+import time
+
+import numpy as np
+
+from app import app
+from utils.screen import screen, evaluate, referenced_fields, ScreenExpressionError
+
+class TestScreenExpression(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.codes = ['A', 'B', 'C', 'D', 'E']
+        self.columns = {
+            'PE_TTM': np.array([10.0, 20.0, np.nan, 8.0, 12.0]),
+            'PB': np.array([1.0, 0.8, 1.2, 2.0, 1.4]),
+            'INDUSTRY_SW': np.array(['银行', '电子', '银行', '化工', '银行'], dtype=object),
+        }
+
+    def test_filter_and_sort(self):
+        """测试筛选表达式的向量化计算、排序与前N个"""
+        matched, selected = screen(self.codes, self.columns, 'pe_ttm < 15 and pb < 1.5')
+        self.assertEqual((matched, [self.codes[i] for i in selected]), (2, ['A', 'E']))
+
+        _, selected = screen(self.codes, self.columns, sort='pe_ttm', ascending=False, limit=3)
+        self.assertEqual([self.codes[i] for i in selected], ['B', 'E', 'A'])
+        _, selected = screen(self.codes, self.columns, sort='PE_TTM', ascending=True)
+        self.assertEqual([self.codes[i] for i in selected], ['D', 'A', 'E', 'B', 'C'])
+
+        mask = evaluate("industry_sw in ('银行',) and not 1 <= pb < 1.3", self.columns)
+        self.assertEqual(mask.tolist(), [False, False, False, False, True])
+        self.assertEqual(evaluate('pe_ttm / pb', self.columns)[0], 10.0)
+        self.assertEqual(referenced_fields('PE_TTM < 15 or pe_ttm > pb * 2'), ['pe_ttm', 'pb'])
+
+    def test_rejects_unsafe_expressions(self):
+        """测试拒绝函数调用、属性访问等不允许的表达式和未知字段"""
+        for expression in ("__import__('os').system('ls')", 'pe_ttm.real > 1', 'pe_ttm ** 2', '[x for x in pb]',
+                           'roe > 1', 'pe_ttm <', "industry_sw > 1"):
+            with self.assertRaises(ScreenExpressionError):
+                evaluate(expression, self.columns)
+
+    def test_scalar_and_numeric_conditions(self):
+        """测试逻辑运算中的常量广播，数值条件中NaN视为不满足"""
+        mask = evaluate('pb < 1.5 and 1', self.columns)
+        self.assertEqual(mask.tolist(), [True, True, True, False, True])
+        self.assertEqual(evaluate('pb > 10 or 1', self.columns).tolist(), [True] * 5)
+        matched, selected = screen(self.codes, self.columns, 'pe_ttm')
+        self.assertEqual((matched, [self.codes[i] for i in selected]), (4, ['A', 'B', 'D', 'E']))
+        _, selected = screen(self.codes, self.columns, 'not pe_ttm - 10')
+        self.assertEqual([self.codes[i] for i in selected], ['A', 'C'])
+        for condition in ('industry_sw', "industry_sw and pb < 1"):
+            with self.assertRaises(ScreenExpressionError):
+                screen(self.codes, self.columns, condition)
+
+class TestScreenAPI(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.app = app.test_client()
+
+    def test_market_screen(self):
+        """测试全市场选股，字段缓存后在毫秒级完成"""
+        query = '/api/screen?date=2023-12-29&filter=pe_ttm < 15 and pb < 1.5&sort=pe_ttm&order=asc&limit=10'
+        data = self.app.get(query).get_json()['data']
+        self.assertEqual(data['total'], 3000)
+        self.assertEqual(data['fields'], ['PE_TTM', 'PB', 'PS_TTM'])
+        values = [row[0] for row in data['data']]
+        self.assertEqual(values, sorted(values))
+        self.assertTrue(all(row[0] < 15 and row[1] < 1.5 for row in data['data']))
+        self.assertLessEqual(len(data['codes']), 10)
+
+        started = time.perf_counter()
+        data = self.app.get(query).get_json()['data']
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertLess(data['elapsed_ms'], 100)
+
+    def test_index_universe_and_errors(self):
+        """测试指数成分选股与表达式错误返回400"""
+        response = self.app.post('/api/screen', json={'universe': '000016.SH', 'date': '2023-12-29',
+                                                      'sort': 'pb', 'limit': 5, 'fields': 'pb'})
+        data = json.loads(response.data)['data']
+        self.assertEqual((data['total'], len(data['codes'])), (50, 5))
+        self.assertEqual(data['fields'], ['PB'])
+
+        response = self.app.get('/api/screen?universe=000016.SH&filter=open(1)')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.get_json()['success'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+from werkzeug.datastructures import MIMEAccept
+
+from utils import serializers
+from utils.serializers import negotiate_format, serialize_frame, UnsupportedFormatError
+
+class TestSerializers(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.df = pd.DataFrame(
+            {'OPEN': [10.0, 11.0], 'CLOSE': [11.0, np.nan]},
+            index=pd.to_datetime(['2023-01-03', '2023-01-04']))
+
+    def test_negotiate_format(self):
+        """测试format参数与Accept头协商"""
+        self.assertEqual(negotiate_format(), 'json')
+        self.assertEqual(negotiate_format('NDJSON'), 'ndjson')
+        self.assertEqual(negotiate_format(None, MIMEAccept([('*/*', 1)])), 'json')
+        self.assertEqual(negotiate_format(None, MIMEAccept([('application/x-ndjson', 1)])), 'ndjson')
+        with self.assertRaises(UnsupportedFormatError):
+            negotiate_format('xml')
+
+    def test_columnar_json(self):
+        """测试列式JSON，NaN输出为null"""
+        body, mimetype = serialize_frame(self.df, 'columnar', gzip_level=6)
+        data = json.loads(gzip.decompress(body))
+
+        self.assertEqual(mimetype, 'application/json')
+        self.assertEqual(data['dates'], ['2023-01-03', '2023-01-04'])
+        self.assertEqual(data['fields'], ['OPEN', 'CLOSE'])
+        self.assertEqual(data['data'], [[10.0, 11.0], [11.0, None]])
+
+    def test_ndjson_intraday(self):
+        """测试分钟线NDJSON保留时间"""
+        df = self.df.set_axis(pd.to_datetime(['2023-01-03 09:31', '2023-01-03 09:32']))
+        lines = serialize_frame(df, 'ndjson')[0].decode('utf-8').splitlines()
+
+        self.assertEqual(json.loads(lines[0]), {'date': '2023-01-03T09:31:00', 'OPEN': 10.0, 'CLOSE': 11.0})
+        self.assertEqual(len(lines), 2)
+
+    @unittest.skipIf(serializers.msgpack is None, "未安装msgpack")
+    def test_msgpack(self):
+        """测试MessagePack原始字节还原"""
+        data = serializers.msgpack.unpackb(serialize_frame(self.df, 'msgpack')[0])
+        values = np.frombuffer(data['values'], dtype='<f8').reshape(data['shape'])
+
+        np.testing.assert_array_equal(values, self.df.values)
+        self.assertEqual(np.frombuffer(data['dates'], dtype='<i8').tolist(), [19360, 19361])
+
+    @unittest.skipIf(serializers.pa is None, "未安装pyarrow")
+    def test_arrow(self):
+        """测试Arrow IPC流"""
+        table = serializers.pa.ipc.open_stream(serialize_frame(self.df, 'arrow')[0]).read_all()
+
+        self.assertEqual(table.column_names, ['date', 'OPEN', 'CLOSE'])
+        self.assertEqual(table.column('CLOSE').null_count, 1)
+    @unittest.skipIf(serializers.pa is None, "未安装pyarrow")
+    def test_arrow_stream_batches(self):
+        """测试分窗口输出的Arrow流可被完整读取"""
+        frames = [self.df, self.df.iloc[:0], self.df.set_axis(pd.to_datetime(['2024-01-02', '2024-01-03']))]
+        body = b''.join(serializers.iter_stream(iter(frames), 'arrow'))
+        table = serializers.pa.ipc.open_stream(body).read_all()
+
+        self.assertEqual(table.num_rows, 4)
+        self.assertEqual(len(table.column('OPEN').chunks), 2)
+
+    def test_ndjson_stream(self):
+        """测试分窗口输出的NDJSON"""
+        body = b''.join(serializers.iter_stream(iter([self.df, self.df]), 'ndjson'))
+        self.assertEqual(len(body.splitlines()), 4)
+
+if __name__ == '__main__':
+    unittest.main()
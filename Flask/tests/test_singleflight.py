@@ -0,0 +1,68 @@
+import unittest
+import threading
+import time
+
+from services.singleflight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.flight = SingleFlight()
+
+    def _run_concurrently(self, n, func):
+        results, errors = [], []
+        barrier = threading.Barrier(n)
+
+        def worker():
+            barrier.wait()
+            try:
+                results.append(self.flight.do(('wsd', '000300.SH'), func))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results, errors
+
+    def test_concurrent_calls_are_merged(self):
+        """测试并发相同调用只执行一次"""
+        calls = []
+
+        def slow_call():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'close': [1.0]}
+
+        results, errors = self._run_concurrently(10, slow_call)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 10)
+        self.assertFalse(errors)
+        self.assertTrue(all(r is results[0] for r in results))
+        stats = self.flight.stats()
+        self.assertEqual(stats['upstream_calls'], 1)
+        self.assertEqual(stats['deduplicated_calls'], 9)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_error_is_shared(self):
+        """测试上游异常传递给所有等待者"""
+        def failing_call():
+            time.sleep(0.2)
+            raise Exception("获取数据失败，错误码: -40520007")
+
+        results, errors = self._run_concurrently(5, failing_call)
+
+        self.assertFalse(results)
+        self.assertEqual(len(errors), 5)
+
+    def test_sequential_calls_not_merged(self):
+        """测试顺序调用各自访问上游"""
+        self.flight.do('key', lambda: 1)
+        self.flight.do('key', lambda: 2)
+        self.assertEqual(self.flight.stats()['upstream_calls'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
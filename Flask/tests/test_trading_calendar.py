@@ -0,0 +1,89 @@
+import unittest
+import shutil
+import tempfile
+
+import pandas as pd
+
+from utils.trading_calendar import TradingCalendar
+from utils.date_utils import get_previous_trading_days
+
+# 2023年元旦、春节休市日
+HOLIDAYS = {'2023-01-02', '2023-01-23', '2023-01-24', '2023-01-25', '2023-01-26', '2023-01-27'}
+
+class FakeLoader:
+    """模拟w.tdays，返回剔除节假日后的工作日"""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, start_date, end_date, exchange):
+        self.calls.append((start_date, end_date, exchange))
+        days = pd.bdate_range(max(start_date, '2022-12-01'), end_date)
+        return [d.to_pydatetime() for d in days if d.strftime('%Y-%m-%d') not in HOLIDAYS]
+
+class TestTradingCalendar(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.loader = FakeLoader()
+        self.calendar = TradingCalendar('SSE', self.cache_dir, self.loader)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_is_trading_day(self):
+        """测试交易日判断"""
+        self.assertTrue(self.calendar.is_trading_day('2023-01-03'))
+        self.assertFalse(self.calendar.is_trading_day('2023-01-02'))
+        self.assertFalse(self.calendar.is_trading_day('2023-01-07'))
+        # 日历只加载一次
+        self.assertEqual(len(self.loader.calls), 1)
+
+    def test_trading_days_between(self):
+        """测试区间内交易日"""
+        days = self.calendar.trading_days_between('2023-01-19', '2023-01-31')
+        self.assertEqual(days, ['2023-01-19', '2023-01-20', '2023-01-30', '2023-01-31'])
+
+    def test_previous_trading_days_and_offset(self):
+        """测试向前若干交易日"""
+        self.assertEqual(self.calendar.previous_trading_days('2023-01-29', 2), ['2023-01-19', '2023-01-20'])
+        self.assertEqual(self.calendar.offset('2023-01-30', -1), '2023-01-20')
+        self.assertEqual(self.calendar.offset('2023-01-28', 1), '2023-01-30')
+
+    def test_persisted_calendar_not_reloaded(self):
+        """测试持久化后重新创建不再调用w.tdays"""
+        self.calendar.is_trading_day('2023-01-03')
+        loader = FakeLoader()
+        reopened = TradingCalendar('SSE', self.cache_dir, loader)
+
+        self.assertTrue(reopened.is_loaded)
+        self.assertFalse(reopened.is_trading_day('2023-01-24'))
+        self.assertEqual(loader.calls, [])
+
+    def test_retry_after_failed_load(self):
+        """测试首次加载失败后间隔一段时间重试，而不是等到第二天"""
+        loader = FakeLoader()
+        failures = [RuntimeError('Wind连接未建立')]
+
+        def flaky_loader(*args):
+            if failures:
+                raise failures.pop()
+            return loader(*args)
+
+        calendar = TradingCalendar('SSE', None, flaky_loader)
+        self.assertEqual(calendar.trading_days_between('2023-01-19', '2023-01-31'), [])
+        # 重试间隔内不再调用
+        self.assertEqual(calendar.trading_days_between('2023-01-19', '2023-01-31'), [])
+        self.assertEqual(loader.calls, [])
+
+        calendar._retry_at = 0.0
+        self.assertEqual(calendar.trading_days_between('2023-01-19', '2023-01-31'),
+                         ['2023-01-19', '2023-01-20', '2023-01-30', '2023-01-31'])
+        self.assertEqual(len(loader.calls), 1)
+
+    def test_date_utils_uses_calendar(self):
+        """测试get_previous_trading_days使用交易日历"""
+        self.assertEqual(get_previous_trading_days('2023-01-03', 2, self.calendar), ['2022-12-30', '2023-01-03'])
+        self.assertEqual(get_previous_trading_days('2023-01-03', 2), ['2023-01-02', '2023-01-03'])
+
+if __name__ == '__main__':
+    unittest.main()
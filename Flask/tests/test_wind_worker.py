@@ -0,0 +1,57 @@
+import unittest
+import threading
+
+from services.wind_worker import (WindWorker, WindOverloadedError,
+                                  PRIORITY_REALTIME, PRIORITY_BULK)
+
+class TestWindWorker(unittest.TestCase):
+    def setUp(self):
+        """测试前的设置"""
+        self.worker = WindWorker(num_workers=1, max_queue_size=3, retry_after=2)
+        # 阻塞工作线程，使后续请求留在队列中
+        self.release = threading.Event()
+        self.blocker = self.worker.submit(PRIORITY_BULK, self.release.wait)
+        while self.worker.queue_depth():
+            pass
+
+    def tearDown(self):
+        self.release.set()
+
+    def test_realtime_runs_before_bulk(self):
+        """测试实时请求优先于历史回补"""
+        order = []
+        bulk = self.worker.submit(PRIORITY_BULK, order.append, 'wsd')
+        realtime = self.worker.submit(PRIORITY_REALTIME, order.append, 'wsq')
+        self.release.set()
+        bulk.result(timeout=5)
+        realtime.result(timeout=5)
+
+        self.assertEqual(order, ['wsq', 'wsd'])
+
+    def test_queue_full_raises_overloaded(self):
+        """测试队列已满时快速失败"""
+        for _ in range(3):
+            self.worker.submit(PRIORITY_BULK, lambda: None)
+
+        with self.assertRaises(WindOverloadedError) as ctx:
+            self.worker.submit(PRIORITY_REALTIME, lambda: None)
+        self.assertEqual(ctx.exception.retry_after, 2)
+
+    def test_exception_propagates(self):
+        """测试工作线程中的异常传递给调用方"""
+        def failing():
+            raise ValueError("错误码: -40520007")
+
+        future = self.worker.submit(PRIORITY_BULK, failing)
+        self.release.set()
+        with self.assertRaises(ValueError):
+            future.result(timeout=5)
+
+    def test_call_timeout_cancels_queued_request(self):
+        """测试等待超时后取消排队中的请求"""
+        with self.assertRaises(TimeoutError):
+            self.worker.call(PRIORITY_BULK, 0.05, lambda: None)
+        self.assertEqual(self.worker.queue_depth(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
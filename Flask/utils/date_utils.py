@@ -48,19 +48,24 @@ def standardize_date_format(date_str):
     except:
         return date_str
 
-def get_previous_trading_days(end_date=None, days=30):
+def get_previous_trading_days(end_date=None, days=30, calendar=None):
     """
     获取之前的交易日
     
     Args:
         end_date (str, optional): 结束日期，默认为今天
         days (int, optional): 交易日数量，默认为30
+        calendar (TradingCalendar, optional): 交易日历，提供时按真实交易日计算
         
     Returns:
         list: 交易日列表
     """
-    # 注意：这个函数在实际使用中应该使用WindPy的w.tdays来获取真实的交易日
-    # 这里简化处理，假设周一至周五都是交易日
+    if calendar is not None:
+        result = calendar.previous_trading_days(end_date, days)
+        if calendar.is_loaded:
+            return result
+    
+    # 没有交易日历时简化处理，假设周一至周五都是交易日
     
     if end_date:
         end_dt = datetime.strptime(standardize_date_format(end_date), '%Y-%m-%d')
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+HTTP缓存模块
+为行情接口设置ETag与Cache-Control，请求带If-None-Match且数据未变化时返回304。
+已收盘区间的ETag由请求参数与数据版本计算，命中时不读取数据；含当天的区间按响应内容计算
+"""
+
+import hashlib
+import logging
+from datetime import datetime
+
+from flask import Response, current_app, request
+
+from utils.date_utils import standardize_date_format
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def is_closed_range(end_date, now=None):
+    """
+    判断请求区间是否已全部收盘(结束日期早于今天)，已收盘的历史数据不再变化
+
+    Args:
+        end_date (str): 结束日期，如'2023-12-31'
+        now (datetime, optional): 当前时间，默认为datetime.now()
+
+    Returns:
+        bool: 结束日期早于今天时为True
+    """
+    today = (now or datetime.now()).strftime('%Y-%m-%d')
+    return standardize_date_format(str(end_date)) < today
+
+
+def cache_control(closed):
+    """
+    生成Cache-Control响应头
+
+    Args:
+        closed (bool): 请求区间是否已全部收盘；为None时表示实时数据，每次需向服务端验证
+
+    Returns:
+        str: Cache-Control的值
+    """
+    if closed is None:
+        return 'no-cache'
+    max_age = current_app.config['HTTP_CACHE_CLOSED_MAX_AGE' if closed else 'HTTP_CACHE_OPEN_MAX_AGE']
+    return f'public, max-age={max_age}' if max_age else 'no-cache'
+
+
+def request_etag(*versions):
+    """
+    由请求路径、查询参数与数据版本计算ETag，不读取数据
+
+    Args:
+        *versions: 影响响应内容的其他值，如响应格式、复权基准
+
+    Returns:
+        str: ETag(不含引号)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    parts = [current_app.config['HTTP_CACHE_VERSION'], request.path]
+    parts += [f'{key}={value}' for key, value in sorted(request.args.items(multi=True))]
+    parts += [str(v) for v in versions]
+    digest.update('\x1f'.join(parts).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def not_modified(etag, closed):
+    """
+    客户端缓存的ETag与etag一致时返回304响应，否则返回None
+
+    Args:
+        etag (str): 由request_etag计算的ETag
+        closed (bool): 请求区间是否已全部收盘
+
+    Returns:
+        flask.Response or None: 304响应
+    """
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control(closed)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+
+def conditional_response(response, closed, etag=None):
+    """
+    为成功的响应设置ETag与Cache-Control，ETag与请求的If-None-Match一致时转换为304
+
+    未给出etag时按响应内容计算(流式响应除外)；gzip压缩与否的响应内容等价，使用弱ETag
+
+    Args:
+        response (flask.Response): 响应对象
+        closed (bool): 请求区间是否已全部收盘，为None时表示实时数据
+        etag (str, optional): 由request_etag计算的ETag
+
+    Returns:
+        flask.Response: 设置了缓存响应头的响应，或304响应
+    """
+    if response.status_code != 200:
+        return response
+    response.headers['Cache-Control'] = cache_control(closed)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    if etag is None and not response.is_streamed:
+        etag = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    if response.is_streamed:
+        # make_conditional会缓冲整个响应以计算Content-Length；流式响应的304已由not_modified在读取数据前返回
+        return response
+    return response.make_conditional(request)
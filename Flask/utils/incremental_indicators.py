@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+增量技术指标模块
+每个指标对象保存计算所需的最小状态，新价格到达时以O(1)更新；
+同一根K线内的多次报价通过replace_last覆盖最后一个值，而不是追加新值。
+状态可序列化为字典，服务重启后无需回放完整历史
+"""
+
+import os
+import json
+import math
+import threading
+import logging
+from collections import deque
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+
+class RollingMean:
+    """滚动均值(MA)"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def update(self, value):
+        self.values.append(value)
+        self.total += value
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        return self.value
+
+    def replace_last(self, value):
+        self.total += value - self.values[-1]
+        self.values[-1] = value
+        return self.value
+
+    @property
+    def value(self):
+        return self.total / self.window if len(self.values) == self.window else NAN
+
+    def to_dict(self):
+        return {'window': self.window, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state['window'])
+        for value in state['values']:
+            obj.update(value)
+        return obj
+
+
+class EMA:
+    """指数移动平均，与pandas ewm(span, adjust=False)一致"""
+
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = NAN
+        self._previous = NAN
+
+    def update(self, value):
+        self._previous = self.value
+        self.value = value if math.isnan(self._previous) else self._previous + self.alpha * (value - self._previous)
+        return self.value
+
+    def replace_last(self, value):
+        self.value = self._previous
+        return self.update(value)
+
+    def to_dict(self):
+        return {'span': self.span, 'value': self.value, 'previous': self._previous}
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state['span'])
+        obj.value, obj._previous = state['value'], state['previous']
+        return obj
+
+
+class MACD:
+    """MACD: 快慢EMA之差及其信号线"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, value):
+        self.signal.update(self.fast.update(value) - self.slow.update(value))
+        return self.value
+
+    def replace_last(self, value):
+        self.signal.replace_last(self.fast.replace_last(value) - self.slow.replace_last(value))
+        return self.value
+
+    @property
+    def value(self):
+        macd = self.fast.value - self.slow.value
+        return {'macd': macd, 'signal': self.signal.value, 'macd_hist': macd - self.signal.value}
+
+    def to_dict(self):
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(), 'signal': self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls()
+        obj.fast, obj.slow, obj.signal = (EMA.from_dict(state[k]) for k in ('fast', 'slow', 'signal'))
+        return obj
+
+
+class RSI:
+    """RSI，涨跌幅取简单滚动均值，与calculate_technical_indicators口径一致"""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.gain = RollingMean(window)
+        self.loss = RollingMean(window)
+        self.last_price = NAN
+        self._previous_price = NAN
+
+    def _changes(self, value, previous):
+        delta = 0.0 if math.isnan(previous) else value - previous
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def update(self, value):
+        self._previous_price = self.last_price
+        gain, loss = self._changes(value, self._previous_price)
+        self.gain.update(gain)
+        self.loss.update(loss)
+        self.last_price = value
+        return self.value
+
+    def replace_last(self, value):
+        gain, loss = self._changes(value, self._previous_price)
+        self.gain.replace_last(gain)
+        self.loss.replace_last(loss)
+        self.last_price = value
+        return self.value
+
+    @property
+    def value(self):
+        avg_gain, avg_loss = self.gain.value, self.loss.value
+        if math.isnan(avg_gain) or math.isnan(avg_loss):
+            return NAN
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else NAN
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+    def to_dict(self):
+        return {'window': self.window, 'gain': self.gain.to_dict(), 'loss': self.loss.to_dict(),
+                'last_price': self.last_price, 'previous_price': self._previous_price}
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state['window'])
+        obj.gain = RollingMean.from_dict(state['gain'])
+        obj.loss = RollingMean.from_dict(state['loss'])
+        obj.last_price, obj._previous_price = state['last_price'], state['previous_price']
+        return obj
+
+
+class Bollinger:
+    """布林带，窗口内均值和方差用Welford算法增量维护"""
+
+    def __init__(self, window=20, width=2.0):
+        self.window = window
+        self.width = width
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _add(self, value):
+        n = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+
+    def _remove(self, value):
+        n = len(self.values)
+        if n == 0:
+            self.mean, self.m2 = 0.0, 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / n
+        self.m2 -= delta * (value - self.mean)
+
+    def update(self, value):
+        self.values.append(value)
+        self._add(value)
+        if len(self.values) > self.window:
+            self._remove(self.values.popleft())
+        return self.value
+
+    def replace_last(self, value):
+        old = self.values.pop()
+        self._remove(old)
+        self.values.append(value)
+        self._add(value)
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.values) < self.window:
+            return {'boll_mid': NAN, 'boll_std': NAN, 'boll_upper': NAN, 'boll_lower': NAN}
+        std = math.sqrt(max(self.m2, 0.0) / (self.window - 1))
+        return {'boll_mid': self.mean, 'boll_std': std,
+                'boll_upper': self.mean + self.width * std, 'boll_lower': self.mean - self.width * std}
+
+    def to_dict(self):
+        return {'window': self.window, 'width': self.width, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(state['window'], state['width'])
+        for value in state['values']:
+            obj.update(value)
+        return obj
+
+
+class IndicatorState:
+    """单只证券的全部增量指标"""
+
+    def __init__(self, ma_periods=(5, 10, 20, 60)):
+        self.ma = {period: RollingMean(period) for period in ma_periods}
+        self.macd = MACD()
+        self.rsi = RSI()
+        self.boll = Bollinger()
+        self.bar = None
+
+    def _indicators(self):
+        return [*self.ma.values(), self.macd, self.rsi, self.boll]
+
+    def update(self, price, bar=None):
+        """
+        输入一个新价格
+
+        Args:
+            price (float): 最新价格
+            bar (str, optional): 所属K线标识(如交易日)；与上一次相同则覆盖最后一根K线，
+                为None时总是视为新K线
+
+        Returns:
+            dict: 最新指标值
+        """
+        same_bar = bar is not None and bar == self.bar
+        for indicator in self._indicators():
+            if same_bar:
+                indicator.replace_last(price)
+            else:
+                indicator.update(price)
+        self.bar = bar
+        return self.values()
+
+    def values(self):
+        """
+        获取当前指标值
+
+        Returns:
+            dict: 与calculate_technical_indicators同名的指标值
+        """
+        result = {f'ma{period}': ma.value for period, ma in self.ma.items()}
+        result.update(self.macd.value)
+        result['rsi'] = self.rsi.value
+        result.update(self.boll.value)
+        return result
+
+    def to_dict(self):
+        return {
+            'bar': self.bar,
+            'ma': {str(period): ma.to_dict() for period, ma in self.ma.items()},
+            'macd': self.macd.to_dict(),
+            'rsi': self.rsi.to_dict(),
+            'boll': self.boll.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls(ma_periods=())
+        obj.ma = {int(period): RollingMean.from_dict(ma) for period, ma in state['ma'].items()}
+        obj.macd = MACD.from_dict(state['macd'])
+        obj.rsi = RSI.from_dict(state['rsi'])
+        obj.boll = Bollinger.from_dict(state['boll'])
+        obj.bar = state['bar']
+        return obj
+
+
+class IndicatorStateStore:
+    """按证券代码保存增量指标状态，可持久化到JSON文件；有证券进入新K线时写入文件"""
+
+    def __init__(self, path=None):
+        """
+        初始化状态存储
+
+        Args:
+            path (str, optional): 持久化文件路径，为None时只保存在内存中
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._states = {}
+        self.load()
+
+    def get(self, code):
+        """
+        获取证券的指标状态，不存在时返回None
+
+        Args:
+            code (str): 证券代码
+
+        Returns:
+            IndicatorState: 指标状态
+        """
+        with self._lock:
+            return self._states.get(code)
+
+    def stale_codes(self, codes, bars):
+        """
+        获取需要用历史价格重新初始化的证券：没有状态，或最后一根K线不在bars中(中间缺少K线)
+
+        Args:
+            codes (iterable): 证券代码
+            bars (iterable): 可以直接续接的K线标识，如前一交易日与当天
+
+        Returns:
+            list: 证券代码列表
+        """
+        bars = set(bars)
+        with self._lock:
+            return [code for code in codes
+                    if code not in self._states or self._states[code].bar not in bars]
+
+    def seed(self, code, prices, bars=None):
+        """
+        用历史价格初始化证券的指标状态
+
+        Args:
+            code (str): 证券代码
+            prices (iterable): 按时间升序的历史收盘价
+            bars (iterable, optional): 与prices对应的K线标识
+        """
+        state = IndicatorState()
+        bars = list(bars) if bars is not None else [None] * len(prices)
+        for price, bar in zip(prices, bars):
+            if not math.isnan(price):
+                state.update(float(price), bar)
+        with self._lock:
+            self._states[code] = state
+
+    def update(self, code, price, bar=None):
+        """
+        输入证券的最新价格
+
+        Args:
+            code (str): 证券代码
+            price (float): 最新价格
+            bar (str, optional): 所属K线标识
+
+        Returns:
+            dict: 最新指标值
+        """
+        values, rolled = self._update(code, price, bar)
+        if rolled:
+            self.save()
+        return values
+
+    def _update(self, code, price, bar):
+        """更新证券的状态，返回(最新指标值, 是否进入了新K线)"""
+        with self._lock:
+            state = self._states.get(code)
+            if state is None:
+                state = self._states[code] = IndicatorState()
+            rolled = bar is not None and state.bar is not None and bar != state.bar
+            return state.update(float(price), bar), rolled
+
+    def update_from_realtime(self, data, field='RT_LAST', bar=None):
+        """
+        用get_realtime_data的返回结果更新所有证券
+
+        Args:
+            data (dict): 包含codes、fields、data的实时数据字典
+            field (str, optional): 价格字段，默认为'RT_LAST'
+            bar (str, optional): 所属K线标识，如当天日期
+
+        Returns:
+            dict: 证券代码到最新指标值的映射
+        """
+        fields = [f.upper() for f in data['fields']]
+        if field.upper() not in fields:
+            return {}
+        column = fields.index(field.upper())
+        result = {}
+        rolled = False
+        for code, row in zip(data['codes'], data['data']):
+            price = row[column]
+            if price is not None and not math.isnan(price):
+                result[code], code_rolled = self._update(code, price, bar)
+                rolled = rolled or code_rolled
+        # 进入新K线时上一根已经确定，写入文件使进程异常退出后也能从此恢复
+        if rolled:
+            self.save()
+        return result
+
+    def load(self):
+        """从持久化文件恢复状态"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                states = json.load(f)
+            with self._lock:
+                self._states = {code: IndicatorState.from_dict(state) for code, state in states.items()}
+            logger.info(f"已恢复{len(self._states)}只证券的指标状态")
+        except Exception as e:
+            logger.error(f"恢复指标状态失败: {str(e)}")
+
+    def save(self):
+        """将状态写入持久化文件"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                states = {code: state.to_dict() for code, state in self._states.items()}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(states, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+向量化技术指标引擎
+输入为日期×证券的二维收盘价数组，一次计算整个指数成分的全部指标：
+滚动均值/标准差基于累计和，EMA按时间递推、每步对所有证券向量化，不存在逐只证券的Python循环
+"""
+
+import logging
+
+import numpy as np
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+DEFAULT_MA_PERIODS = (5, 10, 20, 60)
+
+
+def _as_matrix(values):
+    """转换为时间优先、C连续的float64二维数组"""
+    matrix = np.ascontiguousarray(values, dtype=np.float64)
+    return matrix.reshape(-1, 1) if matrix.ndim == 1 else matrix
+
+
+def _prefix_sums(matrix, ccount=None):
+    """
+    计算按时间累计的前缀和及有效值个数，首行为0
+
+    无缺失值时不计算有效个数，返回None
+
+    Args:
+        matrix (numpy.ndarray): 日期×证券的二维数组
+        ccount (numpy.ndarray, optional): 缺失位置相同的数组已算出的前缀有效个数，直接沿用
+
+    Returns:
+        tuple: (前缀和, 前缀有效个数或None)，形状均为(T + 1, N)
+    """
+    rows, cols = matrix.shape
+    valid = ~np.isnan(matrix)
+    has_missing = not valid.all()
+    csum = np.empty((rows + 1, cols))
+    csum[0] = 0.0
+    np.cumsum(np.where(valid, matrix, 0.0) if has_missing else matrix, axis=0, out=csum[1:])
+    if not has_missing:
+        return csum, None
+    if ccount is not None:
+        return csum, ccount
+    ccount = np.empty((rows + 1, cols), dtype=np.int64)
+    ccount[0] = 0
+    np.cumsum(valid, axis=0, out=ccount[1:])
+    return csum, ccount
+
+
+def _window_mean(prefix, window, shape):
+    """由前缀和计算滚动均值，窗口内存在缺失值时为NaN"""
+    csum, ccount = prefix
+    out = np.full(shape, np.nan)
+    if window > shape[0]:
+        return out
+    sums = csum[window:] - csum[:-window]
+    sums /= window
+    if ccount is not None:
+        sums[(ccount[window:] - ccount[:-window]) != window] = np.nan
+    out[window - 1:] = sums
+    return out
+
+
+def rolling_mean(values, window):
+    """
+    滚动均值，窗口内存在缺失值时结果为NaN(与pandas rolling(window).mean()一致)
+
+    Args:
+        values (numpy.ndarray): 日期×证券的二维数组
+        window (int): 窗口长度
+
+    Returns:
+        numpy.ndarray: 与输入形状相同的数组
+    """
+    matrix = _as_matrix(values)
+    return _window_mean(_prefix_sums(matrix), window, matrix.shape)
+
+
+def _centered(matrix):
+    """
+    减去各列均值，以降低累计平方和的舍入误差
+
+    Returns:
+        tuple: (中心化后的数组, 各列均值)
+    """
+    valid = ~np.isnan(matrix)
+    means = np.where(valid, matrix, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    return matrix - means, means
+
+
+def _square_prefix(centered, prefix):
+    """中心化数组的平方前缀和，有效个数与prefix共用"""
+    return _prefix_sums(centered * centered, prefix[1])
+
+
+def _window_std(prefix, square_prefix, window, shape, ddof=1):
+    """由前缀和与平方前缀和计算滚动标准差"""
+    mean = _window_mean(prefix, window, shape)
+    mean_square = _window_mean(square_prefix, window, shape)
+    variance = (mean_square - mean * mean) * (window / (window - ddof))
+    return np.sqrt(np.maximum(variance, 0.0), where=~np.isnan(variance), out=variance)
+
+
+def rolling_std(values, window, ddof=1):
+    """
+    滚动标准差，基于累计和与累计平方和(与pandas rolling(window).std()一致)
+
+    Args:
+        values (numpy.ndarray): 日期×证券的二维数组
+        window (int): 窗口长度
+        ddof (int, optional): 自由度修正，默认为1
+
+    Returns:
+        numpy.ndarray: 与输入形状相同的数组
+    """
+    centered, _ = _centered(_as_matrix(values))
+    prefix = _prefix_sums(centered)
+    return _window_std(prefix, _square_prefix(centered, prefix), window, centered.shape, ddof)
+
+
+def ema(values, span):
+    """
+    指数移动平均，与pandas ewm(span, adjust=False).mean()一致；每个时间步对所有证券同时更新
+
+    缺失值处沿用上一期结果，缺失期间上一期结果的权重每期乘以(1 - alpha)，
+    缺失后的首个有效值按 (w * 上一期 + alpha * 当前值) / (w + alpha) 计入(同pandas的ignore_na=False)
+
+    Args:
+        values (numpy.ndarray): 日期×证券的二维数组
+        span (int): 跨度
+
+    Returns:
+        numpy.ndarray: 与输入形状相同的数组
+    """
+    matrix = _as_matrix(values)
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty_like(matrix)
+    if matrix.shape[0] == 0:
+        return out
+    out[0] = matrix[0]
+    if not np.isnan(matrix).any():
+        step = np.empty(matrix.shape[1])
+        for t in range(1, matrix.shape[0]):
+            np.subtract(matrix[t], out[t - 1], out=step)
+            step *= alpha
+            np.add(out[t - 1], step, out=out[t])
+        return out
+
+    prev = matrix[0].copy()
+    # 上一期结果的权重，有效值计入后重置为1
+    weight = np.ones(matrix.shape[1])
+    for t in range(1, matrix.shape[0]):
+        row = matrix[t]
+        started = ~np.isnan(prev)
+        observed = ~np.isnan(row)
+        weight = np.where(started, weight * (1.0 - alpha), weight)
+        with np.errstate(invalid='ignore'):
+            updated = (weight * prev + alpha * row) / (weight + alpha)
+        # 尚无有效值的证券以当前值起始，当前值缺失的证券保持上一期结果
+        prev = np.where(started, np.where(observed, updated, prev), row)
+        weight = np.where(observed, 1.0, weight)
+        out[t] = prev
+    return out
+
+
+def compute_indicators(close, ma_periods=DEFAULT_MA_PERIODS):
+    """
+    一次计算全部技术指标，口径与wind_utils.calculate_technical_indicators相同
+
+    Args:
+        close (numpy.ndarray): 日期×证券的收盘价二维数组
+        ma_periods (iterable, optional): 移动平均周期
+
+    Returns:
+        dict: 指标名到日期×证券二维数组的映射，包含ma{N}、macd、signal、macd_hist、
+            rsi、boll_mid、boll_std、boll_upper、boll_lower
+    """
+    close = _as_matrix(close)
+    result = {}
+
+    # 所有均线与布林带标准差共用一次中心化收盘价的前缀和，均线再加回各列均值
+    centered, means = _centered(close)
+    prefix = _prefix_sums(centered)
+
+    # 计算移动平均线
+    for period in ma_periods:
+        result[f'ma{period}'] = _window_mean(prefix, period, close.shape) + means
+
+    # 计算MACD
+    macd = ema(close, 12) - ema(close, 26)
+    signal = ema(macd, 9)
+    result['macd'] = macd
+    result['signal'] = signal
+    result['macd_hist'] = macd - signal
+
+    # 计算RSI (14日RSI)，首行差分视为0
+    delta = np.zeros_like(close)
+    delta[1:] = close[1:] - close[:-1]
+    with np.errstate(invalid='ignore'):
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+    avg_gain = rolling_mean(gain, 14)
+    avg_loss = rolling_mean(loss, 14)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result['rsi'] = 100 - 100 / (1 + avg_gain / avg_loss)
+
+    # 计算布林带 (20日布林带)
+    boll_mid = result['ma20'] if 20 in ma_periods else _window_mean(prefix, 20, close.shape) + means
+    boll_std = _window_std(prefix, _square_prefix(centered, prefix), 20, close.shape)
+    result['boll_mid'] = boll_mid
+    result['boll_std'] = boll_std
+    result['boll_upper'] = boll_mid + boll_std * 2
+    result['boll_lower'] = boll_mid - boll_std * 2
+
+    return result
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+K线重采样模块
+每只证券只保存1分钟线和日线两种基础周期，5/15/30/60分钟线与周线、月线在本地由基础K线合成：
+先求出各根K线在基础数组中的起始位置，再对每个字段做一次np.*.reduceat，不逐组循环
+"""
+
+import logging
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 各字段的合并方式，未列出的字段取最后一个有效值
+FIELD_REDUCTIONS = {
+    'OPEN': 'first',
+    'HIGH': 'max',
+    'LOW': 'min',
+    'CLOSE': 'last',
+    'VOLUME': 'sum',
+    'AMT': 'sum',
+}
+
+# 周线、月线合成时每个周期最多包含的自然日
+_PERIOD_DAYS = {'W': 7, 'M': 31}
+
+
+def _reduce(values, starts, how):
+    """
+    按起始位置合并一列，忽略NaN(如停牌)；组内全为NaN时结果为NaN
+
+    Args:
+        values (numpy.ndarray): float64数组
+        starts (numpy.ndarray): 各组在values中的起始位置，升序且第一个为0
+        how (str): 'first'、'last'、'max'、'min'或'sum'
+
+    Returns:
+        numpy.ndarray: 每组一个值
+    """
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid, starts)
+    if how == 'sum':
+        result = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    elif how == 'max':
+        result = np.fmax.reduceat(values, starts)
+    elif how == 'min':
+        result = np.fmin.reduceat(values, starts)
+    else:
+        positions = np.arange(len(values))
+        if how == 'first':
+            index = np.minimum.reduceat(np.where(valid, positions, len(values) - 1), starts)
+        else:
+            index = np.maximum.reduceat(np.where(valid, positions, 0), starts)
+        result = values[index]
+    return np.where(counts > 0, result, np.nan)
+
+
+def aggregate(df, starts, stamps):
+    """
+    按起始位置把基础K线合并为粗周期K线
+
+    Args:
+        df (pandas.DataFrame): 以时间为索引的基础K线，字段名大写
+        starts (numpy.ndarray): 每根新K线在df中的起始行
+        stamps (pandas.DatetimeIndex): 每根新K线的时间
+
+    Returns:
+        pandas.DataFrame: 合并后的K线，字段与df相同
+    """
+    if df.empty:
+        return df
+    columns = {}
+    for column in df.columns:
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        columns[column] = _reduce(values, starts, FIELD_REDUCTIONS.get(column, 'last'))
+    return pd.DataFrame(columns, index=stamps, columns=df.columns)
+
+
+def period_keys(days, period):
+    """
+    计算每个日期所属的周或月
+
+    Args:
+        days (numpy.ndarray): 自1970-01-01起的天数
+        period (str): 'W'(周一至周日)或'M'
+
+    Returns:
+        numpy.ndarray: 周期编号，同一周期内相同
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if period == 'W':
+        # 1970-01-01为周四，加3后周一的余数为0
+        return (days + 3) // 7
+    if period == 'M':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"不支持的周期: {period}")
+
+
+def resample_daily(df, period):
+    """
+    由日线合成周线或月线，K线日期为该周期内最后一个交易日(与Wind的Period=W/M一致)
+
+    Args:
+        df (pandas.DataFrame): 以交易日为索引的日线
+        period (str): 'W'或'M'
+
+    Returns:
+        pandas.DataFrame: 周线或月线
+    """
+    if df.empty:
+        return df
+    days = df.index.values.astype('datetime64[D]').astype(np.int64)
+    keys = period_keys(days, period)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return aggregate(df, starts, df.index[ends])
+
+
+def resample_minutes(df, bar_size):
+    """
+    由1分钟线合成N分钟线：每个交易日从第一根1分钟线起每N根合并一次，午休不单独成组，
+    K线时间为区间内最后一根1分钟线的时间(与Wind的Period=N一致)
+
+    Args:
+        df (pandas.DataFrame): 以时间为索引的1分钟线
+        bar_size (int): 分钟数，如5、15、30、60
+
+    Returns:
+        pandas.DataFrame: N分钟线
+    """
+    if df.empty or bar_size <= 1:
+        return df
+    days = df.index.values.astype('datetime64[D]').astype(np.int64)
+    day_starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    # 每根1分钟线在当天的序号
+    position = np.arange(len(days)) - np.repeat(day_starts, np.diff(np.r_[day_starts, len(days)]))
+    starts = np.flatnonzero(position % bar_size == 0)
+    ends = np.r_[starts[1:], len(days)] - 1
+    return aggregate(df, starts, df.index[ends])
+
+
+def resample(df, timeframe):
+    """
+    将基础K线转换为指定周期
+
+    Args:
+        df (pandas.DataFrame): timeframe为'D'、'W'、'M'时为日线，否则为1分钟线
+        timeframe (str): 'D'、'W'、'M'或分钟数，如'5'
+
+    Returns:
+        pandas.DataFrame: 指定周期的K线
+    """
+    timeframe = str(timeframe).upper()
+    if timeframe == 'D':
+        return df
+    if timeframe in _PERIOD_DAYS:
+        return resample_daily(df, timeframe)
+    return resample_minutes(df, int(timeframe))
+
+
+def period_start(calendar, end_date, period, count):
+    """
+    按交易日历计算最近count个周或月的第一个交易日，使第一根K线也是完整的周期
+
+    Args:
+        calendar (TradingCalendar): 交易日历
+        end_date (str): 结束日期
+        period (str): 'W'或'M'
+        count (int): 周期数
+
+    Returns:
+        str: 开始日期
+    """
+    end = pd.Timestamp(end_date)
+    # 多取两个周期和长假的余量
+    lookback = (end - timedelta(days=(count + 2) * _PERIOD_DAYS[period] + 14)).strftime('%Y-%m-%d')
+    trading_days = calendar.trading_days_between(lookback, end.strftime('%Y-%m-%d'))
+    if not trading_days:
+        return lookback
+    keys = period_keys(np.array(trading_days, dtype='datetime64[D]').astype(np.int64), period)
+    # 只计有交易日的周期，整周休市不占用数量
+    present = np.unique(keys)
+    first = np.flatnonzero(keys >= present[max(len(present) - count, 0)])[0]
+    return trading_days[first]
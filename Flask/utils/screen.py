@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+截面选股表达式模块
+将'pe_ttm < 15 and pb < 1.5'之类的筛选、排序表达式解析为语法树后，在全市场的字段数组上
+一次计算出布尔掩码或排序键；只允许字段名、常量、算术、比较和逻辑运算，不执行任意代码
+"""
+
+import ast
+import logging
+
+import numpy as np
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 表达式长度上限
+MAX_EXPRESSION_LENGTH = 500
+
+_BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Mod: np.mod,
+}
+
+_COMPARE_OPS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+
+class ScreenExpressionError(ValueError):
+    """表达式语法错误、包含不允许的运算或引用未知字段时抛出，接口应返回400"""
+
+
+def parse_expression(text):
+    """
+    解析并检查表达式
+
+    Args:
+        text (str): 表达式，如'pe_ttm < 15 and pb < 1.5'
+
+    Returns:
+        ast.Expression: 语法树
+
+    Raises:
+        ScreenExpressionError: 语法错误或包含不允许的节点
+    """
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ScreenExpressionError(f"表达式长度超过{MAX_EXPRESSION_LENGTH}")
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ScreenExpressionError(f"表达式语法错误: {e.msg}")
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+                             ast.BinOp, ast.Compare, ast.Name, ast.Load, ast.Tuple, ast.List, ast.In, ast.NotIn)):
+            continue
+        if type(node) in _BINARY_OPS or type(node) in _COMPARE_OPS:
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)):
+            continue
+        raise ScreenExpressionError(f"表达式中不允许使用{type(node).__name__}")
+    return tree
+
+
+def referenced_fields(text):
+    """
+    表达式引用的字段名
+
+    Args:
+        text (str): 表达式
+
+    Returns:
+        list: 按出现顺序去重的小写字段名
+    """
+    names = [node.id.lower() for node in ast.walk(parse_expression(text)) if isinstance(node, ast.Name)]
+    return list(dict.fromkeys(names))
+
+
+def _constant_list(node):
+    if not isinstance(node, (ast.Tuple, ast.List)) or not all(isinstance(e, ast.Constant) for e in node.elts):
+        raise ScreenExpressionError("in/not in的右侧应为常量列表，如industry in ('银行', '电子')")
+    return [e.value for e in node.elts]
+
+
+def _as_mask(value):
+    """将布尔或数值结果转换为布尔掩码，数值非零为True，NaN为False；其他类型不能作为条件"""
+    value = np.asarray(value)
+    if value.dtype == bool:
+        return value
+    if value.dtype.kind in 'iuf':
+        return np.not_equal(value, 0) & ~np.isnan(value)
+    raise ScreenExpressionError("条件的结果应为布尔值或数值")
+
+
+def _evaluate(node, columns):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, columns)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        name = node.id.upper()
+        if name not in columns:
+            raise ScreenExpressionError(f"未知字段: {node.id}")
+        return columns[name]
+    if isinstance(node, ast.BoolOp):
+        # 常量与字段数组广播为相同长度后逐元素运算
+        values = np.broadcast_arrays(*(_as_mask(_evaluate(v, columns)) for v in node.values))
+        reduce = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return reduce.reduce(values)
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate(node.operand, columns)
+        if isinstance(node.op, ast.Not):
+            return np.logical_not(_as_mask(operand))
+        return np.negative(operand) if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.BinOp):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return _BINARY_OPS[type(node.op)](_evaluate(node.left, columns), _evaluate(node.right, columns))
+    if isinstance(node, ast.Compare):
+        # 链式比较a < b < c等价于(a < b) and (b < c)；与NaN比较的结果为False
+        left = _evaluate(node.left, columns)
+        result = None
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                mask = np.isin(left, _constant_list(comparator), invert=isinstance(op, ast.NotIn))
+                right = None
+            else:
+                right = _evaluate(comparator, columns)
+                with np.errstate(invalid='ignore'):
+                    mask = _COMPARE_OPS[type(op)](left, right)
+            result = mask if result is None else np.logical_and(result, mask)
+            left = right
+        return result
+    raise ScreenExpressionError(f"表达式中不允许使用{type(node).__name__}")
+
+
+def evaluate(text, columns):
+    """
+    在字段数组上计算表达式
+
+    Args:
+        text (str): 表达式
+        columns (dict): {大写字段名: 与证券对齐的数组}
+
+    Returns:
+        numpy.ndarray: 与证券对齐的结果数组
+
+    Raises:
+        ScreenExpressionError: 表达式无效
+    """
+    size = len(next(iter(columns.values()))) if columns else 0
+    try:
+        result = _evaluate(parse_expression(text), columns)
+    except ScreenExpressionError:
+        raise
+    except (TypeError, ValueError) as e:
+        # 如字符串字段与数值比较、数组长度不一致
+        raise ScreenExpressionError(f"表达式类型错误: {str(e)}")
+    return np.broadcast_to(np.asarray(result), (size,))
+
+
+def screen(codes, columns, condition=None, sort=None, ascending=False, limit=None):
+    """
+    按条件筛选证券并排序
+
+    Args:
+        codes (list): 证券代码列表
+        columns (dict): {大写字段名: 与codes对齐的数组}
+        condition (str, optional): 筛选表达式，如'pe_ttm < 15 and pb < 1.5'
+        sort (str, optional): 排序表达式，如'pe_ttm'或'roe / pb'，NaN排在最后
+        ascending (bool, optional): 是否升序
+        limit (int, optional): 返回的证券数上限
+
+    Returns:
+        tuple: (满足条件的证券数, 结果在codes中的位置数组)
+    """
+    selected = np.arange(len(codes))
+    if condition:
+        selected = np.flatnonzero(_as_mask(evaluate(condition, columns)))
+    matched = len(selected)
+
+    if sort:
+        keys = np.asarray(evaluate(sort, columns), dtype=np.float64)[selected]
+        # 降序时对相反数升序排序，NaN始终排在最后；只需前N个时先用argpartition缩小范围
+        keys = keys if ascending else -keys
+        if limit is not None and limit < len(keys):
+            keys = np.where(np.isnan(keys), np.inf, keys)
+            top = np.argpartition(keys, limit)[:limit]
+            selected = selected[top[np.argsort(keys[top], kind='stable')]]
+        else:
+            selected = selected[np.argsort(keys, kind='stable')]
+    elif limit is not None:
+        selected = selected[:limit]
+    return matched, selected
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+行情数据序列化模块
+直接从DataFrame生成列式JSON、NDJSON、MessagePack或Arrow IPC，
+避免先转换为Python列表再由jsonify编码
+"""
+
+import gzip
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+from flask import Response, stream_with_context
+
+from services import metrics
+
+# 可选依赖
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 格式名称与MIME类型
+FORMAT_MIMETYPES = {
+    'json': 'application/json',
+    'columnar': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Accept请求头中可识别的MIME类型
+ACCEPT_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.apache.arrow.stream': 'arrow',
+}
+
+
+class UnsupportedFormatError(Exception):
+    """请求的格式未知或缺少可选依赖时抛出，接口应返回406"""
+
+
+def negotiate_format(format_param=None, accept_mimetypes=None):
+    """
+    根据format参数或Accept请求头确定响应格式
+
+    Args:
+        format_param (str, optional): 查询参数format的值
+        accept_mimetypes (werkzeug.datastructures.MIMEAccept, optional): 请求的Accept头
+
+    Returns:
+        str: 格式名称，默认为'json'
+
+    Raises:
+        UnsupportedFormatError: 格式未知或当前环境不支持
+    """
+    if format_param:
+        fmt = format_param.lower()
+    elif accept_mimetypes:
+        best = accept_mimetypes.best_match(list(ACCEPT_FORMATS), default='application/json')
+        fmt = ACCEPT_FORMATS[best]
+    else:
+        fmt = 'json'
+
+    if fmt not in FORMAT_MIMETYPES:
+        raise UnsupportedFormatError(f"不支持的格式: {fmt}，可选: {', '.join(FORMAT_MIMETYPES)}")
+    if fmt == 'arrow' and pa is None:
+        raise UnsupportedFormatError("Arrow格式需要安装pyarrow")
+    if fmt == 'msgpack' and msgpack is None:
+        raise UnsupportedFormatError("MessagePack格式需要安装msgpack")
+    return fmt
+
+
+def _index_unit(index):
+    """日线数据返回'D'，含时间的分钟线数据返回's'"""
+    values = index.values
+    return 'D' if (values.astype('datetime64[D]') == values).all() else 's'
+
+
+def _date_strings(index):
+    """将DatetimeIndex转换为'YYYY-MM-DD'或'YYYY-MM-DDTHH:MM:SS'字符串数组"""
+    unit = _index_unit(index)
+    return np.datetime_as_string(index.values.astype(f'datetime64[{unit}]'), unit=unit)
+
+
+def to_columnar_json(df):
+    """
+    生成列式JSON: {"dates": [...], "fields": [...], "data": [[字段1的序列], [字段2的序列], ...]}
+
+    数值部分由pandas的C实现直接编码，NaN输出为null
+
+    Args:
+        df (pandas.DataFrame): 以日期为索引的数据
+
+    Returns:
+        bytes: UTF-8编码的JSON
+    """
+    values = pd.DataFrame(np.ascontiguousarray(df.to_numpy(dtype=np.float64).T))
+    body = (
+        '{"dates":' + json.dumps(_date_strings(df.index).tolist())
+        + ',"fields":' + json.dumps(df.columns.tolist(), ensure_ascii=False)
+        + ',"data":' + values.to_json(orient='values') + '}'
+    )
+    return body.encode('utf-8')
+
+
+def to_ndjson(df):
+    """
+    生成NDJSON，每行一个交易日: {"date": "2023-01-03", "OPEN": 12.5, ...}
+
+    Args:
+        df (pandas.DataFrame): 以日期为索引的数据
+
+    Returns:
+        bytes: UTF-8编码的NDJSON
+    """
+    if df.empty:
+        return b''
+    records = df.copy(deep=False)
+    records.insert(0, 'date', _date_strings(df.index))
+    return records.to_json(orient='records', lines=True, force_ascii=False).encode('utf-8')
+
+
+def to_msgpack(df):
+    """
+    生成MessagePack，数值以小端float64原始字节存放
+
+    结构: {"dates": int64字节, "unit": "D"或"s", "fields": [...], "shape": [行, 列], "values": float64行优先字节}，
+    dates为自1970-01-01起的天数(日线)或秒数(分钟线)
+
+    Args:
+        df (pandas.DataFrame): 以日期为索引的数据
+
+    Returns:
+        bytes: MessagePack编码的数据
+    """
+    unit = _index_unit(df.index)
+    dates = df.index.values.astype(f'datetime64[{unit}]').astype('<i8')
+    values = np.ascontiguousarray(df.to_numpy(dtype='<f8'))
+    return msgpack.packb({
+        'dates': dates.tobytes(),
+        'unit': unit,
+        'fields': df.columns.tolist(),
+        'shape': list(values.shape),
+        'values': values.tobytes(),
+    })
+
+
+def _arrow_batch(df, unit):
+    """将DataFrame转换为Arrow RecordBatch"""
+    if unit == 'D':
+        arrays = [pa.array(df.index.values.astype('datetime64[D]'), type=pa.date32())]
+    else:
+        arrays = [pa.array(df.index.values.astype('datetime64[s]'), type=pa.timestamp('s'))]
+    arrays += [pa.array(df[column].to_numpy(dtype=np.float64), from_pandas=True) for column in df.columns]
+    return pa.RecordBatch.from_arrays(arrays, names=['date'] + [str(c) for c in df.columns])
+
+
+def to_arrow(df):
+    """
+    生成Arrow IPC流，日线的date列为date32类型，分钟线为timestamp[s]类型
+
+    Args:
+        df (pandas.DataFrame): 以日期为索引的数据
+
+    Returns:
+        bytes: Arrow IPC流
+    """
+    batch = _arrow_batch(df, _index_unit(df.index))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+# Arrow IPC流结束标记
+ARROW_EOS = b'\xff\xff\xff\xff\x00\x00\x00\x00'
+
+# 支持流式输出的格式
+STREAM_FORMATS = ('ndjson', 'arrow')
+
+SERIALIZERS = {
+    'columnar': to_columnar_json,
+    'ndjson': to_ndjson,
+    'msgpack': to_msgpack,
+    'arrow': to_arrow,
+}
+
+
+def serialize_frame(df, fmt, gzip_level=None):
+    """
+    按指定格式序列化DataFrame
+
+    Args:
+        df (pandas.DataFrame): 以日期为索引的数据
+        fmt (str): 格式名称，'columnar'、'ndjson'、'msgpack'或'arrow'
+        gzip_level (int, optional): gzip压缩级别，为None时不压缩
+
+    Returns:
+        tuple: (响应体bytes, MIME类型)
+    """
+    with metrics.span('serialize', format=fmt):
+        body = SERIALIZERS[fmt](df)
+        if gzip_level is not None:
+            body = gzip.compress(body, compresslevel=gzip_level)
+    return body, FORMAT_MIMETYPES[fmt]
+
+
+def iter_stream(frames, fmt, unit='D'):
+    """
+    逐个窗口序列化DataFrame，供分块流式响应使用
+
+    NDJSON每个窗口输出若干行；Arrow先输出schema消息，每个窗口输出一个RecordBatch消息，
+    最后输出流结束标记，客户端可用pyarrow.ipc.open_stream增量读取
+
+    Args:
+        frames (iterable): 按时间顺序产生DataFrame的迭代器
+        fmt (str): 'ndjson'或'arrow'
+        unit (str, optional): 日期精度，日线为'D'，分钟线为's'
+
+    Yields:
+        bytes: 响应体分块
+    """
+    schema = None
+    for df in frames:
+        if df.empty:
+            continue
+        # 只计序列化耗时，不含获取下一个窗口的时间
+        with metrics.span('serialize', format=fmt):
+            if fmt == 'ndjson':
+                chunks = [to_ndjson(df)]
+            else:
+                batch = _arrow_batch(df, unit)
+                chunks = [batch.serialize().to_pybytes()]
+                if schema is None:
+                    schema = batch.schema
+                    chunks.insert(0, schema.serialize().to_pybytes())
+        yield from chunks
+    if fmt == 'arrow':
+        if schema is None:
+            # 无数据时仍输出合法的空流
+            yield pa.schema([('date', pa.date32() if unit == 'D' else pa.timestamp('s'))]).serialize().to_pybytes()
+        yield ARROW_EOS
+
+
+def frame_response(df, fmt, accept_encodings=None):
+    """
+    生成Flask响应，文本格式在客户端支持时使用gzip压缩
+
+    Args:
+        df (pandas.DataFrame): 以日期为索引的数据
+        fmt (str): 格式名称
+        accept_encodings (werkzeug.datastructures.Accept, optional): 请求的Accept-Encoding头
+
+    Returns:
+        flask.Response: 响应对象
+    """
+    compress = fmt in ('columnar', 'ndjson') and accept_encodings is not None and 'gzip' in accept_encodings
+    body, mimetype = serialize_frame(df, fmt, gzip_level=6 if compress else None)
+    response = Response(body, mimetype=mimetype)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def stream_response(frames, fmt, unit='D'):
+    """
+    生成分块传输的流式响应
+
+    第一块数据在返回响应前获取，使上游错误(如队列已满)仍能以正常的错误状态码返回；
+    之后的窗口在发送过程中逐个获取
+
+    Args:
+        frames (iterable): 按时间顺序产生DataFrame的迭代器
+        fmt (str): 'ndjson'或'arrow'
+        unit (str, optional): 日期精度，日线为'D'，分钟线为's'
+
+    Returns:
+        flask.Response: 流式响应对象
+    """
+    if fmt not in STREAM_FORMATS:
+        raise UnsupportedFormatError(f"流式输出仅支持: {', '.join(STREAM_FORMATS)}")
+    chunks = iter_stream(frames, fmt, unit)
+    first = next(chunks, b'')
+
+    def generate():
+        yield first
+        try:
+            yield from chunks
+        except Exception as e:
+            # 响应头已发送，只能记录错误并中断连接；不发送分块结束标记，客户端与缓存不会把截断的响应当作完整响应
+            logger.error(f"流式输出中断: {str(e)}")
+            raise
+
+    return Response(stream_with_context(generate()), mimetype=FORMAT_MIMETYPES[fmt])
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+交易日历模块
+每个交易所的日历只从Wind加载一次并持久化到本地，之后按需增量刷新；
+日期以有序NumPy数组保存，各类查询均为O(log n)的二分查找
+"""
+
+import os
+import json
+import threading
+import time
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from utils.date_utils import standardize_date_format
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 上交所首个交易日，首次加载时的起始日期
+CALENDAR_START_DATE = '1990-12-19'
+
+# 刷新失败(如启动时Wind连接尚未建立)后重试的间隔(秒)
+REFRESH_RETRY_INTERVAL = 30
+
+
+def _to_day(date_value):
+    """将日期字符串或datetime转换为datetime64[D]对应的天数"""
+    if date_value is None:
+        date_value = datetime.now()
+    if isinstance(date_value, str):
+        date_value = standardize_date_format(date_value)
+    else:
+        date_value = date_value.strftime('%Y-%m-%d')
+    return int(np.datetime64(date_value, 'D').astype(np.int64))
+
+
+def _to_str(days):
+    """将天数数组转换为'YYYY-MM-DD'字符串列表"""
+    return np.datetime_as_string(np.asarray(days, dtype=np.int64).astype('datetime64[D]'), unit='D').tolist()
+
+
+class TradingCalendar:
+    """单个交易所的交易日历"""
+
+    def __init__(self, exchange='SSE', cache_dir=None, loader=None):
+        """
+        初始化交易日历
+
+        Args:
+            exchange (str, optional): 交易所代码，默认为'SSE'(上海证券交易所)
+            cache_dir (str, optional): 日历持久化目录，为None时只保存在内存中
+            loader (callable, optional): loader(start_date, end_date, exchange)返回交易日列表，
+                通常为w.tdays的封装
+        """
+        self.exchange = exchange
+        self.cache_dir = cache_dir
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._days = np.empty(0, dtype=np.int64)
+        # 已从Wind获取过的日期范围(天数)，范围内不在_days中的日期为非交易日
+        self._covered_from = None
+        self._covered_until = None
+        self._last_refresh_day = None
+        self._retry_at = 0.0
+        self.retry_interval = REFRESH_RETRY_INTERVAL
+        self._load()
+
+    @property
+    def _path(self):
+        return os.path.join(self.cache_dir, f'{self.exchange}.npy') if self.cache_dir else None
+
+    def _load(self):
+        if not self._path or not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self._days = np.load(self._path)
+            self._covered_from = meta['covered_from']
+            self._covered_until = meta['covered_until']
+        except Exception as e:
+            logger.error(f"加载交易日历{self.exchange}失败: {str(e)}")
+
+    def _save(self):
+        if not self._path:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 临时文件名带进程号，多个工作进程同时保存时互不覆盖
+        tmp_path = f'{self._path}.{os.getpid()}.tmp.npy'
+        np.save(tmp_path, self._days)
+        os.replace(tmp_path, self._path)
+        tmp_meta = f'{self._path}.{os.getpid()}.json.tmp'
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({'covered_from': self._covered_from, 'covered_until': self._covered_until}, f)
+        os.replace(tmp_meta, self._path + '.json')
+
+    def refresh(self):
+        """
+        增量刷新日历：只获取已覆盖范围之后至当年年底的交易日(Wind按年发布节假日安排)
+
+        Returns:
+            bool: 是否刷新成功
+        """
+        if self.loader is None:
+            return False
+        today = _to_day(None)
+        start = self._covered_until + 1 if self._covered_until is not None else _to_day(CALENDAR_START_DATE)
+        end = _to_day(f'{datetime.now().year}-12-31')
+        if start > end:
+            self._last_refresh_day = today
+            return True
+        try:
+            days = self.loader(_to_str([start])[0], _to_str([end])[0], self.exchange)
+        except Exception as e:
+            logger.error(f"刷新交易日历{self.exchange}失败，{self.retry_interval}秒后重试: {str(e)}")
+            self._retry_at = time.monotonic() + self.retry_interval
+            return False
+        self._last_refresh_day = today
+
+        new_days = np.array([_to_day(d) for d in days], dtype=np.int64)
+        self._days = np.union1d(self._days, new_days)
+        if self._covered_from is None:
+            self._covered_from = start
+        self._covered_until = end
+        self._save()
+        logger.info(f"交易日历{self.exchange}已更新至{_to_str([end])[0]}，新增{len(new_days)}个交易日")
+        return True
+
+    def _ensure(self, day):
+        """查询日期超出已覆盖范围时刷新日历，每天最多成功刷新一次，失败后间隔retry_interval秒重试"""
+        if self._covered_until is not None and day <= self._covered_until:
+            return
+        with self._lock:
+            if self._covered_until is not None and day <= self._covered_until:
+                return
+            if self._last_refresh_day != _to_day(None) and time.monotonic() >= self._retry_at:
+                self.refresh()
+
+    @property
+    def is_loaded(self):
+        """日历是否已有数据"""
+        return self._covered_until is not None
+
+    def _is_covered(self, day):
+        return self._covered_until is not None and self._covered_from <= day <= self._covered_until
+
+    def is_trading_day(self, date):
+        """
+        判断是否为交易日
+
+        Args:
+            date (str): 日期
+
+        Returns:
+            bool: 是否为交易日；日历未覆盖该日期时按周一至周五判断
+        """
+        day = _to_day(date)
+        self._ensure(day)
+        if not self._is_covered(day):
+            return (day + 3) % 7 < 5  # 1970-01-01为周四
+        i = np.searchsorted(self._days, day)
+        return bool(i < len(self._days) and self._days[i] == day)
+
+    def trading_days_between(self, start_date, end_date=None):
+        """
+        获取两个日期之间(含)的交易日
+
+        Args:
+            start_date (str): 开始日期
+            end_date (str, optional): 结束日期，默认为今天
+
+        Returns:
+            list: 交易日列表，如['2023-01-03', '2023-01-04']
+        """
+        start, end = _to_day(start_date), _to_day(end_date)
+        self._ensure(end)
+        lo = np.searchsorted(self._days, start, side='left')
+        hi = np.searchsorted(self._days, end, side='right')
+        return _to_str(self._days[lo:hi])
+
+    def previous_trading_days(self, end_date=None, days=30):
+        """
+        获取截至end_date(含)的最近若干个交易日
+
+        Args:
+            end_date (str, optional): 结束日期，默认为今天
+            days (int, optional): 交易日数量
+
+        Returns:
+            list: 按日期升序排列的交易日列表
+        """
+        end = _to_day(end_date)
+        self._ensure(end)
+        hi = np.searchsorted(self._days, end, side='right')
+        return _to_str(self._days[max(hi - days, 0):hi])
+
+    def offset(self, date, n):
+        """
+        获取date之前或之后第n个交易日
+
+        Args:
+            date (str): 基准日期，若非交易日则以其之前最近的交易日为基准
+            n (int): 偏移量，负数表示之前
+
+        Returns:
+            str: 交易日；超出日历范围时返回最早或最晚的交易日
+        """
+        day = _to_day(date)
+        self._ensure(day)
+        if len(self._days) == 0:
+            return None
+        i = np.searchsorted(self._days, day, side='right') - 1 + n
+        return _to_str([self._days[min(max(i, 0), len(self._days) - 1)]])[0]
+
+
+# 各交易所的日历实例
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def get_trading_calendar(exchange='SSE', loader=None, cache_dir=None):
+    """
+    获取交易所日历，同一进程内每个交易所只创建一个实例
+
+    Args:
+        exchange (str, optional): 交易所代码
+        loader (callable, optional): 交易日加载函数，仅在实例尚未设置时生效
+        cache_dir (str, optional): 持久化目录，仅在实例尚未设置时生效
+
+    Returns:
+        TradingCalendar: 交易日历
+    """
+    with _calendars_lock:
+        calendar = _calendars.get(exchange)
+        if calendar is None:
+            calendar = _calendars[exchange] = TradingCalendar(exchange, cache_dir, loader)
+        else:
+            if calendar.loader is None and loader is not None:
+                calendar.loader = loader
+            if calendar.cache_dir is None and cache_dir is not None:
+                calendar.cache_dir = cache_dir
+                if calendar._covered_until is None:
+                    calendar._load()
+        return calendar
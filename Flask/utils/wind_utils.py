@@ -11,23 +11,39 @@ import numpy as np
 from datetime import datetime, timedelta
 import logging
 
-# 导入WindPy
-try:
-    from WindPy import w
-except ImportError:
-    raise ImportError("无法导入WindPy模块，请确保Wind Python API已正确安装")
+from utils.trading_calendar import get_trading_calendar
+from services.wind_service import get_default_wind_service
+from services.snapshot_store import get_default_snapshot_store
+from services.pit_store import get_default_pit_store
+from services.cache import to_day
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
-def get_trading_days(start_date, end_date=None, exchange='SSE'):
+def _call(service, func_name, *args):
+    """经WindService调用Wind函数(工作线程队列、请求合并、熔断与耗时统计)，默认为进程内默认服务"""
+    return (service or get_default_wind_service()).call(func_name, *args)
+
+def _trading_days_loader(service):
+    """调用w.tdays获取交易日，作为本地交易日历的加载函数"""
+    def loader(start_date, end_date, exchange):
+        result = _call(service, 'tdays', start_date, end_date, f"TradingCalendar={exchange}")
+        if result.ErrorCode != 0:
+            raise Exception(f"获取交易日失败: {result.ErrorCode}")
+        return result.Data[0] if result.Data else []
+    return loader
+
+def get_trading_days(start_date, end_date=None, exchange='SSE', service=None):
     """
     获取交易日列表
     
+    交易日从本地交易日历中查询，日历只在首次使用或超出已加载范围时调用w.tdays
+    
     Args:
         start_date (str): 开始日期
         end_date (str, optional): 结束日期，默认为当前日期
         exchange (str, optional): 交易所代码，默认为'SSE'(上海证券交易所)
+        service (WindService, optional): 调用Wind的数据服务，默认为进程内默认服务
         
     Returns:
         list: 交易日列表
@@ -36,30 +52,46 @@ def get_trading_days(start_date, end_date=None, exchange='SSE'):
         # 如果未提供结束日期，使用当前日期
         if not end_date:
             end_date = datetime.now().strftime('%Y-%m-%d')
-            
-        # 调用Wind API获取交易日
-        result = w.tdays(start_date, end_date, f"TradingCalendar={exchange}")
         
-        # 检查返回结果
-        if result.ErrorCode != 0:
-            logger.error(f"获取交易日失败: {result.ErrorCode}")
-            return []
-            
-        # 转换为日期字符串列表
-        trading_days = [d.strftime('%Y-%m-%d') for d in result.Data[0]]
-        return trading_days
+        calendar = get_trading_calendar(exchange, loader=_trading_days_loader(service))
+        return calendar.trading_days_between(start_date, end_date)
     
     except Exception as e:
         logger.error(f"获取交易日异常: {str(e)}")
         return []
 
-def get_index_constituents(index_code, date=None):
+def _index_members_loader(service):
+    """调用w.wset获取指数在某日的成分股，作为时点存储的加载函数"""
+    def loader(index_code, date):
+        result = _call(service, 'wset', "indexconstituent", f"date={date};windcode={index_code}")
+        if result.ErrorCode != 0:
+            raise Exception(f"获取指数成分股失败: {result.ErrorCode}")
+        return result.Data[1]  # 第2列是成分股代码
+    return loader
+
+def _index_changes_loader(service):
+    """调用w.wset获取指数的成分调整记录，返回[(天数, 证券代码, 是否纳入)]"""
+    def loader(index_code, start_date, end_date):
+        result = _call(service, 'wset', "indexhistory",
+                       f"startdate={start_date};enddate={end_date};windcode={index_code}")
+        if result.ErrorCode != 0:
+            raise Exception(f"获取指数成分调整记录失败: {result.ErrorCode}")
+        columns = dict(zip([f.lower() for f in result.Fields], result.Data))
+        return [(to_day(date), code, status == '纳入')
+                for date, code, status in zip(columns['tradedate'], columns['tradecode'], columns['tradestatus'])]
+    return loader
+
+def get_index_constituents(index_code, date=None, service=None):
     """
     获取指数成分股
     
+    成分股从本地时点存储中查询：首次使用某指数时获取一次成分快照和历史调整记录，
+    之后任意日期的成分都无需访问Wind
+    
     Args:
         index_code (str): 指数代码，如'000300.SH'(沪深300)
         date (str, optional): 查询日期，默认为当前日期
+        service (WindService, optional): 调用Wind的数据服务，默认为进程内默认服务
         
     Returns:
         list: 成分股代码列表
@@ -69,17 +101,9 @@ def get_index_constituents(index_code, date=None):
         if not date:
             date = datetime.now().strftime('%Y-%m-%d')
             
-        # 调用Wind API获取指数成分股
-        result = w.wset("indexconstituent", f"date={date};windcode={index_code}")
-        
-        # 检查返回结果
-        if result.ErrorCode != 0:
-            logger.error(f"获取指数成分股失败: {result.ErrorCode}")
-            return []
-            
-        # 获取成分股代码
-        constituents = result.Data[1]  # 第2列是成分股代码
-        return constituents
+        # 从时点存储查询，必要时调用Wind API获取
+        return get_default_pit_store().constituents(index_code, date, _index_members_loader(service),
+                                                    _index_changes_loader(service))
     
     except Exception as e:
         logger.error(f"获取指数成分股异常: {str(e)}")
@@ -142,14 +166,32 @@ def calculate_technical_indicators(price_data, ma_periods=[5, 10, 20, 60]):
         logger.error(f"计算技术指标异常: {str(e)}")
         return price_data
 
-def get_fundamental_data(codes, fields, date=None):
+def _split(values):
+    """将逗号分隔的字符串或列表转换为列表"""
+    if isinstance(values, str):
+        values = values.split(',')
+    return [v.strip() for v in values if v.strip()]
+
+def _snapshot_loader(options, error_name, service=None):
+    """调用w.wss获取截面数据，作为截面缓存的加载函数"""
+    def loader(codes, fields):
+        result = _call(service, 'wss', ','.join(codes), ','.join(fields), options)
+        if result.ErrorCode != 0:
+            raise Exception(f"获取{error_name}失败: {result.ErrorCode}")
+        return pd.DataFrame(result.Data, index=result.Fields, columns=result.Codes).T
+    return loader
+
+def get_fundamental_data(codes, fields, date=None, service=None):
     """
     获取基本面数据
     
+    同一交易日已获取过的(证券, 字段)从本地截面缓存读取，只向Wind补取缺失部分
+    
     Args:
         codes (str or list): 证券代码，如'000001.SZ'或['000001.SZ', '600000.SH']
         fields (str or list): 字段列表，如'pe_ttm,pb,ps_ttm'
         date (str, optional): 查询日期，默认为当前日期
+        service (WindService, optional): 调用Wind的数据服务，默认为进程内默认服务
         
     Returns:
         pandas.DataFrame: 基本面数据
@@ -159,29 +201,26 @@ def get_fundamental_data(codes, fields, date=None):
         if not date:
             date = datetime.now().strftime('%Y-%m-%d')
             
-        # 调用Wind API获取基本面数据
-        result = w.wss(codes, fields, f"tradeDate={date}")
-        
-        # 检查返回结果
-        if result.ErrorCode != 0:
-            logger.error(f"获取基本面数据失败: {result.ErrorCode}")
-            return pd.DataFrame()
-            
-        # 将结果转换为DataFrame
-        df = pd.DataFrame(result.Data, index=result.Fields, columns=result.Codes).T
-        return df
+        # 从截面缓存读取，缺失部分调用Wind API获取；日期统一格式作为缓存键
+        date = pd.Timestamp(date).strftime('%Y-%m-%d')
+        loader = _snapshot_loader(f"tradeDate={date}", '基本面数据', service)
+        return get_default_snapshot_store().get_frame(_split(codes), _split(fields), date, '', loader)
     
     except Exception as e:
         logger.error(f"获取基本面数据异常: {str(e)}")
         return pd.DataFrame()
 
-def get_industry_classification(codes, classification_standard='sw'):
+def get_industry_classification(codes, classification_standard='sw', date=None, service=None):
     """
     获取行业分类
     
+    行业分类从本地时点存储中查询，同一证券两次查询结果相同时其间的日期都无需访问Wind
+    
     Args:
         codes (str or list): 证券代码，如'000001.SZ'或['000001.SZ', '600000.SH']
         classification_standard (str, optional): 行业分类标准，默认为'sw'(申万)
+        date (str, optional): 查询日期，默认为当前日期
+        service (WindService, optional): 调用Wind的数据服务，默认为进程内默认服务
         
     Returns:
         pandas.DataFrame: 行业分类数据
@@ -196,18 +235,22 @@ def get_industry_classification(codes, classification_standard='sw'):
         
         options = classification_map.get(classification_standard.lower(), 'industryType=1')
         
-        # 调用Wind API获取行业分类
-        result = w.wss(codes, "industry_sw", options)
+        def load_labels(code_list, label_date):
+            # 调用Wind API获取某日的行业分类
+            result = _call(service, 'wss', ','.join(code_list), "industry_sw", f"{options};tradeDate={label_date}")
+            if result.ErrorCode != 0:
+                raise Exception(f"获取行业分类失败: {result.ErrorCode}")
+            return result.Data[0]
+        
+        # 从时点存储查询，缺失部分调用Wind API获取
+        code_list = [code.upper() for code in _split(codes)]
+        industries = get_default_pit_store().industry(code_list, date or datetime.now().strftime('%Y-%m-%d'),
+                                                      classification_standard.lower(), load_labels)
         
-        # 检查返回结果
-        if result.ErrorCode != 0:
-            logger.error(f"获取行业分类失败: {result.ErrorCode}")
-            return pd.DataFrame()
-            
         # 将结果转换为DataFrame
         df = pd.DataFrame({
-            'code': result.Codes,
-            'industry': result.Data[0]
+            'code': code_list,
+            'industry': industries
         })
         
         return df